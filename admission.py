@@ -0,0 +1,274 @@
+# --- START OF FILE admission.py ---
+"""Admission control dan load shedding untuk jalur chat (/predict, /predict_stream, /predict_batch).
+
+Tiga lapis pemeriksaan sebelum giliran chat (dan inferensi NLU) dijalankan:
+  1. Umur antrean: jika proxy mengirim header X-Request-Start dan request sudah menunggu
+     lebih lama dari batasnya (misal di backlog gunicorn), langsung ditolak.
+  2. Token bucket per klien (key: sid session, atau IP jika belum ada session).
+  3. Batas request in-flight per proses dengan antrean tunggu terbatas; request yang tidak
+     mendapat slot sebelum tenggatnya ditolak.
+
+Penolakan dilaporkan lewat AdmissionRejected (alasan + Retry-After dalam detik) dan
+dijawab 503 secara cepat oleh route, daripada membuat semua request menunggu sampai timeout.
+Semua batas berlaku per proses worker.
+"""
+
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class AdmissionRejected(Exception):
+    """Request ditolak admission control. `reason` untuk metrik/log, `retry_after` (detik) untuk header."""
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__(f"Request ditolak admission control ({reason}).")
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucketLimiter:
+    """Token bucket per key: `rate` token per detik, kapasitas `burst`.
+
+    Bucket disimpan dalam LRU berukuran `max_clients`; bucket klien lama dibuang
+    (klien tersebut mendapat bucket penuh lagi saat kembali).
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_clients = max(1, int(max_clients))
+        self._buckets = OrderedDict() # key -> [token, waktu update terakhir]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, now=None):
+        """Ambil satu token. Mengembalikan 0.0 jika berhasil, atau detik sampai token berikutnya tersedia."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class InFlightLimiter:
+    """Batas request yang diproses bersamaan (thread), dengan antrean tunggu terbatas dan tenggat per request."""
+
+    def __init__(self, max_in_flight, max_queue):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        """Tunggu slot paling lama `timeout` detik. Mengembalikan None jika dapat, atau alasan penolakan."""
+        with self._cond:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                self.in_flight += 1
+                return None
+            if self.waiting >= self.max_queue:
+                return "queue_full"
+            self.waiting += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if self.in_flight >= self.max_in_flight:
+                            return "wait_timeout"
+                self.in_flight += 1
+                return None
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+
+class AsyncInFlightLimiter:
+    """Sama dengan InFlightLimiter untuk satu event loop asyncio (mode ASGI); tidak thread-safe."""
+
+    def __init__(self, max_in_flight, max_queue):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self, timeout):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return None # Slot sudah dipindahkan ke request ini oleh release()
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return None # Slot diberikan tepat saat tenggat habis
+            waiter.cancel()
+            return "wait_timeout"
+        except asyncio.CancelledError:
+            # Request dibatalkan (klien putus) saat menunggu; kembalikan slot jika sempat diberikan
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            with contextlib.suppress(ValueError):
+                self._waiters.remove(waiter)
+
+    def release(self):
+        # Slot langsung diserahkan ke penunggu pertama yang masih aktif (in_flight tidak berubah)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    """Gabungan token bucket per klien, batas in-flight, dan batas umur antrean.
+
+    Args:
+        rate (float): Token per detik per klien; 0 menonaktifkan token bucket.
+        burst (int): Kapasitas bucket (request beruntun yang boleh lewat sekaligus).
+        max_in_flight (int): Maks giliran chat yang diproses bersamaan per proses; 0 = tanpa batas.
+        max_queue (int): Maks request yang menunggu slot in-flight.
+        wait_timeout_s (float): Tenggat menunggu slot (dihitung sejak request diterima).
+        max_queue_age_s (float): Umur maks request menurut X-Request-Start; 0 = tidak dicek.
+        max_clients (int): Jumlah bucket klien yang disimpan (LRU).
+    """
+
+    def __init__(self, rate=2.0, burst=10, max_in_flight=0, max_queue=32, wait_timeout_s=2.0,
+                 max_queue_age_s=0.0, max_clients=10000):
+        self.rate_limiter = TokenBucketLimiter(rate, burst, max_clients) if rate > 0 else None
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.wait_timeout_s = wait_timeout_s
+        self.max_queue_age_s = max_queue_age_s
+        self.in_flight = InFlightLimiter(max_in_flight, max_queue) if max_in_flight > 0 else None
+        self._async_in_flight = None
+        self._stats_lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = {}
+
+    def _reject(self, reason, retry_after):
+        with self._stats_lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        raise AdmissionRejected(reason, retry_after)
+
+    def check(self, client_key, queued_s=None):
+        """Pemeriksaan cepat sebelum menunggu slot: umur antrean dan token bucket klien."""
+        if self.max_queue_age_s and queued_s is not None and queued_s > self.max_queue_age_s:
+            self._reject("queue_age", 1)
+        if self.rate_limiter is not None:
+            wait_s = self.rate_limiter.acquire(client_key)
+            if wait_s > 0:
+                self._reject("rate_limited", wait_s)
+
+    def _slot_timeout(self, queued_s):
+        return max(0.0, self.wait_timeout_s - (queued_s or 0.0))
+
+    @contextlib.contextmanager
+    def slot(self, client_key, queued_s=None):
+        """Context manager (worker sync/thread): check() lalu tunggu slot in-flight. Raise AdmissionRejected jika ditolak."""
+        self.check(client_key, queued_s)
+        if self.in_flight is not None:
+            reason = self.in_flight.acquire(self._slot_timeout(queued_s))
+            if reason:
+                self._reject(reason, self.wait_timeout_s)
+        with self._stats_lock:
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            if self.in_flight is not None:
+                self.in_flight.release()
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, client_key, queued_s=None):
+        """Versi asyncio dari slot() untuk mode ASGI (satu event loop per proses)."""
+        self.check(client_key, queued_s)
+        limiter = None
+        if self.max_in_flight > 0:
+            if self._async_in_flight is None:
+                self._async_in_flight = AsyncInFlightLimiter(self.max_in_flight, self.max_queue)
+            limiter = self._async_in_flight
+            reason = await limiter.acquire(self._slot_timeout(queued_s))
+            if reason:
+                self._reject(reason, self.wait_timeout_s)
+        with self._stats_lock:
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    def stats(self):
+        limiter = self.in_flight or self._async_in_flight
+        with self._stats_lock:
+            return {
+                "enabled": True,
+                "rate_per_client": self.rate_limiter.rate if self.rate_limiter else None,
+                "burst": self.rate_limiter.burst if self.rate_limiter else None,
+                "tracked_clients": len(self.rate_limiter) if self.rate_limiter else 0,
+                "max_in_flight": self.max_in_flight or None,
+                "max_queue": self.max_queue,
+                "in_flight": limiter.in_flight if limiter else None,
+                "waiting": limiter.waiting if limiter else None,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+            }
+
+
+def parse_request_start(header_value, now=None):
+    """Detik sejak request diterima proxy menurut header X-Request-Start ("t=<epoch>" dalam s/ms/µs).
+
+    None jika header kosong atau tidak bisa dibaca.
+    """
+    if not header_value:
+        return None
+    value = header_value.strip()
+    if value.startswith("t="):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # Satuan ditebak dari besarnya angka (nginx: detik.milidetik, Heroku/Render: ms, sebagian: µs)
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+# --- END OF FILE admission.py ---
@@ -1,27 +1,117 @@
 # --- START OF CLEANED FILE app.py ---
+import time
+_IMPORT_STARTED_AT = time.perf_counter() # Awal startup, dipakai untuk timing tahap 'import_libraries'
 import spacy
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session, stream_with_context
 from markupsafe import escape
 import random
 import os
 import secrets
 import json
+import threading
 import traceback
 import re
-from spacy.matcher import PhraseMatcher
-import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import lru_cache
 
 # --- Import Logic Handler ---
 import intent_logic
+from admission import AdmissionController, AdmissionRejected, parse_request_start
+from data_store import DataSource, DataStore
+from fuzzy_entities import MAX_EDIT_DISTANCE, FuzzyEntityIndex, entity_terms
+from jadwal_index import build_jadwal_indexes
+from nlu_batcher import MicroBatcher
+from nlu_cache import NLUResultCache
+from nlu_cascade import CascadeTextcat, load_cascade_config
+from metrics import MetricsRegistry
+from nlu_server import NLUClient, NLUServerError
+from response_cache import ResponseCache
+from serving_bundle import BundleError, ServingBundle, build_phrase_matcher, compile_entity_patterns
+from session_store import CLARIFICATION_STATE, create_session_store, make_clarification_record
+from structured_log import LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_RATE, get_logger, logging_stats
 
 # --- KONFIGURASI APLIKASI ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, "intent_model_ft_v2")
 DATA_DIR = os.path.join(BASE_DIR, 'data')
+# Bundle serving satu file (build_bundle.py): model, pola PhraseMatcher, dan data/ dalam satu artefak
+# bercek-sum. Jika diset, MODEL_DIR dan file data/ tidak dibaca saat startup; bundle yang tidak valid
+# dilaporkan di /readyz dan startup kembali memakai MODEL_DIR + DATA_DIR.
+SERVING_BUNDLE = os.environ.get('SERVING_BUNDLE', '')
+SERVING_BUNDLE_VERIFY = os.environ.get('SERVING_BUNDLE_VERIFY', '1') == '1' # Cek sha256 semua section saat dibuka
 
 CONFIDENCE_THRESHOLD = 0.5
 ENABLE_INTENT_DISAMBIGUATION = True
 DISAMBIGUATION_MARGIN = 0.15
+MAX_INPUT_LENGTH = 500
+NLU_BATCH_SIZE = int(os.environ.get('NLU_BATCH_SIZE', 32)) # Ukuran batch nlp.pipe untuk /predict_batch
+MAX_BATCH_TEXTS = int(os.environ.get('MAX_BATCH_TEXTS', 256)) # Batas jumlah teks per request /predict_batch
+STREAM_CHUNK_CHARS = int(os.environ.get('STREAM_CHUNK_CHARS', 400)) # Ukuran maks satu chunk jawaban di /predict_stream
+# Coalescer: gabungkan request /predict yang datang bersamaan menjadi satu nlp.pipe (berguna untuk gunicorn --threads)
+ENABLE_NLU_COALESCER = os.environ.get('NLU_COALESCE', '0') == '1'
+NLU_COALESCE_MAX_BATCH = int(os.environ.get('NLU_COALESCE_MAX_BATCH', 16))
+NLU_COALESCE_MAX_WAIT_MS = float(os.environ.get('NLU_COALESCE_MAX_WAIT_MS', 5))
+NLU_COALESCE_TIMEOUT_S = 10.0
+# Cache hasil NLU per teks (LRU + TTL); NLU_CACHE_SIZE=0 untuk menonaktifkan
+NLU_CACHE_SIZE = int(os.environ.get('NLU_CACHE_SIZE', 2048))
+NLU_CACHE_TTL_S = float(os.environ.get('NLU_CACHE_TTL_S', 3600))
+# Komponen 'ner' hanya dipakai untuk nama (PERSON). 'conditional': textcat dijalankan dulu, lalu 'ner' pada Doc
+# yang sama hanya jika skor provide_name >= NER_GATE_MIN_SCORE atau teks memuat frasa perkenalan; 'always': textcat+ner
+NER_MODE = os.environ.get('NER_MODE', 'conditional').lower()
+NER_GATE_MIN_SCORE = float(os.environ.get('NER_GATE_MIN_SCORE', 0.05))
+# Cascade textcat (nlu_cascade.py): sub-model linear (BOW) dulu, ensemble penuh hanya jika selisih skor teratas
+# dan kedua < margin. Margin dibaca dari <MODEL_DIR>/cascade.json (calibrate_cascade.py) atau NLU_CASCADE_MARGIN;
+# tanpa keduanya cascade tidak aktif. NLU_CASCADE=0 untuk menonaktifkan.
+NLU_CASCADE = os.environ.get('NLU_CASCADE', '1') == '1'
+NLU_CASCADE_MARGIN = os.environ.get('NLU_CASCADE_MARGIN', '')
+# Cache respons handler intent deterministik per versi data; HANDLER_CACHE_SIZE=0 untuk menonaktifkan
+HANDLER_CACHE_SIZE = int(os.environ.get('HANDLER_CACHE_SIZE', 1024))
+# Entitas tahan typo (fuzzy_entities.py): nama prodi/lab/matkul dalam jarak edit 1-2 dari terms.json dan
+# data jadwal ditambahkan ke hasil NLU setelah PhraseMatcher (PRODI/LAB) dan sebagai entitas MATKUL
+FUZZY_ENTITIES = os.environ.get('FUZZY_ENTITIES', '1') == '1'
+FUZZY_MAX_DISTANCE = int(os.environ.get('FUZZY_MAX_DISTANCE', MAX_EDIT_DISTANCE))
+# Modul handler intent (paket intent_handlers) di-import saat intent-nya pertama kali muncul;
+# HANDLER_PRELOAD=1 mengimport semuanya saat startup (mis. sebelum fork gunicorn --preload)
+HANDLER_PRELOAD = os.environ.get('HANDLER_PRELOAD', '0') == '1'
+# Metrik latensi per tahap/intent di /metrics (format Prometheus); METRICS_ENABLED=0 untuk menonaktifkan
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_WINDOW = int(os.environ.get('METRICS_WINDOW', 1024)) # Sampel terakhir per seri untuk p50/p95/p99
+# Kategori akhir yang dihitung sebagai fallback (counter chatbot_fallbacks_total)
+FALLBACK_CATEGORY_PREFIXES = ("fallback", "unhandled", "handler_error", "nlu_system_", "internal_server_error")
+# Admission control (admission.py) per proses worker: token bucket per klien (sid/IP) + batas giliran chat
+# yang diproses bersamaan dengan antrean tunggu terbatas. Request yang ditolak dijawab cepat 503 + Retry-After.
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 2)) # Token per detik per klien; 0 = tanpa token bucket
+ADMISSION_BURST = int(os.environ.get('ADMISSION_BURST', 10))
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 8)) # 0 = tanpa batas
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 32))
+ADMISSION_WAIT_TIMEOUT_S = float(os.environ.get('ADMISSION_WAIT_TIMEOUT_S', 2))
+# Umur maks request menurut header X-Request-Start dari proxy (menunggu di backlog gunicorn); 0 = tidak dicek
+ADMISSION_MAX_QUEUE_AGE_S = float(os.environ.get('ADMISSION_MAX_QUEUE_AGE_S', 0))
+# Jumlah reverse proxy tepercaya yang menambahkan X-Forwarded-For (0 = header diabaikan, pakai alamat koneksi).
+# Alamat klien diambil dari hop ke-N dari kanan; hop paling kiri bisa diisi bebas oleh klien.
+TRUSTED_PROXY_HOPS = max(0, int(os.environ.get('TRUSTED_PROXY_HOPS', 0)))
+# Server NLU terpisah (nlu_server.py) lewat Unix socket; kosong = model dimuat di proses ini.
+# Jika server tidak bisa dihubungi, NLU jatuh kembali ke model in-process (dimuat saat dibutuhkan).
+NLU_SERVER_SOCKET = os.environ.get('NLU_SERVER_SOCKET', '')
+NLU_SERVER_POOL_SIZE = int(os.environ.get('NLU_SERVER_POOL_SIZE', 4))
+NLU_SERVER_TIMEOUT_S = float(os.environ.get('NLU_SERVER_TIMEOUT_S', 5))
+NLU_SERVER_CONNECT_WAIT_S = float(os.environ.get('NLU_SERVER_CONNECT_WAIT_S', 10))
+NLU_SERVER_RETRY_S = float(os.environ.get('NLU_SERVER_RETRY_S', 5)) # Jeda sebelum server yang gagal dicoba lagi
+# Muat model di worker ini jika server NLU mati; '0' menjaga memori worker tetap kecil (NLU tidak aktif sampai server kembali)
+NLU_LOCAL_FALLBACK = os.environ.get('NLU_LOCAL_FALLBACK', '1') == '1'
+# 'eager': model dimuat saat import (wajib untuk gunicorn preload); 'lazy': model dimuat di thread background
+# sehingga /healthz langsung bisa menjawab dan /readyz baru 200 setelah model + warm-up selesai
+APP_STARTUP_MODE = os.environ.get('APP_STARTUP_MODE', 'eager').lower()
+WARMUP_TEXTS = ["halo", "berapa spp teknik informatika", "jadwal kuliah teknik sipil hari senin", "info lab hidrolika"]
+# State dialog (klarifikasi intent) disimpan di server; cookie hanya berisi sid + nama user.
+# 'sqlite' bisa dibagi antar worker gunicorn di satu mesin; 'memory' hanya untuk satu proses.
+SESSION_STORE_BACKEND = os.environ.get('SESSION_STORE', 'sqlite')
+# Default di folder instance/ aplikasi (bukan /tmp yang bisa ditulis semua user); file dibuat 0600
+SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH') or os.path.join(BASE_DIR, 'instance', 'sessions.sqlite3')
+SESSION_TTL_S = float(os.environ.get('SESSION_TTL_S', 1800))
+# Polling perubahan file di data/ (detik); 0 untuk menonaktifkan hot-reload
+DATA_RELOAD_INTERVAL_S = float(os.environ.get('DATA_RELOAD_INTERVAL_S', 5))
 INTENT_DESCRIPTIONS = {
     "info_spp_ft": "Informasi biaya SPP (kuliah per semester)",
     "info_biaya_pmb": "Informasi biaya awal terkait pendaftaran mahasiswa baru (PMB)",
@@ -49,7 +139,7 @@ PLACEHOLDER_CONFIG = {
     "CONFIDENCE_THRESHOLD": CONFIDENCE_THRESHOLD,
 }
 
-DOMAIN_KEYWORDS = set([
+DOMAIN_KEYWORDS = frozenset([
     "fakultas", "teknik", "unanda", "andi djemma", "informatika", "if", "ti",
     "sipil", "ts", "tambang", "pertambangan", "prodi", "jurusan",
     "lab", "laboratorium", "praktikum", "jadwal", "kuliah", "kelas", "dosen",
@@ -60,7 +150,7 @@ DOMAIN_KEYWORDS = set([
     "fasilitas", "website", "link", "kurikulum", "silabus", "kaprodi", "dekan",
     # Tambahkan keyword domain lain jika relevan
 ])
-OOS_KEYWORDS = set([
+OOS_KEYWORDS = frozenset([
     "cuaca", "resep", "masak", "film", "bioskop", "politik", "bola", "sepakbola",
     "musik", "lagu", "liburan", "jalan-jalan", "traveling", "saham", "investasi",
     "gempa", "berita", "koran", "covid", "corona", "rekomendasi", "resto", "cafe",
@@ -71,135 +161,223 @@ OOS_KEYWORDS = set([
 ])
 MIN_LEN_FOR_NO_DOMAIN_OOS = 4 # Minimal panjang input tanpa keyword domain untuk dianggap OOS potensial
 
+# Log jalur request lewat antrean + thread penulis (JSON lines); atur dengan LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE
+logger = get_logger("app")
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'ganti-ini-dengan-kunci-rahasia-acak-yang-aman-' + secrets.token_hex(16)) # PENTING: Ganti secret key ini di produksi
 
-# --- Helper Functions for Loading Data ---
-def load_json_data(filename):
-    """Memuat data dari file JSON di DATA_DIR."""
-    filepath = os.path.join(DATA_DIR, filename)
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"INFO: Data '{filename}' berhasil dimuat.")
-        return data
-    except FileNotFoundError:
-        print(f"ERROR: File data '{filepath}' tidak ditemukan.")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"ERROR: File data '{filepath}' bukan JSON valid. Kesalahan: {e}")
-        return {}
-    except Exception as e:
-        print(f"ERROR: Terjadi kesalahan lain saat memuat '{filepath}': {e}")
-        traceback.print_exc()
-        return {}
+# --- Status & Timing Startup (untuk /healthz, /readyz) ---
+STARTUP_STATE = {
+    "mode": APP_STARTUP_MODE,
+    "ready": False,
+    "error": None,
+    "started_at": time.time(),
+    "ready_at": None,
+    "stages_ms": {"import_libraries": round((time.perf_counter() - _IMPORT_STARTED_AT) * 1000, 1)},
+}
 
-def load_text_data(filename):
-    """Memuat data dari file teks di DATA_DIR."""
-    filepath = os.path.join(DATA_DIR, filename)
+@contextmanager
+def startup_stage(name):
+    """Catat durasi satu tahap startup ke STARTUP_STATE['stages_ms']."""
+    stage_start = time.perf_counter()
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content_data = f.read()
-        print(f"INFO: Teks '{filename}' berhasil dimuat.")
-        return content_data
-    except FileNotFoundError:
-        error_msg = f"Konten panduan '{os.path.basename(filepath)}' tidak ditemukan."
-        print(f"ERROR: File teks '{filepath}' tidak ditemukan.")
-        return error_msg
-    except Exception as e:
-        error_msg = f"Terjadi kesalahan saat memuat panduan '{os.path.basename(filepath)}'."
-        print(f"ERROR: Terjadi kesalahan saat memuat '{filepath}': {e}")
-        traceback.print_exc()
-        return error_msg
-
+        yield
+    finally:
+        elapsed_ms = round((time.perf_counter() - stage_start) * 1000, 1)
+        STARTUP_STATE["stages_ms"][name] = elapsed_ms
+        print(f"INFO: Tahap startup '{name}' selesai dalam {elapsed_ms} ms.")
+
+# --- Validasi Data (dipakai saat reload; data yang tidak valid tidak dipasang) ---
+def _validate_dict(data):
+    if not isinstance(data, dict) or not data:
+        raise ValueError("isi file harus object JSON yang tidak kosong")
+
+def _validate_jadwal(data):
+    _validate_dict(data)
+    if not isinstance(data.get("jadwal_kuliah"), dict):
+        raise ValueError("key 'jadwal_kuliah' tidak ada atau bukan object")
+
+def _validate_spp(data):
+    _validate_dict(data)
+    for prodi, per_angkatan in data.items():
+        if not isinstance(per_angkatan, dict) or not all(isinstance(v, (int, float)) for v in per_angkatan.values()):
+            raise ValueError(f"biaya SPP '{prodi}' harus berupa mapping angkatan -> angka")
+
+def _validate_terms(data):
+    _validate_dict(data)
+    for section in ("prodi", "lab"):
+        if not isinstance(data.get(section), dict):
+            raise ValueError(f"key '{section}' tidak ada atau bukan object")
+
+def _validate_text(data):
+    if not isinstance(data, str) or not data.strip():
+        raise ValueError("file teks kosong")
+
+DATA_SOURCES = [
+    DataSource('FT_FEES', 'ft_fees.json', validator=_validate_dict),
+    DataSource('PMB_INFO', 'pmb_info.json', validator=_validate_dict),
+    DataSource('LEARNING_CONTENT', 'learning_content.json', validator=_validate_dict),
+    DataSource('SPP_DATA', 'spp_data.json', validator=_validate_spp),
+    DataSource('TERMS_DATA', 'terms.json', validator=_validate_terms),
+    DataSource('JADWAL_TI_DATA', 'jadwal_ti.json', validator=_validate_jadwal),
+    DataSource('JADWAL_SIPIL_DATA', 'jadwal_sipil.json', validator=_validate_jadwal),
+    DataSource('JADWAL_TAMBANG_DATA', 'jadwal_tambang.json', validator=_validate_jadwal),
+    DataSource('KRS_SEVIMA_GUIDE', 'krs_guide.txt', kind='text', validator=_validate_text),
+    DataSource('PAYMENT_SEVIMA_TOKOPEDIA_GUIDE', 'payment_guide.txt', kind='text', validator=_validate_text),
+]
+
+
+# --- Bundle Serving (opsional) ---
+serving_bundle = None
+STARTUP_STATE["bundle"] = None
+if SERVING_BUNDLE:
+    with startup_stage("open_bundle"):
+        try:
+            serving_bundle = ServingBundle.open(SERVING_BUNDLE, verify=SERVING_BUNDLE_VERIFY)
+            STARTUP_STATE["bundle"] = serving_bundle.info()
+            print(f"INFO: Bundle serving '{SERVING_BUNDLE}' dibuka (content_hash {serving_bundle.content_hash}, "
+                  f"dibangun {serving_bundle.header.get('built_at')}, pid {os.getpid()}).")
+        except (OSError, BundleError) as e:
+            print(f"ERROR: Bundle serving '{SERVING_BUNDLE}' tidak bisa dipakai ({e}); memakai MODEL_DIR dan DATA_DIR.")
+            STARTUP_STATE["bundle"] = {"path": SERVING_BUNDLE, "content_hash": None, "error": str(e)}
 
 # --- Muat Semua Data Eksternal & Buat Config ---
 print("\n--- Memuat Data Eksternal ---")
-APP_CONFIG = {}
-APP_CONFIG.update(PLACEHOLDER_CONFIG)
-APP_CONFIG['FT_FEES'] = load_json_data('ft_fees.json')
-APP_CONFIG['PMB_INFO'] = load_json_data('pmb_info.json')
-APP_CONFIG['LEARNING_CONTENT'] = load_json_data('learning_content.json')
-APP_CONFIG['SPP_DATA'] = load_json_data('spp_data.json')
-APP_CONFIG['TERMS_DATA'] = load_json_data('terms.json')
-APP_CONFIG['JADWAL_TI_DATA'] = load_json_data('jadwal_ti.json')
-APP_CONFIG['JADWAL_SIPIL_DATA'] = load_json_data('jadwal_sipil.json') # <<<--- ADDED
-APP_CONFIG['JADWAL_TAMBANG_DATA'] = load_json_data('jadwal_tambang.json') # <<<--- ADDED
-APP_CONFIG['KRS_SEVIMA_GUIDE'] = load_text_data('krs_guide.txt')
-APP_CONFIG['PAYMENT_SEVIMA_TOKOPEDIA_GUIDE'] = load_text_data('payment_guide.txt')
-
-# Safely get TERMS data after loading for Matcher
-TERMS_DATA = APP_CONFIG.get('TERMS_DATA', {})
-PRODI_TERMS = TERMS_DATA.get('prodi', {})
-LAB_TERMS = TERMS_DATA.get('lab', {})
+DATA_STORE = DataStore(DATA_DIR, DATA_SOURCES, base_config=PLACEHOLDER_CONFIG, poll_interval=DATA_RELOAD_INTERVAL_S)
+
+def _build_jadwal_index_from_config(config):
+    jadwal_index = build_jadwal_indexes(config, intent_logic.JADWAL_PRODI_MAPPING)
+    print(f"INFO: Indeks jadwal dibangun untuk {len(jadwal_index)} prodi "
+          f"({sum(len(idx) for periods in jadwal_index.values() for idx in periods.values())} entri jadwal).")
+    return jadwal_index
+
+# Indeks jadwal hanya dibangun ulang jika salah satu file jadwal berubah
+DATA_STORE.add_derived('JADWAL_INDEX', _build_jadwal_index_from_config,
+                       depends_on=['JADWAL_TI_DATA', 'JADWAL_SIPIL_DATA', 'JADWAL_TAMBANG_DATA'])
+# Fragmen respons (Rupiah terformat, teks ter-escape, mapping prodi/lab) dikompilasi sekali per snapshot
+DATA_STORE.add_derived('RESPONSE_FRAGMENTS', intent_logic.compile_response_fragments,
+                       depends_on=['FT_FEES', 'PMB_INFO', 'SPP_DATA', 'LEARNING_CONTENT', 'TERMS_DATA',
+                                   'JADWAL_TI_DATA', 'JADWAL_SIPIL_DATA', 'JADWAL_TAMBANG_DATA'])
+def _build_fuzzy_index_from_config(config):
+    fuzzy_index = FuzzyEntityIndex(entity_terms(config), max_distance=FUZZY_MAX_DISTANCE)
+    stats = fuzzy_index.stats()
+    print(f"INFO: Indeks entitas fuzzy dibangun ({stats['phrases']} frasa, {stats['words']} kata, "
+          f"{stats['delete_variants']} varian hapus, jarak edit maks {FUZZY_MAX_DISTANCE}).")
+    return fuzzy_index
+
+# Dibangun setelah JADWAL_INDEX (nama matkul diambil dari indeks jadwal)
+if FUZZY_ENTITIES:
+    DATA_STORE.add_derived('FUZZY_ENTITIES', _build_fuzzy_index_from_config,
+                           depends_on=['TERMS_DATA', 'JADWAL_TI_DATA', 'JADWAL_SIPIL_DATA', 'JADWAL_TAMBANG_DATA'])
+with startup_stage("load_data"):
+    DATA_STORE.load_initial(preloaded=serving_bundle.data_files() if serving_bundle else None)
+
+def get_app_config():
+    """Snapshot config/data saat ini. Ambil sekali per request dan teruskan ke handler."""
+    return DATA_STORE.snapshot()
+
 print("--- Selesai Memuat Data Eksternal ---\n")
 
 # --- Memuat Model spaCy & Inisialisasi Matcher ---
-nlp = None
-matcher = None
-entity_details = {} # Initialize here, before the try block
-
-try:
-    print("--- Memuat Model NLP & Matcher ---")
-    if not os.path.exists(MODEL_DIR):
-        raise OSError(f"Direktori model '{MODEL_DIR}' tidak ditemukan.")
-    nlp = spacy.load(MODEL_DIR)
-    print(f"INFO: Model spaCy '{os.path.basename(MODEL_DIR)}' berhasil dimuat.")
-
-    # Initialize PhraseMatcher with case-insensitive matching
-    matcher = PhraseMatcher(nlp.vocab, attr='LOWER')
-    added_prodi_count = 0
-    if PRODI_TERMS and isinstance(PRODI_TERMS, dict):
-        for canonical, variations in PRODI_TERMS.items():
-            if not isinstance(variations, list): continue
-            # Create patterns only for valid strings and non-empty variations
-            patterns = [nlp.make_doc(text) for text in variations if isinstance(text, str) and text.strip()]
-            if patterns:
-                match_id = f"PRODI_{canonical.replace(' ', '_').replace('&', 'and').upper()}"
-                # Add patterns to the matcher
-                matcher.add(match_id, patterns)
-                entity_details[match_id] = {"label": "PRODI", "canonical": canonical}
-                added_prodi_count += len(patterns) # Count individual patterns added
-        print(f"INFO: Menambahkan {added_prodi_count} pola PRODI dari {len(PRODI_TERMS)} kanonikal ke PhraseMatcher.")
-    else:
-        print("WARNING: PRODI_TERMS kosong atau tidak valid. Deteksi prodi rules tidak aktif.")
-
-    added_lab_count = 0
-    if LAB_TERMS and isinstance(LAB_TERMS, dict):
-        for canonical, variations in LAB_TERMS.items():
-            if not isinstance(variations, list): continue
-            patterns = [nlp.make_doc(text) for text in variations if isinstance(text, str) and text.strip()]
-            if patterns:
-                safe_canonical = re.sub(r'\W+', '_', canonical) # Make key safer
-                match_id = f"LAB_{safe_canonical.upper()}"
-                matcher.add(match_id, patterns)
-                entity_details[match_id] = {"label": "LAB", "canonical": canonical}
-                added_lab_count += len(patterns) # Count individual patterns added
-        print(f"INFO: Menambahkan {added_lab_count} pola LAB dari {len(LAB_TERMS)} kanonikal ke PhraseMatcher.")
-    else:
-        print("WARNING: LAB_TERMS kosong atau tidak valid. Deteksi lab rules tidak aktif.")
+def build_entity_matcher(nlp_model, terms_data, entries=None):
+    """Bangun PhraseMatcher PRODI/LAB dari terms.json.
+
+    Args:
+        entries (list): Opsional, pola yang sudah dikompilasi (compile_entity_patterns, misal dari bundle);
+            jika None pola ditokenisasi dari terms_data.
+
+    Returns:
+        tuple: (matcher, entity_details) dengan entity_details match_id -> {"label", "canonical"}.
+    """
+    if entries is None:
+        entries = compile_entity_patterns(nlp_model, terms_data)
+    new_matcher, details = build_phrase_matcher(nlp_model.vocab, entries)
+    for label in ("PRODI", "LAB"):
+        label_entries = [entry for entry in entries if entry["label"] == label]
+        if label_entries:
+            print(f"INFO: Menambahkan {sum(len(entry['patterns']) for entry in label_entries)} pola {label} "
+                  f"dari {len(label_entries)} kanonikal ke PhraseMatcher.")
+        else:
+            print(f"WARNING: {label}_TERMS kosong atau tidak valid. Deteksi {label.lower()} rules tidak aktif.")
 
-    if matcher and (added_prodi_count > 0 or added_lab_count > 0):
-         print(f"INFO: PhraseMatcher diinisialisasi dengan total {len(matcher)} pola. Detail entitas: {len(entity_details)}")
-    elif matcher:
+    if entries:
+         print(f"INFO: PhraseMatcher diinisialisasi dengan total {len(new_matcher)} pola. Detail entitas: {len(details)}")
+    else:
          print(f"WARNING: PhraseMatcher diinisialisasi tetapi tidak ada pola yang ditambahkan dari TERMS_DATA.")
+    return new_matcher, details
+
+nlp = None
+textcat_cascade = None # CascadeTextcat untuk model yang sedang dimuat (None = textcat ensemble biasa)
+# (matcher, entity_details) disimpan sebagai satu tuple agar bisa di-swap atomik saat terms.json berubah
+matcher_state = (None, {})
+
+def load_nlp_components():
+    """Muat model spaCy dan bangun PhraseMatcher (tahap 'load_model' dan 'build_matcher')."""
+    global nlp, matcher_state, textcat_cascade
+    try:
+        print("--- Memuat Model NLP & Matcher ---")
+        with startup_stage("load_model"):
+            if serving_bundle:
+                loaded_nlp = serving_bundle.load_nlp()
+                print(f"INFO: Model spaCy dimuat dari bundle ({serving_bundle.header.get('model', {}).get('dir')}).")
+            else:
+                if not os.path.exists(MODEL_DIR):
+                    raise OSError(f"Direktori model '{MODEL_DIR}' tidak ditemukan.")
+                loaded_nlp = spacy.load(MODEL_DIR)
+                print(f"INFO: Model spaCy '{os.path.basename(MODEL_DIR)}' berhasil dimuat.")
+        with startup_stage("build_matcher"):
+            new_matcher_state = build_entity_matcher(loaded_nlp, get_app_config().get('TERMS_DATA', {}),
+                                                     entries=serving_bundle.entity_patterns() if serving_bundle else None)
+        new_cascade = build_textcat_cascade(loaded_nlp)
+        # Pasang matcher dan cascade lebih dulu agar request tidak pernah melihat nlp tanpa keduanya
+        matcher_state = new_matcher_state
+        textcat_cascade = new_cascade
+        nlp = loaded_nlp
+
+    except OSError as e:
+        print(f"FATAL ERROR: Tidak dapat memuat model spaCy dari '{SERVING_BUNDLE if serving_bundle else MODEL_DIR}'. {e}")
+        STARTUP_STATE["error"] = f"Model tidak dapat dimuat: {e}"
+        # Disable NLU functionality
+        nlp = None
+        matcher_state = (None, {})
+        textcat_cascade = None
+    except Exception as e:
+        print(f"FATAL ERROR lain saat memuat model/matcher atau menginisialisasi matcher: {e}")
+        traceback.print_exc()
+        STARTUP_STATE["error"] = f"Gagal memuat model/matcher: {e}"
+        # Disable NLU functionality
+        nlp = None
+        matcher_state = (None, {})
+        textcat_cascade = None
+    print("--- Selesai Memuat Model NLP & Matcher ---\n")
+
+def build_textcat_cascade(loaded_nlp):
+    """Bangun CascadeTextcat jika aktif dan margin terkalibrasi tersedia; None jika tidak."""
+    if not NLU_CASCADE or "textcat" not in loaded_nlp.pipe_names:
+        return None
+    if NLU_CASCADE_MARGIN:
+        margin, source = float(NLU_CASCADE_MARGIN), "NLU_CASCADE_MARGIN"
     else:
-         print("WARNING: PhraseMatcher tidak berhasil diinisialisasi.")
-
-except OSError as e:
-    print(f"FATAL ERROR: Tidak dapat memuat model spaCy dari '{MODEL_DIR}'. {e}")
-    # Disable NLU functionality
-    nlp = None
-    matcher = None
-    entity_details = {}
-except Exception as e:
-    print(f"FATAL ERROR lain saat memuat model/matcher atau menginisialisasi matcher: {e}")
-    traceback.print_exc()
-    # Disable NLU functionality
-    nlp = None
-    matcher = None
-    entity_details = {}
-print("--- Selesai Memuat Model NLP & Matcher ---\n")
+        cascade_config = serving_bundle.cascade_config() if serving_bundle else load_cascade_config(MODEL_DIR)
+        if cascade_config is None:
+            print("INFO: Cascade textcat tidak aktif (belum ada cascade.json; jalankan calibrate_cascade.py).")
+            return None
+        margin, source = float(cascade_config["margin"]), "cascade.json"
+    try:
+        cascade = CascadeTextcat(loaded_nlp.get_pipe("textcat"), margin, on_route=_count_cascade_routes)
+    except ValueError as e:
+        print(f"WARNING: Cascade textcat tidak aktif: {e}")
+        return None
+    print(f"INFO: Cascade textcat aktif (margin {margin} dari {source}).")
+    return cascade
+
+def _count_cascade_routes(fast, full):
+    """Hitung Doc yang dijawab jalur cepat (linear) vs ensemble penuh di metrik."""
+    if fast:
+        metrics.inc("textcat_cascade", fast, path="fast")
+    if full:
+        metrics.inc("textcat_cascade", full, path="full")
 
 
 # --- Helper Functions Lanjutan ---
@@ -224,99 +402,421 @@ def extract_model_person_name(doc):
                      return name_text
     return None
 
-def process_nlu(text):
-    """Proses teks input menggunakan model spaCy NLU dan PhraseMatcher."""
+# Pre-check murah sebelum NER: frasa perkenalan ("nama saya", "namaku", "panggil aku", "kenalkan", "saya adalah")
+NAME_HINT_PATTERN = re.compile(r"\b(?:nama\w*|panggil\w*|kenal\w*|(?:saya|aku|gua|gue)\s+adalah)\b")
+
+def should_run_ner(doc):
+    """True jika komponen 'ner' perlu dijalankan untuk Doc yang sudah melewati textcat.
+
+    NER hanya berguna saat pengguna mungkin menyebut nama: intent provide_name cukup mungkin
+    (skor >= NER_GATE_MIN_SCORE, tidak harus intent teratas) atau ada frasa perkenalan di teks.
+    """
+    if NER_MODE == 'always':
+        return True
+    run = doc.cats.get("provide_name", 0.0) >= NER_GATE_MIN_SCORE or NAME_HINT_PATTERN.search(doc.text) is not None
+    metrics.inc("ner_gate", decision="run" if run else "skipped")
+    return run
+
+def _empty_nlu_result():
+    """Struktur hasil NLU kosong (dipakai saat model belum siap atau terjadi error)."""
+    return {"doc": None, "intent": None, "score": 0.0, "entities": {"PERSON": None, "PRODI": [], "LAB": [], "MATKUL": []}, "all_intents": {}}
+
+def _fuzzy_index(config=None):
+    """Indeks entitas fuzzy dari snapshot config request (default: snapshot terbaru); None jika nonaktif."""
+    if not FUZZY_ENTITIES:
+        return None
+    return (config if config is not None else get_app_config()).get('FUZZY_ENTITIES')
+
+def _build_nlu_result(doc, text, fuzzy_index=None):
+    """Bangun hasil NLU (intent, skor, entitas) dari Doc spaCy yang sudah diproses pipeline.
+
+    fuzzy_index diambil dari snapshot request (lihat _fuzzy_index()), bukan dari snapshot terbaru,
+    agar entitas fuzzy konsisten dengan data yang dipakai handler walau data/ di-reload.
+    """
+    intents = doc.cats
+    top_intent = max(intents, key=intents.get) if intents else None
+    top_score = intents.get(top_intent, 0.0) if top_intent else 0.0
+
+    # Extract entities from model NER
+    ner_person = extract_model_person_name(doc)
+
+    # Extract entities using PhraseMatcher (rules) if matcher is initialized
+    detected_prodi_list, detected_lab_list = [], []
+    found_prodi_can, found_lab_can = set(), set() # Use sets to avoid duplicates
+    matcher, entity_details = matcher_state # Satu pasangan yang konsisten walau terms.json sedang di-reload
+    if matcher and entity_details: # Only run matcher if it's initialized and has patterns loaded
+        with metrics.stage("phrase_matcher"):
+            matches = matcher(doc)
+        # Sort matches by start index to handle overlapping or nested matches more predictably
+        sorted_matches = sorted(matches, key=lambda m: m[1])
+
+        for match_id_hash, start, end in sorted_matches:
+            string_id = nlp.vocab.strings[match_id_hash]
+            details = entity_details.get(string_id) # Use .get() for safety
+            if details:
+                label, canonical = details["label"], details["canonical"]
+                # Only add if the canonical form hasn't been added yet
+                if label == "PRODI" and canonical not in found_prodi_can:
+                    # Validate that the span matches the original text segment after lowercasing
+                    span_text = doc.text[start:end] # text is already lowercased
+                    original_span_text = text[start:end].lower() # Get original text part lowercased
+                    if span_text == original_span_text: # Basic check
+                        detected_prodi_list.append(canonical)
+                        found_prodi_can.add(canonical)
+                    else:
+                        logger.debug("Matcher span mismatch for PRODI %r (original part: %r) at [%s:%s]. Skipping.", span_text, original_span_text, start, end)
+
+                elif label == "LAB" and canonical not in found_lab_can:
+                    # Validate that the span matches the original text segment after lowercasing
+                    span_text = doc.text[start:end]
+                    original_span_text = text[start:end].lower()
+                    if span_text == original_span_text: # Basic check
+                        detected_lab_list.append(canonical)
+                        found_lab_can.add(canonical)
+                    else:
+                         logger.debug("Matcher span mismatch for LAB %r (original part: %r) at [%s:%s]. Skipping.", span_text, original_span_text, start, end)
+
+            # else: WARNING already printed during matcher init if entity_details is incomplete
+
+    # Sumber entitas tambahan: nama prodi/lab/matkul dengan typo (indeks deletion, lihat fuzzy_entities.py)
+    detected_matkul_list = []
+    if fuzzy_index is not None:
+        with metrics.stage("fuzzy_entities"):
+            fuzzy_matches = fuzzy_index.find(doc.text)
+        for match in fuzzy_matches:
+            label, canonical = match["label"], match["canonical"]
+            if label == "MATKUL":
+                if canonical not in detected_matkul_list:
+                    detected_matkul_list.append(canonical)
+                    if match["distance"]:
+                        metrics.inc("fuzzy_entities", label=label)
+            elif label == "PRODI" and canonical not in found_prodi_can:
+                detected_prodi_list.append(canonical)
+                found_prodi_can.add(canonical)
+                metrics.inc("fuzzy_entities", label=label)
+            elif label == "LAB" and canonical not in found_lab_can:
+                detected_lab_list.append(canonical)
+                found_lab_can.add(canonical)
+                metrics.inc("fuzzy_entities", label=label)
+
+    # Ensure entities dictionary is fully populated even if no entities found
+    entities_result = {"PERSON": ner_person, "PRODI": detected_prodi_list, "LAB": detected_lab_list, "MATKUL": detected_matkul_list}
+
+    return {
+        "doc": doc, # Keep doc for potential downstream use
+        "intent": top_intent,
+        "score": top_score,
+        "entities": entities_result,
+        "all_intents": intents # Return all scores for disambiguation
+    }
+
+def process_nlu(text, config=None):
+    """Proses teks input menggunakan model spaCy NLU dan PhraseMatcher.
+
+    config adalah snapshot get_app_config() milik request (default: snapshot terbaru); indeks
+    entitas fuzzy diambil dari snapshot ini.
+
+    Hasil untuk teks yang sama (setelah lowercase/strip) diambil dari cache jika ada.
+    Hasil dari cache tidak menyertakan Doc ("doc" bernilai None).
+    Jika coalescer aktif, teks digabung dengan request lain yang datang bersamaan
+    dan diproses dalam satu batch nlp.pipe.
+    Jika NLU_SERVER_SOCKET disetel, inferensi dijalankan di server NLU (nlu_server.py).
+    """
+    if nlu_cache and nlu_ready():
+        cached = nlu_cache.get(text.lower().strip())
+        if cached is not None:
+            return cached
+    return process_nlu_uncached(text, config)
+
+def process_nlu_uncached(text, config=None):
+    """process_nlu() tanpa lookup cache; hasil yang valid tetap disimpan ke cache.
+
+    Dipakai asgi.run_nlu() setelah lookup cache di event loop meleset, agar miss tidak dihitung dua kali.
+    """
+    result = None
+    if nlu_client is not None and nlu_client.available(NLU_SERVER_RETRY_S):
+        remote_results = _process_nlu_remote([text])
+        result = remote_results[0] if remote_results else None
+    if result is None and nlu_batcher and nlp:
+        try:
+            result = nlu_batcher.submit((text, _fuzzy_index(config)), timeout=NLU_COALESCE_TIMEOUT_S)
+        except Exception as e:
+            logger.error("NLU via coalescer gagal untuk %r: %s. Fallback ke proses langsung.", text, e)
+    if result is None:
+        result = _process_nlu_direct(text, config)
+
+    # Hanya simpan hasil yang valid (bukan hasil kosong karena error)
+    if nlu_cache and result.get("intent") is not None:
+        nlu_cache.put(text.lower().strip(), result)
+    return result
+
+def _run_pipeline(normalized_text):
+    """Sama dengan nlp(text), tetapi durasi tokenizer dan setiap komponen (textcat, ner) dicatat di metrik.
+
+    Komponen 'ner' dijalankan terakhir pada Doc yang sama, dan hanya jika should_run_ner() (NER_MODE=conditional).
+    Jika cascade aktif, langkah textcat dijalankan lewat CascadeTextcat.
+    """
+    cascade = textcat_cascade
+    if not metrics.enabled and NER_MODE == 'always' and cascade is None:
+        return nlp(normalized_text)
+    with metrics.stage("spacy_tokenizer"):
+        doc = nlp.make_doc(normalized_text)
+    ner = None
+    for name, proc in nlp.pipeline:
+        if name == "ner":
+            ner = proc
+            continue
+        if name == "textcat" and cascade is not None:
+            proc = cascade
+        with metrics.stage(f"spacy_{name}"):
+            doc = proc(doc)
+    if ner is not None and should_run_ner(doc):
+        with metrics.stage("spacy_ner"):
+            doc = ner(doc)
+    return doc
+
+def _process_nlu_direct(text, config=None):
+    """Jalankan pipeline spaCy untuk satu teks tanpa melalui coalescer."""
     normalized_text = text.lower().strip()
 
     # Check if NLU components are ready
     if not nlp:
-        print("WARNING: NLP model not ready. Returning empty NLU result.")
+        logger.warning("NLP model not ready. Returning empty NLU result.")
         # Ensure the returned dictionary structure is consistent
-        return {"doc": None, "intent": None, "score": 0.0, "entities": {"PERSON": None, "PRODI": [], "LAB": []}, "all_intents": {}}
+        return _empty_nlu_result()
 
     try:
-        doc = nlp(normalized_text)
-        intents = doc.cats
-        top_intent = max(intents, key=intents.get) if intents else None
-        top_score = intents.get(top_intent, 0.0) if top_intent else 0.0
-
-        # Extract entities from model NER
-        ner_person = extract_model_person_name(doc)
-
-        # Extract entities using PhraseMatcher (rules) if matcher is initialized
-        detected_prodi_list, detected_lab_list = [], []
-        found_prodi_can, found_lab_can = set(), set() # Use sets to avoid duplicates
-        if matcher and entity_details: # Only run matcher if it's initialized and has patterns loaded
-            matches = matcher(doc)
-            # Sort matches by start index to handle overlapping or nested matches more predictably
-            sorted_matches = sorted(matches, key=lambda m: m[1])
-
-            for match_id_hash, start, end in sorted_matches:
-                string_id = nlp.vocab.strings[match_id_hash]
-                details = entity_details.get(string_id) # Use .get() for safety
-                if details:
-                    label, canonical = details["label"], details["canonical"]
-                    # Only add if the canonical form hasn't been added yet
-                    if label == "PRODI" and canonical not in found_prodi_can:
-                        # Validate that the span matches the original text segment after lowercasing
-                        span_text = doc.text[start:end] # text is already lowercased
-                        original_span_text = text[start:end].lower() # Get original text part lowercased
-                        if span_text == original_span_text: # Basic check
-                            detected_prodi_list.append(canonical)
-                            found_prodi_can.add(canonical)
-                        else:
-                            print(f"DEBUG: Matcher span mismatch for PRODI '{span_text}' (original part: '{original_span_text}') at [{start}:{end}]. Skipping.")
-
-                    elif label == "LAB" and canonical not in found_lab_can:
-                        # Validate that the span matches the original text segment after lowercasing
-                        span_text = doc.text[start:end]
-                        original_span_text = text[start:end].lower()
-                        if span_text == original_span_text: # Basic check
-                            detected_lab_list.append(canonical)
-                            found_lab_can.add(canonical)
-                        else:
-                             print(f"DEBUG: Matcher span mismatch for LAB '{span_text}' (original part: '{original_span_text}') at [{start}:{end}]. Skipping.")
-
-                # else: WARNING already printed during matcher init if entity_details is incomplete
-
-        # Ensure entities dictionary is fully populated even if no entities found
-        entities_result = {"PERSON": ner_person, "PRODI": detected_prodi_list, "LAB": detected_lab_list}
-
-
-        return {
-            "doc": doc, # Keep doc for potential downstream use
-            "intent": top_intent,
-            "score": top_score,
-            "entities": entities_result,
-            "all_intents": intents # Return all scores for disambiguation
-        }
+        doc = _run_pipeline(normalized_text)
+        return _build_nlu_result(doc, text, _fuzzy_index(config))
     except Exception as e:
-        print(f"ERROR saat NLU: '{text}'. Kesalahan: {e}")
-        traceback.print_exc()
+        logger.error("NLU gagal untuk %r: %s", text, e, exc_info=True)
         # Return empty result but with the expected structure on error
-        return {"doc": None, "intent": None, "score": 0.0, "entities": {"PERSON": None, "PRODI": [], "LAB": []}, "all_intents": {}}
+        return _empty_nlu_result()
+
+def process_nlu_batch(texts, batch_size=None, config=None):
+    """Proses banyak teks sekaligus dengan nlp.pipe (textcat+ner dijalankan per batch).
+
+    Dengan NER_MODE=conditional, 'ner' hanya dijalankan (juga per batch) untuk Doc yang lolos should_run_ner().
+    Jika cascade aktif, hanya Doc yang ragu menurut model linear yang diproses ensemble textcat penuh.
+
+    Urutan hasil sama dengan urutan input dan setiap item memiliki struktur yang sama
+    dengan hasil process_nlu(); config berlaku untuk semua teks.
+    """
+    if not texts:
+        return []
+    if nlu_client is not None and nlu_client.available(NLU_SERVER_RETRY_S):
+        remote_results = _process_nlu_remote(texts)
+        if remote_results is not None:
+            return remote_results
+    return _process_nlu_batch_local(texts, [_fuzzy_index(config)] * len(texts), batch_size)
+
+def _process_nlu_coalesced(items):
+    """process_batch untuk MicroBatcher: item (teks, fuzzy_index) dari request berbeda, satu nlp.pipe.
+
+    Setiap request membawa indeks fuzzy dari snapshot-nya sendiri (lihat process_nlu()).
+    """
+    return _process_nlu_batch_local([text for text, _ in items], [index for _, index in items])
+
+def _process_nlu_batch_local(texts, fuzzy_indexes, batch_size=None):
+    """nlp.pipe in-process untuk process_nlu_batch(); fuzzy_indexes sejajar dengan texts."""
+    if not nlp:
+        logger.warning("NLP model not ready. Returning empty NLU results for batch.")
+        return [_empty_nlu_result() for _ in texts]
+
+    batch_size = batch_size or NLU_BATCH_SIZE
+    normalized_texts = [text.lower().strip() for text in texts]
+    try:
+        cascade = textcat_cascade
+        staged = ["ner"] if NER_MODE != 'always' and "ner" in nlp.pipe_names else []
+        if cascade is not None:
+            staged.append("textcat")
+        with metrics.stage("spacy_pipe_batch"):
+            docs = list(nlp.pipe(normalized_texts, batch_size=batch_size, disable=staged))
+            if cascade is not None:
+                docs = cascade.pipe(docs, batch_size=batch_size)
+            if "ner" in staged:
+                ner_indexes = [i for i, doc in enumerate(docs) if should_run_ner(doc)]
+                if ner_indexes:
+                    ner_docs = nlp.get_pipe("ner").pipe([docs[i] for i in ner_indexes], batch_size=batch_size)
+                    for i, doc in zip(ner_indexes, ner_docs):
+                        docs[i] = doc
+        return [_build_nlu_result(doc, text, fuzzy_index) for doc, text, fuzzy_index in zip(docs, texts, fuzzy_indexes)]
+    except Exception as e:
+        logger.error("NLU batch (%d teks) gagal: %s", len(texts), e, exc_info=True)
+        return [_empty_nlu_result() for _ in texts]
+
+def nlu_ready():
+    """True jika NLU bisa dipakai: model in-process sudah dimuat atau server NLU terakhir kali merespons."""
+    return nlp is not None or (nlu_client is not None and nlu_client.available(NLU_SERVER_RETRY_S))
+
+def _process_nlu_remote(texts):
+    """NLU lewat server NLU (request beruntun dalam satu koneksi). None jika server gagal.
+
+    Saat gagal, model in-process mulai dimuat di thread background (sekali, jika NLU_LOCAL_FALLBACK aktif);
+    selama itu request dijawab "sedang bersiap" alih-alih ikut menunggu spacy.load.
+    """
+    try:
+        with metrics.stage("nlu_remote"):
+            return nlu_client.process_batch(texts)
+    except NLUServerError as e:
+        NLU_FALLBACK_STATS["fallbacks"] += len(texts)
+        logger.warning("Server NLU %r gagal (%s); %s", NLU_SERVER_SOCKET, e,
+                       "memakai model in-process." if NLU_LOCAL_FALLBACK else "fallback in-process dinonaktifkan.")
+        _ensure_local_nlp()
+        return None
+
+def _ensure_local_nlp(background=True):
+    """Muat model in-process sebagai fallback server NLU (hanya sekali per proses).
+
+    background=True (jalur request): pemuatan berjalan di thread 'nlu-local-fallback' dan fungsi langsung kembali.
+    background=False (startup): pemuatan dijalankan di thread pemanggil.
+    """
+    if not NLU_LOCAL_FALLBACK:
+        return
+    with _local_nlp_lock:
+        if nlp is not None or NLU_FALLBACK_STATS["local_model"] is not None:
+            return
+        NLU_FALLBACK_STATS["local_model"] = "loading"
+    if background:
+        threading.Thread(target=_load_local_nlp, name="nlu-local-fallback", daemon=True).start()
+    else:
+        _load_local_nlp()
+
+def _load_local_nlp():
+    load_nlp_components()
+    NLU_FALLBACK_STATS["local_model"] = "loaded" if nlp is not None else "failed"
+
+def local_nlp_loading():
+    """True selama model fallback in-process sedang dimuat."""
+    return NLU_FALLBACK_STATS["local_model"] == "loading"
+
+nlu_client = NLUClient(NLU_SERVER_SOCKET, pool_size=NLU_SERVER_POOL_SIZE, timeout=NLU_SERVER_TIMEOUT_S) if NLU_SERVER_SOCKET else None
+# local_model: None (belum perlu), 'loading', 'loaded', atau 'failed'
+NLU_FALLBACK_STATS = {"fallbacks": 0, "local_model": None}
+_local_nlp_lock = threading.Lock()
+
+nlu_cache = NLUResultCache(
+    max_size=NLU_CACHE_SIZE, ttl_seconds=NLU_CACHE_TTL_S,
+    watch_paths=[SERVING_BUNDLE if serving_bundle else MODEL_DIR, os.path.join(DATA_DIR, 'terms.json')]
+) if NLU_CACHE_SIZE > 0 else None
+response_cache = ResponseCache(max_size=HANDLER_CACHE_SIZE) if HANDLER_CACHE_SIZE > 0 else None
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED, window=METRICS_WINDOW)
+metrics.describe("stage_latency_seconds", "Latensi per tahap /predict (OOS, NLU, komponen spaCy, PhraseMatcher, aturan nama, handler).")
+metrics.describe("request_latency_seconds", "Latensi total satu giliran chat per kategori intent akhir.")
+metrics.describe("requests", "Giliran chat per kategori intent akhir.")
+metrics.describe("oos", "Input yang ditolak heuristik out-of-scope, per alasan.")
+metrics.describe("disambiguation_prompts", "Jawaban yang meminta klarifikasi intent.")
+metrics.describe("fallbacks", "Jawaban fallback/error per kategori.")
+metrics.describe("textcat_cascade", "Teks per jalur cascade textcat: fast (model linear saja) atau full (ensemble).")
+metrics.describe("fuzzy_entities", "Entitas yang hanya ditemukan indeks fuzzy (typo/penulisan berbeda), per label.")
+metrics.describe("ner_gate", "Keputusan menjalankan komponen NER per teks (NER_MODE=conditional).")
+metrics.describe("admission_rejected", "Request yang ditolak admission control (503), per alasan.")
+
+admission = AdmissionController(
+    rate=ADMISSION_RATE, burst=ADMISSION_BURST, max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queue=ADMISSION_MAX_QUEUE,
+    wait_timeout_s=ADMISSION_WAIT_TIMEOUT_S, max_queue_age_s=ADMISSION_MAX_QUEUE_AGE_S,
+) if ADMISSION_ENABLED else None
+
+def _on_data_reloaded(old_snapshot, new_snapshot, changed_keys):
+    """Kosongkan cache respons; bangun ulang PhraseMatcher dan kosongkan cache NLU jika terms.json berubah."""
+    global matcher_state
+    # Cache respons juga terikat ke DATA_VERSION; dikosongkan di sini agar memori lama langsung dilepas
+    if response_cache:
+        response_cache.clear()
+    if 'TERMS_DATA' not in changed_keys and 'FUZZY_ENTITIES' not in changed_keys:
+        return
+    if nlp and 'TERMS_DATA' in changed_keys:
+        matcher_state = build_entity_matcher(nlp, new_snapshot.get('TERMS_DATA', {}))
+        logger.info("PhraseMatcher dibangun ulang karena terms.json berubah.")
+    # Dengan server NLU, matcher dibangun ulang di server; cache di worker ini tetap harus dikosongkan
+    # (juga jika hanya nama matkul di data jadwal yang berubah: entitas fuzzy ikut di-cache)
+    if nlu_cache:
+        nlu_cache.clear()
+
+DATA_STORE.subscribe(_on_data_reloaded)
+DATA_STORE.start_watching()
+
+nlu_batcher = MicroBatcher(
+    _process_nlu_coalesced, max_batch_size=NLU_COALESCE_MAX_BATCH, max_wait_ms=NLU_COALESCE_MAX_WAIT_MS
+) if ENABLE_NLU_COALESCER else None
+
+# --- Session Store (state dialog di sisi server) ---
+session_store = create_session_store(SESSION_STORE_BACKEND, ttl_seconds=SESSION_TTL_S, path=SESSION_STORE_PATH)
+
+def get_dialogue_state(sess=None):
+    """Ambil record state dialog untuk sesi ini (None jika tidak ada/kedaluwarsa).
+
+    sess default-nya session Flask; asgi.py mengirim session cookie-nya sendiri.
+    """
+    sess = session if sess is None else sess
+    sid = sess.get('sid')
+    return session_store.get(sid) if sid else None
+
+def ensure_session_id(sess=None):
+    """sid sesi ini; dibuat sekali per browser (halaman utama atau chat pertama) dan disimpan di cookie."""
+    sess = session if sess is None else sess
+    sid = sess.get('sid')
+    if not sid:
+        sid = secrets.token_urlsafe(16)
+        sess['sid'] = sid
+    return sid
+
+def save_dialogue_state(record, sess=None):
+    """Simpan record state dialog di bawah sid sesi ini."""
+    session_store.set(ensure_session_id(sess), record)
+
+def clear_dialogue_state(sess=None):
+    """Hapus state dialog sesi ini. Mengembalikan True jika ada state yang dihapus."""
+    sess = session if sess is None else sess
+    sid = sess.get('sid')
+    return session_store.delete(sid) if sid else False
 
 # --- OOS Helper Function ---
+@lru_cache(maxsize=8)
+def compile_oos_pattern(domain_kws, oos_kws):
+    """Kompilasi semua keyword OOS dan domain menjadi satu regex (sekali saja per set keyword).
+
+    Setiap alternatif dibungkus lookahead sehingga match tidak saling "memakan" teks:
+    satu kali finditer menemukan semua posisi keyword OOS maupun domain (word boundary).
+    Keyword OOS dicoba lebih dulu, dan keyword yang lebih panjang didahulukan.
+
+    Args:
+        domain_kws (frozenset): Keyword domain Fakultas Teknik.
+        oos_kws (frozenset): Keyword out-of-scope eksplisit.
+
+    Returns:
+        re.Pattern: Pola dengan group bernama 'oos' dan 'domain'.
+    """
+    def alternation(keywords):
+        return "|".join(re.escape(k) for k in sorted(keywords, key=lambda k: (-len(k), k)))
+    parts = []
+    if oos_kws:
+        parts.append(r'(?P<oos>\b(?:' + alternation(oos_kws) + r')\b)')
+    if domain_kws:
+        parts.append(r'(?P<domain>\b(?:' + alternation(domain_kws) + r')\b)')
+    if not parts:
+        return re.compile(r'(?!)') # Tidak ada keyword: pola yang tidak pernah cocok
+    return re.compile(r'(?=' + '|'.join(parts) + r')')
+
 def check_out_of_scope(text_lower, domain_kws, oos_kws, min_len_no_domain=5):
     """Cek apakah teks berada di luar cakupan domain berdasarkan keywords."""
-    # 1. Cek keyword OOS eksplisit
-    for keyword in oos_kws:
-        # Gunakan word boundary (\b) untuk mencocokkan kata utuh
-        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
-            print(f"DEBUG OOS: Keyword eksplisit '{keyword}' ditemukan.")
-            return True, "explicit" # Pasti OOS
+    pattern = compile_oos_pattern(frozenset(domain_kws), frozenset(oos_kws))
+    groups = pattern.groupindex
 
-    # 2. Cek keberadaan keyword domain
+    # 1. Cek keyword OOS eksplisit dan 2. keberadaan keyword domain dalam satu kali scan
     found_domain_keyword = False
-    for keyword in domain_kws:
-        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
-            found_domain_keyword = True
-            break
+    for match in pattern.finditer(text_lower):
+        # Gunakan word boundary (\b) untuk mencocokkan kata utuh (sudah ada di dalam pola)
+        if 'oos' in groups and match.group('oos') is not None:
+            logger.debug("OOS: Keyword eksplisit %r ditemukan.", match.group('oos'))
+            return True, "explicit" # Pasti OOS
+        found_domain_keyword = True
 
     # 3. Logika OOS berdasarkan ketiadaan keyword domain (untuk input yang lebih panjang)
     # Abaikan input input yang sangat pendek (<=2 kata) tanpa keyword domain (mungkin salam generik non-islamic)
     if not found_domain_keyword and len(text_lower.split()) > 2 and len(text_lower.split()) >= min_len_no_domain:
-         print(f"DEBUG OOS: Tidak ada keyword domain & panjang >= {min_len_no_domain}. Potensi OOS.")
+         logger.debug("OOS: Tidak ada keyword domain & panjang >= %s. Potensi OOS.", min_len_no_domain)
          # Dianggap OOS jika tidak ada keyword domain DAN input cukup panjang
          return True, "potential_no_domain" # Mengaktifkan heuristic ini sedikit lebih agresif OOS
          # return False, "potential_no_domain_ignored" # Saat ini diabaikan
@@ -329,31 +829,168 @@ def check_out_of_scope(text_lower, domain_kws, oos_kws, min_len_no_domain=5):
     else: # (not found_domain_keyword and len(text_lower.split()) < min_len_no_domain) or (len(text_lower.split()) <= 2)
         return False, "in_scope_short_or_generic"
 
+# Kompilasi pola OOS saat startup agar request pertama tidak menanggung biayanya
+compile_oos_pattern(DOMAIN_KEYWORDS, OOS_KEYWORDS)
+
+# --- Startup Bertahap: Model, Matcher, Warm-up ---
+def warm_up_nlp():
+    """Jalankan inferensi contoh (nlp() dan nlp.pipe) agar request pertama tidak membayar alokasi awal.
+
+    Tidak lewat cache/coalescer supaya statistik keduanya tetap bersih.
+    """
+    with startup_stage("warmup"):
+        for text in WARMUP_TEXTS:
+            _process_nlu_direct(text)
+        process_nlu_batch(WARMUP_TEXTS)
+
+def run_startup():
+    """Tahap startup yang berat; dipanggil langsung (eager) atau di thread background (lazy)."""
+    startup_start = time.perf_counter()
+    if nlu_client is not None:
+        with startup_stage("connect_nlu_server"):
+            connected = nlu_client.wait_until_ready(NLU_SERVER_CONNECT_WAIT_S)
+        if connected:
+            print(f"INFO: Server NLU '{NLU_SERVER_SOCKET}' terhubung; model tidak dimuat di proses ini.")
+            STARTUP_STATE["ready"] = True
+            STARTUP_STATE["ready_at"] = time.time()
+        else:
+            print(f"WARNING: Server NLU '{NLU_SERVER_SOCKET}' tidak merespons; "
+                  f"{'memakai model in-process.' if NLU_LOCAL_FALLBACK else 'fallback in-process dinonaktifkan.'}")
+            _ensure_local_nlp(background=False)
+    else:
+        load_nlp_components()
+    if HANDLER_PRELOAD:
+        with startup_stage("load_handlers"):
+            intent_logic.load_all_handlers()
+    if nlp and not STARTUP_STATE["ready"]:
+        try:
+            warm_up_nlp()
+            STARTUP_STATE["ready"] = True
+            STARTUP_STATE["ready_at"] = time.time()
+        except Exception as e:
+            print(f"ERROR: Warm-up NLU gagal: {e}")
+            traceback.print_exc()
+            STARTUP_STATE["error"] = f"Warm-up gagal: {e}"
+    STARTUP_STATE["stages_ms"]["total_after_import"] = round((time.perf_counter() - startup_start) * 1000, 1)
+    print(f"INFO: Startup {'siap' if STARTUP_STATE['ready'] else 'TIDAK siap'}; timing tahap (ms): {STARTUP_STATE['stages_ms']}")
+
+if APP_STARTUP_MODE == 'lazy':
+    threading.Thread(target=run_startup, name="app-startup", daemon=True).start()
+else:
+    run_startup()
+
+# --- Route Health Check ---
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness probe: proses hidup dan Flask bisa menjawab (tidak menunggu model)."""
+    return jsonify({"status": "ok", "uptime_s": round(time.time() - STARTUP_STATE["started_at"], 1)})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness probe: 200 hanya setelah model, matcher, dan warm-up selesai; 503 selama startup/gagal."""
+    ready = STARTUP_STATE["ready"]
+    body = {
+        "status": "ready" if ready else ("failed" if STARTUP_STATE["error"] else "starting"),
+        "mode": STARTUP_STATE["mode"],
+        "error": STARTUP_STATE["error"],
+        "stages_ms": dict(STARTUP_STATE["stages_ms"]),
+        "ready_after_s": round(STARTUP_STATE["ready_at"] - STARTUP_STATE["started_at"], 2) if STARTUP_STATE["ready_at"] else None,
+        "data_version": DATA_STORE.version,
+        "bundle_hash": STARTUP_STATE["bundle"]["content_hash"] if STARTUP_STATE["bundle"] else None,
+    }
+    return jsonify(body), (200 if ready else 503)
+
 # --- Route Utama ---
 @app.route("/")
 def index():
     """Render halaman utama dan bersihkan state dialog."""
     # Bersihkan state dialog dan nama pengguna saat halaman di-load/reload
-    if 'dialogue_state' in session:
-        session.pop('dialogue_state', None)
-        session.pop('clarification_options', None)
-        session.pop('original_ambiguous_nlu', None)
-        print("INFO: Dialogue state cleared on page load.")
+    if clear_dialogue_state():
+        logger.info("Dialogue state cleared on page load.")
     if 'user_name' in session:
          session.pop('user_name', None)
-         print("INFO: User name cleared on page load.")
+         logger.info("User name cleared on page load.")
+    ensure_session_id() # Request chat berikutnya dihitung admission control per sid, bukan per IP
+
 
     return render_template("index.html")
 
 
 # --- Route Prediksi Chat (Coordinator) ---
-@app.route("/predict", methods=["POST"])
-def predict():
-    """Handle permintaan chat, proses NLU, state, OOS, dan panggil logic handler."""
+def _nlu_not_ready_response(text, start_time):
+    """Jawaban saat NLU belum bisa dipakai: 'sedang bersiap' (model sedang dimuat) atau 'tidak aktif'."""
+    loading = not STARTUP_STATE["error"] and (APP_STARTUP_MODE == 'lazy' or local_nlp_loading())
+    if loading: # Model masih dimuat di background (startup lazy atau fallback server NLU)
+        response_text = "Chatbot sedang bersiap, silakan coba lagi dalam beberapa detik."
+        final_intent_category = "nlu_system_starting"
+    else: # Model NLP gagal load (dan server NLU tidak tersedia)
+        logger.error("Model NLP tidak tersedia, tidak dapat memproses NLU.")
+        response_text = "Maaf, sistem NLU sedang tidak aktif. Tidak dapat memproses permintaan Anda saat ini."
+        final_intent_category = "nlu_system_unavailable"
+    debug_info = { "user_text": text, "final_intent_category": final_intent_category }
+    end_time = time.time(); debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
+    return { "answer": response_text, "debug_info": debug_info }, 200
+
+class TurnEvent:
+    """Event yang di-yield chat_turn(stream=True) di tengah giliran, sebelum jawaban selesai dibuat."""
+
+    __slots__ = ("name", "data")
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+def chat_turn(data, sess, stream=False):
+    """Satu giliran chat: state, OOS, NLU, dan logic handler, tanpa bergantung pada framework web.
+
+    Generator: saat butuh NLU, (teks, snapshot config request) di-yield dan hasil process_nlu()
+    dikirim balik lewat send().
+    Dengan begitu kerja aturan berjalan di thread/event loop pemanggil, sedangkan inferensi
+    spaCy bisa dijalankan di tempat lain (lihat run_chat_turn() dan asgi.py).
+
+    Dengan stream=True, TurnEvent("intent", ...) di-yield tepat sebelum intent handler dipanggil
+    (setelah NLU dan aturan nama, jadi cookie session tidak berubah lagi sesudahnya); pemanggil
+    melanjutkan dengan send(None). Lihat advance_chat_turn() dan /predict_stream.
+
+    Args:
+        data (dict): Body JSON request.
+        sess (MutableMapping): Session cookie (session Flask atau SecureCookieSession di asgi.py).
+        stream (bool): Yield TurnEvent untuk /predict_stream.
+
+    Returns:
+        tuple: (body dict, status HTTP) sebagai nilai StopIteration.
+    """
+    trace = metrics.trace()
+    body, status = yield from _chat_turn(data, sess, trace, stream)
+    _record_turn_metrics(trace, body, status)
+    return body, status
+
+def _record_turn_metrics(trace, body, status):
+    """Masukkan span giliran chat ke histogram dan perbarui counter OOS/klarifikasi/fallback."""
+    if not metrics.enabled:
+        return
+    debug_info = body.get("debug_info") or {}
+    category = debug_info.get("final_intent_category") or ("invalid_input" if status == 400 else "unknown_flow")
+    metrics.observe_trace(trace, category)
+    metrics.inc("requests", intent=category)
+    if category.startswith("out_of_scope"):
+        metrics.inc("oos", reason=debug_info.get("oos_detection_reason", "unknown"))
+    elif category == "intent_disambiguation_prompt":
+        metrics.inc("disambiguation_prompts")
+    elif category.startswith(FALLBACK_CATEGORY_PREFIXES):
+        metrics.inc("fallbacks", category=category)
+
+def _intent_event(intent, score):
+    """Event 'intent' awal; kategori akhir baru diketahui setelah handler (ada di event 'done')."""
+    return TurnEvent("intent", {"final_intent_category": None, "intent": intent, "score": round(score, 4)})
+
+def _chat_turn(data, sess, trace, stream=False):
+    """Isi chat_turn(); span per tahap dicatat ke `trace` (metrics.RequestTrace)."""
     start_time = time.time()
     final_intent_category = "unknown_flow" # Default category
     response_text = "Maaf, terjadi sedikit gangguan dalam memproses permintaan Anda. Silakan coba lagi." # Default error response
     debug_info = {}
+    app_config = get_app_config() # Snapshot data untuk seluruh request ini, walau data/ di-reload di tengah jalan
 
     # Inisialisasi variabel yang mungkin digunakan di berbagai alur atau debug info
     extracted_name_person_ner = None # <<<--- INI YANG DITAMBAHKAN UNTUK INISIALISASI
@@ -361,32 +998,30 @@ def predict():
     name_source = "unknown"
     user_name_to_save = None
     response_generated_by_name_logic = False
-    nlu_result = {"doc": None, "intent": None, "score": 0.0, "entities": {"PERSON": None, "PRODI": [], "LAB": []}, "all_intents": {}} # Inisialisasi nlu_result
+    nlu_result = {"doc": None, "intent": None, "score": 0.0, "entities": {"PERSON": None, "PRODI": [], "LAB": [], "MATKUL": []}, "all_intents": {}} # Inisialisasi nlu_result
 
 
     try:
         # --- Validasi Input ---
-        if not request.is_json:
-            return jsonify({"error": "Request JSON diperlukan", "debug_info": {}}), 400
-        data = request.get_json()
         text = data.get("text")
         if not text or not isinstance(text, str) or not text.strip():
-            return jsonify({"error": "Input 'text' tidak boleh kosong!", "debug_info": {"user_text": text}}), 400
+            return {"error": "Input 'text' tidak boleh kosong!", "debug_info": {"user_text": text}}, 400
 
         text = text.strip()
-        if len(text) > 500: # Batasi panjang input
-            return jsonify({"error": "Input terlalu panjang (maks 500 karakter)", "debug_info": {"user_text": text[:50] + "..."}}), 400
+        if len(text) > MAX_INPUT_LENGTH: # Batasi panjang input
+            return {"error": f"Input terlalu panjang (maks {MAX_INPUT_LENGTH} karakter)", "debug_info": {"user_text": text[:50] + "..."}}, 400
 
         text_lower_stripped = text.lower()
-        user_name_from_session = session.get('user_name') # Ambil nama dari sesi (jika ada)
+        user_name_from_session = sess.get('user_name') # Ambil nama dari sesi (jika ada)
 
         # === BAGIAN 1: Cek State Klarifikasi Intent ===
-        if session.get('dialogue_state') == 'awaiting_intent_clarification':
-            print("INFO: Handling response to intent clarification request.")
+        with trace.span("dialogue_state"):
+            dialogue_state = get_dialogue_state(sess=sess)
+        if dialogue_state and dialogue_state.get('state') == CLARIFICATION_STATE:
+            logger.info("Handling response to intent clarification request.")
             user_choice = text_lower_stripped
-            options_map = session.get('clarification_options', {})
-            original_nlu = session.get('original_ambiguous_nlu', None)
-            original_user_text = original_nlu.get('user_text', 'N/A') if original_nlu else 'N/A'
+            options_map = dialogue_state.get('options', {})
+            original_user_text = dialogue_state.get('text', 'N/A')
 
             resolved_intent = None
             # Cari intent berdasarkan pilihan user (1, 2, dst.)
@@ -394,14 +1029,14 @@ def predict():
             if user_choice in options_map:
                  resolved_intent = options_map[user_choice]
 
-            if resolved_intent and original_nlu:
-                print(f"INFO: Intent disambiguated by user to: {resolved_intent}")
+            if resolved_intent:
+                logger.info("Intent disambiguated by user to: %s", resolved_intent, extra={"intent": resolved_intent})
                 # Buat NLU result baru dengan intent yang sudah pasti
-                # Gunakan entitas dari NLU asli saat klarifikasi terjadi
-                entities_from_original_nlu = original_nlu.get("entities", {"PERSON": None, "PRODI": [], "LAB": []})
+                # Gunakan entitas (canonical) dari NLU asli saat klarifikasi terjadi
+                entities_from_original_nlu = dialogue_state.get("entities", {"PERSON": None, "PRODI": [], "LAB": []})
 
                 modified_nlu = {
-                    "doc": original_nlu.get("doc"), # Pertahankan doc asli jika ada
+                    "doc": None, # Doc tidak disimpan di session store
                     "intent": resolved_intent,
                     "score": 1.0, # Anggap skor 1.0 karena user memilih
                     "entities": entities_from_original_nlu,
@@ -409,19 +1044,19 @@ def predict():
                     "user_text": original_user_text # Simpan teks asli user
                 }
 
-                # Hapus state klarifikasi dari session
-                session.pop('dialogue_state', None)
-                session.pop('clarification_options', None)
-                session.pop('original_ambiguous_nlu', None)
+                # Hapus state klarifikasi dari session store
+                clear_dialogue_state(sess=sess)
 
                 # Panggil logic handler dengan NLU yang sudah dimodifikasi
+                if stream:
+                    yield _intent_event(resolved_intent, 1.0)
                 try:
-                    response_text, final_intent_category = intent_logic.get_response_for_intent(
-                        modified_nlu, user_name_from_session, original_user_text, APP_CONFIG
-                    )
+                    with trace.span("intent_handler"):
+                        response_text, final_intent_category = intent_logic.get_response_for_intent(
+                            modified_nlu, user_name_from_session, original_user_text, app_config, cache=response_cache
+                        )
                 except Exception as logic_err:
-                     print(f"ERROR saat menjalankan intent logic post-clarification: {logic_err}")
-                     traceback.print_exc()
+                     logger.error("Intent logic post-clarification gagal: %s", logic_err, exc_info=True)
                      safe_user_name_temp = escape(user_name_from_session) if user_name_from_session else None
                      sapaan_temp = f"{safe_user_name_temp}, " if safe_user_name_temp else ""
                      response_text = f"Maaf {sapaan_temp}terjadi kesalahan saat memproses permintaan Anda setelah klarifikasi."
@@ -436,7 +1071,7 @@ def predict():
                 })
             else:
                 # Jika user tidak memilih opsi yang valid
-                print(f"WARNING: Failed to parse user clarification choice: '{user_choice}'. Options offered: {options_map}")
+                logger.warning("Failed to parse user clarification choice: %r. Options offered: %s", user_choice, options_map)
                 response_text = random.choice([
                     "Maaf, pilihan Anda tidak dikenali. Mohon pilih nomor opsi yang tersedia (misal: '1' atau '2').",
                     "Pilihan tidak valid. Silakan ketik nomor (1 atau 2) sesuai opsi yang Anda maksud.",
@@ -452,18 +1087,19 @@ def predict():
 
             end_time = time.time()
             debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
-            return jsonify({"answer": response_text, "debug_info": debug_info})
+            return {"answer": response_text, "debug_info": debug_info}, 200
         # === END BAGIAN 1 ===
 
         # === BAGIAN 2: Proses Input BARU (Tidak dalam state klarifikasi) ===
         else:
             # --- 0. Cek Out-of-Scope Dulu ---
-            is_oos, oos_reason = check_out_of_scope(
-                text_lower_stripped, DOMAIN_KEYWORDS, OOS_KEYWORDS, MIN_LEN_FOR_NO_DOMAIN_OOS
-            )
+            with trace.span("oos_check"):
+                is_oos, oos_reason = check_out_of_scope(
+                    text_lower_stripped, DOMAIN_KEYWORDS, OOS_KEYWORDS, MIN_LEN_FOR_NO_DOMAIN_OOS
+                )
 
             if is_oos: # Trigger OOS if heuristic returns True for any reason
-                print(f"INFO: Input terdeteksi OOS. Reason: {oos_reason}. Text: '{text}'")
+                logger.info("Input terdeteksi OOS. Reason: %s. Text: %r", oos_reason, text, extra={"oos_reason": oos_reason})
                 final_intent_category = f"out_of_scope_heuristic_{oos_reason}"
                 safe_user_name_oos = escape(user_name_from_session) if user_name_from_session else None
                 sapaan_oos = f"Maaf {safe_user_name_oos}, " if safe_user_name_oos else "Maaf, "
@@ -479,7 +1115,7 @@ def predict():
                 }
                 end_time = time.time()
                 debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
-                return jsonify({"answer": response_text, "debug_info": debug_info})
+                return {"answer": response_text, "debug_info": debug_info}, 200
             # Jika is_oos False, lanjutkan proses NLU
 
             # --- 1. Handle Special Cases (Salam Islami, dll.) ---
@@ -497,19 +1133,17 @@ def predict():
                 }
                 end_time = time.time()
                 debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
-                return jsonify({ "answer": answer, "debug_info": debug_info })
+                return { "answer": answer, "debug_info": debug_info }, 200
             # Tambahkan handle special case lain jika perlu di sini
 
             # --- 2. Proses NLU ---
-            if not nlp: # Jika model NLP gagal load, beri pesan error
-                 print("ERROR: Model NLP tidak tersedia, tidak dapat memproses NLU.")
-                 response_text = "Maaf, sistem NLU sedang tidak aktif. Tidak dapat memproses permintaan Anda saat ini."
-                 final_intent_category = "nlu_system_unavailable"
-                 debug_info = { "user_text": text, "final_intent_category": final_intent_category }
-                 end_time = time.time(); debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
-                 return jsonify({ "answer": response_text, "debug_info": debug_info })
-
-            nlu_result = process_nlu(text) # NLU result is guaranteed to be a dictionary
+            if not nlu_ready():
+                 return _nlu_not_ready_response(text, start_time)
+
+            with trace.span("nlu"): # Termasuk antre di thread pool (asgi.py) dan server NLU
+                nlu_result = yield text, app_config # Hasil process_nlu(text, app_config), selalu berupa dictionary
+            if nlu_result.get('intent') is None and not nlu_ready(): # Server NLU baru saja gagal di request ini
+                 return _nlu_not_ready_response(text, start_time)
             all_intents_scores = nlu_result.get("all_intents", {})
             # Ensure top intent and score are based on the actual result
             top_intent = nlu_result.get('intent')
@@ -543,7 +1177,7 @@ def predict():
                                    break # Stop if score difference is too large or max options reached
 
             if needs_disambiguation and len(ambiguous_intents) >= 2: # Only disambiguate if at least 2 options identified
-                 print(f"INFO: Intent ambiguity detected for '{text}'. Candidates: {ambiguous_intents}")
+                 logger.info("Intent ambiguity detected for %r. Candidates: %s", text, ambiguous_intents)
                  options = {}
                  response_lines = ["Hmm, saya perlu sedikit klarifikasi. Apakah yang Anda maksud:"]
                  option_num = 1
@@ -565,12 +1199,10 @@ def predict():
                       response_text = "\n".join(response_lines)
                       final_intent_category = "intent_disambiguation_prompt"
 
-                      # Simpan state ke session
-                      session['dialogue_state'] = 'awaiting_intent_clarification'
-                      session['clarification_options'] = options
-                      nlu_result['user_text'] = text # Tambahkan teks asli user ke NLU result yang disimpan
-                      # Simpan NLU result asli (termasuk entities dan doc)
-                      session['original_ambiguous_nlu'] = nlu_result
+                      # Simpan state ringkas ke session store (kandidat intent, entitas canonical, teks asli)
+                      save_dialogue_state(sess=sess, record=make_clarification_record(
+                          text, ambiguous_intents, options, nlu_result.get('entities', {})
+                      ))
 
                       debug_info = {
                           "user_text": text, "final_intent_category": final_intent_category,
@@ -583,10 +1215,10 @@ def predict():
                       }
                       end_time = time.time()
                       debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
-                      return jsonify({"answer": response_text, "debug_info": debug_info})
+                      return {"answer": response_text, "debug_info": debug_info}, 200
                  else:
                       # Jika karena suatu hal tidak bisa membuat 2 opsi valid (misal deskripsi hilang)
-                      print(f"WARNING: Ambiguity detected but not enough valid descriptions ({valid_options_count} out of {len(ambiguous_intents)}). Proceeding with top intent.")
+                      logger.warning("Ambiguity detected but not enough valid descriptions (%d out of %d). Proceeding with top intent.", valid_options_count, len(ambiguous_intents))
                       needs_disambiguation = False # Batalkan klarifikasi, lanjutkan dengan intent teratas
                       # top_intent and top_score are already set from nlu_result at the beginning of Bagian 2
 
@@ -610,7 +1242,7 @@ def predict():
 
 
             if is_low_confidence or is_only_neutral_low_conf:
-                 print(f"INFO: Intent low confidence or not detected for '{text}'. Top Intent: {top_intent}, Score: {top_score}")
+                 logger.info("Intent low confidence or not detected for %r. Top Intent: %s, Score: %s", text, top_intent, top_score, extra={"intent": top_intent, "score": top_score})
                  # Berikan respons fallback generik
                  fallback_responses = [
                      "Maaf, saya kurang mengerti maksud pertanyaan Anda. Bisa coba gunakan kalimat lain?",
@@ -636,10 +1268,11 @@ def predict():
                  }
                  end_time = time.time()
                  debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
-                 return jsonify({"answer": response_text, "debug_info": debug_info})
+                 return {"answer": response_text, "debug_info": debug_info}, 200
 
 
             # --- 5. Handle Interaksi Nama ---
+            name_logic_started = time.perf_counter()
             # Inisialisasi variabel terkait nama (sudah diinisialisasi di awal fungsi)
             # rule_extracted_name = None
             # name_source = "unknown"
@@ -679,17 +1312,17 @@ def predict():
 
             # Kasus 2: User kemungkinan memberikan nama -> Proses Nama
             elif likely_providing_name:
-                print(f"DEBUG: Likely providing name detected for input: '{text}'")
+                logger.debug("Likely providing name detected for input: %r", text)
                 # Prioritaskan nama dari NER jika ada
                 if extracted_name_person_ner:
                     user_name_to_save = extracted_name_person_ner
                     name_source = "ner"
-                    print(f"DEBUG: Nama '{user_name_to_save}' valid dari NER.")
+                    logger.debug("Nama %r valid dari NER.", user_name_to_save)
 
                 # Jika NER tidak ada ATAU intent provide_name sangat kuat, coba rules regex
                 # Rules regex ini hanya dijalankan jika nama belum berhasil didapat dari NER
                 if not user_name_to_save:
-                    print(f"DEBUG: Nama dari NER tidak ada. Mencoba ekstraksi nama dengan rules...")
+                    logger.debug("Nama dari NER tidak ada. Mencoba ekstraksi nama dengan rules...")
                     # Pola regex dari yang paling spesifik ke paling umum
                     # Menangkap grup nama setelah frasa pengantar
                     extraction_patterns = [
@@ -709,7 +1342,7 @@ def predict():
                          match = re.search(pattern, text, flags=re.IGNORECASE)
                          if match and match.lastindex is not None and match.lastindex > 0:
                                 extracted_part = match.group(match.lastindex).strip(' .,?!')
-                                print(f"DEBUG: Pola Regex '{pattern}' cocok. Ekstraksi: '{extracted_part}'")
+                                logger.debug("Pola Regex %r cocok. Ekstraksi: %r", pattern, extracted_part)
                                 # Validasi hasil ekstraksi (panjang, bukan kata umum, tidak mengandung kata ganti)
                                 if extracted_part and 1 < len(extracted_part) <= 30 and len(extracted_part.split()) <= 5 and \
                                    extracted_part.lower() not in ["iya", "ya", "oke", "ok", "baik", "siap", "bisa", "terima kasih", "thank you"]:
@@ -729,7 +1362,7 @@ def predict():
                              if not any(pronoun in f" {short_input_name_candidate.lower()} " for pronoun in [" saya ", " aku ", " ku "]):
                                 potential_name_rule = short_input_name_candidate
                                 pattern_that_matched = "short_input_catch_all"
-                                print(f"DEBUG: Pola short input catch-all cocok. Ekstraksi: '{potential_name_rule}'")
+                                logger.debug("Pola short input catch-all cocok. Ekstraksi: %r", potential_name_rule)
 
 
                     # Jika nama dari NER tidak ada, gunakan hasil dari rules jika valid
@@ -737,14 +1370,14 @@ def predict():
                          user_name_to_save = potential_name_rule
                          name_source = f"rule_{pattern_that_matched}"
                          rule_extracted_name = user_name_to_save # Simpan juga nama hasil rule ke variabel terpisah
-                         print(f"INFO: Nama '{user_name_to_save}' disimpan dari rule (pola: {pattern_that_matched}).")
+                         logger.info("Nama %r disimpan dari rule (pola: %s).", user_name_to_save, pattern_that_matched)
                     else:
-                         print("DEBUG: Tidak ada nama valid yang bisa diekstrak dari rules.")
+                         logger.debug("Tidak ada nama valid yang bisa diekstrak dari rules.")
 
                 # Setelah mencoba NER dan Rules, cek apakah nama berhasil didapatkan
                 if user_name_to_save:
-                    session['user_name'] = user_name_to_save.strip().title() # Simpan ke sesi dengan kapitalisasi
-                    safe_user_name = escape(session['user_name'])
+                    sess['user_name'] = user_name_to_save.strip().title() # Simpan ke sesi dengan kapitalisasi
+                    safe_user_name = escape(sess['user_name'])
                     final_intent_category = "provide_name_handled"
                     success_responses = [
                         f"Baik {safe_user_name}, senang berkenalan! Nama Anda sudah saya ingat. Anda bisa bertanya tentang:\n- Biaya kuliah (Contoh: 'berapa spp informatika?')\n- Jadwal (Contoh: 'jadwal ti hari senin')\n- Info prodi (Contoh: 'info prodi tambang')\nAtau topik lainnya seputar Fakultas Teknik?",
@@ -768,21 +1401,24 @@ def predict():
 
                 response_generated_by_name_logic = True
             # Akhir dari blok 'likely_providing_name'
+            trace.add("name_rules", time.perf_counter() - name_logic_started)
 
             # Kasus 3: Tidak minta nama DAN tidak proses nama -> Panggil Intent Logic Handler Utama
             if not response_generated_by_name_logic:
+                if stream:
+                    yield _intent_event(top_intent, top_score)
                 try:
-                    print(f"INFO: Calling intent logic handler for intent '{top_intent}' with score {top_score:.4f}")
+                    logger.info("Calling intent logic handler for intent %r with score %.4f", top_intent, top_score, extra={"intent": top_intent, "score": top_score})
                     # Pass the extracted entities to the logic handler
                     # Ensure the latest extracted name is in nlu_result for the handler
                     nlu_result['entities']['PERSON'] = extracted_name_person_ner
 
-                    response_text, final_intent_category = intent_logic.get_response_for_intent(
-                        nlu_result, user_name_from_session, text, APP_CONFIG
-                    )
+                    with trace.span("intent_handler"):
+                        response_text, final_intent_category = intent_logic.get_response_for_intent(
+                            nlu_result, user_name_from_session, text, app_config, cache=response_cache
+                        )
                 except Exception as logic_err:
-                     print(f"ERROR saat menjalankan intent logic utama: {logic_err}")
-                     traceback.print_exc()
+                     logger.error("Intent logic utama gagal: %s", logic_err, exc_info=True)
                      safe_user_name_temp = escape(user_name_from_session) if user_name_from_session else None
                      sapaan_temp = f"{safe_user_name_temp}, " if safe_user_name_temp else ""
                      response_text = f"Maaf {sapaan_temp}terjadi kesalahan saat memproses permintaan Anda tentang topik tersebut."
@@ -790,7 +1426,7 @@ def predict():
 
             # --- 7. Siapkan Debug Info Final & Kembalikan Respons ---
             # Ambil nama terbaru dari sesi setelah logic handler berjalan (jika nama baru disimpan)
-            user_name_after_logic = session.get('user_name')
+            user_name_after_logic = sess.get('user_name')
 
             # Rekonstruksi debug_info untuk mencakup semua skenario
             # Mulai dengan debug_info yang mungkin sudah diisi di Bagian 1 atau 2 (saat low confidence/OOS/name handling)
@@ -804,7 +1440,7 @@ def predict():
                 "intent_score": round(nlu_result.get('score', 0.0), 4),
                 "all_intent_scores": {k: round(v, 4) for k, v in nlu_result.get('all_intents', {}).items()},
                 # <<<--- PERBAIKAN TYPO DI SINI --->>>
-                "entities_ner_model": {"PERSON": extract_model_person_name(nlu_result.get('doc')) if nlu_result.get('doc') else None}, # Re-extract safely using correct function name
+                "entities_ner_model": {"PERSON": extracted_name_person_ner}, # Hasil NER dari process_nlu (juga tersedia untuk hasil cache tanpa Doc)
                 # <<<--- AKHIR PERBAIKAN --->>>
                 "entities_rules": {"PRODI": nlu_result.get('entities', {}).get('PRODI', []), "LAB": nlu_result.get('entities', {}).get('LAB', [])}, # Ambil dari nlu_result
                 "name_in_session_before_logic": user_name_from_session,
@@ -820,22 +1456,21 @@ def predict():
             end_time = time.time()
             debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
 
-            return jsonify({"answer": response_text, "debug_info": debug_info})
+            return {"answer": response_text, "debug_info": debug_info}, 200
         # === END BAGIAN 2 ===
 
     # --- Exception Handling Global ---
     except Exception as e:
-        print(f"FATAL ERROR in /predict endpoint: {e}")
-        traceback.print_exc()
+        logger.critical("Unhandled error in /predict endpoint: %s", e, exc_info=True)
         # Selalu coba bersihkan state dialog dan nama pengguna jika terjadi error tak terduga
-        if 'dialogue_state' in session:
-             session.pop('dialogue_state', None)
-             session.pop('clarification_options', None)
-             session.pop('original_ambiguous_nlu', None)
-             print("ERROR: Dialogue state cleared due to unhandled exception.")
-        if 'user_name' in session:
+        try:
+             if clear_dialogue_state(sess=sess):
+                  logger.error("Dialogue state cleared due to unhandled exception.")
+        except Exception as store_err:
+             logger.error("Gagal membersihkan state dialog: %s", store_err)
+        if 'user_name' in sess:
              # session.pop('user_name', None) # Jangan hapus nama di sesi saat error fatal, agar user tidak perlu memperkenalkan diri lagi
-             print("INFO: User name preserved in session despite unhandled exception.")
+             logger.info("User name preserved in session despite unhandled exception.")
 
 
         error_message = "Maaf, terjadi kendala teknis di sistem saya. Silakan coba beberapa saat lagi."
@@ -843,14 +1478,14 @@ def predict():
         error_text_on_error = "N/A"
         try:
             # Coba dapatkan nama dari sesi sebelum dihapus (jika sempat)
-            user_name_on_error = escape(session.get('user_name', 'N/A'))
+            user_name_on_error = escape(sess.get('user_name', 'N/A'))
             if user_name_on_error != "N/A":
                  error_message = f"Maaf {user_name_on_error}, terjadi kendala teknis di sistem saya. Silakan coba beberapa saat lagi."
             # Coba dapatkan teks input saat error terjadi
             if 'data' in locals() and isinstance(data, dict):
                  error_text_on_error = data.get("text", "N/A")
         except Exception as inner_e:
-             print(f"Error during exception handling itself: {inner_e}")
+             logger.error("Error during exception handling itself: %s", inner_e)
 
         error_debug_info = {
             "error_type": type(e).__name__,
@@ -865,48 +1500,314 @@ def predict():
             end_time = time.time()
             error_debug_info["processing_time_ms"] = round((end_time - start_time) * 1000)
 
-        return jsonify({
+        return {
             "answer": error_message,
             "error": "Internal Server Error",
             "debug_info": error_debug_info
-        }), 500
+        }, 500
+
+# --- Admission Control ---
+def admission_client_key(sess, client_addr):
+    """Key token bucket: sid dari cookie yang dikirim klien, selain itu alamat klien (lihat trusted_client_addr).
+
+    Dipanggil sebelum ensure_session_id(), jadi request tanpa cookie (klien baru, atau klien yang
+    membuang cookie) dihitung per alamat, bukan mendapat bucket baru setiap request.
+    """
+    sid = sess.get('sid')
+    return f"sid:{sid}" if sid else f"ip:{client_addr}"
+
+def admission_slot(sess, client_addr, request_start=None):
+    """Context manager admission untuk satu request (nullcontext jika admission dinonaktifkan).
+
+    Raise AdmissionRejected jika request ditolak; state dialog belum tersentuh pada titik ini.
+    """
+    if admission is None:
+        return nullcontext()
+    return admission.slot(admission_client_key(sess, client_addr), parse_request_start(request_start))
+
+def admission_rejected_body(rejection):
+    """Body JSON 503 untuk request yang ditolak admission control (juga dicatat di metrik/log)."""
+    metrics.inc("admission_rejected", reason=rejection.reason)
+    logger.warning("Request ditolak admission control: %s (Retry-After %s s).", rejection.reason, rejection.retry_after,
+                   extra={"admission": rejection.reason})
+    return {"error": "Server sedang sibuk, silakan coba lagi.",
+            "debug_info": {"admission": rejection.reason, "retry_after_s": rejection.retry_after}}
+
+def admission_rejected_response(rejection):
+    return jsonify(admission_rejected_body(rejection)), 503, {"Retry-After": str(rejection.retry_after)}
+
+def trusted_client_addr(forwarded_for, peer_addr):
+    """Alamat klien untuk admission: hop ke-TRUSTED_PROXY_HOPS dari kanan X-Forwarded-For, atau alamat koneksi.
+
+    Hop yang lebih kiri ditulis oleh klien sendiri, jadi tidak dipakai (sama dengan ProxyFix(x_for=N)).
+    """
+    if TRUSTED_PROXY_HOPS and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",")]
+        if len(hops) >= TRUSTED_PROXY_HOPS and hops[-TRUSTED_PROXY_HOPS]:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return peer_addr
+
+def _client_addr():
+    return trusted_client_addr(request.headers.get('X-Forwarded-For'), request.remote_addr)
+
+def advance_chat_turn(turn, nlu_func=None):
+    """Lanjutkan generator chat_turn() sampai TurnEvent berikutnya atau sampai selesai; NLU di thread ini.
+
+    Returns:
+        tuple: (TurnEvent, None) jika giliran berhenti di sebuah event, atau (None, (body, status)) jika selesai.
+    """
+    nlu_func = nlu_func or process_nlu
+    try:
+        item = turn.send(None)
+        while not isinstance(item, TurnEvent):
+            try:
+                nlu_result = nlu_func(*item)
+            except Exception as e:
+                item = turn.throw(e) # Ditangani exception handler global di chat_turn()
+            else:
+                item = turn.send(nlu_result)
+        return item, None
+    except StopIteration as stop:
+        return None, stop.value
+
+def run_chat_turn(data, sess, nlu_func=None):
+    """Jalankan chat_turn() secara sinkron; NLU dipanggil langsung di thread ini."""
+    _, result = advance_chat_turn(chat_turn(data, sess), nlu_func)
+    return result
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    """Handle permintaan chat, proses NLU, state, OOS, dan panggil logic handler."""
+    if not request.is_json:
+        return jsonify({"error": "Request JSON diperlukan", "debug_info": {}}), 400
+    try:
+        with admission_slot(session, _client_addr(), request.headers.get('X-Request-Start')):
+            ensure_session_id()
+            body, status = run_chat_turn(request.get_json(), session)
+    except AdmissionRejected as rejection:
+        return admission_rejected_response(rejection)
+    return jsonify(body), status
+
+# --- Route Prediksi Streaming (Server-Sent Events) ---
+def split_answer_chunks(text, max_chars=None):
+    """Potong jawaban di batas baris (atau spasi untuk baris yang sangat panjang).
+
+    Gabungan semua chunk selalu sama persis dengan teks asli.
+    """
+    max_chars = max_chars or STREAM_CHUNK_CHARS
+    chunks, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars) + 1 or max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:cut])
+            line = line[cut:]
+        if current and len(current) + len(line) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current:
+        chunks.append(current)
+    return chunks
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def sse_events(body):
+    """Event untuk jawaban yang selesai tanpa intent handler (OOS, klarifikasi, nama, fallback): intent, chunk, done."""
+    debug_info = body.get("debug_info", {})
+    yield format_sse("intent", {
+        "final_intent_category": debug_info.get("final_intent_category"),
+        "intent": debug_info.get("top_intent_raw_model"),
+        "score": debug_info.get("intent_score"),
+    })
+    yield from sse_answer_events(body)
+
+def sse_answer_events(body):
+    """Potongan jawaban lalu event 'done' berisi debug_info (termasuk final_intent_category)."""
+    for chunk in split_answer_chunks(body.get("answer") or ""):
+        yield format_sse("chunk", {"text": chunk})
+    yield format_sse("done", {"debug_info": body.get("debug_info", {})})
+
+def stream_chat_turn(turn, event, nlu_func=None):
+    """Event SSE untuk giliran yang sedang berjalan: event yang sudah di-yield turn, lalu sisa giliran (handler)."""
+    while event is not None:
+        yield format_sse(event.name, event.data)
+        event, result = advance_chat_turn(turn, nlu_func)
+    yield from sse_answer_events(result[0])
+
+@app.route("/predict_stream", methods=["POST"])
+def predict_stream():
+    """Seperti /predict, tetapi jawaban dikirim sebagai Server-Sent Events (event intent, chunk, done).
+
+    Giliran chat dijalankan sampai NLU dan aturan nama selesai (semua perubahan cookie session terjadi
+    di sini), lalu Response dibuka dengan event 'intent' dan intent handler berjalan di dalam stream.
+    Giliran yang selesai tanpa handler dikirim utuh; error (status selain 200) sebagai JSON biasa.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request JSON diperlukan", "debug_info": {}}), 400
+    slot = ExitStack()
+    try:
+        slot.enter_context(admission_slot(session, _client_addr(), request.headers.get('X-Request-Start')))
+    except AdmissionRejected as rejection:
+        return admission_rejected_response(rejection)
+    try:
+        ensure_session_id()
+        turn = chat_turn(request.get_json(), session, stream=True)
+        event, result = advance_chat_turn(turn)
+    except BaseException:
+        slot.close()
+        raise
+    if result is not None:
+        slot.close()
+        body, status = result
+        if status != 200 or "answer" not in body:
+            return jsonify(body), status
+        events = sse_events(body)
+    else:
+        # Slot admission dilepas saat stream selesai (atau klien memutus koneksi)
+        events = _close_after(stream_chat_turn(turn, event), slot, turn)
+    # X-Accel-Buffering: no agar proxy (nginx/Render) tidak menahan event sampai respons selesai
+    return Response(stream_with_context(events), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _close_after(events, slot, turn):
+    try:
+        yield from events
+    finally:
+        turn.close()
+        slot.close()
+
+# --- Route Prediksi Batch (NLU saja) ---
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Jalankan NLU untuk banyak teks sekaligus (untuk bridge kiosk/LINE yang mengirim antrean pesan).
+
+    Body JSON: {"texts": ["...", "..."], "batch_size": 32 (opsional)}.
+    Setiap item hasil berisi intent, score, entities, dan all_intents seperti process_nlu().
+    """
+    start_time = time.time()
+    if not request.is_json:
+        return jsonify({"error": "Request JSON diperlukan", "debug_info": {}}), 400
+    data = request.get_json()
+    texts = data.get("texts") if isinstance(data, dict) else None
+    if not isinstance(texts, list) or not texts:
+        return jsonify({"error": "Input 'texts' harus berupa list teks yang tidak kosong!", "debug_info": {}}), 400
+    if len(texts) > MAX_BATCH_TEXTS:
+        return jsonify({"error": f"Terlalu banyak teks dalam satu batch (maks {MAX_BATCH_TEXTS})", "debug_info": {"count": len(texts)}}), 400
+
+    batch_size = data.get("batch_size", NLU_BATCH_SIZE)
+    if not isinstance(batch_size, int) or batch_size < 1:
+        return jsonify({"error": "Input 'batch_size' harus bilangan bulat positif", "debug_info": {"batch_size": batch_size}}), 400
+
+    if not nlu_ready():
+        logger.error("Model NLP tidak tersedia, tidak dapat memproses NLU batch.")
+        return jsonify({"error": "Sistem NLU sedang tidak aktif", "debug_info": {"count": len(texts)}}), 503
+
+    # Validasi per item; item yang tidak valid tetap mendapat slot hasil berisi pesan error
+    results = [None] * len(texts)
+    valid_indices, valid_texts = [], []
+    for i, text in enumerate(texts):
+        if not text or not isinstance(text, str) or not text.strip():
+            results[i] = {"error": "Input teks tidak boleh kosong!"}
+        elif len(text.strip()) > MAX_INPUT_LENGTH:
+            results[i] = {"error": f"Input terlalu panjang (maks {MAX_INPUT_LENGTH} karakter)"}
+        else:
+            valid_indices.append(i)
+            valid_texts.append(text.strip())
+
+    try:
+        with admission_slot(session, _client_addr(), request.headers.get('X-Request-Start')):
+            nlu_results = process_nlu_batch(valid_texts, batch_size=batch_size)
+    except AdmissionRejected as rejection:
+        return admission_rejected_response(rejection)
+
+    for i, text, nlu_result in zip(valid_indices, valid_texts, nlu_results):
+        results[i] = {
+            "text": text,
+            "intent": nlu_result.get("intent"),
+            "score": nlu_result.get("score", 0.0),
+            "entities": nlu_result.get("entities", {}),
+            "all_intents": nlu_result.get("all_intents", {}),
+        }
+
+    debug_info = {
+        "count": len(texts),
+        "processed": len(valid_texts),
+        "batch_size": batch_size,
+        "processing_time_ms": round((time.time() - start_time) * 1000),
+    }
+    return jsonify({"results": results, "debug_info": debug_info})
+
+# --- Route Statistik NLU ---
+@app.route("/nlu_stats", methods=["GET"])
+def nlu_stats():
+    """Statistik komponen NLU (cache, coalescer), data store, session store, dan startup."""
+    fuzzy_index = get_app_config().get('FUZZY_ENTITIES') # Tidak ada di snapshot jika FUZZY_ENTITIES=0
+    return jsonify({
+        "cache": nlu_cache.stats() if nlu_cache else {"enabled": False},
+        "handler_cache": response_cache.stats() if response_cache else {"enabled": False},
+        "handlers": intent_logic.handler_stats(),
+        "logging": logging_stats(),
+        "admission": admission.stats() if admission else {"enabled": False},
+        "coalescer": nlu_batcher.stats() if nlu_batcher else {"enabled": False},
+        "textcat_cascade": textcat_cascade.stats() if textcat_cascade else {"enabled": False},
+        "fuzzy_entities": fuzzy_index.stats() if fuzzy_index is not None else {"enabled": False},
+        "nlu_server": dict(nlu_client.stats(), **NLU_FALLBACK_STATS) if nlu_client else {"enabled": False},
+        "data": DATA_STORE.stats(),
+        "bundle": STARTUP_STATE["bundle"] or {"enabled": False},
+        "sessions": session_store.stats(),
+        "startup": {"mode": STARTUP_STATE["mode"], "ready": STARTUP_STATE["ready"], "stages_ms": dict(STARTUP_STATE["stages_ms"])},
+    })
+
+# --- Route Metrik (format teks Prometheus) ---
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Histogram latensi per tahap dan per intent (p50/p95/p99) serta counter OOS/klarifikasi/fallback."""
+    return Response(metrics.render_prometheus(), content_type=METRICS_CONTENT_TYPE)
 
 # --- Route Lupa Nama ---
-@app.route("/forget_name", methods=["POST"])
-def forget_name():
-    """Hapus nama pengguna dari sesi dan bersihkan state dialog."""
+def forget_user_name(sess):
+    """Hapus nama pengguna dari sesi dan bersihkan state dialog. Mengembalikan (body dict, status HTTP)."""
     # Bersihkan state dialog apapun saat lupa nama
-    if 'dialogue_state' in session:
-        session.pop('dialogue_state', None)
-        session.pop('clarification_options', None)
-        session.pop('original_ambiguous_nlu', None)
-        print("INFO: Dialogue state cleared on forget_name request.")
+    if clear_dialogue_state(sess=sess):
+        logger.info("Dialogue state cleared on forget_name request.")
 
-    user_name = session.get('user_name')
+    user_name = sess.get('user_name')
     if user_name:
         safe_removed_name = escape(user_name)
-        session.pop('user_name', None)
+        sess.pop('user_name', None)
         # Verifikasi bahwa nama benar-benar hilang dari sesi
-        if 'user_name' not in session:
-            print(f"INFO: User name '{safe_removed_name}' removed from session.")
-            return jsonify({
+        if 'user_name' not in sess:
+            logger.info("User name %r removed from session.", safe_removed_name)
+            return {
                 "status": "success",
                 "message": f"Baik {safe_removed_name}, nama Anda sudah tidak saya simpan lagi. Kita mulai dari awal ya."
-            })
+            }, 200
         else:
             # Kasus aneh jika pop gagal
-            print("WARNING: Session pop 'user_name' failed unexpectedly.")
-            return jsonify({
+            logger.warning("Session pop 'user_name' failed unexpectedly.")
+            return {
                 "status": "error",
                 "message": "Maaf, terjadi sedikit masalah saat mencoba melupakan nama Anda."
-            }), 500
+            }, 500
     else:
         # Jika memang belum ada nama di sesi
-        print("INFO: /forget_name called but no user_name was in session.")
-        return jsonify({
+        logger.info("/forget_name called but no user_name was in session.")
+        return {
             "status": "no_name",
             "message": "Tidak masalah, saya memang belum menyimpan nama Anda sebelumnya."
-        })
+        }, 200
+
+@app.route("/forget_name", methods=["POST"])
+def forget_name():
+    """Hapus nama pengguna dari sesi dan bersihkan state dialog."""
+    body, status = forget_user_name(session)
+    return jsonify(body), status
 
 
 # --- Jalankan Server ---
@@ -915,12 +1816,34 @@ if __name__ == "__main__":
     print("      CHATBOT FAKULTAS TEKNIK SERVER (UNANDA) - Cleaned Version")
     print("="*60)
     print(f"[*] Base Directory      : '{BASE_DIR}'")
-    print(f"[*] Model Dimuat dari   : '{MODEL_DIR}'")
+    print(f"[*] Model Dimuat dari   : '{SERVING_BUNDLE if serving_bundle else MODEL_DIR}'")
+    bundle_info = STARTUP_STATE["bundle"]
+    if bundle_info and bundle_info.get("content_hash"):
+        print(f"[*] Bundle Serving      : {bundle_info['content_hash']} (dibangun {bundle_info['built_at']})")
+    else:
+        print(f"[*] Bundle Serving      : {'GAGAL, ' + bundle_info['error'] if bundle_info else 'Tidak'}")
+    print(f"[*] Server NLU          : {NLU_SERVER_SOCKET or 'Tidak (model in-process)'}")
     print(f"[*] Folder Data         : '{DATA_DIR}'")
-    print(f"[*] Logic Handler File  : intent_logic.py")
+    print(f"[*] Logic Handler File  : intent_logic.py + intent_handlers/ ({'preload' if HANDLER_PRELOAD else 'lazy'})")
     print(f"[*] Conf. Threshold     : {CONFIDENCE_THRESHOLD}")
     print(f"[*] OOS Keywords        : Loaded ({len(DOMAIN_KEYWORDS)} domain, {len(OOS_KEYWORDS)} explicit OOS)")
     print(f"[*] Intent Disambiguation: {'ENABLED' if ENABLE_INTENT_DISAMBIGUATION else 'DISABLED'} (Margin: {DISAMBIGUATION_MARGIN})")
+    print(f"[*] NLU Batch Size      : {NLU_BATCH_SIZE} (maks {MAX_BATCH_TEXTS} teks per /predict_batch)")
+    print(f"[*] NLU Cache           : {'ENABLED' if nlu_cache else 'DISABLED'} (size {NLU_CACHE_SIZE}, TTL {NLU_CACHE_TTL_S} s)")
+    print(f"[*] Cascade Textcat     : {f'ENABLED (margin {textcat_cascade.margin})' if textcat_cascade else 'DISABLED'}")
+    print(f"[*] Entitas Fuzzy       : {f'ENABLED (jarak edit maks {FUZZY_MAX_DISTANCE})' if FUZZY_ENTITIES else 'DISABLED'}")
+    print(f"[*] NER                 : {NER_MODE}" + (f" (provide_name >= {NER_GATE_MIN_SCORE} atau frasa perkenalan)" if NER_MODE != 'always' else ""))
+    print(f"[*] Metrics (/metrics)  : {'ENABLED' if METRICS_ENABLED else 'DISABLED'} (jendela kuantil {METRICS_WINDOW} sampel)")
+    print(f"[*] Handler Cache       : {'ENABLED' if response_cache else 'DISABLED'} (size {HANDLER_CACHE_SIZE})")
+    print(f"[*] Admission Control   : {'ENABLED' if admission else 'DISABLED'} ({ADMISSION_RATE} req/s per klien, burst {ADMISSION_BURST}, "
+          f"maks in-flight {ADMISSION_MAX_IN_FLIGHT or '-'}, antrean {ADMISSION_MAX_QUEUE}, tenggat {ADMISSION_WAIT_TIMEOUT_S} s, "
+          f"proxy tepercaya {TRUSTED_PROXY_HOPS})")
+    print(f"[*] Logging Request     : level {LOG_LEVEL}, format {LOG_FORMAT}, sampling DEBUG/INFO {LOG_SAMPLE_RATE}")
+    print(f"[*] NLU Coalescer       : {'ENABLED' if nlu_batcher else 'DISABLED'} (max batch {NLU_COALESCE_MAX_BATCH}, max wait {NLU_COALESCE_MAX_WAIT_MS} ms)")
+    print(f"[*] Mode Startup        : {APP_STARTUP_MODE} (timing tahap: {STARTUP_STATE['stages_ms']})")
+    print(f"[*] Session Store       : {SESSION_STORE_BACKEND} (TTL {SESSION_TTL_S} s)"
+          + (f", file '{SESSION_STORE_PATH}'" if SESSION_STORE_BACKEND == 'sqlite' else ""))
+    print(f"[*] Data Hot-Reload     : {'ENABLED' if DATA_RELOAD_INTERVAL_S else 'DISABLED'} (polling {DATA_RELOAD_INTERVAL_S} s, versi data {DATA_STORE.version})")
     print(f"[*] Mode Debug Flask    : {app.debug}")
     secret_key_status = "Default (TIDAK AMAN!)" if 'ganti-ini-dengan-kunci-rahasia' in app.secret_key else "Custom/Env Var (Lebih Aman)"
     print(f"[*] Status Secret Key   : {secret_key_status}")
@@ -928,6 +1851,7 @@ if __name__ == "__main__":
     print("\n--- Status Model & Matcher ---")
     print(f"[*] Model spaCy ({os.path.basename(MODEL_DIR)}) : {'Loaded' if nlp else 'FAILED'}")
     # Berikan status matcher berdasarkan nlp dan entity_details
+    matcher, entity_details = matcher_state
     matcher_status = 'Not Initialized'
     if nlp and matcher and entity_details and (len(matcher) > 0 or len(entity_details) > 0): matcher_status = f'Initialized ({len(matcher)} patterns, {len(entity_details)} entity details)'
     elif nlp and matcher: matcher_status = f'Initialized ({len(matcher)} patterns, BUT entity_details empty/invalid!)'
@@ -941,11 +1865,12 @@ if __name__ == "__main__":
          print("    - Tidak ada pola Prodi atau Lab yang berhasil ditambahkan.")
 
 
-    print("\n--- Status Data Eksternal (via APP_CONFIG) ---")
+    print("\n--- Status Data Eksternal (via DATA_STORE) ---")
+    app_config = get_app_config()
     data_keys_to_check=['FT_FEES','PMB_INFO','LEARNING_CONTENT','SPP_DATA','TERMS_DATA','JADWAL_TI_DATA','JADWAL_SIPIL_DATA','JADWAL_TAMBANG_DATA','KRS_SEVIMA_GUIDE','PAYMENT_SEVIMA_TOKOPEDIA_GUIDE']
     all_data_loaded_check = True # Use a different variable name to avoid conflict
     for key in data_keys_to_check:
-        data = APP_CONFIG.get(key)
+        data = app_config.get(key)
         status = 'MISSING/ERROR'
         # Check if data is loaded and not empty (for dict/list) or not an error string (for text)
         if data is not None: # Check if key exists
@@ -957,13 +1882,13 @@ if __name__ == "__main__":
              else: # Data is empty dict/list or an error string or empty string or None
                   status = 'EMPTY/ERROR'
                   all_data_loaded_check = False
-        else: # Key is missing from APP_CONFIG (shouldn't happen with .get) or data is None
+        else: # Key is missing from snapshot (shouldn't happen with .get) or data is None
              status = 'MISSING/NONE'
              all_data_loaded_check = False
 
         print(f"[*] Config Key: {key.ljust(30)}: {status}")
 
-    if not nlp:
+    if not nlu_ready():
         print("\n" + "!"*20 + " ERROR KRITIS: Model spaCy gagal dimuat. Chatbot tidak dapat berfungsi penuh. " + "!"*20)
     # Check against the new variable name
     elif not all_data_loaded_check:
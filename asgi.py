@@ -0,0 +1,427 @@
+# --- START OF FILE asgi.py ---
+"""Mode serving ASGI/asyncio untuk chatbot (alternatif dari worker sync gunicorn + Flask).
+
+Satu event loop per proses memegang semua koneksi (termasuk koneksi keep-alive yang
+sedang diam), menjalankan validasi, cek OOS, state dialog, dan logic handler. Hanya
+inferensi spaCy (process_nlu) yang dikirim ke ThreadPoolExecutor berukuran tetap,
+sehingga satu worker tidak lagi tertahan oleh satu koneksi lambat/diam.
+
+Logika chat sama persis dengan /predict di Flask (app.chat_turn), termasuk cookie
+session bertanda tangan yang kompatibel dengan Flask.
+
+Menjalankan (butuh server ASGI, misal `pip install uvicorn`):
+    uvicorn asgi:application --host 0.0.0.0 --port 8000 --workers 2
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+Variabel lingkungan:
+    NLU_THREADS        Thread inferensi per proses (default 1).
+    NLU_MAX_PENDING    Maks request yang sedang menunggu/menjalankan inferensi per proses
+                       (default 64); lebih dari itu dijawab 503 + Retry-After.
+    ASGI_MAX_BODY_BYTES  Batas ukuran body request (default 65536).
+    ADMISSION_*        Admission control yang sama dengan app.py (token bucket per klien, batas
+                       in-flight); slot in-flight ditunggu tanpa memblokir event loop.
+    TRUSTED_PROXY_HOPS Jumlah proxy tepercaya di depan server (default 0: X-Forwarded-For diabaikan).
+
+Route yang dilayani: /, /static/<file>, /predict, /predict_stream, /forget_name, /healthz, /readyz, /nlu_stats, /metrics.
+"""
+
+import asyncio
+import contextlib
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from flask import render_template
+from flask.sessions import SecureCookieSession
+from itsdangerous import BadSignature
+
+import app as flask_app_module
+from admission import AdmissionRejected, parse_request_start
+from structured_log import get_logger
+
+app = flask_app_module.app
+logger = get_logger("asgi")
+
+NLU_THREADS = max(1, int(os.environ.get("NLU_THREADS", 1)))
+NLU_MAX_PENDING = max(1, int(os.environ.get("NLU_MAX_PENDING", 64)))
+ASGI_MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", 65536))
+
+_executor = None
+_executor_pid = None
+_pending_nlu = 0 # Hanya diubah dari event loop, jadi tidak perlu lock
+SERVING_STATS = {"nlu_offloaded": 0, "nlu_cache_hits_on_loop": 0, "rejected_busy": 0, "max_pending_seen": 0}
+
+
+def get_executor():
+    """ThreadPoolExecutor inferensi; dibuat per proses (thread tidak ikut ter-fork)."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=NLU_THREADS, thread_name_prefix="nlu-infer")
+        _executor_pid = os.getpid()
+    return _executor
+
+
+# --- Session cookie (kompatibel dengan SecureCookieSessionInterface Flask) ---
+def _session_cookie_name():
+    return app.config["SESSION_COOKIE_NAME"]
+
+
+def load_session(headers):
+    """Baca cookie session Flask dari header request; cookie rusak/kedaluwarsa menjadi session kosong."""
+    serializer = app.session_interface.get_signing_serializer(app)
+    raw_cookie = headers.get(b"cookie")
+    if serializer is None or not raw_cookie:
+        return SecureCookieSession()
+    cookie = SimpleCookie()
+    try:
+        cookie.load(raw_cookie.decode("latin-1"))
+    except Exception:
+        return SecureCookieSession()
+    morsel = cookie.get(_session_cookie_name())
+    if morsel is None:
+        return SecureCookieSession()
+    max_age = int(app.permanent_session_lifetime.total_seconds())
+    try:
+        return SecureCookieSession(serializer.loads(morsel.value, max_age=max_age))
+    except BadSignature:
+        return SecureCookieSession()
+
+
+def session_cookie_header(sess):
+    """Header Set-Cookie jika session berubah (None jika tidak perlu dikirim)."""
+    if not sess.modified:
+        return None
+    name = _session_cookie_name()
+    path = app.config["SESSION_COOKIE_PATH"] or app.config["APPLICATION_ROOT"] or "/"
+    if not sess:
+        return f"{name}=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; Max-Age=0; Path={path}"
+    value = app.session_interface.get_signing_serializer(app).dumps(dict(sess))
+    parts = [f"{name}={value}", f"Path={path}"]
+    if app.config["SESSION_COOKIE_HTTPONLY"]:
+        parts.append("HttpOnly")
+    if app.config["SESSION_COOKIE_SECURE"]:
+        parts.append("Secure")
+    if app.config["SESSION_COOKIE_SAMESITE"]:
+        parts.append(f"SameSite={app.config['SESSION_COOKIE_SAMESITE']}")
+    return "; ".join(parts)
+
+
+# --- Helper HTTP ---
+async def read_body(receive):
+    """Baca seluruh body request; None jika melebihi ASGI_MAX_BODY_BYTES."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b""
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > ASGI_MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def send_response_start(send, status, content_type, headers=None, content_length=None):
+    raw_headers = [(b"content-type", content_type.encode("latin-1"))]
+    if content_length is not None:
+        raw_headers.append((b"content-length", str(content_length).encode()))
+    for key, value in (headers or {}).items():
+        if value is not None:
+            raw_headers.append((key.encode("latin-1"), value.encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+
+
+async def send_response(send, status, body, content_type="application/json", headers=None):
+    await send_response_start(send, status, content_type, headers, content_length=len(body))
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, body, sess=None, headers=None):
+    headers = dict(headers or {})
+    if sess is not None:
+        headers["set-cookie"] = session_cookie_header(sess)
+    # Serializer JSON milik Flask supaya body identik dengan jsonify()
+    payload = (app.json.dumps(body) + "\n").encode("utf-8")
+    await send_response(send, status, payload, "application/json", headers)
+
+
+def parse_json_body(body, headers):
+    """Setara request.is_json + request.get_json(): None jika bukan JSON."""
+    content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+    if not (content_type == "application/json" or (content_type.startswith("application/") and content_type.endswith("+json"))):
+        return None, False
+    try:
+        return app.json.loads(body), True
+    except ValueError:
+        return None, True
+
+
+# --- Inferensi ---
+async def run_nlu(text, config=None):
+    """process_nlu di thread pool; hit cache dijawab langsung di event loop tanpa pindah thread.
+
+    Lookup di event loop tidak menelusuri disk: jika fingerprint cache sedang jatuh tempo dicek,
+    seluruh process_nlu() (termasuk lookup) dijalankan di thread pool. Jika lookup di loop meleset,
+    hanya process_nlu_uncached() yang dijalankan agar miss tidak tercatat dua kali.
+    """
+    global _pending_nlu
+    nlu_cache = flask_app_module.nlu_cache
+    process = flask_app_module.process_nlu
+    if nlu_cache and flask_app_module.nlu_ready() and not nlu_cache.invalidation_check_due():
+        cached = nlu_cache.get(text.lower().strip(), check_invalidation=False)
+        if cached is not None:
+            SERVING_STATS["nlu_cache_hits_on_loop"] += 1
+            return cached
+        process = flask_app_module.process_nlu_uncached
+    _pending_nlu += 1
+    SERVING_STATS["max_pending_seen"] = max(SERVING_STATS["max_pending_seen"], _pending_nlu)
+    SERVING_STATS["nlu_offloaded"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), process, text, config)
+    finally:
+        _pending_nlu -= 1
+
+
+async def advance_chat_turn_async(turn):
+    """Versi async dari app.advance_chat_turn(): (TurnEvent, None) atau (None, (body, status))."""
+    try:
+        item = turn.send(None)
+        while not isinstance(item, flask_app_module.TurnEvent):
+            try:
+                nlu_result = await run_nlu(*item)
+            except Exception as e:
+                item = turn.throw(e)
+            else:
+                item = turn.send(nlu_result)
+        return item, None
+    except StopIteration as stop:
+        # Dikembalikan, bukan diteruskan: StopIteration yang keluar dari coroutine menjadi RuntimeError
+        return None, stop.value
+
+
+async def run_chat_turn_async(data, sess):
+    """Versi async dari app.run_chat_turn(): aturan di event loop, NLU di thread pool."""
+    _, result = await advance_chat_turn_async(flask_app_module.chat_turn(data, sess))
+    return result
+
+
+# --- Route ---
+async def read_chat_request(receive, send, headers):
+    """Baca dan validasi body /predict(_stream). None jika respons error sudah dikirim."""
+    body = await read_body(receive)
+    if body is None:
+        await send_json(send, 413, {"error": "Request terlalu besar", "debug_info": {}})
+        return None
+    data, is_json = parse_json_body(body, headers)
+    if not is_json:
+        await send_json(send, 400, {"error": "Request JSON diperlukan", "debug_info": {}})
+        return None
+    if _pending_nlu >= NLU_MAX_PENDING:
+        # Antrean inferensi penuh: tolak cepat daripada menumpuk latensi untuk semua user
+        SERVING_STATS["rejected_busy"] += 1
+        await send_json(send, 503, {"error": "Server sedang sibuk, silakan coba lagi.", "debug_info": {"pending_nlu": _pending_nlu}},
+                        headers={"retry-after": "1"})
+        return None
+    return data
+
+
+def client_addr(scope, headers):
+    """Alamat klien: hop tepercaya X-Forwarded-For (TRUSTED_PROXY_HOPS, lihat app.trusted_client_addr) atau alamat koneksi."""
+    forwarded = headers.get(b"x-forwarded-for")
+    client = scope.get("client")
+    return flask_app_module.trusted_client_addr(forwarded.decode("latin-1") if forwarded else None,
+                                                client[0] if client else None)
+
+
+def admission_slot_async(scope, headers, sess):
+    """Versi async dari app.admission_slot(); slot in-flight ditunggu tanpa memblokir event loop."""
+    admission = flask_app_module.admission
+    if admission is None:
+        return contextlib.nullcontext()
+    request_start = headers.get(b"x-request-start", b"").decode("latin-1")
+    return admission.slot_async(flask_app_module.admission_client_key(sess, client_addr(scope, headers)),
+                                parse_request_start(request_start))
+
+
+async def send_admission_rejected(send, rejection):
+    await send_json(send, 503, flask_app_module.admission_rejected_body(rejection),
+                    headers={"retry-after": str(rejection.retry_after)})
+
+
+async def run_admitted_chat_turn(scope, send, headers, data, sess):
+    """Giliran chat di dalam slot admission. None jika ditolak (respons 503 sudah dikirim)."""
+    try:
+        async with admission_slot_async(scope, headers, sess):
+            flask_app_module.ensure_session_id(sess)
+            return await run_chat_turn_async(data, sess)
+    except AdmissionRejected as rejection:
+        await send_admission_rejected(send, rejection)
+        return None
+
+
+async def handle_predict(scope, receive, send, headers):
+    data = await read_chat_request(receive, send, headers)
+    if data is None:
+        return
+    sess = load_session(headers)
+    result = await run_admitted_chat_turn(scope, send, headers, data, sess)
+    if result is None:
+        return
+    response_body, status = result
+    await send_json(send, status, response_body, sess=sess)
+
+
+async def send_sse_event(send, event):
+    await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+
+
+async def handle_predict_stream(scope, receive, send, headers):
+    """/predict_stream: seperti app.predict_stream(), header (cookie session) dan event 'intent' dikirim
+    begitu NLU dan aturan nama selesai; intent handler berjalan setelah stream terbuka."""
+    data = await read_chat_request(receive, send, headers)
+    if data is None:
+        return
+    sess = load_session(headers)
+    try:
+        async with admission_slot_async(scope, headers, sess):
+            flask_app_module.ensure_session_id(sess)
+            turn = flask_app_module.chat_turn(data, sess, stream=True)
+            try:
+                event, result = await advance_chat_turn_async(turn)
+                if result is not None and (result[1] != 200 or "answer" not in result[0]):
+                    await send_json(send, result[1], result[0], sess=sess)
+                    return
+                await send_response_start(send, 200, "text/event-stream; charset=utf-8",
+                                          {"cache-control": "no-cache", "x-accel-buffering": "no", "set-cookie": session_cookie_header(sess)})
+                if result is not None: # Selesai tanpa intent handler (OOS, klarifikasi, nama, fallback)
+                    events = flask_app_module.sse_events(result[0])
+                else:
+                    while event is not None:
+                        await send_sse_event(send, flask_app_module.format_sse(event.name, event.data))
+                        event, result = await advance_chat_turn_async(turn)
+                    events = flask_app_module.sse_answer_events(result[0])
+                for sse_event in events:
+                    await send_sse_event(send, sse_event)
+                await send({"type": "http.response.body", "body": b""})
+            finally:
+                turn.close()
+    except AdmissionRejected as rejection:
+        await send_admission_rejected(send, rejection)
+
+
+async def handle_forget_name(scope, receive, send, headers):
+    await read_body(receive)
+    sess = load_session(headers)
+    response_body, status = flask_app_module.forget_user_name(sess)
+    await send_json(send, status, response_body, sess=sess)
+
+
+_index_html = None
+
+async def handle_index(scope, receive, send, headers):
+    """Halaman utama; seperti index() di Flask, state dialog dan nama dibersihkan."""
+    global _index_html
+    sess = load_session(headers)
+    if flask_app_module.clear_dialogue_state(sess=sess):
+        logger.info("Dialogue state cleared on page load.")
+    if 'user_name' in sess:
+        sess.pop('user_name', None)
+        logger.info("User name cleared on page load.")
+    flask_app_module.ensure_session_id(sess)
+    if _index_html is None:
+        # Template statis (hanya url_for static): render sekali per proses
+        with app.test_request_context("/"):
+            _index_html = render_template("index.html").encode("utf-8")
+    await send_response(send, 200, _index_html, "text/html; charset=utf-8", {"set-cookie": session_cookie_header(sess)})
+
+
+async def handle_static(scope, receive, send, headers):
+    static_root = os.path.realpath(app.static_folder)
+    filepath = os.path.realpath(os.path.join(static_root, scope["path"][len("/static/"):]))
+    if not filepath.startswith(static_root + os.sep) or not os.path.isfile(filepath):
+        await send_json(send, 404, {"error": "Not Found"})
+        return
+    with open(filepath, "rb") as f:
+        content = f.read()
+    content_type = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+    await send_response(send, 200, content, content_type)
+
+
+def serving_stats():
+    return dict(SERVING_STATS, nlu_threads=NLU_THREADS, nlu_max_pending=NLU_MAX_PENDING, pending_nlu=_pending_nlu)
+
+
+async def handle_simple_json(view, send):
+    """Jalankan view JSON Flask tanpa input request (healthz/readyz) di app context."""
+    with app.app_context():
+        result = view()
+    response, status = result if isinstance(result, tuple) else (result, 200)
+    await send_response(send, status, response.get_data(), "application/json")
+
+
+async def handle_nlu_stats(scope, receive, send, headers):
+    with app.app_context():
+        stats = flask_app_module.nlu_stats().get_json()
+    stats["asgi"] = serving_stats()
+    await send_json(send, 200, stats)
+
+
+async def handle_metrics(scope, receive, send, headers):
+    body = flask_app_module.metrics.render_prometheus().encode("utf-8")
+    await send_response(send, 200, body, flask_app_module.METRICS_CONTENT_TYPE)
+
+
+ROUTES = {
+    ("POST", "/predict"): handle_predict,
+    ("POST", "/predict_stream"): handle_predict_stream,
+    ("POST", "/forget_name"): handle_forget_name,
+    ("GET", "/"): handle_index,
+    ("GET", "/healthz"): lambda scope, receive, send, headers: handle_simple_json(flask_app_module.healthz, send),
+    ("GET", "/readyz"): lambda scope, receive, send, headers: handle_simple_json(flask_app_module.readyz, send),
+    ("GET", "/nlu_stats"): handle_nlu_stats,
+    ("GET", "/metrics"): handle_metrics,
+}
+
+
+async def application(scope, receive, send):
+    """Entry point ASGI 3."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                get_executor()
+                logger.info("Mode ASGI aktif (PID %s): %s thread inferensi, maks %s antrean NLU.", os.getpid(), NLU_THREADS, NLU_MAX_PENDING)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if _executor is not None:
+                    _executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    headers = dict(scope.get("headers") or [])
+    method, path = scope["method"], scope["path"]
+    handler = ROUTES.get((method, path))
+    if handler is None and method == "GET" and path.startswith("/static/"):
+        handler = handle_static
+    if handler is None:
+        known_path = any(route_path == path for _, route_path in ROUTES)
+        await send_json(send, 405 if known_path else 404, {"error": "Method Not Allowed" if known_path else "Not Found"})
+        return
+    start_time = time.time()
+    try:
+        await handler(scope, receive, send, headers)
+    except Exception as e:
+        # Error di luar chat_turn (yang sudah punya handler sendiri), misal cookie/route lain
+        logger.critical("Unhandled error in ASGI %s %s: %s", method, path, e, exc_info=True)
+        await send_json(send, 500, {"error": "Internal Server Error",
+                                    "debug_info": {"error_type": type(e).__name__,
+                                                   "processing_time_ms": round((time.time() - start_time) * 1000)}})
+
+# --- END OF FILE asgi.py ---
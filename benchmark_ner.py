@@ -0,0 +1,169 @@
+# --- START OF FILE benchmark_ner.py ---
+"""Bandingkan NLU penuh (textcat+ner untuk setiap teks) dengan NER bersyarat (NER_MODE=conditional).
+
+Untuk setiap teks di test set dilaporkan:
+- berapa persen teks yang tetap menjalankan 'ner',
+- latensi pipeline per request (rata-rata, p50, p95) dan selisih yang dihemat,
+- dampak akurasi: PERSON hasil extract_model_person_name yang berubah, recall PERSON pada teks
+  berlabel provide_name, dan kecocokan intent teratas (textcat tidak berubah, harus 100%).
+
+Jalankan dari root project:
+    python benchmark_ner.py --repeat 5
+    python benchmark_ner.py --json hasil_ner.json --show-mismatches
+
+Catatan: mengimpor app.py (memuat data & model); metrik Prometheus dimatikan agar tidak ikut terukur.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("METRICS_ENABLED", "0")
+os.environ.setdefault("APP_STARTUP_MODE", "eager")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+
+def load_test_set(path):
+    """List (teks, label intent emas) dari test_set.json ([teks, {"cats": {...}}])."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    items = []
+    for entry in data:
+        if not isinstance(entry, list) or len(entry) < 2 or not isinstance(entry[0], str):
+            continue
+        cats = entry[1].get("cats", {}) if isinstance(entry[1], dict) else {}
+        gold = max(cats, key=cats.get) if cats else None
+        items.append((entry[0], gold))
+    return items
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def time_pipeline(run, text, repeat):
+    """Durasi terbaik (detik) dari `repeat` kali run(text), plus Doc hasil run terakhir."""
+    best, doc = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        doc = run(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, doc
+
+
+def run_mode(mode, text):
+    app.NER_MODE = mode
+    return app._run_pipeline(text)
+
+
+def summarize(seconds):
+    ordered = sorted(seconds)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NER bersyarat vs textcat+ner penuh.")
+    parser.add_argument("--test-set", default=os.path.join(app.BASE_DIR, "test_set.json"))
+    parser.add_argument("--repeat", type=int, default=5, help="Ulangan per teks; durasi terbaik yang dipakai.")
+    parser.add_argument("--json", help="Simpan ringkasan ke file JSON.")
+    parser.add_argument("--show-mismatches", action="store_true", help="Tampilkan teks yang PERSON-nya berubah.")
+    args = parser.parse_args()
+
+    if not app.nlp:
+        raise SystemExit("ERROR: Model NLU tidak dimuat; benchmark tidak bisa dijalankan.")
+    if "ner" not in app.nlp.pipe_names:
+        raise SystemExit("ERROR: Pipeline model tidak memiliki komponen 'ner'.")
+    items = load_test_set(args.test_set)
+    if not items:
+        raise SystemExit(f"ERROR: Test set '{args.test_set}' kosong atau tidak valid.")
+    original_mode = app.NER_MODE
+
+    full_times, conditional_times, saved = [], [], []
+    ner_runs = intent_agree = person_agree = 0
+    gold_name_total = gold_name_full = gold_name_conditional = 0
+    mismatches = []
+    for text, gold in items:
+        normalized = text.lower().strip()
+        full_s, full_doc = time_pipeline(lambda t: run_mode("always", t), normalized, args.repeat)
+        conditional_s, conditional_doc = time_pipeline(lambda t: run_mode("conditional", t), normalized, args.repeat)
+        full_times.append(full_s)
+        conditional_times.append(conditional_s)
+        saved.append(full_s - conditional_s)
+
+        app.NER_MODE = "conditional"
+        ner_runs += app.should_run_ner(conditional_doc)
+        full_top = max(full_doc.cats, key=full_doc.cats.get) if full_doc.cats else None
+        conditional_top = max(conditional_doc.cats, key=conditional_doc.cats.get) if conditional_doc.cats else None
+        intent_agree += full_top == conditional_top
+
+        full_person = app.extract_model_person_name(full_doc)
+        conditional_person = app.extract_model_person_name(conditional_doc)
+        if full_person == conditional_person:
+            person_agree += 1
+        else:
+            mismatches.append({"text": text, "gold_intent": gold, "predicted_intent": full_top,
+                               "person_full": full_person, "person_conditional": conditional_person})
+        if gold == "provide_name":
+            gold_name_total += 1
+            gold_name_full += full_person is not None
+            gold_name_conditional += conditional_person is not None
+    app.NER_MODE = original_mode
+
+    total = len(items)
+    summary = {
+        "texts": total,
+        "ner_gate_min_score": app.NER_GATE_MIN_SCORE,
+        "ner_run_ratio": round(ner_runs / total, 4),
+        "latency_full": summarize(full_times),
+        "latency_conditional": summarize(conditional_times),
+        "saved_per_request": summarize(saved),
+        "top_intent_agreement": round(intent_agree / total, 4),
+        "person_agreement": round(person_agree / total, 4),
+        "person_mismatches": len(mismatches),
+        "provide_name_texts": gold_name_total,
+        "provide_name_person_recall_full": round(gold_name_full / gold_name_total, 4) if gold_name_total else None,
+        "provide_name_person_recall_conditional": round(gold_name_conditional / gold_name_total, 4) if gold_name_total else None,
+    }
+
+    print(f"Teks: {total} | NER dijalankan untuk {summary['ner_run_ratio'] * 100:.1f}% teks "
+          f"(provide_name >= {app.NER_GATE_MIN_SCORE} atau frasa perkenalan)")
+    print(f"{'mode':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, key in (("textcat+ner", "latency_full"), ("conditional", "latency_conditional"), ("dihemat", "saved_per_request")):
+        row = summary[key]
+        print(f"{label:<14}{row['mean_ms']:>10.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}")
+    print(f"Intent teratas sama   : {summary['top_intent_agreement'] * 100:.1f}%")
+    print(f"PERSON sama           : {summary['person_agreement'] * 100:.1f}% ({len(mismatches)} teks berubah)")
+    if gold_name_total:
+        print(f"Recall PERSON pada {gold_name_total} teks provide_name: "
+              f"penuh {summary['provide_name_person_recall_full'] * 100:.1f}% vs "
+              f"bersyarat {summary['provide_name_person_recall_conditional'] * 100:.1f}%")
+    if args.show_mismatches:
+        for row in mismatches:
+            print(f"  - {row['text']!r} (emas: {row['gold_intent']}, prediksi: {row['predicted_intent']}): "
+                  f"{row['person_full']!r} -> {row['person_conditional']!r}")
+
+    if args.json:
+        summary["mismatches"] = mismatches
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Ringkasan disimpan ke '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE benchmark_ner.py ---
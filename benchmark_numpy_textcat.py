@@ -0,0 +1,192 @@
+# --- START OF FILE benchmark_numpy_textcat.py ---
+"""Uji paritas dan benchmark scorer NumPy (numpy_textcat.py) vs textcat spaCy pada test_set.json.
+
+Paritas: token hasil tokenizer, fitur token (NORM/LOWER/PREFIX/SUFFIX/SHAPE), selisih maksimum
+skor doc.cats, dan kecocokan intent teratas. Keluar dengan kode 1 jika selisih > --tolerance
+atau ada intent teratas yang berbeda, sehingga bisa dipakai sebagai cek setelah melatih ulang model.
+
+Latensi: satu teks per panggilan (seperti /predict) dan satu batch penuh, berdampingan.
+Startup dan memori: waktu import + muat model dan RSS puncak, masing-masing di subprocess baru.
+
+Jalankan dari root project (ekspor dulu dengan export_textcat_numpy.py):
+    python benchmark_numpy_textcat.py
+    python benchmark_numpy_textcat.py --repeat 10 --json hasil_numpy.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import spacy
+
+from export_textcat_numpy import DEFAULT_MODEL_DIR, EXPORT_FILE_NAME
+from numpy_textcat import NumpyTextcat
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_SNIPPETS = {
+    "spacy": ("import spacy\n"
+              "nlp = spacy.load({model!r}, exclude=['ner'])\n"
+              "nlp('halo')"),
+    "numpy": ("from numpy_textcat import NumpyTextcat\n"
+              "scorer = NumpyTextcat.load({export!r})\n"
+              "scorer('halo')"),
+}
+
+
+def load_texts(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [entry[0].lower().strip() for entry in data if isinstance(entry, list) and entry and isinstance(entry[0], str)]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_ms(seconds):
+    ordered = sorted(seconds)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 4),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 4),
+    }
+
+
+def check_parity(nlp, scorer, texts):
+    """Bandingkan token, fitur token, dan skor untuk setiap teks."""
+    token_mismatches, feature_mismatches = [], []
+    for text in texts:
+        doc = nlp.make_doc(text)
+        spacy_tokens = [token.text for token in doc]
+        tokens, features, _ = scorer.token_features(text)
+        if spacy_tokens != [orth for orth, _ in tokens]:
+            token_mismatches.append({"text": text, "spacy": spacy_tokens, "numpy": [orth for orth, _ in tokens]})
+            continue
+        if len(doc):
+            expected = np.array([[getattr(token, attr.lower()) for attr in scorer.feature_attrs] for token in doc], dtype=np.uint64)
+            if not np.array_equal(expected, features):
+                feature_mismatches.append(text)
+    spacy_scores = np.array([[doc.cats.get(label, 0.0) for label in scorer.labels] for doc in nlp.pipe(texts)], dtype=np.float32)
+    numpy_scores = scorer.predict(texts)
+    diff = np.abs(spacy_scores - numpy_scores)
+    top_agreement = float((spacy_scores.argmax(axis=1) == numpy_scores.argmax(axis=1)).mean())
+    return {
+        "texts": len(texts),
+        "token_mismatches": token_mismatches,
+        "feature_mismatches": feature_mismatches,
+        "max_abs_diff": float(diff.max()) if diff.size else 0.0,
+        "mean_abs_diff": float(diff.mean()) if diff.size else 0.0,
+        "top_intent_agreement": round(top_agreement, 6),
+    }
+
+
+def time_single(run, texts, repeat):
+    """Durasi terbaik dari `repeat` kali per teks untuk run(text)."""
+    timings = []
+    for text in texts:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(text)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+    return timings
+
+
+def time_batch(run, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(texts)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_startup(kind, model_dir, export_path):
+    """Waktu import + muat + satu prediksi (ms) dan RSS puncak (MB) di subprocess baru."""
+    # VmHWM, bukan ru_maxrss: ru_maxrss ikut terbawa dari proses induk saat fork+exec
+    code = ("import time\n"
+            "started = time.perf_counter()\n"
+            + STARTUP_SNIPPETS[kind].format(model=model_dir, export=export_path) + "\n"
+            "elapsed = time.perf_counter() - started\n"
+            "hwm = [line for line in open('/proc/self/status') if line.startswith('VmHWM:')][0].split()[1]\n"
+            "print(round(elapsed * 1000, 1), round(int(hwm) / 1024, 1))\n")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    startup_ms, rss_mb = result.stdout.strip().splitlines()[-1].split()
+    return {"startup_ms": float(startup_ms), "peak_rss_mb": float(rss_mb)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paritas dan latensi scorer NumPy vs textcat spaCy.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--export", help=f"File .npz (default: <model>/{EXPORT_FILE_NAME})")
+    parser.add_argument("--test-set", default=os.path.join(BASE_DIR, "test_set.json"))
+    parser.add_argument("--repeat", type=int, default=5, help="Ulangan per teks/batch; durasi terbaik yang dipakai.")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Selisih skor maksimum yang masih dianggap sama.")
+    parser.add_argument("--skip-startup", action="store_true", help="Lewati pengukuran startup/memori (subprocess).")
+    parser.add_argument("--json", help="Simpan ringkasan ke file JSON.")
+    args = parser.parse_args()
+    export_path = args.export or os.path.join(args.model, EXPORT_FILE_NAME)
+    if not os.path.exists(export_path):
+        raise SystemExit(f"ERROR: '{export_path}' tidak ada; jalankan export_textcat_numpy.py dulu.")
+
+    nlp = spacy.load(args.model, exclude=["ner"])
+    scorer = NumpyTextcat.load(export_path)
+    texts = load_texts(args.test_set)
+    if not texts:
+        raise SystemExit(f"ERROR: Test set '{args.test_set}' kosong atau tidak valid.")
+
+    parity = check_parity(nlp, scorer, texts)
+    passed = (parity["max_abs_diff"] <= args.tolerance and parity["top_intent_agreement"] == 1.0
+              and not parity["token_mismatches"] and not parity["feature_mismatches"])
+    print(f"Paritas ({parity['texts']} teks): selisih skor maks {parity['max_abs_diff']:.2e} "
+          f"(rata-rata {parity['mean_abs_diff']:.2e}), intent teratas sama {parity['top_intent_agreement'] * 100:.2f}%, "
+          f"token berbeda {len(parity['token_mismatches'])}, fitur berbeda {len(parity['feature_mismatches'])} "
+          f"-> {'LULUS' if passed else 'GAGAL'}")
+    for row in parity["token_mismatches"][:10]:
+        print(f"  - token {row['text']!r}: spaCy {row['spacy']} vs NumPy {row['numpy']}")
+
+    latency = {
+        "spacy_single": summarize_ms(time_single(nlp, texts, args.repeat)),
+        "numpy_single": summarize_ms(time_single(scorer, texts, args.repeat)),
+        "spacy_batch_ms": round(time_batch(lambda batch: list(nlp.pipe(batch)), texts, args.repeat) * 1000, 2),
+        "numpy_batch_ms": round(time_batch(scorer.predict, texts, args.repeat) * 1000, 2),
+    }
+    print(f"\n{'latensi per teks':<20}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, key in (("spaCy textcat", "spacy_single"), ("NumPy", "numpy_single")):
+        row = latency[key]
+        print(f"{label:<20}{row['mean_ms']:>10.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}")
+    print(f"Batch {len(texts)} teks: spaCy nlp.pipe {latency['spacy_batch_ms']:.1f} ms vs NumPy predict {latency['numpy_batch_ms']:.1f} ms")
+
+    startup = None
+    if not args.skip_startup:
+        startup = {kind: measure_startup(kind, args.model, export_path) for kind in STARTUP_SNIPPETS}
+        print(f"\n{'startup (proses baru)':<24}{'ms':>10}{'RSS puncak MB':>16}")
+        for kind, row in startup.items():
+            print(f"{kind:<24}{row['startup_ms']:>10.1f}{row['peak_rss_mb']:>16.1f}")
+
+    if args.json:
+        summary = {"parity": dict(parity, passed=passed), "latency": latency, "startup": startup,
+                   "export_kb": round(os.path.getsize(export_path) / 1024, 1)}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Ringkasan disimpan ke '{args.json}'.")
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE benchmark_numpy_textcat.py ---
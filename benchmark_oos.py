@@ -0,0 +1,93 @@
+# --- START OF FILE benchmark_oos.py ---
+"""Micro-benchmark check_out_of_scope: loop regex per keyword (lama) vs satu pola precompiled.
+
+Jalankan dari root project:
+    python benchmark_oos.py --repeat 2000
+
+Catatan: mengimpor app.py (memuat data & model); hasil benchmark hanya mengukur fungsi OOS.
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import re
+import timeit
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+
+def check_out_of_scope_legacy(text_lower, domain_kws, oos_kws, min_len_no_domain=5):
+    """Implementasi lama: satu re.search (dengan kompilasi) per keyword."""
+    for keyword in oos_kws:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
+            return True, "explicit"
+    found_domain_keyword = False
+    for keyword in domain_kws:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text_lower):
+            found_domain_keyword = True
+            break
+    if not found_domain_keyword and len(text_lower.split()) > 2 and len(text_lower.split()) >= min_len_no_domain:
+        return True, "potential_no_domain"
+    if found_domain_keyword:
+        return False, "in_scope_domain_keyword_present"
+    return False, "in_scope_short_or_generic"
+
+
+FILLER_WORDS = ["apa", "bagaimana", "saya", "mau", "tanya", "tentang", "yang", "di", "dan", "itu",
+                "tolong", "info", "dong", "kak", "bisa", "kapan", "berapa", "ini", "untuk", "ya"]
+
+
+def make_text(length, rng, domain_word=None, oos_word=None):
+    """Buat teks sepanjang `length` karakter dari kata pengisi, opsional disisipi keyword."""
+    words = []
+    while len(" ".join(words)) < length:
+        words.append(rng.choice(FILLER_WORDS))
+    if domain_word:
+        words[rng.randrange(len(words))] = domain_word
+    if oos_word:
+        words[rng.randrange(len(words))] = oos_word
+    return " ".join(words)[:length].strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deteksi out-of-scope (OOS).")
+    parser.add_argument("--repeat", type=int, default=2000, help="Jumlah pemanggilan per kasus.")
+    parser.add_argument("--lengths", default="10,50,100,200,350,500", help="Panjang input (karakter), dipisah koma.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    domain_kws, oos_kws = app.DOMAIN_KEYWORDS, app.OOS_KEYWORDS
+    min_len = app.MIN_LEN_FOR_NO_DOMAIN_OOS
+    lengths = [int(x) for x in args.lengths.split(",") if x.strip()]
+
+    # Nonaktifkan print DEBUG selama pengukuran
+    sink = io.StringIO()
+
+    print(f"{'panjang':>7} | {'kasus':<10} | {'lama (us)':>10} | {'baru (us)':>10} | {'speedup':>7}")
+    print("-" * 58)
+    for length in lengths:
+        cases = {
+            "no_keyword": make_text(length, rng),
+            "domain": make_text(length, rng, domain_word=rng.choice(sorted(domain_kws))),
+            "oos": make_text(length, rng, oos_word=rng.choice(sorted(oos_kws))),
+        }
+        for case_name, text in cases.items():
+            with contextlib.redirect_stdout(sink):
+                expected = check_out_of_scope_legacy(text, domain_kws, oos_kws, min_len)
+                actual = app.check_out_of_scope(text, domain_kws, oos_kws, min_len)
+                if expected != actual:
+                    raise AssertionError(f"Hasil berbeda untuk {text!r}: lama={expected}, baru={actual}")
+                legacy_s = timeit.timeit(lambda: check_out_of_scope_legacy(text, domain_kws, oos_kws, min_len), number=args.repeat)
+                new_s = timeit.timeit(lambda: app.check_out_of_scope(text, domain_kws, oos_kws, min_len), number=args.repeat)
+            legacy_us = legacy_s / args.repeat * 1e6
+            new_us = new_s / args.repeat * 1e6
+            print(f"{len(text):>7} | {case_name:<10} | {legacy_us:>10.1f} | {new_us:>10.1f} | {legacy_us / new_us:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE benchmark_oos.py ---
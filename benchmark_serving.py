@@ -0,0 +1,259 @@
+# --- START OF FILE benchmark_serving.py ---
+"""Benchmark serving: gunicorn sync (app:app) vs ASGI (asgi:application) dengan jumlah core yang sama.
+
+Kedua mode dijalankan lewat gunicorn.conf.py dengan jumlah worker = --cores dan proses
+server di-pin ke --cores CPU pertama (Linux). Mode ASGI memakai worker uvicorn
+(`pip install uvicorn`). Klien beban berjalan di proses ini (asyncio, HTTP/1.1 keep-alive):
+--concurrency koneksi aktif mengirim /predict terus-menerus, ditambah --idle koneksi yang
+dibuka lalu dibiarkan diam (meniru tab chat yang terbuka tanpa mengetik).
+
+Jalankan dari root project:
+    python benchmark_serving.py --cores 2 --concurrency 16 --duration 20
+    python benchmark_serving.py --cores 2 --concurrency 16 --idle 4 --nlu-threads 2 --json hasil.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERVER_COMMANDS = {
+    "sync": ["app:app"],
+    "asgi": ["-k", "uvicorn.workers.UvicornWorker", "asgi:application"],
+}
+
+
+def load_texts(path, limit=None):
+    """Ambil teks dari test_set.json ([[teks, anotasi], ...]); entri rusak dilewati."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    texts = [item[0] for item in data if isinstance(item, (list, tuple)) and item and isinstance(item[0], str) and item[0].strip()]
+    return texts[:limit] if limit else texts
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+# --- Server ---
+def start_server(mode, args, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(args.cores), GUNICORN_MEMORY_REPORT="0",
+               NLU_THREADS=str(args.nlu_threads), PYTHONUNBUFFERED="1")
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}"] + SERVER_COMMANDS[mode]
+    cores = sorted(os.sched_getaffinity(0))[:args.cores] if hasattr(os, "sched_getaffinity") else None
+    if cores is not None and len(cores) < args.cores:
+        print(f"WARNING: Hanya {len(cores)} CPU tersedia; server tetap dijalankan dengan {args.cores} worker.")
+    preexec = (lambda: os.sched_setaffinity(0, cores)) if cores else None
+    log = open(os.path.join(args.log_dir, f"benchmark_serving_{mode}.log"), "w")
+    proc = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, preexec_fn=preexec)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server {mode} berhenti saat startup (lihat {log.name}).")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=2) as response:
+                if response.status == 200:
+                    return proc
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(proc)
+    raise RuntimeError(f"Server {mode} tidak siap dalam {args.startup_timeout} s (lihat {log.name}).")
+
+
+def stop_server(proc):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+# --- Klien beban ---
+class Connection:
+    """Koneksi HTTP/1.1 keep-alive minimal; tersambung ulang jika server menutup koneksi.
+
+    Body respons terakhir disimpan di `last_body` (dipakai loadtest.py untuk distribusi intent).
+    """
+
+    def __init__(self, port, host="127.0.0.1", path="/predict"):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.reader = self.writer = None
+        self.cookie = None
+        self.last_body = b""
+
+    async def request(self, text):
+        body = json.dumps({"text": text}).encode("utf-8")
+        headers = [f"POST {self.path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Content-Type: application/json",
+                   f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        if self.cookie:
+            headers.append(f"Cookie: {self.cookie}")
+        payload = ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Koneksi lama ditutup server (worker sync tidak mendukung keep-alive): coba sekali lagi
+                self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        length, keep_alive = 0, True
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.lower() == "close":
+                keep_alive = False
+            elif name == "set-cookie":
+                self.cookie = value.split(";", 1)[0]
+        self.last_body = await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def active_client(client_id, port, texts, deadline, results, request_timeout):
+    conn = Connection(port)
+    rng = random.Random(client_id)
+    try:
+        # Perkenalan dulu supaya request berikutnya melewati alur normal (nama sudah ada di sesi)
+        await asyncio.wait_for(conn.request("nama saya Budi"), request_timeout)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(conn.request(rng.choice(texts)), request_timeout)
+            except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError):
+                results["errors"] += 1
+                conn.close()
+                continue
+            results["latencies"].append(time.perf_counter() - started)
+            results["status"][status] = results["status"].get(status, 0) + 1
+    except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError):
+        results["errors"] += 1
+    finally:
+        conn.close()
+
+
+async def idle_client(port, stop_event):
+    """Buka koneksi lalu diam sampai benchmark selesai (tanpa mengirim request)."""
+    try:
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        return
+    await stop_event.wait()
+    writer.close()
+
+
+async def run_load(port, texts, args):
+    results = {"latencies": [], "errors": 0, "status": {}}
+    stop_event = asyncio.Event()
+    idle_tasks = [asyncio.create_task(idle_client(port, stop_event)) for _ in range(args.idle)]
+    await asyncio.sleep(0.2)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(active_client(i, port, texts, deadline, results, args.request_timeout) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    await asyncio.gather(*idle_tasks)
+    return results, elapsed
+
+
+def summarize(mode, results, elapsed):
+    latencies = sorted(results["latencies"])
+    ok = sum(count for status, count in results["status"].items() if status == 200)
+    to_ms = lambda seconds: round(seconds * 1000, 1) if seconds is not None else None
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": results["errors"],
+        "status": {str(k): v for k, v in sorted(results["status"].items())},
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": to_ms(percentile(latencies, 50)),
+        "p90_ms": to_ms(percentile(latencies, 90)),
+        "p99_ms": to_ms(percentile(latencies, 99)),
+        "max_ms": to_ms(latencies[-1] if latencies else None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan serving gunicorn sync vs ASGI pada jumlah core yang sama.")
+    parser.add_argument("--modes", default="sync,asgi", help="Mode yang diuji, dipisah koma (sync, asgi).")
+    parser.add_argument("--cores", type=int, default=1, help="Jumlah core/worker untuk setiap mode.")
+    parser.add_argument("--nlu-threads", type=int, default=1, help="Thread inferensi per worker pada mode ASGI.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Koneksi aktif yang mengirim request terus-menerus.")
+    parser.add_argument("--idle", type=int, default=0, help="Koneksi tambahan yang dibuka tetapi tidak mengirim apa-apa.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durasi beban per mode (detik).")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Timeout per request (detik).")
+    parser.add_argument("--startup-timeout", type=float, default=180.0, help="Batas waktu menunggu /readyz (detik).")
+    parser.add_argument("--port", type=int, default=8091, help="Port server benchmark.")
+    parser.add_argument("--texts", default=os.path.join(BASE_DIR, "test_set.json"), help="File teks uji (format test_set.json).")
+    parser.add_argument("--log-dir", default=BASE_DIR, help="Folder log server.")
+    parser.add_argument("--json", help="Simpan hasil ke file JSON.")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    if "asgi" in modes and importlib.util.find_spec("uvicorn") is None:
+        print("WARNING: uvicorn tidak terpasang (pip install uvicorn); mode 'asgi' dilewati.")
+        modes.remove("asgi")
+    texts = load_texts(args.texts)
+    print(f"--- Benchmark serving: {args.cores} core, {args.concurrency} koneksi aktif, {args.idle} koneksi diam, "
+          f"{args.duration:.0f} s per mode, {len(texts)} teks ---")
+
+    summaries = []
+    for mode in modes:
+        proc = start_server(mode, args, args.port)
+        try:
+            results, elapsed = asyncio.run(run_load(args.port, texts, args))
+        finally:
+            stop_server(proc)
+        summary = summarize(mode, results, elapsed)
+        summary.update(cores=args.cores, nlu_threads=args.nlu_threads if mode == "asgi" else None)
+        summaries.append(summary)
+        print(f"[*] {mode.ljust(5)} {summary['throughput_rps']:>7} req/s  p50 {summary['p50_ms']} ms  p90 {summary['p90_ms']} ms  "
+              f"p99 {summary['p99_ms']} ms  max {summary['max_ms']} ms  error {summary['errors']}  status {summary['status']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": summaries}, f, indent=2)
+        print(f"INFO: Hasil disimpan ke '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE benchmark_serving.py ---
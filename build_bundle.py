@@ -0,0 +1,157 @@
+# --- START OF FILE build_bundle.py ---
+"""Bangun bundle serving (serving_bundle.py) dari intent_model_ft_v2 dan folder data/.
+
+Isi bundle:
+- nlp_config + nlp: config dan nlp.to_bytes() model spaCy (semua komponen),
+- entity_patterns: pola PRODI/LAB dari terms.json yang sudah ditokenisasi, lengkap dengan
+  match_id dan entity_details (label, canonical),
+- data: semua file .json/.txt di data/ yang sudah di-parse (build gagal jika ada JSON rusak),
+- cascade: cascade.json model jika ada (margin cascade terikat ke bobot model).
+
+Worker memakai bundle dengan SERVING_BUNDLE=<path> (lihat app.py). Setiap perubahan model atau
+data/ butuh build ulang; content_hash yang dicetak sama dengan yang dilaporkan /readyz worker.
+
+Jalankan dari root project:
+    python build_bundle.py
+    python build_bundle.py --output /srv/chatbot/serving_bundle.bin --compare
+"""
+
+import argparse
+import json
+import os
+import time
+
+import spacy
+
+from data_store import load_json_file, load_text_file
+from nlu_cascade import load_cascade_config
+from serving_bundle import ServingBundle, build_phrase_matcher, compile_entity_patterns, write_bundle
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_DIR = os.path.join(BASE_DIR, "intent_model_ft_v2")
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "serving_bundle.bin")
+DATA_EXTENSIONS = (".json", ".txt")
+
+
+def _json_bytes(value):
+    # Tanpa sort_keys: urutan key data (mis. daftar lab/prodi) dipakai handler dan harus sama dengan file aslinya
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def load_data_dir(data_dir):
+    """Parse semua file data/ (strict: file rusak menggagalkan build, tidak dibundel sebagai {})."""
+    files = {}
+    for filename in sorted(os.listdir(data_dir)):
+        filepath = os.path.join(data_dir, filename)
+        if not os.path.isfile(filepath) or not filename.endswith(DATA_EXTENSIONS):
+            continue
+        loader = load_json_file if filename.endswith(".json") else load_text_file
+        files[filename] = loader(filepath, strict=True)
+    return files
+
+
+def build_sections(nlp, data_files, cascade_config):
+    entries = compile_entity_patterns(nlp, data_files.get("terms.json", {}))
+    sections = [
+        ("nlp_config", nlp.config.to_str().encode("utf-8")),
+        ("nlp", nlp.to_bytes()),
+        ("entity_patterns", _json_bytes(entries)),
+        ("data", _json_bytes(data_files)),
+    ]
+    if cascade_config is not None:
+        sections.append(("cascade", _json_bytes(cascade_config)))
+    return sections, entries
+
+
+def time_directory_load(model_dir, data_dir):
+    """Durasi (ms) jalur startup lama: spacy.load, pola matcher via make_doc, parse data/."""
+    timings = {}
+    started = time.perf_counter()
+    nlp = spacy.load(model_dir)
+    timings["model_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    data_files = load_data_dir(data_dir)
+    timings["data_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    build_phrase_matcher(nlp.vocab, compile_entity_patterns(nlp, data_files.get("terms.json", {})))
+    timings["matcher_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def time_bundle_load(path):
+    """Durasi (ms) jalur startup bundle: open + verifikasi checksum, model, matcher, data."""
+    timings = {}
+    started = time.perf_counter()
+    bundle = ServingBundle.open(path, verify=True)
+    timings["open_verify_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    nlp = bundle.load_nlp()
+    timings["model_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    bundle.data_files()
+    timings["data_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    build_phrase_matcher(nlp.vocab, bundle.entity_patterns())
+    timings["matcher_ms"] = (time.perf_counter() - started) * 1000
+    bundle.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bangun bundle serving (model + matcher + data) satu file.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", action="store_true",
+                        help="Bandingkan waktu muat bundle vs direktori model + data/ (memuat model dua kali).")
+    parser.add_argument("--json", help="Simpan ringkasan build ke file JSON.")
+    args = parser.parse_args()
+
+    build_started = time.perf_counter()
+    nlp = spacy.load(args.model)
+    try:
+        data_files = load_data_dir(args.data_dir)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"ERROR: Data di '{args.data_dir}' tidak bisa dibundel: {e}")
+    sections, entries = build_sections(nlp, data_files, load_cascade_config(args.model))
+    header = write_bundle(args.output, sections, meta={
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model": {"dir": os.path.basename(os.path.normpath(args.model)), "name": nlp.meta.get("name"),
+                  "version": nlp.meta.get("version"), "pipeline": list(nlp.pipe_names)},
+        "spacy_version": spacy.__version__,
+        "data_files": sorted(data_files),
+        "entity_patterns": {"entities": len(entries), "patterns": sum(len(entry["patterns"]) for entry in entries)},
+    })
+    build_ms = (time.perf_counter() - build_started) * 1000
+
+    # Baca ulang: pastikan file yang ditulis lolos verifikasi yang sama dengan worker
+    bundle = ServingBundle.open(args.output, verify=True)
+    size_kb = bundle.info()["size_bytes"] / 1024
+    bundle.close()
+    print(f"Bundle '{args.output}' ({size_kb:.0f} KB) dibangun dalam {build_ms:.0f} ms.")
+    print(f"content_hash: {header['content_hash']}")
+    for entry in header["sections"]:
+        print(f"  - {entry['name']:<16}{entry['length'] / 1024:>10.1f} KB  sha256 {entry['sha256'][:16]}")
+    print(f"Pola matcher: {header['entity_patterns']['patterns']} pola untuk {header['entity_patterns']['entities']} entitas; "
+          f"data: {len(data_files)} file.")
+
+    comparison = None
+    if args.compare:
+        comparison = {"directory": time_directory_load(args.model, args.data_dir), "bundle": time_bundle_load(args.output)}
+        print(f"\n{'waktu muat (ms)':<18}{'direktori':>12}{'bundle':>12}")
+        for key in ("open_verify_ms", "model_ms", "matcher_ms", "data_ms"):
+            directory = comparison["directory"].get(key)
+            print(f"{key:<18}{(f'{directory:.1f}' if directory is not None else '-'):>12}{comparison['bundle'][key]:>12.1f}")
+        print(f"{'total':<18}{sum(comparison['directory'].values()):>12.1f}{sum(comparison['bundle'].values()):>12.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"header": header, "build_ms": round(build_ms, 1), "load_comparison": comparison}, f, ensure_ascii=False, indent=2)
+        print(f"Ringkasan disimpan ke '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE build_bundle.py ---
@@ -0,0 +1,170 @@
+# --- START OF FILE calibrate_cascade.py ---
+"""Kalibrasi margin cascade textcat (nlu_cascade.py) dari test_set.json.
+
+Untuk setiap kandidat margin, teks dengan selisih skor teratas-kedua model linear >= margin dijawab
+jalur cepat (model linear saja), sisanya oleh ensemble penuh. Akurasi dihitung seperti di app.py:
+intent teratas dianggap jawaban hanya jika skornya >= --confidence-threshold (di bawahnya app
+menjawab fallback low confidence). Margin terkecil (jalur cepat terbanyak) yang penurunan
+akurasinya terhadap ensemble penuh <= --max-accuracy-loss yang dipilih.
+
+Dengan --traffic (log query JSONL, format sama dengan loadtest.py --log) dilaporkan juga
+berapa persen traffic produksi yang akan lewat jalur cepat dengan margin terpilih.
+
+Jalankan dari root project:
+    python calibrate_cascade.py --max-accuracy-loss 0.005 --traffic query_log.jsonl
+    python calibrate_cascade.py --write   # simpan ke intent_model_ft_v2/cascade.json (dibaca app.py)
+"""
+
+import argparse
+import json
+import os
+import time
+
+import spacy
+
+from loadtest import load_query_log
+from nlu_cascade import CASCADE_FILE_NAME, find_linear_model, top_two_margin
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DISABLED_MARGIN = 1.01 # Selisih skor softmax tidak pernah > 1: jalur cepat tidak pernah dipakai
+
+
+def load_test_set(path):
+    """List (teks, label intent emas) dari test_set.json ([teks, {"cats": {...}}])."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    items = []
+    for entry in data:
+        if not isinstance(entry, list) or len(entry) < 2 or not isinstance(entry[0], str):
+            continue
+        cats = entry[1].get("cats", {}) if isinstance(entry[1], dict) else {}
+        if cats:
+            items.append((entry[0], max(cats, key=cats.get)))
+    return items
+
+
+def score_texts(nlp, linear_model, textcat, texts, batch_size):
+    """Skor model linear dan ensemble penuh untuk setiap teks (urutan label = textcat.labels)."""
+    docs = [nlp.make_doc(text.lower().strip()) for text in texts]
+    linear_scores, full_scores = [], []
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        linear_scores.extend(linear_model.ops.to_numpy(linear_model.predict(batch)))
+        full_scores.extend(textcat.model.ops.to_numpy(textcat.model.predict(batch)))
+    return linear_scores, full_scores
+
+
+def answer(labels, row, threshold):
+    """Label yang dijawab app (intent teratas jika skornya >= threshold, selain itu None)."""
+    top = int(row.argmax())
+    return labels[top] if row[top] >= threshold else None
+
+
+def evaluate(margin, rows, gold, labels, threshold):
+    """(akurasi cascade, rasio jalur cepat) untuk satu margin."""
+    correct = fast = 0
+    for (linear_row, full_row), gold_label in zip(rows, gold):
+        if top_two_margin(linear_row)[1] >= margin:
+            fast += 1
+            predicted = answer(labels, linear_row, threshold)
+        else:
+            predicted = answer(labels, full_row, threshold)
+        correct += predicted == gold_label
+    return correct / len(gold), fast / len(gold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kalibrasi margin cascade textcat (model linear -> ensemble).")
+    parser.add_argument("--model", default=os.path.join(BASE_DIR, "intent_model_ft_v2"))
+    parser.add_argument("--test-set", default=os.path.join(BASE_DIR, "test_set.json"))
+    parser.add_argument("--max-accuracy-loss", type=float, default=0.005,
+                        help="Penurunan akurasi maksimum vs ensemble penuh (0.005 = 0.5 poin persen).")
+    parser.add_argument("--confidence-threshold", type=float, default=0.5, help="Sama dengan CONFIDENCE_THRESHOLD di app.py.")
+    parser.add_argument("--traffic", action="append", default=[], help="Log query JSONL produksi (boleh diulang).")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--write", action="store_true", help=f"Simpan margin ke <model>/{CASCADE_FILE_NAME}.")
+    parser.add_argument("--json", help="Simpan ringkasan (termasuk kurva margin) ke file JSON.")
+    args = parser.parse_args()
+
+    nlp = spacy.load(args.model)
+    if "textcat" not in nlp.pipe_names:
+        raise SystemExit("ERROR: Model tidak memiliki komponen 'textcat'.")
+    textcat = nlp.get_pipe("textcat")
+    linear_model = find_linear_model(textcat.model)
+    if linear_model is None:
+        raise SystemExit("ERROR: Model textcat bukan TextCatEnsemble dengan sub-model linear; cascade tidak bisa dipakai.")
+    labels = list(textcat.labels)
+
+    items = load_test_set(args.test_set)
+    if not items:
+        raise SystemExit(f"ERROR: Test set '{args.test_set}' kosong atau tidak valid.")
+    gold = [label for _, label in items]
+    linear_scores, full_scores = score_texts(nlp, linear_model, textcat, [text for text, _ in items], args.batch_size)
+    rows = list(zip(linear_scores, full_scores))
+
+    accuracy_full, _ = evaluate(DISABLED_MARGIN, rows, gold, labels, args.confidence_threshold)
+    candidates = sorted({round(top_two_margin(row)[1], 6) for row in linear_scores} | {0.0})
+    curve = []
+    chosen = None
+    for margin in candidates:
+        accuracy, fast_ratio = evaluate(margin, rows, gold, labels, args.confidence_threshold)
+        curve.append({"margin": margin, "accuracy": round(accuracy, 4), "fast_path_ratio": round(fast_ratio, 4)})
+        if chosen is None and accuracy_full - accuracy <= args.max_accuracy_loss + 1e-12:
+            chosen = curve[-1]
+    if chosen is None or chosen["fast_path_ratio"] == 0.0:
+        chosen = {"margin": DISABLED_MARGIN, "accuracy": round(accuracy_full, 4), "fast_path_ratio": 0.0}
+
+    traffic_texts = [text for path in args.traffic for text in load_query_log(path)]
+    traffic_fast_ratio = None
+    if traffic_texts:
+        traffic_linear, _ = score_texts(nlp, linear_model, textcat, traffic_texts, args.batch_size)
+        traffic_fast = sum(1 for row in traffic_linear if top_two_margin(row)[1] >= chosen["margin"])
+        traffic_fast_ratio = round(traffic_fast / len(traffic_texts), 4)
+
+    print(f"Test set: {len(items)} teks | akurasi ensemble penuh {accuracy_full * 100:.2f}% "
+          f"(threshold confidence {args.confidence_threshold})")
+    print(f"{'margin':>8}{'akurasi':>10}{'jalur cepat':>13}")
+    step = max(1, len(curve) // 15)
+    for row in curve[::step]:
+        print(f"{row['margin']:>8.4f}{row['accuracy'] * 100:>9.2f}%{row['fast_path_ratio'] * 100:>12.1f}%")
+    if chosen["margin"] >= DISABLED_MARGIN:
+        print(f"Tidak ada margin dengan penurunan akurasi <= {args.max_accuracy_loss} yang memakai jalur cepat; "
+              "cascade sebaiknya tidak diaktifkan untuk model ini.")
+    else:
+        print(f"Margin terpilih: {chosen['margin']:.4f} -> akurasi {chosen['accuracy'] * 100:.2f}% "
+              f"(turun {(accuracy_full - chosen['accuracy']) * 100:.2f} poin), "
+              f"jalur cepat {chosen['fast_path_ratio'] * 100:.1f}% test set")
+    if traffic_fast_ratio is not None:
+        print(f"Traffic produksi: {len(traffic_texts)} query, {traffic_fast_ratio * 100:.1f}% lewat jalur cepat")
+
+    summary = {
+        "margin": chosen["margin"],
+        "max_accuracy_loss": args.max_accuracy_loss,
+        "confidence_threshold": args.confidence_threshold,
+        "test_set": os.path.basename(args.test_set),
+        "texts": len(items),
+        "accuracy_full": round(accuracy_full, 4),
+        "accuracy_cascade": chosen["accuracy"],
+        "fast_path_ratio_test": chosen["fast_path_ratio"],
+        "fast_path_ratio_traffic": traffic_fast_ratio,
+        "traffic_texts": len(traffic_texts),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if args.write:
+        if chosen["margin"] >= DISABLED_MARGIN:
+            print(f"INFO: {CASCADE_FILE_NAME} tidak ditulis karena tidak ada margin yang layak.")
+        else:
+            output_path = os.path.join(args.model, CASCADE_FILE_NAME)
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            print(f"Margin disimpan ke '{output_path}'.")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(dict(summary, curve=curve), f, ensure_ascii=False, indent=2)
+        print(f"Ringkasan disimpan ke '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE calibrate_cascade.py ---
@@ -0,0 +1,279 @@
+# --- START OF FILE data_store.py ---
+"""Data store untuk file di folder data/ yang bisa di-reload tanpa restart worker.
+
+File JSON/TXT dimuat menjadi satu snapshot read-only (DataStore.snapshot()).
+Thread polling memeriksa mtime file secara berkala; file yang berubah di-parse dan
+divalidasi di background, lalu snapshot baru dipasang secara atomik (satu assignment
+referensi). Request yang sedang berjalan tetap memakai snapshot yang diambilnya di
+awal, sehingga tidak pernah melihat campuran data lama dan baru.
+
+Data turunan (misal indeks jadwal) didaftarkan lewat add_derived() dan dihitung
+ulang hanya jika file sumbernya berubah.
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from types import MappingProxyType
+
+
+def load_json_file(filepath, strict=False):
+    """Memuat file JSON. Jika strict=False, error dicetak dan {} dikembalikan."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if strict: raise
+        print(f"ERROR: File data '{filepath}' tidak ditemukan.")
+    except json.JSONDecodeError as e:
+        if strict: raise
+        print(f"ERROR: File data '{filepath}' bukan JSON valid. Kesalahan: {e}")
+    except Exception as e:
+        if strict: raise
+        print(f"ERROR: Terjadi kesalahan lain saat memuat '{filepath}': {e}")
+        traceback.print_exc()
+    return {}
+
+
+def load_text_file(filepath, strict=False):
+    """Memuat file teks. Jika strict=False, pesan error (string) dikembalikan sebagai konten."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        if strict: raise
+        print(f"ERROR: File teks '{filepath}' tidak ditemukan.")
+        return f"Konten panduan '{os.path.basename(filepath)}' tidak ditemukan."
+    except Exception as e:
+        if strict: raise
+        print(f"ERROR: Terjadi kesalahan saat memuat '{filepath}': {e}")
+        traceback.print_exc()
+        return f"Terjadi kesalahan saat memuat panduan '{os.path.basename(filepath)}'."
+
+
+class DataSource:
+    """Satu file di data/ yang dipetakan ke satu key config.
+
+    Args:
+        key (str): Key di snapshot, misal 'SPP_DATA'.
+        filename (str): Nama file relatif terhadap data_dir.
+        kind (str): 'json' atau 'text'.
+        validator (callable): Opsional; menerima data hasil parse dan raise ValueError jika tidak valid.
+    """
+    __slots__ = ("key", "filename", "kind", "validator")
+
+    def __init__(self, key, filename, kind="json", validator=None):
+        if kind not in ("json", "text"):
+            raise ValueError(f"Jenis data '{kind}' tidak dikenal untuk {filename}.")
+        self.key = key
+        self.filename = filename
+        self.kind = kind
+        self.validator = validator
+
+    def load(self, data_dir, strict=False):
+        filepath = os.path.join(data_dir, self.filename)
+        loader = load_json_file if self.kind == "json" else load_text_file
+        data = loader(filepath, strict=strict)
+        if strict and self.validator:
+            self.validator(data)
+        return data
+
+
+def _file_signature(filepath):
+    try:
+        st = os.stat(filepath)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class DataStore:
+    """Snapshot data/ yang immutable di level atas dan di-swap secara atomik saat file berubah.
+
+    Nilai di dalam snapshot (dict/list hasil parse JSON) dipakai bersama oleh semua
+    request dan TIDAK boleh dimodifikasi; buat salinan jika perlu mengubahnya.
+
+    Args:
+        data_dir (str): Folder data.
+        sources (list): List DataSource.
+        base_config (dict): Nilai statis yang ikut dimasukkan ke setiap snapshot (link, kontak, dll).
+        poll_interval (float): Jeda polling mtime (detik). 0 atau None menonaktifkan reload.
+    """
+
+    def __init__(self, data_dir, sources, base_config=None, poll_interval=5.0):
+        self.data_dir = data_dir
+        self.sources = {source.key: source for source in sources}
+        self.base_config = dict(base_config or {})
+        self.poll_interval = float(poll_interval) if poll_interval else 0.0
+
+        self._derived = [] # List (key, func, depends_on)
+        self._listeners = []
+        self._signatures = {}
+        self._snapshot = MappingProxyType({})
+        self._version = 0
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_reload_at = None
+        self.last_error = None
+        # Lock bisa sedang dipegang thread watcher saat fork (gunicorn preload); buat ulang di child
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    # --- Setup ---
+    def add_derived(self, key, func, depends_on):
+        """Daftarkan data turunan: func(config_dict) dipanggil ulang jika salah satu key depends_on berubah."""
+        self._derived.append((key, func, frozenset(depends_on)))
+
+    def subscribe(self, callback):
+        """callback(old_snapshot, new_snapshot, changed_keys) dipanggil setelah snapshot baru dipasang."""
+        self._listeners.append(callback)
+
+    def load_initial(self, preloaded=None):
+        """Muat semua file (mode toleran seperti loader lama: file rusak menjadi {} / pesan error).
+
+        Args:
+            preloaded (dict): Opsional, nama file -> data yang sudah di-parse (misal dari bundle serving);
+                file yang ada di sini tidak dibaca dari disk. Perubahan file setelah startup tetap di-reload.
+        """
+        preloaded = preloaded or {}
+        with self._reload_lock:
+            data = dict(self.base_config)
+            for key, source in self.sources.items():
+                self._signatures[key] = _file_signature(os.path.join(self.data_dir, source.filename))
+                if source.filename in preloaded:
+                    data[key] = preloaded[source.filename]
+                else:
+                    data[key] = source.load(self.data_dir, strict=False)
+                if source.validator:
+                    try:
+                        source.validator(data[key])
+                    except ValueError as e:
+                        print(f"WARNING: Data '{source.filename}' tidak lolos validasi: {e}")
+                origin = " (dari bundle)" if source.filename in preloaded else ""
+                print(f"INFO: Data '{source.filename}' berhasil dimuat{origin}." if data[key] else f"WARNING: Data '{source.filename}' kosong.")
+            self._apply_derived(data, set(self.sources))
+            self._publish(data, set(self.sources) | {key for key, _, _ in self._derived})
+        return self._snapshot
+
+    # --- Akses ---
+    def snapshot(self):
+        """Snapshot saat ini. Ambil sekali di awal request lalu pakai snapshot yang sama sampai selesai."""
+        if self.poll_interval and self._watcher_pid != os.getpid():
+            self.start_watching()
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._version
+
+    def stats(self):
+        return {
+            "version": self._version,
+            "poll_interval_s": self.poll_interval,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error,
+            "watching": bool(self._watcher and self._watcher.is_alive() and self._watcher_pid == os.getpid()),
+        }
+
+    # --- Reload ---
+    def check_for_changes(self):
+        """Periksa mtime semua file; parse, validasi, dan pasang snapshot baru jika ada yang berubah.
+
+        File yang gagal di-parse/divalidasi tidak dipasang (snapshot tetap memakai data lama),
+        tetapi file lain yang berubah dan valid tetap diterapkan.
+
+        Returns:
+            set: Key yang berubah di snapshot baru (kosong jika tidak ada perubahan).
+        """
+        with self._reload_lock:
+            changed = {}
+            for key, source in self.sources.items():
+                signature = _file_signature(os.path.join(self.data_dir, source.filename))
+                if signature == self._signatures.get(key):
+                    continue
+                self._signatures[key] = signature
+                if signature is None:
+                    self._record_error(f"File '{source.filename}' hilang; data lama tetap dipakai.")
+                    continue
+                try:
+                    changed[key] = source.load(self.data_dir, strict=True)
+                except (OSError, ValueError) as e: # json.JSONDecodeError adalah subclass ValueError
+                    self._record_error(f"Reload '{source.filename}' ditolak, data lama tetap dipakai: {e}")
+            if not changed:
+                return set()
+
+            data = dict(self._snapshot)
+            data.update(changed)
+            try:
+                derived_keys = self._apply_derived(data, set(changed))
+            except Exception as e:
+                self._record_error(f"Gagal membangun data turunan untuk {sorted(changed)}: {e}")
+                traceback.print_exc()
+                return set()
+            changed_keys = set(changed) | derived_keys
+            self._publish(data, changed_keys)
+            self.reloads += 1
+            self.last_reload_at = time.time()
+            print(f"INFO: Data dimuat ulang ({', '.join(sorted(changed))}); versi data sekarang {self._version}.")
+            return changed_keys
+
+    def start_watching(self):
+        """Mulai thread polling (sekali per proses; aman dipanggil ulang setelah fork)."""
+        if not self.poll_interval:
+            return
+        with self._reload_lock:
+            if self._watcher is not None and self._watcher_pid == os.getpid() and self._watcher.is_alive():
+                return
+            self._watcher_pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch, name="data-store-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                self._record_error(f"Error tak terduga saat memeriksa data/: {e}")
+                traceback.print_exc()
+
+    # --- Internal ---
+    def _reset_after_fork(self):
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+
+    def _apply_derived(self, data, changed_keys):
+        derived_keys = set()
+        for key, func, depends_on in self._derived:
+            if depends_on & changed_keys:
+                data[key] = func(data)
+                derived_keys.add(key)
+        return derived_keys
+
+    def _publish(self, data, changed_keys):
+        old_snapshot = self._snapshot
+        self._version += 1
+        data["DATA_VERSION"] = self._version
+        self._snapshot = MappingProxyType(data) # Swap atomik: pembaca lama tetap memegang snapshot lama
+        for callback in self._listeners:
+            try:
+                callback(old_snapshot, self._snapshot, changed_keys)
+            except Exception as e:
+                print(f"ERROR: Listener data store gagal: {e}")
+                traceback.print_exc()
+
+    def _record_error(self, message):
+        self.reload_errors += 1
+        self.last_error = message
+        print(f"ERROR: {message}")
+
+# --- END OF FILE data_store.py ---
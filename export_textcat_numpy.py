@@ -0,0 +1,188 @@
+# --- START OF FILE export_textcat_numpy.py ---
+"""Ekspor bobot textcat (TextCatEnsemble.v2) intent_model_ft_v2 ke .npz untuk numpy_textcat.py.
+
+Yang diekspor:
+- bobot semua layer (HashEmbed, Maxout, LayerNorm, ParametricAttention, output softmax),
+- SparseLinear hanya untuk bucket yang bobotnya tidak nol (sisa tabel 2^18 x label bernilai nol),
+- konfigurasi tokenizer (pola prefix/suffix/infix/token_match/url_match dan special case),
+- tabel norm (BASE_NORMS + lookups lexeme_norm) dan simbol bawaan StringStore spaCy,
+sehingga scorer bisa mereproduksi doc.cats tanpa mengimpor spaCy/thinc.
+
+Jalankan dari root project (butuh spaCy, hanya saat ekspor):
+    python export_textcat_numpy.py
+    python export_textcat_numpy.py --model intent_model_ft_v2 --output intent_model_ft_v2/textcat_numpy.npz
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import spacy
+from spacy.attrs import NORM, ORTH
+from spacy.lang.norm_exceptions import BASE_NORMS
+from spacy.strings import get_string_id
+
+from numpy_textcat import FORMAT_VERSION
+from nlu_cascade import find_linear_model
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_DIR = os.path.join(BASE_DIR, "intent_model_ft_v2")
+EXPORT_FILE_NAME = "textcat_numpy.npz"
+
+
+def _nodes(model, name):
+    """Sub-layer bernama `name` dalam urutan layer (DFS pre-order)."""
+    return [node for node in model.walk(order="dfs_pre") if node.name == name]
+
+
+def _single(model, name):
+    nodes = _nodes(model, name)
+    if len(nodes) != 1:
+        raise ValueError(f"Diharapkan tepat satu layer '{name}', ditemukan {len(nodes)}.")
+    return nodes[0]
+
+
+def _params(node, *names):
+    return [np.asarray(node.get_param(name), dtype=np.float32) for name in names]
+
+
+def _pattern(regex_method):
+    """Pola regex dari method search/finditer/match milik re.Pattern (None jika tidak diset)."""
+    if regex_method is None:
+        return None
+    compiled = getattr(regex_method, "__self__", None)
+    if compiled is None or not hasattr(compiled, "pattern"):
+        raise ValueError(f"Callable tokenizer {regex_method!r} bukan method re.Pattern; tidak bisa diekspor.")
+    return {"pattern": compiled.pattern, "flags": compiled.flags}
+
+
+def export_tokenizer(nlp):
+    tokenizer = nlp.tokenizer
+    specials = []
+    for key, tokens in tokenizer.rules.items():
+        specials.append([key, [[token[ORTH], token.get(NORM)] for token in tokens]])
+    return {
+        "prefix": _pattern(tokenizer.prefix_search),
+        "suffix": _pattern(tokenizer.suffix_search),
+        "infix": _pattern(tokenizer.infix_finditer),
+        "token_match": _pattern(tokenizer.token_match),
+        "url_match": _pattern(tokenizer.url_match),
+        "specials": specials,
+    }
+
+
+def export_symbols():
+    """String yang ID-nya simbol bawaan spaCy (bukan hash), misal nama atribut/label POS."""
+    from spacy.symbols import IDS
+    symbols = {}
+    for string in IDS:
+        if string and get_string_id(string) == IDS[string]:
+            symbols[string] = IDS[string]
+    return symbols
+
+
+def export_textcat(nlp):
+    """(meta, arrays) untuk komponen textcat; ValueError jika arsitekturnya bukan TextCatEnsemble.v2."""
+    textcat = nlp.get_pipe("textcat")
+    model = textcat.model
+    linear_model = find_linear_model(model)
+    if linear_model is None or len(model.layers) != 2 or model.layers[-1].name != "softmax":
+        raise ValueError("Model textcat bukan TextCatEnsemble (linear | cnn) >> softmax.")
+    arrays = {}
+
+    # Cabang linear (TextCatBOW)
+    ngrams = _single(linear_model, "extract_ngrams")
+    if ngrams.attrs["ngram_size"] != 1 or ngrams.attrs["attr"] != ORTH:
+        raise ValueError("Hanya TextCatBOW unigram ORTH (ngram_size=1) yang didukung.")
+    sparse_linear = _single(linear_model, "sparse_linear")
+    if sparse_linear.attrs.get("v1_indexing"):
+        raise ValueError("SparseLinear v1 indexing tidak didukung.")
+    n_labels = sparse_linear.get_dim("nO")
+    length = sparse_linear.get_dim("length")
+    W, b = _params(sparse_linear, "W", "b")
+    W = W.reshape(n_labels, length)
+    buckets = np.flatnonzero(np.any(W != 0, axis=0)).astype(np.uint32)
+    arrays["linear_buckets"] = buckets
+    arrays["linear_W"] = np.ascontiguousarray(W[:, buckets].T)
+    arrays["linear_b"] = b
+
+    # Cabang CNN: embed
+    tok2vec = model.get_ref("tok2vec")
+    embed, encode = tok2vec.get_ref("embed"), tok2vec.get_ref("encode")
+    feature_attrs = list(_single(embed, "extract_features").attrs["columns"])
+    hash_embeds = sorted(_nodes(embed, "hashembed"), key=lambda node: node.attrs["column"])
+    if len(hash_embeds) != len(feature_attrs) or _nodes(embed, "static_vectors"):
+        raise ValueError("Embed harus MultiHashEmbed satu tabel per atribut tanpa static vectors.")
+    for i, node in enumerate(hash_embeds):
+        arrays[f"embed_E{i}"] = _params(node, "E")[0]
+    arrays["embed_maxout_W"], arrays["embed_maxout_b"] = _params(_single(embed, "maxout"), "W", "b")
+    arrays["embed_ln_G"], arrays["embed_ln_b"] = _params(_single(embed, "layernorm"), "G", "b")
+
+    # Cabang CNN: encoder MaxoutWindowEncoder (residual berulang)
+    windows = _nodes(encode, "expand_window")
+    maxouts, norms = _nodes(encode, "maxout"), _nodes(encode, "layernorm")
+    if not windows or not (len(windows) == len(maxouts) == len(norms)):
+        raise ValueError("Encoder harus MaxoutWindowEncoder (expand_window >> maxout >> layernorm per blok).")
+    window_size = windows[0].attrs["window_size"]
+    for d, (maxout, norm) in enumerate(zip(maxouts, norms)):
+        arrays[f"encode{d}_maxout_W"], arrays[f"encode{d}_maxout_b"] = _params(maxout, "W", "b")
+        arrays[f"encode{d}_ln_G"], arrays[f"encode{d}_ln_b"] = _params(norm, "G", "b")
+
+    # Cabang CNN: attention + residual maxout, lalu output softmax
+    arrays["attention_Q"] = _params(model.get_ref("attention_layer"), "Q")[0]
+    arrays["cnn_maxout_W"], arrays["cnn_maxout_b"] = _params(model.get_ref("maxout_layer"), "W", "b")
+    arrays["cnn_ln_G"], arrays["cnn_ln_b"] = _params(model.get_ref("norm_layer"), "G", "b")
+    output = model.layers[-1]
+    arrays["output_W"], arrays["output_b"] = _params(output, "W", "b")
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "labels": list(textcat.labels),
+        "linear": {"length": length, "nonzero_buckets": int(len(buckets))},
+        "embed": {"attrs": feature_attrs, "seeds": [node.attrs["seed"] for node in hash_embeds]},
+        "encode": {"window_size": window_size, "depth": len(maxouts), "pad": encode.attrs.get("pad", window_size * len(maxouts))},
+        "output": {"normalize": output.attrs.get("softmax_normalize", True), "temperature": output.attrs.get("softmax_temperature", 1.0)},
+    }
+    return meta, arrays
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekspor textcat spaCy ke .npz untuk scorer NumPy.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--output", help=f"Default: <model>/{EXPORT_FILE_NAME}")
+    args = parser.parse_args()
+    output_path = args.output or os.path.join(args.model, EXPORT_FILE_NAME)
+
+    nlp = spacy.load(args.model, exclude=["ner"])
+    try:
+        meta, arrays = export_textcat(nlp)
+    except ValueError as e:
+        raise SystemExit(f"ERROR: {e}")
+    lexeme_norm = nlp.vocab.lookups.get_table("lexeme_norm") if nlp.vocab.lookups.has_table("lexeme_norm") else {}
+    meta.update({
+        "tokenizer": export_tokenizer(nlp),
+        "base_norms": dict(BASE_NORMS),
+        "lexeme_norm": dict(lexeme_norm),
+        "symbols": export_symbols(),
+        "source": {
+            "model": os.path.basename(os.path.normpath(args.model)),
+            "model_version": nlp.meta.get("version"),
+            "lang": nlp.lang,
+            "spacy_version": spacy.__version__,
+            "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+    })
+    np.savez_compressed(output_path, meta_json=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+
+    n_params = sum(array.size for array in arrays.values())
+    print(f"Textcat '{meta['source']['model']}' ({len(meta['labels'])} label) diekspor ke '{output_path}' "
+          f"({os.path.getsize(output_path) / 1024:.0f} KB, {n_params:,} parameter; "
+          f"SparseLinear {meta['linear']['nonzero_buckets']:,}/{meta['linear']['length']:,} bucket tidak nol).")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE export_textcat_numpy.py ---
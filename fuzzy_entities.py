@@ -0,0 +1,215 @@
+# --- START OF FILE fuzzy_entities.py ---
+"""Pencocokan entitas tahan typo (PRODI, LAB, MATKUL) dengan indeks deletion ala SymSpell.
+
+PhraseMatcher di app.py dan trie matkul di jadwal_index.py hanya menerima bentuk persis, sehingga
+"informatka", "lab hidrolik", atau "struktur baja2" tidak dikenali. Modul ini:
+- memecah teks menjadi token kata (huruf dan angka dipisah: "baja2" -> "baja", "2"),
+- mengoreksi setiap token ke kata kamus (kata penyusun nama prodi/lab/matkul) dalam jarak edit
+  Damerau (OSA) terbatas, memakai indeks varian hapus-karakter yang dihitung sekali saat data dimuat
+  (lookup = membangkitkan varian hapus token lalu lookup dict, tanpa memindai semua istilah),
+- mencocokkan urutan token terkoreksi ke frasa istilah lewat trie per kata.
+
+Jarak edit maksimum per kata ditentukan panjang kata kamus: kata pendek (<= 4 huruf, misal "baja",
+"lab", "ti") hanya cocok persis agar kata umum seperti "saja" tidak menjadi "baja".
+"""
+
+import re
+
+MAX_EDIT_DISTANCE = 2
+# (panjang minimum kata kamus, jarak edit yang diizinkan), dari yang terbesar
+EDIT_BUDGETS = ((8, 2), (5, 1))
+_TOKEN_RE = re.compile(r"[^\W\d_]+|\d+")
+
+
+def tokenize(text):
+    """Token lowercase untuk teks user dan istilah; huruf dan angka dipisah ("baja2" -> ["baja", "2"])."""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def edit_budget(word, max_distance=MAX_EDIT_DISTANCE):
+    """Jarak edit yang diizinkan untuk mengoreksi token menjadi `word` (0 = hanya cocok persis)."""
+    if word.isdigit():
+        return 0
+    for min_length, distance in EDIT_BUDGETS:
+        if len(word) >= min_length:
+            return min(distance, max_distance)
+    return 0
+
+
+def _deletes(word, max_distance):
+    """Semua string hasil menghapus 1..max_distance karakter dari word."""
+    results, frontier = set(), {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+def osa_distance(a, b, max_distance):
+    """Jarak Damerau-Levenshtein (optimal string alignment); max_distance + 1 jika melebihi batas."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class DeletionIndex:
+    """Indeks SymSpell: varian hapus-karakter setiap kata kamus -> kata asalnya.
+
+    Args:
+        words (iterable): Kata kamus (lowercase).
+        max_distance (int): Jarak edit maksimum global (dibatasi lagi per kata oleh edit_budget).
+    """
+
+    def __init__(self, words, max_distance=MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self.words = set(words)
+        self.budgets = {word: edit_budget(word, max_distance) for word in self.words}
+        self._deletes = {}
+        for word, budget in self.budgets.items():
+            for variant in _deletes(word, budget) | {word}:
+                self._deletes.setdefault(variant, []).append(word)
+
+    def __len__(self):
+        return len(self._deletes)
+
+    def lookup(self, token):
+        """Kata kamus terdekat untuk token: list (kata, jarak) dengan jarak minimum yang sama.
+
+        Token yang ada di kamus hanya mengembalikan dirinya sendiri (jarak 0).
+        """
+        if token in self.words:
+            return [(token, 0)]
+        if len(token) < EDIT_BUDGETS[-1][0] - self.max_distance:
+            return []
+        candidates = set()
+        for variant in _deletes(token, self.max_distance) | {token}:
+            candidates.update(self._deletes.get(variant, ()))
+        best, best_distance = [], self.max_distance + 1
+        for word in candidates:
+            budget = self.budgets[word]
+            distance = osa_distance(token, word, budget)
+            if distance > budget or distance > best_distance:
+                continue
+            if distance < best_distance:
+                best, best_distance = [], distance
+            best.append((word, distance))
+        return sorted(best)
+
+
+class FuzzyEntityIndex:
+    """Pencari entitas tahan typo atas frasa istilah (prodi, lab, matkul).
+
+    Args:
+        terms (iterable): Tuple (label, canonical, variations) dengan variations list string frasa.
+        max_distance (int): Jarak edit maksimum per kata dan total per frasa.
+    """
+
+    def __init__(self, terms, max_distance=MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self._trie = {}
+        self.phrases = 0
+        vocabulary = set()
+        for label, canonical, variations in terms:
+            for variation in variations:
+                tokens = tokenize(variation)
+                if not tokens:
+                    continue
+                node = self._trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                # Frasa yang sama untuk dua istilah: yang pertama dipakai (urutan data)
+                if (label, None) not in node:
+                    node[(label, None)] = canonical
+                    self.phrases += 1
+                vocabulary.update(tokens)
+        self.index = DeletionIndex(vocabulary, max_distance)
+
+    def _candidates(self, tokens):
+        return [self.index.lookup(token) for token in tokens]
+
+    def find(self, text):
+        """Entitas dalam teks, termasuk yang persis (jarak 0).
+
+        Returns:
+            list: Dict {"label", "canonical", "start", "end" (indeks token), "distance"} yang tidak
+                saling tumpang tindih; span terpanjang lalu jarak terkecil yang diutamakan.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        candidates = self._candidates(tokens)
+        found = []
+        for start in range(len(tokens)):
+            # (node trie, total jarak) yang masih hidup setelah token ke-offset
+            states = [(self._trie, 0)]
+            for offset in range(start, len(tokens)):
+                next_states = []
+                for node, distance in states:
+                    for word, word_distance in candidates[offset]:
+                        child = node.get(word)
+                        total = distance + word_distance
+                        if child is not None and total <= self.max_distance:
+                            next_states.append((child, total))
+                if not next_states:
+                    break
+                states = next_states
+                for node, distance in states:
+                    for key, canonical in node.items():
+                        if isinstance(key, tuple):
+                            found.append({"label": key[0], "canonical": canonical, "start": start,
+                                          "end": offset + 1, "distance": distance})
+        found.sort(key=lambda m: (m["start"] - m["end"], m["distance"], m["start"]))
+        chosen, taken = [], {}
+        for match in found:
+            label_taken = taken.setdefault(match["label"], set())
+            span = set(range(match["start"], match["end"]))
+            if span & label_taken:
+                continue
+            label_taken |= span
+            chosen.append(match)
+        return sorted(chosen, key=lambda m: m["start"])
+
+    def stats(self):
+        return {"phrases": self.phrases, "words": len(self.index.words), "delete_variants": len(self.index),
+                "max_distance": self.max_distance}
+
+
+def entity_terms(config):
+    """Istilah PRODI/LAB dari TERMS_DATA dan MATKUL dari JADWAL_INDEX sebuah snapshot config."""
+    terms = []
+    terms_data = config.get('TERMS_DATA', {})
+    for section, label in (("prodi", "PRODI"), ("lab", "LAB")):
+        section_terms = terms_data.get(section, {}) if isinstance(terms_data, dict) else {}
+        if not isinstance(section_terms, dict):
+            continue
+        for canonical, variations in section_terms.items():
+            if isinstance(variations, list):
+                terms.append((label, canonical, [canonical] + [v for v in variations if isinstance(v, str)]))
+    seen_courses = set()
+    for periods in (config.get('JADWAL_INDEX') or {}).values():
+        for schedule_index in periods.values():
+            for course_name in schedule_index.course_names:
+                if course_name.lower() not in seen_courses:
+                    seen_courses.add(course_name.lower())
+                    terms.append(("MATKUL", course_name, [course_name]))
+    return terms
+
+# --- END OF FILE fuzzy_entities.py ---
@@ -0,0 +1,78 @@
+# --- START OF FILE gunicorn.conf.py ---
+"""Konfigurasi gunicorn (dipakai oleh render.yaml: gunicorn -c gunicorn.conf.py app:app).
+
+Mode preload (default): app.py diimport SEKALI di master sebelum fork, sehingga
+model spaCy, PhraseMatcher, dan data/ yang sudah di-parse dipakai bersama oleh
+semua worker lewat copy-on-write. Setel GUNICORN_PRELOAD=0 untuk kembali ke
+perilaku lama (setiap worker memuat model sendiri).
+
+Variabel lingkungan:
+    WEB_CONCURRENCY     Jumlah worker (default 2).
+    GUNICORN_THREADS    Thread per worker (default 1).
+    GUNICORN_TIMEOUT    Timeout worker dalam detik (default 60).
+    GUNICORN_PRELOAD    1/0, aktifkan preload (default 1).
+    GUNICORN_MEMORY_REPORT  1/0, cetak laporan RSS/PSS setelah semua worker siap (default 1).
+
+APP_STARTUP_MODE=lazy (model dimuat di background, lihat /readyz) hanya berlaku
+jika preload nonaktif; dengan preload model selalu dimuat di master.
+"""
+
+import gc
+import os
+import sys
+import threading
+import time
+
+from memory_report import build_report, print_report, read_process_memory, format_mb
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+MEMORY_REPORT = os.environ.get("GUNICORN_MEMORY_REPORT", "1") == "1"
+if preload_app and os.environ.get("APP_STARTUP_MODE", "eager").lower() == "lazy":
+    # Thread loader tidak ikut ter-fork: dengan preload model harus dimuat eager di master
+    os.environ["APP_STARTUP_MODE"] = "eager"
+# bind tidak disetel: gunicorn memakai $PORT (Render) atau 127.0.0.1:8000
+
+# File config dimuat sebelum app di-preload, jadi waktu startup dihitung dari sini
+_CONFIG_LOADED_AT = time.perf_counter()
+
+
+def when_ready(server):
+    """Dipanggil di master setelah app (jika preload) dimuat, sebelum worker di-fork."""
+    elapsed = time.perf_counter() - _CONFIG_LOADED_AT
+    if preload_app:
+        # Pindahkan objek yang sudah ada ke generasi permanen: GC di worker tidak menyentuh
+        # (dan tidak men-dirty) halaman model yang di-share copy-on-write.
+        gc.collect()
+        gc.freeze()
+        master_mem = read_process_memory(os.getpid())
+        rss = format_mb(master_mem["rss_kb"]) if master_mem else "n/a"
+        server.log.info(f"Preload selesai dalam {elapsed:.2f} s (RSS master {rss}, {gc.get_freeze_count()} objek dibekukan).")
+    else:
+        server.log.info(f"Master siap dalam {elapsed:.2f} s (preload nonaktif, setiap worker memuat model sendiri).")
+
+
+def post_fork(server, worker):
+    worker._forked_at = time.perf_counter()
+    # Thread background tidak ikut ter-fork: mulai ulang di worker (watcher data/)
+    app_module = sys.modules.get("app")
+    if app_module is not None and hasattr(app_module, "DATA_STORE"):
+        app_module.DATA_STORE.start_watching()
+
+
+def post_worker_init(worker):
+    boot_time = time.perf_counter() - getattr(worker, "_forked_at", time.perf_counter())
+    mem = read_process_memory(os.getpid())
+    if mem:
+        worker.log.info(f"Worker {os.getpid()} siap dalam {boot_time:.2f} s "
+                        f"(RSS {format_mb(mem['rss_kb'])}, PSS {format_mb(mem['pss_kb'])}, private {format_mb(mem['private_kb'])}).")
+    else:
+        worker.log.info(f"Worker {os.getpid()} siap dalam {boot_time:.2f} s.")
+    if MEMORY_REPORT and worker.age == workers:
+        # Worker terakhir dari putaran pertama: laporan memori semua proses setelah sedikit jeda
+        master_pid = worker.ppid
+        threading.Timer(2.0, lambda: print_report(build_report(master_pid))).start()
+
+# --- END OF FILE gunicorn.conf.py ---
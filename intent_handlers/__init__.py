@@ -0,0 +1,202 @@
+# --- START OF FILE intent_handlers/__init__.py ---
+"""Registry handler intent untuk intent_logic.get_response_for_intent.
+
+Setiap handler adalah fungsi handler(ctx) -> (response_text, final_intent_category) yang
+didaftarkan dengan dekorator @handler(...) dan mendeklarasikan kebutuhannya:
+  - intents/prefix yang ditangani,
+  - config: key config yang dibaca (ctx.config hanya berisi key ini),
+  - fragments: grup RESPONSE_FRAGMENTS yang dipakai (ctx.fragments hanya berisi grup ini),
+  - entities: entitas NLU yang dipakai ("PRODI", "LAB"); entitas lain bernilai None di ctx
+    dan tidak ikut menjadi bagian key cache respons,
+  - cacheable / cache_text_key: apakah respons boleh di-cache, dan bagian teks input yang
+    memengaruhi respons (misal periode SPP),
+  - defers_to_lab: jika True dan LAB terdeteksi, request ditangani handler lab
+    (mempertahankan prioritas cabang lab pada rantai if/elif lama).
+
+Modul handler baru diimport saat intent-nya pertama kali diminta (HANDLER_MODULES); hasil
+resolusi intent -> handler disimpan, sehingga dispatch berikutnya cukup satu lookup dict.
+"""
+
+import importlib
+import threading
+import time
+
+# Intent persis, atau prefix (diakhiri '_'), -> modul handler di paket ini
+HANDLER_MODULES = {
+    "greeting_ft": "percakapan",
+    "goodbye_ft": "percakapan",
+    "thankyou_ft": "percakapan",
+    "ask_bot_identity": "percakapan",
+    "info_biaya_umum": "biaya",
+    "info_spp_ft": "biaya",
+    "cara_bayar_spp_ft": "biaya",
+    "cara_bayar_sevima_tokopedia": "biaya",
+    "info_krs_sevima": "akademik",
+    "jadwal_kuliah_ft": "akademik",
+    "fasilitas_umum_ft": "fakultas",
+    "kontak_ft": "fakultas",
+    "info_lab_": "lab",
+    "tanya_biaya_praktikum": "lab",
+    "info_prodi_": "prodi",
+    "info_pmb_umum": "pmb",
+    "info_jalur_pmb": "pmb",
+    "info_biaya_pmb": "pmb",
+    "cara_daftar_pmb": "pmb",
+    "tanya_pembelajaran_prodi": "pembelajaran",
+    "tanya_pembelajaran_lab": "pembelajaran",
+}
+# Modul handler untuk intent valid yang tidak punya handler spesifik
+FALLBACK_MODULE = "fallback"
+# Intent yang diarahkan ke handler lab saat LAB terdeteksi dan handler asal defers_to_lab
+LAB_ROUTE = "info_lab_"
+
+
+class HandlerSpec:
+    """Deklarasi satu handler beserta statistik pemanggilannya."""
+    __slots__ = ("name", "func", "intents", "prefixes", "config", "fragments", "entities",
+                 "cacheable", "cache_text_key", "defers_to_lab", "is_fallback", "calls", "total_s")
+
+    def __init__(self, func, intents=(), prefixes=(), config=(), fragments=(), entities=(),
+                 cacheable=True, cache_text_key=None, defers_to_lab=False, is_fallback=False):
+        unknown = set(entities) - {"PRODI", "LAB", "MATKUL"}
+        if unknown:
+            raise ValueError(f"Entitas tidak dikenal untuk handler '{func.__name__}': {sorted(unknown)}")
+        self.name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        self.func = func
+        self.intents = tuple(intents)
+        self.prefixes = tuple(prefixes)
+        self.config = tuple(config)
+        self.fragments = tuple(fragments)
+        self.entities = frozenset(entities)
+        self.cacheable = cacheable
+        self.cache_text_key = cache_text_key
+        self.defers_to_lab = defers_to_lab
+        self.is_fallback = is_fallback
+        self.calls = 0
+        self.total_s = 0.0
+
+
+class HandlerContext:
+    """Input satu pemanggilan handler (dibangun intent_logic per request)."""
+    __slots__ = ("intent", "score", "prodi", "lab", "matkul", "user_name", "safe_user_name", "sapaan",
+                 "sapaan_awal", "text_lower", "config", "fragments")
+
+    def __init__(self, intent, score, prodi, lab, user_name, safe_user_name, sapaan, sapaan_awal,
+                 text_lower, config, fragments, matkul=()):
+        self.intent = intent
+        self.score = score
+        self.prodi = prodi
+        self.lab = lab
+        self.matkul = matkul # Semua nama matkul yang disebut (bisa milik prodi lain), urut kemunculan
+        self.user_name = user_name
+        self.safe_user_name = safe_user_name
+        self.sapaan = sapaan # Sapaan tengah kalimat
+        self.sapaan_awal = sapaan_awal # Sapaan awal kalimat
+        self.text_lower = text_lower
+        self.config = config
+        self.fragments = fragments
+
+
+class HandlerRegistry:
+    """Pemetaan intent -> HandlerSpec dengan import modul handler secara lazy."""
+
+    def __init__(self, modules, fallback_module, package):
+        self._modules = dict(modules)
+        self._module_prefixes = tuple(key for key in self._modules if key.endswith("_"))
+        self._fallback_module = fallback_module
+        self._package = package
+        self._exact = {}
+        self._prefixes = {}
+        self._fallback = None
+        self._resolved = {} # intent -> HandlerSpec (setelah resolusi pertama)
+        self._loaded = set()
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+
+    def register(self, spec):
+        with self._lock:
+            for intent in spec.intents:
+                if intent in self._exact:
+                    raise ValueError(f"Intent '{intent}' sudah ditangani oleh {self._exact[intent].name}.")
+                self._exact[intent] = spec
+            for prefix in spec.prefixes:
+                if prefix in self._prefixes:
+                    raise ValueError(f"Prefix '{prefix}' sudah ditangani oleh {self._prefixes[prefix].name}.")
+                self._prefixes[prefix] = spec
+            if spec.is_fallback:
+                self._fallback = spec
+            self._resolved.clear()
+
+    def _load(self, module_name):
+        if module_name not in self._loaded:
+            with self._lock:
+                if module_name not in self._loaded:
+                    importlib.import_module(f"{self._package}.{module_name}")
+                    self._loaded.add(module_name)
+
+    def _resolve_slow(self, intent):
+        module_name = self._modules.get(intent)
+        if module_name is None:
+            module_name = next((self._modules[p] for p in self._module_prefixes if intent.startswith(p)), None)
+        if module_name is not None:
+            self._load(module_name)
+        spec = self._exact.get(intent) or next((s for p, s in self._prefixes.items() if intent.startswith(p)), None)
+        if spec is None:
+            self._load(self._fallback_module)
+            spec = self._fallback
+        if spec is None:
+            raise LookupError(f"Tidak ada handler (termasuk fallback) untuk intent '{intent}'.")
+        self._resolved[intent] = spec
+        return spec
+
+    def resolve(self, intent, has_lab=False):
+        """HandlerSpec untuk intent; handler lab jika LAB terdeteksi dan handler asal defers_to_lab."""
+        spec = self._resolved.get(intent) or self._resolve_slow(intent)
+        if has_lab and spec.defers_to_lab:
+            return self._resolved.get(LAB_ROUTE) or self._resolve_slow(LAB_ROUTE)
+        return spec
+
+    def dispatch(self, spec, ctx):
+        started = time.perf_counter()
+        try:
+            return spec.func(ctx)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                spec.calls += 1
+                spec.total_s += elapsed
+
+    def load_all(self):
+        """Import semua modul handler sekarang (misalnya saat warm-up sebelum fork worker)."""
+        for module_name in set(self._modules.values()) | {self._fallback_module}:
+            self._load(module_name)
+
+    def stats(self):
+        """Jumlah panggilan dan rata-rata durasi (ms) per handler yang sudah dimuat."""
+        specs = {spec.name: spec for spec in list(self._exact.values()) + list(self._prefixes.values()) + [self._fallback] if spec}
+        with self._stats_lock:
+            return {
+                "loaded_modules": sorted(self._loaded),
+                "handlers": {
+                    name: {"calls": spec.calls, "total_ms": round(spec.total_s * 1000, 2),
+                           "mean_ms": round(spec.total_s * 1000 / spec.calls, 3) if spec.calls else None}
+                    for name, spec in sorted(specs.items())
+                },
+            }
+
+
+REGISTRY = HandlerRegistry(HANDLER_MODULES, FALLBACK_MODULE, __name__)
+
+
+def handler(*intents, prefix=(), config=(), fragments=(), entities=(), cacheable=True,
+            cache_text_key=None, defers_to_lab=False, fallback=False):
+    """Dekorator pendaftaran handler ke REGISTRY. Lihat docstring modul untuk arti argumen."""
+    prefixes = (prefix,) if isinstance(prefix, str) else tuple(prefix)
+
+    def decorator(func):
+        REGISTRY.register(HandlerSpec(func, intents, prefixes, config, fragments, entities,
+                                      cacheable, cache_text_key, defers_to_lab, fallback))
+        return func
+    return decorator
+
+# --- END OF FILE intent_handlers/__init__.py ---
@@ -0,0 +1,108 @@
+# --- START OF FILE intent_handlers/akademik.py ---
+"""Handler akademik: panduan KRS Sevima dan jadwal kuliah."""
+
+from markupsafe import escape
+
+from intent_handlers import handler
+from intent_logic import _get_jadwal_prodi_response
+
+
+@handler("info_krs_sevima", config=("KRS_SEVIMA_GUIDE",))
+def info_krs_sevima(ctx):
+    krs_sevima_guide = ctx.config.get('KRS_SEVIMA_GUIDE', '')
+    if krs_sevima_guide and "tidak ditemukan" not in krs_sevima_guide:
+        response_text = (f"{ctx.sapaan_awal}, berikut panduan umum pengisian Kartu Rencana Studi (KRS) "
+                         f"di sistem Sevima/SIAKAD Cloud:\n\n{krs_sevima_guide}\n\n"
+                         "**Ingat:** Selalu perhatikan **jadwal resmi pengisian KRS** yang dikeluarkan oleh fakultas/universitas. "
+                         "Jika ada mata kuliah yang tidak muncul, error, atau Anda ragu, segera konsultasikan "
+                         "dengan **Dosen Pembimbing Akademik (PA)** Anda atau bagian akademik.")
+        return response_text, "info_krs_sevima_handled"
+    response_text = (f"Maaf {ctx.sapaan}, panduan pengisian KRS via Sevima belum tersedia di data saya. "
+                     "Secara umum, Anda perlu login ke sistem SIAKAD/Sevima pada jadwal yang ditentukan, "
+                     "memilih mata kuliah yang akan diambil sesuai dengan semester dan kurikulum Anda, "
+                     "lalu menyimpannya. Pastikan status KRS Anda disetujui oleh Dosen PA. "
+                     "Untuk panduan detail, silakan cek sumber informasi resmi dari kampus.")
+    return response_text, "fallback_krs_guide_missing"
+
+
+# Respons jadwal bergantung pada teks lengkap (hari/jam/dosen/ruang), jadi tidak di-cache
+@handler("jadwal_kuliah_ft", entities=("PRODI", "MATKUL"), cacheable=False,
+         config=("JADWAL_TI_DATA", "JADWAL_SIPIL_DATA", "JADWAL_TAMBANG_DATA", "JADWAL_INDEX",
+                 "LINK_JADWAL_TI", "LINK_JADWAL_SIPIL", "LINK_JADWAL_TAMBANG", "LINK_JADWAL_UMUM_FT"))
+def jadwal_kuliah(ctx):
+    config = ctx.config
+    detected_prodi = ctx.prodi
+    link_jadwal_ti = config.get('LINK_JADWAL_TI', '')
+    link_jadwal_sipil = config.get('LINK_JADWAL_SIPIL', '')
+    link_jadwal_tambang = config.get('LINK_JADWAL_TAMBANG', '')
+    link_jadwal_umum_ft = config.get('LINK_JADWAL_UMUM_FT', '')
+
+    # Mapping prodi yang didukung untuk pencarian jadwal spesifik
+    supported_jadwal_prodi = {
+         "Teknik Informatika": config.get('JADWAL_TI_DATA'),
+         "Teknik Sipil": config.get('JADWAL_SIPIL_DATA'),
+         "Teknik Pertambangan": config.get('JADWAL_TAMBANG_DATA'),
+    }
+    # Filter prodi yang datanya benar-benar ada dan tidak kosong
+    # Check if data exists, is a dictionary, contains "jadwal_kuliah", and that key is also a dictionary
+    available_jadwal_prodi = {
+        p: data for p, data in supported_jadwal_prodi.items()
+        if data and isinstance(data, dict) and isinstance(data.get("jadwal_kuliah"), dict) and data["jadwal_kuliah"]
+    }
+
+    if detected_prodi and detected_prodi in available_jadwal_prodi:
+        # Panggil helper jadwal umum untuk prodi yang terdeteksi
+        return _get_jadwal_prodi_response(ctx.text_lower, detected_prodi, ctx.user_name, config, ctx.matkul)
+
+    # Logika untuk prodi lain atau jika prodi tidak terdeteksi ATAU data jadwalnya tidak ada
+    base_response = f"{ctx.sapaan_awal}. Untuk jadwal kuliah Fakultas Teknik semester ini, "
+    links_found = []
+    specific_prodi_link_handled = False # Flag untuk menandai jika sudah menawarkan link spesifik prodi yang terdeteksi
+
+    # Coba cari link prodi yang terdeteksi (jika ada)
+    if detected_prodi:
+        base_response += f"khususnya untuk **{escape(detected_prodi)}**, "
+        prodi_link_key = f"LINK_JADWAL_{detected_prodi.replace('Teknik ', '').upper()}"
+        prodi_specific_link = config.get(prodi_link_key)
+        # Pastikan link bukan placeholder
+        if prodi_specific_link and "[GANTI" not in prodi_specific_link and "http" in prodi_specific_link:
+            links_found.append(f"- **{escape(detected_prodi)}**: {prodi_specific_link}")
+            specific_prodi_link_handled = True
+
+        if not specific_prodi_link_handled:
+             base_response += "saya belum punya link jadwal spesifiknya. "
+        else:
+             base_response += "berikut link yang mungkin relevan:\n"
+
+    # Jika tidak ada prodi terdeteksi ATAU link spesifik tidak ketemu, tawarkan semua link
+    if not detected_prodi or not specific_prodi_link_handled:
+        if not detected_prodi:
+            base_response += "berikut link jadwal yang mungkin relevan untuk beberapa prodi:\n"
+        else: # Link spesifik prodi tidak ada, tawarkan yang lain
+             base_response += "Namun, Anda bisa cek link prodi lain atau link umum berikut:\n"
+
+        # Tambahkan link untuk prodi yang didukung, kecuali yang sudah ditambahkan
+        # Pastikan link bukan placeholder
+        if detected_prodi != "Teknik Informatika" and link_jadwal_ti and "[GANTI" not in link_jadwal_ti and "http" in link_jadwal_ti: links_found.append(f"- **Teknik Informatika**: {link_jadwal_ti}")
+        if detected_prodi != "Teknik Sipil" and link_jadwal_sipil and "[GANTI" not in link_jadwal_sipil and "http" in link_jadwal_sipil: links_found.append(f"- **Teknik Sipil**: {link_jadwal_sipil}")
+        if detected_prodi != "Teknik Pertambangan" and link_jadwal_tambang and "[GANTI" not in link_jadwal_tambang and "http" in link_jadwal_tambang: links_found.append(f"- **Teknik Pertambangan**: {link_jadwal_tambang}")
+        if link_jadwal_umum_ft and "[GANTI" not in link_jadwal_umum_ft and "http" in link_jadwal_umum_ft: links_found.append(f"- **Umum Fakultas**: {link_jadwal_umum_ft}")
+
+    # Tawarkan bantuan untuk prodi jika datanya ada (menggunakan helper _get_jadwal_prodi_response)
+    offer_detail_help_prodi = [p for p in available_jadwal_prodi.keys()]
+    if links_found:
+        response_text = base_response + "\n".join(links_found)
+        response_text += "\n\nJadwal biasanya dibagikan oleh masing-masing prodi. Anda juga bisa cek pengumuman di grup mahasiswa atau sistem Sevima/SIAKAD."
+        if offer_detail_help_prodi:
+             response_text += f"\nUntuk {' atau '.join(map(escape, offer_detail_help_prodi))}, saya bisa coba bantu cek jadwal mata kuliah atau hari tertentu jika Anda bertanya lebih spesifik."
+        return response_text, "jadwal_kuliah_ft_links_provided"
+
+    # Tidak ada link sama sekali DAN tidak ada data jadwal spesifik
+    response_text = (f"Maaf {ctx.sapaan}, saya belum memiliki data atau link jadwal kuliah yang bisa dibagikan saat ini. "
+                     "Silakan cek pengumuman resmi dari prodi Anda, grup mahasiswa, atau sistem Sevima/SIAKAD. "
+                     "Jadwal biasanya keluar mendekati awal semester.")
+    if offer_detail_help_prodi:
+         response_text += f"\nJika Anda mahasiswa {' atau '.join(map(escape, offer_detail_help_prodi))}, saya bisa coba bantu cek jadwal mata kuliah atau hari tertentu jika Anda bertanya lebih spesifik."
+    return response_text, "fallback_jadwal_links_missing"
+
+# --- END OF FILE intent_handlers/akademik.py ---
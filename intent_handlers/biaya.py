@@ -0,0 +1,56 @@
+# --- START OF FILE intent_handlers/biaya.py ---
+"""Handler biaya kuliah: pilihan jenis biaya, SPP, dan cara pembayaran SPP."""
+
+from intent_handlers import handler
+from intent_logic import _detect_spp_periode, _get_spp_response
+
+
+@handler("info_biaya_umum")
+def info_biaya_umum(ctx):
+    # Ini sudah merupakan bentuk disambiguasi, tidak perlu diubah
+    response_text = (f"{ctx.sapaan_awal}. Saya bisa bantu informasi biaya di Fakultas Teknik. "
+                     "Jenis biaya apa yang spesifik Anda maksud?\n\n"
+                     "1. **SPP** (Biaya kuliah per semester)\n"
+                     "2. **Praktikum/Laboratorium** (Biaya kegiatan di lab)\n"
+                     "3. **Pendaftaran Mahasiswa Baru (PMB)** (Biaya formulir, tes, orientasi awal, dll.)\n\n"
+                     "Silakan sebutkan jenisnya (misal: 'info SPP', 'biaya praktikum', atau 'biaya PMB').")
+    return response_text, "disambiguate_cost"
+
+
+@handler("info_spp_ft", fragments=("spp",), entities=("PRODI",), cache_text_key=_detect_spp_periode)
+def info_spp(ctx):
+    # Slot filling prodi dan pemilihan periode dikerjakan helper SPP
+    return _get_spp_response(ctx.text_lower, ctx.prodi, ctx.user_name, ctx.fragments["spp"])
+
+
+@handler("cara_bayar_spp_ft", config=("PAYMENT_SEVIMA_TOKOPEDIA_GUIDE",))
+def cara_bayar_spp(ctx):
+    payment_sevima_tokopedia_guide = ctx.config.get('PAYMENT_SEVIMA_TOKOPEDIA_GUIDE', '')
+    response_text = (f"{ctx.sapaan_awal}. Untuk pembayaran SPP/UKT (setelah Anda resmi menjadi mahasiswa), "
+                     "biasanya dilakukan melalui sistem akademik online Sevima/SIAKAD Cloud. "
+                     "Apakah Anda ingin tahu:\n"
+                     "1. **Panduan bayar via Tokopedia** (jika tersedia)?\n"
+                     "2. **Informasi metode pembayaran lain** (misal transfer bank)?\n"
+                     "3. **Batas waktu pembayaran** semester ini?\n\n"
+                     "Mohon konfirmasi ke bagian keuangan atau cek pengumuman resmi fakultas/universitas "
+                     "untuk detail metode pembayaran yang valid dan jadwalnya.")
+    if payment_sevima_tokopedia_guide and "tidak ditemukan" not in payment_sevima_tokopedia_guide:
+        response_text += "\n\nJika ingin panduan pembayaran via Tokopedia, ketik 'cara bayar sevima tokopedia'."
+    return response_text, "cara_bayar_spp_ft_prompt"
+
+
+@handler("cara_bayar_sevima_tokopedia", config=("PAYMENT_SEVIMA_TOKOPEDIA_GUIDE",))
+def cara_bayar_sevima_tokopedia(ctx):
+    payment_sevima_tokopedia_guide = ctx.config.get('PAYMENT_SEVIMA_TOKOPEDIA_GUIDE', '')
+    if payment_sevima_tokopedia_guide and "tidak ditemukan" not in payment_sevima_tokopedia_guide:
+        response_text = (f"{ctx.sapaan_awal}, ini panduan umum membayar uang kuliah melalui Sevima Pay "
+                         f"di platform Tokopedia:\n\n{payment_sevima_tokopedia_guide}\n\n"
+                         "**Penting:** Pastikan Anda mengikuti langkah-langkah ini dengan benar, "
+                         "memilih tagihan yang sesuai, dan membayar sebelum batas waktu yang ditentukan. "
+                         "Simpan bukti pembayaran Anda.")
+        return response_text, "cara_bayar_sevima_tokopedia_handled"
+    response_text = (f"Maaf {ctx.sapaan}, panduan spesifik pembayaran via Tokopedia belum tersedia di data saya. "
+                     "Silakan cek pengumuman resmi dari bagian keuangan atau universitas mengenai metode pembayaran yang tersedia.")
+    return response_text, "fallback_payment_guide_missing"
+
+# --- END OF FILE intent_handlers/biaya.py ---
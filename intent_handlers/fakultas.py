@@ -0,0 +1,31 @@
+# --- START OF FILE intent_handlers/fakultas.py ---
+"""Handler informasi fakultas: fasilitas umum dan kontak Tata Usaha."""
+
+from intent_handlers import handler
+
+
+@handler("fasilitas_umum_ft")
+def fasilitas_umum(ctx):
+    response_text = (f"{ctx.sapaan_awal}. Fasilitas umum yang tersedia di lingkungan Fakultas Teknik UNANDA antara lain:\n"
+                     "- Ruang kuliah yang dilengkapi AC dan LCD Proyektor.\n"
+                     "- Jaringan WiFi di beberapa area kampus.\n"
+                     "- Perpustakaan fakultas/universitas.\n"
+                     "- Laboratorium komputer dan laboratorium spesifik per prodi.\n"
+                     "- Area diskusi mahasiswa.\n"
+                     "- Kantin atau area jajan terdekat.\n"
+                     "- Mushola/Tempat ibadah.\n"
+                     "- Toilet.\n\n"
+                     "Untuk detail fasilitas laboratorium spesifik prodi, Anda bisa tanyakan misalnya 'info lab informatika'.")
+    return response_text, "fasilitas_umum_ft_handled"
+
+
+@handler("kontak_ft", config=("KONTAK_TU_INFO",), defers_to_lab=True)
+def kontak(ctx):
+    kontak_tu_info = ctx.config.get('KONTAK_TU_INFO', 'Informasi kontak TU belum tersedia.')
+    if "[GANTI" in kontak_tu_info:
+        response_text = (f"{ctx.sapaan}Informasi kontak Tata Usaha (TU) belum lengkap di data saya. "
+                         "Anda bisa coba cek langsung di website resmi Fakultas Teknik UNANDA untuk informasi kontak terbaru.")
+        return response_text, "fallback_kontak_placeholder"
+    return f"{ctx.sapaan_awal}. {kontak_tu_info}", "kontak_ft_handled" # Mulai dengan Baik Nama, ...
+
+# --- END OF FILE intent_handlers/fakultas.py ---
@@ -0,0 +1,28 @@
+# --- START OF FILE intent_handlers/fallback.py ---
+"""Handler untuk intent valid (skor di atas threshold) yang belum punya handler spesifik."""
+
+from markupsafe import escape
+
+from intent_handlers import handler
+
+# Daftarkan intent yang ada di model tapi belum ditangani spesifik
+# Contoh: "info_dosen", "info_kurikulum"
+KNOWN_INTENTS_WITHOUT_HANDLERS = frozenset()
+
+
+# Respons memuat skor mentah, jadi tidak di-cache
+@handler(fallback=True, cacheable=False, defers_to_lab=True)
+def unhandled_valid_intent(ctx):
+    intent, score = ctx.intent, ctx.score
+    if intent and intent in KNOWN_INTENTS_WITHOUT_HANDLERS:
+         response_text = (f"Saya mengerti Anda bertanya tentang '{escape(intent.replace('_', ' '))}' ({score*100:.1f}%). "
+                          f"Namun, saya belum memiliki informasi detail atau tindakan spesifik untuk topik tersebut saat ini. "
+                          "Mungkin Anda bisa bertanya tentang topik lain seperti biaya, pendaftaran, jadwal, atau prodi?")
+    else:
+        # Ini kasus sangat jarang, intent tidak umum atau salah deteksi
+        response_text = (f"Saya mendeteksi niat '{escape(intent.replace('_', ' ')) if intent else 'Tidak Dikenali'}' ({score*100:.1f}%) dari pertanyaan Anda, "
+                         "tapi saya belum diprogram untuk menjawab topik tersebut. "
+                         "Mohon ajukan pertanyaan lain yang terkait Fakultas Teknik UNANDA.")
+    return response_text, "unhandled_valid_intent"
+
+# --- END OF FILE intent_handlers/fallback.py ---
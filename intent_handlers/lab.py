@@ -0,0 +1,113 @@
+# --- START OF FILE intent_handlers/lab.py ---
+"""Handler laboratorium: info lab (per prodi/spesifik) dan biaya praktikum.
+
+Handler info lab juga menerima intent lain yang handler-nya defers_to_lab saat entitas
+LAB terdeteksi (lihat HandlerRegistry.resolve).
+"""
+
+from markupsafe import escape
+
+from intent_handlers import handler
+from intent_logic import INTENT_PRODI_MAPPING, _compile_lab_fee_response, _render_fragment, _rng
+
+
+@handler(prefix="info_lab_", config=("TERMS_DATA",), fragments=("lab",), entities=("PRODI", "LAB"))
+def info_lab(ctx):
+    intent = ctx.intent
+    detected_prodi = ctx.prodi
+    detected_lab = ctx.lab
+    lab_fragments = ctx.fragments["lab"]
+    lab_terms = ctx.config.get('TERMS_DATA', {}).get('lab', {})
+    target_prodi_from_intent = INTENT_PRODI_MAPPING.get(intent) if intent.startswith("info_lab_") else None
+    target_prodi = detected_prodi or target_prodi_from_intent # Prioritaskan prodi dari NLU
+
+    response_parts = [f"{ctx.sapaan_awal}. Mengenai laboratorium di Fakultas Teknik:"]
+    has_learning_data = lab_fragments["has_learning_data"]
+    has_fee_data = lab_fragments["has_fee_data"]
+
+    if not has_learning_data and not has_fee_data and not detected_lab:
+         response_parts.append("Maaf, informasi detail mengenai laboratorium (materi atau biaya) tidak dapat dimuat saat ini.")
+         final_intent_category = "fallback_lab_data_missing"
+    else:
+        # Jika tanya spesifik LAB tapi tidak terdeteksi PRODI, pakai prodi pertama pemilik lab
+        if detected_lab and not target_prodi:
+            target_prodi = lab_fragments["lab_owner"].get(detected_lab)
+
+        if target_prodi:
+            response_parts.append(f"\n**Untuk Prodi {escape(target_prodi)}:**")
+            labs_in_prodi = lab_fragments["labs_by_prodi"].get(target_prodi, [])
+
+            if detected_lab and detected_lab in labs_in_prodi:
+                # Info spesifik LAB yang diminta
+                response_parts.append(f"- Fokus pada: **{escape(detected_lab)}**.")
+                # Tambahkan info biaya jika ada
+                if has_fee_data:
+                     response_parts.extend(lab_fragments["fee_specific"].get(detected_lab, lab_fragments["fee_specific_default"]))
+
+                # Tambahkan ajakan tanya pembelajaran jika ada datanya
+                if detected_lab in lab_fragments["labs_with_learning"].get(target_prodi, []):
+                    response_parts.append(f"  Anda bisa tanya 'apa yang dipelajari di {escape(detected_lab)}?'")
+                final_intent_category = "info_lab_specific_handled"
+
+            elif labs_in_prodi:
+                # Info umum LAB untuk PRODI yang diminta (karena lab spesifik tidak diminta/ditemukan)
+                response_parts.append(f"  Terdapat beberapa laboratorium utama, antara lain: **{lab_fragments['labs_by_prodi_text'][target_prodi]}**.")
+                # Tampilkan biaya umum jika ada
+                response_parts.extend(lab_fragments["fee_prodi_list"])
+                response_parts.append("  Anda bisa tanya info lebih detail tentang lab spesifik (misal: 'info lab software' atau 'biaya lab hidrolika').")
+                final_intent_category = "info_lab_prodi_list_handled"
+            else:
+                response_parts.append(f"  Maaf, daftar laboratorium spesifik untuk Prodi {escape(target_prodi)} belum tersedia di data saya.")
+                final_intent_category = "fallback_lab_list_missing"
+        else:
+            # Tidak ada prodi terdeteksi sama sekali (baik dari intent atau NLU)
+            # Ambil dari terms di config dan pastikan terms_data valid
+            all_labs_options = list(lab_terms.keys()) if lab_terms and isinstance(lab_terms, dict) else []
+            if all_labs_options:
+               response_parts.append("\nFakultas Teknik memiliki berbagai laboratorium untuk mendukung pembelajaran.")
+               display_count = min(len(all_labs_options), 5)
+               contoh_labs = _rng.sample(all_labs_options, display_count)
+               response_parts.append(f"Beberapa di antaranya: **{', '.join(map(escape, contoh_labs))}**{ '...' if len(all_labs_options) > display_count else '.'}")
+
+               # Tampilkan biaya umum jika ada
+               response_parts.extend(lab_fragments["fee_general"])
+               response_parts.append("\nApakah ada laboratorium spesifik atau dari prodi tertentu yang ingin Anda ketahui lebih lanjut? (Contoh: 'info lab sipil' atau 'lab software')")
+               final_intent_category = "info_lab_general_prompt"
+            else:
+               response_parts.append("\nMaaf, informasi umum mengenai laboratorium belum tersedia saat ini.")
+               final_intent_category = "fallback_lab_terms_missing"
+
+    return "\n".join(response_parts), final_intent_category
+
+
+@handler("tanya_biaya_praktikum", config=("FT_FEES",), fragments=("lab",), entities=("LAB",))
+def biaya_praktikum(ctx):
+    detected_lab = ctx.lab
+    lab_fragments = ctx.fragments["lab"]
+    # === DISAMBIGUASI / SLOT FILLING ===
+    # Daftar lab yang memiliki info biaya (spesifik atau default)
+    labs_with_fee_info = lab_fragments["labs_with_fee_info"]
+
+    if not detected_lab:
+         if labs_with_fee_info:
+             contoh_lab_list = lab_fragments["fee_example_labs"]
+             contoh_display = _rng.sample(contoh_lab_list, min(len(contoh_lab_list), 3))
+             response_text = (f"{ctx.sapaan_awal}, untuk memberikan informasi biaya praktikum yang lebih akurat, "
+                              f"mohon sebutkan nama laboratorium spesifiknya.\n"
+                              f"Beberapa lab yang ada info biayanya (atau info umum): **{', '.join(map(escape, contoh_display))}**{ '...' if len(labs_with_fee_info) > len(contoh_display) else '.'}"
+                              f"\nContoh pertanyaan: 'biaya praktikum {escape(_rng.choice(contoh_display))}'")
+             return response_text, "prompt_for_lab_fee"
+         response_text = f"{ctx.sapaan}Maaf, saya belum punya daftar laboratorium dengan informasi biaya praktikum. Silakan hubungi bagian akademik/lab terkait."
+         return response_text, "fallback_lab_terms_missing_for_fee"
+    # =====================================
+    if not lab_fragments["has_fee_data"]:
+        response_text = f"Maaf {ctx.sapaan}, informasi biaya praktikum tidak dapat dimuat saat ini. Silakan hubungi laboratorium terkait atau bagian akademik."
+        return response_text, "fallback_fee_data_missing"
+
+    # Lab terdeteksi dan data biaya ada; lab di luar data/terms dikompilasi di tempat
+    fee_fragment = lab_fragments["fee_responses"].get(detected_lab)
+    if fee_fragment is None:
+        fee_fragment = _compile_lab_fee_response(detected_lab, ctx.config.get('FT_FEES', {})["praktikum"])
+    return _render_fragment(fee_fragment, ctx.user_name)
+
+# --- END OF FILE intent_handlers/lab.py ---
@@ -0,0 +1,70 @@
+# --- START OF FILE intent_handlers/pembelajaran.py ---
+"""Handler materi pembelajaran prodi dan laboratorium (dengan slot filling entitas)."""
+
+from markupsafe import escape
+
+from intent_handlers import handler
+from intent_logic import (_OTHER_PRODI, _compile_learning_lab_response, _compile_learning_prodi_response,
+                          _render_fragment, _rng)
+
+
+@handler("tanya_pembelajaran_prodi", fragments=("learning",), entities=("PRODI",), defers_to_lab=True)
+def pembelajaran_prodi(ctx):
+    learning_fragments = ctx.fragments["learning"]
+    detected_prodi = ctx.prodi
+    # === DISAMBIGUASI / SLOT FILLING ===
+    # Prodi yang memiliki ringkasan pembelajaran di data
+    prodi_options_with_learning_summary = learning_fragments["prodi_options"]
+
+    if not detected_prodi:
+        if prodi_options_with_learning_summary:
+            response_text = (f"{ctx.sapaan_awal}, Anda ingin mengetahui gambaran pembelajaran di program studi mana? "
+                             f"Pilihan yang ada di data saya: **{learning_fragments['prodi_options_text']}**.")
+            return response_text, "prompt_for_prodi_learning"
+        response_text = f"{ctx.sapaan}Maaf, informasi pembelajaran untuk program studi belum tersedia di data saya."
+        return response_text, "fallback_learning_prodi_list_missing"
+    # =====================================
+    if not learning_fragments["valid"]:
+        response_text = f"Maaf {ctx.sapaan}, informasi materi pembelajaran prodi tidak dapat dimuat saat ini."
+        return response_text, "fallback_learning_data_missing"
+
+    # Prodi di luar data/terms tidak punya ringkasan: fragmen fallback dikompilasi di tempat
+    learning_fragment = learning_fragments["prodi_responses"].get(detected_prodi)
+    if learning_fragment is None:
+        learning_fragment = _compile_learning_prodi_response(detected_prodi, {})
+    return _render_fragment(learning_fragment, ctx.user_name)
+
+
+@handler("tanya_pembelajaran_lab", fragments=("learning",), entities=("PRODI", "LAB"))
+def pembelajaran_lab(ctx):
+    learning_fragments = ctx.fragments["learning"]
+    detected_prodi = ctx.prodi
+    detected_lab = ctx.lab
+    # === DISAMBIGUASI / SLOT FILLING ===
+    if not detected_lab:
+         contoh_lab_list = learning_fragments["lab_example_labs"]
+         if contoh_lab_list:
+             contoh_display = _rng.sample(contoh_lab_list, min(len(contoh_lab_list), 3))
+             response_text = (f"{ctx.sapaan_awal}, Anda ingin tahu materi pembelajaran di laboratorium mana? "
+                              "Mohon sebutkan nama laboratorium spesifiknya. "
+                              f"Contohnya: 'apa yang dipelajari di {escape(_rng.choice(contoh_display))}?'")
+             return response_text, "prompt_for_lab_learning"
+         response_text = (f"{ctx.sapaan_awal}. Anda ingin tahu materi pembelajaran di laboratorium mana? "
+                          "Mohon sebutkan nama laboratorium spesifiknya. (Maaf, daftar lab dengan deskripsi belum tersedia di data saya untuk diberikan contoh).")
+         return response_text, "prompt_for_lab_learning_no_examples"
+    # =====================================
+    if not learning_fragments["valid"]:
+         response_text = f"Maaf {ctx.sapaan}, informasi materi pembelajaran laboratorium tidak dapat dimuat saat ini."
+         return response_text, "fallback_learning_data_missing"
+
+    lab_variants = learning_fragments["lab_responses"].get(detected_lab)
+    if lab_variants is None:
+        # Lab tanpa deskripsi di prodi manapun
+        learning_fragment = _compile_learning_lab_response(detected_lab, detected_prodi, {})
+    else:
+        # Varian sesuai konteks prodi: pemilik lab, prodi lain, atau tanpa prodi
+        context = detected_prodi if detected_prodi in lab_variants else (_OTHER_PRODI if detected_prodi else None)
+        learning_fragment = lab_variants[context]
+    return _render_fragment(learning_fragment, ctx.user_name)
+
+# --- END OF FILE intent_handlers/pembelajaran.py ---
@@ -0,0 +1,56 @@
+# --- START OF FILE intent_handlers/percakapan.py ---
+"""Handler percakapan umum: salam, pamit, terima kasih, identitas bot."""
+
+from intent_handlers import handler
+from intent_logic import _rng
+
+
+@handler("greeting_ft")
+def greeting(ctx):
+    if ctx.safe_user_name:
+         response_text = _rng.choice([
+             f"Halo lagi {ctx.safe_user_name}! Ada lagi yang bisa saya bantu?",
+             f"Hai {ctx.safe_user_name}! Senang bertemu Anda lagi.",
+             f"Ya {ctx.safe_user_name}, ada keperluan apa lagi?"
+         ])
+    else:
+        response_text = _rng.choice([
+            "Halo! Ada yang bisa saya bantu?",
+            "Hai! Selamat datang di chatbot Fakultas Teknik UNANDA.",
+            "Salam! Ada yang ingin ditanyakan seputar Fakultas Teknik?"
+        ])
+    return response_text, "greeting_ft_handled"
+
+
+@handler("goodbye_ft")
+def goodbye(ctx):
+    response_text = _rng.choice([
+        f"{ctx.sapaan_awal}, sampai jumpa!",
+        "Sampai jumpa!",
+        "Senang bisa membantu. Jika ada lagi, jangan ragu bertanya.",
+        "Terima kasih telah bertanya!"
+        ])
+    return response_text, "goodbye_ft_handled"
+
+
+@handler("thankyou_ft")
+def thankyou(ctx):
+    response_text = _rng.choice([
+        f"Sama-sama, {ctx.safe_user_name}!" if ctx.safe_user_name else "Sama-sama!",
+        "Dengan senang hati!",
+        "Tidak masalah!",
+        "Senang bisa membantu!"
+        ])
+    return response_text, "thankyou_ft_handled"
+
+
+@handler("ask_bot_identity")
+def ask_bot_identity(ctx):
+    response_text = ("Saya adalah chatbot Fakultas Teknik Universitas Andi Djemma. "
+                     "Saya dirancang untuk membantu memberikan informasi seputar fakultas, "
+                     "Penerimaan Mahasiswa Baru (PMB), biaya kuliah (SPP, praktikum), "
+                     "informasi prodi & lab, jadwal kuliah, panduan KRS dan pembayaran, serta kontak. "
+                     "Ada yang bisa saya bantu?")
+    return response_text, "ask_bot_identity_handled"
+
+# --- END OF FILE intent_handlers/percakapan.py ---
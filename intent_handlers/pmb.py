@@ -0,0 +1,13 @@
+# --- START OF FILE intent_handlers/pmb.py ---
+"""Handler Penerimaan Mahasiswa Baru (PMB); respons sudah dikompilasi per snapshot di fragmen "pmb"."""
+
+from intent_handlers import handler
+from intent_logic import _render_fragment
+
+
+@handler("info_pmb_umum", "info_jalur_pmb", "info_biaya_pmb", "cara_daftar_pmb", fragments=("pmb",), defers_to_lab=True)
+def pmb(ctx):
+    # Tidak perlu disambiguasi entitas utama di sini
+    return _render_fragment(ctx.fragments["pmb"][ctx.intent], ctx.user_name)
+
+# --- END OF FILE intent_handlers/pmb.py ---
@@ -0,0 +1,49 @@
+# --- START OF FILE intent_handlers/prodi.py ---
+"""Handler informasi umum program studi (intent info_prodi_*)."""
+
+from markupsafe import escape
+
+from intent_handlers import handler
+from intent_logic import INTENT_PRODI_MAPPING, _render_fragment, _rng
+
+
+@handler(prefix="info_prodi_", fragments=("prodi", "lab"), entities=("PRODI",), defers_to_lab=True)
+def info_prodi(ctx):
+    prodi_fragments = ctx.fragments["prodi"]
+    target_prodi_intent = INTENT_PRODI_MAPPING.get(ctx.intent)
+    target_prodi = ctx.prodi or target_prodi_intent # Prioritaskan NLU
+
+    # Daftar prodi yang tersedia di terms data (atau prodi yang punya link jika terms kosong)
+    available_prodi_list = prodi_fragments["available"]
+
+    if target_prodi and target_prodi in available_prodi_list: # Check if detected prodi is in our known list
+        response_text, _ = _render_fragment((prodi_fragments["info"][target_prodi], None), ctx.user_name)
+
+        # Cek apakah ada data pembelajaran lab spesifik untuk prodi ini
+        labs_in_prodi_with_learning = ctx.fragments["lab"]["labs_with_learning"].get(target_prodi, [])
+        if labs_in_prodi_with_learning:
+             response_text += f"\n\nAnda juga bisa tanya informasi mengenai lab spesifik di prodi ini (misal: 'info lab {escape(_rng.choice(labs_in_prodi_with_learning))}') atau materi pembelajarannya ('apa yang dipelajari di lab {escape(_rng.choice(labs_in_prodi_with_learning))}?')."
+
+        final_intent_category = f"info_prodi_{target_prodi.split()[1].lower()}_handled" # e.g., info_prodi_informatika_handled
+
+    elif target_prodi: # Detected prodi but not in our list of available info
+         response_text = f"{ctx.sapaan}Maaf, informasi umum untuk Prodi {escape(target_prodi)} belum tersedia lengkap di data saya. "
+         if prodi_fragments["has_any_link"]:
+              response_text += "Anda bisa coba cek langsung di website Fakultas Teknik UNANDA atau bertanya tentang topik lain."
+         else:
+              response_text += "Anda bisa coba cek langsung di website resmi UNANDA atau bertanya tentang topik lain."
+
+         final_intent_category = "fallback_prodi_info_missing"
+
+    else: # No prodi detected or intent was just info_prodi_
+        if available_prodi_list:
+             response_text = f"{ctx.sapaan_awal}. Fakultas Teknik UNANDA saat ini memiliki program studi: **{prodi_fragments['available_text']}**. Prodi mana yang spesifik ingin Anda ketahui informasinya? (Contoh: 'info prodi sipil')"
+             final_intent_category = "prompt_for_prodi_general"
+        else:
+             response_text = f"{ctx.sapaan}Maaf, daftar program studi di Fakultas Teknik belum tersedia di data saya."
+             final_intent_category = "fallback_prodi_list_missing"
+
+    response_text = "\n".join(filter(None, response_text.split('\n'))) # Clean up empty lines
+    return response_text, final_intent_category
+
+# --- END OF FILE intent_handlers/prodi.py ---
@@ -2,8 +2,141 @@
 
 import random
 import re
+import threading
 from markupsafe import escape
 
+from intent_handlers import REGISTRY, HandlerContext
+from jadwal_index import ScheduleIndex, format_minutes
+from structured_log import get_logger
+
+# Mapping nama prodi kanonikal ke key config dan short name data jadwal
+JADWAL_PRODI_MAPPING = {
+    "Teknik Informatika": {"data_key": "JADWAL_TI_DATA", "link_key": "LINK_JADWAL_TI", "short_name": "TI"},
+    "Teknik Sipil": {"data_key": "JADWAL_SIPIL_DATA", "link_key": "LINK_JADWAL_SIPIL", "short_name": "sipil"},
+    "Teknik Pertambangan": {"data_key": "JADWAL_TAMBANG_DATA", "link_key": "LINK_JADWAL_TAMBANG", "short_name": "TP"}
+}
+# Mapping intent spesifik lab/prodi ke nama prodi kanonikal
+INTENT_PRODI_MAPPING = {
+    "info_lab_sipil": "Teknik Sipil",
+    "info_lab_informatika": "Teknik Informatika",
+    "info_lab_pertambangan": "Teknik Pertambangan",
+    "info_prodi_sipil": "Teknik Sipil",
+    "info_prodi_informatika": "Teknik Informatika",
+    "info_prodi_pertambangan": "Teknik Pertambangan"
+}
+# Mapping nama prodi kanonikal ke key config link website prodi
+PRODI_LINK_KEYS = {
+    "Teknik Sipil": "LINK_PRODI_SIPIL",
+    "Teknik Informatika": "LINK_PRODI_INFORMATIKA",
+    "Teknik Pertambangan": "LINK_PRODI_TAMBANG"
+}
+# Ringkasan prodi jika learning_content tidak punya '_prodi_summary'
+PRODI_SUMMARY_DEFAULTS = {
+    "Teknik Sipil": "Fokus pada perancangan, pembangunan, dan pemeliharaan infrastruktur seperti gedung, jembatan, jalan, dan sistem air.",
+    "Teknik Informatika": "Mempelajari dasar-dasar ilmu komputer, pengembangan perangkat lunak (software), jaringan komputer, kecerdasan buatan, dan manajemen data.",
+    "Teknik Pertambangan": "Berkaitan dengan eksplorasi, penambangan (ekstraksi), dan pengolahan sumber daya mineral dan batubara secara efisien dan aman."
+}
+JADWAL_PERIODE = "2024-2025" # <<-- KONFIGURASI PERIODE JADWAL DI SINI -->>
+JADWAL_DAYS = {"senin": "Senin", "selasa": "Selasa", "rabu": "Rabu",
+               "kamis": "Kamis", "jumat": "Jumat", "sabtu": "Sabtu"}
+# Pola query jadwal tambahan (dicompile sekali)
+_JADWAL_DAY_PATTERNS = {
+    day_key: re.compile(r'\b(' + re.escape(day_key) + r'|hari\s+' + re.escape(day_key) + r'|' + re.escape(day_key) + r'\s+jadwal)\b')
+    for day_key in JADWAL_DAYS
+}
+_JADWAL_JAM_RE = re.compile(r"\b(?:jam|pukul)\s*(\d{1,2})(?:\s*[.:]\s*(\d{2}))?\b")
+_JADWAL_DOSEN_RE = re.compile(r"\b(?:dosen|pak|bapak|bu|ibu)\s+(.+)")
+_JADWAL_FREE_ROOM_RE = re.compile(r"\b(kosong|tersedia|free|bisa dipakai)\b")
+# Kata kunci periode SPP (dipakai handler SPP dan key cache respons)
+_SPP_PERIODE_2023_2024_KWS = ["2023", "2024", "terbaru", "sekarang", "saat ini"]
+_SPP_PERIODE_2018_2022_KWS = ["2018", "2019", "2020", "2021", "2022", "lama", "dulu"]
+
+# --- Cache Respons Handler ---
+# Pengganti nama user saat respons dibangun untuk cache; diganti nama asli setelah diambil.
+# Karakter Private Use Area, tidak mungkin muncul dari data maupun dari escape().
+NAME_PLACEHOLDER = "\uE000\uE001"
+
+
+# Slot variasi acak di respons yang di-cache: mentah, versi escape(), dan penutup (juga Private Use Area)
+_SLOT_RAW, _SLOT_ESCAPED, _SLOT_END = "\uE002", "\uE003", "\uE004"
+_SLOT_RE = re.compile(f"([{_SLOT_RAW}{_SLOT_ESCAPED}])(\\d+){_SLOT_END}")
+
+
+class _Slot(str):
+    """Penanda satu nilai acak yang belum dipilih; escape(slot) menghasilkan penanda versi escape."""
+
+    def __new__(cls, slot_id):
+        slot = super().__new__(cls, f"{_SLOT_RAW}{slot_id}{_SLOT_END}")
+        slot.slot_id = slot_id
+        return slot
+
+    def __html__(self):
+        return f"{_SLOT_ESCAPED}{self.slot_id}{_SLOT_END}"
+
+
+class _VariantRandom:
+    """choice/sample untuk handler yang bisa ditunda ke langkah templating setelah lookup cache.
+
+    Di luar record_variants(), pemanggilan diteruskan langsung ke modul random. Di dalamnya,
+    choice/sample mengembalikan _Slot dan mencatat pilihannya, sehingga badan respons yang
+    deterministik bisa di-cache; fill_variants() lalu mengundi slot per request dengan urutan
+    pemanggilan yang sama (random.seed() tetap menghasilkan teks yang sama dengan tanpa cache).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def record_variants(self):
+        """Mulai merekam pada thread ini; kembalikan list variasi yang akan diisi choice/sample."""
+        self._local.variants = []
+        return self._local.variants
+
+    def stop_recording(self):
+        self._local.variants = None
+
+    def _slots(self, variants, kind, options, k):
+        first = sum(count for _, _, count in variants)
+        variants.append((kind, list(options), k))
+        return [_Slot(first + i) for i in range(k)]
+
+    def choice(self, seq):
+        variants = getattr(self._local, "variants", None)
+        if variants is None:
+            return random.choice(seq)
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return self._slots(variants, "choice", seq, 1)[0]
+
+    def sample(self, population, k):
+        variants = getattr(self._local, "variants", None)
+        if variants is None:
+            return random.sample(population, k)
+        if not 0 <= k <= len(population):
+            raise ValueError("Sample larger than population or is negative")
+        return self._slots(variants, "sample", population, k)
+
+
+_rng = _VariantRandom()
+
+
+def fill_variants(template, variants):
+    """Isi slot dari _VariantRandom dengan undian baru (urutan sama dengan saat respons dibangun)."""
+    if not variants:
+        return template
+    values = []
+    for kind, options, k in variants:
+        drawn = [random.choice(options)] if kind == "choice" else random.sample(options, k)
+        # Pilihan dari hasil sample sebelumnya (choice atas list _Slot) memakai nilai slot itu
+        values.extend(values[value.slot_id] if isinstance(value, _Slot) else value for value in drawn)
+
+    def substitute(match):
+        value = _SLOT_RE.sub(substitute, values[int(match.group(2))])
+        return str(escape(value)) if match.group(1) == _SLOT_ESCAPED else value
+    return _SLOT_RE.sub(substitute, template)
+
+
+logger = get_logger("intent_logic")
+
 # --- Helper Functions ---
 def format_idr(amount):
     """Memformat angka menjadi string Rupiah."""
@@ -14,7 +147,7 @@ def format_idr(amount):
         # Mengganti , menjadi . untuk pemisah ribuan adalah format umum di Indonesia
         return f"Rp {numeric_amount:,.0f}".replace(',', '.')
     except (ValueError, TypeError):
-        print(f"WARNING: Gagal memformat '{amount}' sebagai Rupiah.")
+        logger.warning("Gagal memformat %r sebagai Rupiah.", amount)
         return str(amount) # Kembalikan sebagai string jika gagal
 
 def get_safe_user_name(user_name):
@@ -38,22 +171,65 @@ def get_sapaan(user_name, awal_kalimat=False):
         # Jika tidak ada nama, gunakan "Baik" di awal, atau string kosong di tengah.
         return "Baik" if awal_kalimat else ""
 
+# --- Helper Parsing Query Jadwal ---
+def _find_jadwal_day(original_text_lower):
+    """Kembalikan key hari (misal 'rabu') yang disebut di teks, atau None."""
+    for day_key, pattern in _JADWAL_DAY_PATTERNS.items():
+        if pattern.search(original_text_lower):
+            return day_key
+    return None
+
+
+def _find_jadwal_minute(original_text_lower):
+    """Kembalikan jam yang disebut ('jam 10', 'pukul 13.30') dalam menit sejak 00:00, atau None."""
+    match = _JADWAL_JAM_RE.search(original_text_lower)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour <= 6: # 'jam 1' saat jam kuliah berarti 13.00
+        hour += 12
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def _filter_jadwal_entries(entries, day_key=None, minute=None):
+    """Saring list JadwalEntry berdasarkan hari dan/atau titik waktu (jika disebut)."""
+    if day_key:
+        entries = [entry for entry in entries if entry.day == day_key]
+    if minute is not None:
+        entries = [entry for entry in entries if entry.overlaps(minute, minute + 1)]
+    return list(entries)
+
+
+def _format_free_room_response(schedule_index, room_keys, room_label, day_key, prodi_name, periode, user_name):
+    """Format slot kosong ruang per hari dari ScheduleIndex.free_slots()."""
+    sapaan_awal_kalimat = get_sapaan(user_name, awal_kalimat=True)
+    response_parts = [f"{sapaan_awal_kalimat}, berikut waktu kosong **Ruang {escape(room_label)}** berdasarkan jadwal kuliah {escape(prodi_name)} (Periode {periode}):\n"]
+    for day, slots in schedule_index.free_slots(room_keys, day_name=day_key):
+        day_label = JADWAL_DAYS.get(day, day.capitalize())
+        if slots:
+            slot_text = ", ".join(f"{format_minutes(start)}-{format_minutes(end)}" for start, end in slots)
+            response_parts.append(f"- **{day_label}**: {slot_text}")
+        else:
+            response_parts.append(f"- **{day_label}**: penuh")
+    response_parts.append("\n*Hanya berdasarkan jadwal kuliah prodi ini; ruang bisa saja dipakai kegiatan lain. Konfirmasi ke bagian akademik sebelum memakai ruang.*")
+    return "\n".join(response_parts)
+
+
 # --- Helper Function Spesifik Jadwal (Gabungan TI, Sipil, Tambang) ---
 # Menggunakan satu helper function untuk semua prodi yang datanya ada
-def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, config):
-    """ Mencari dan memformat jadwal untuk prodi spesifik (TI, Sipil, Tambang)."""
+def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, config, matkul_candidates=()):
+    """ Mencari dan memformat jadwal untuk prodi spesifik (TI, Sipil, Tambang).
+
+    matkul_candidates: nama matkul dari entitas NLU MATKUL (termasuk yang ditulis dengan typo),
+    dipakai jika nama matkul tidak ditemukan persis di teks.
+    """
     sapaan_tengah = get_sapaan(user_name)
     sapaan_awal_kalimat = get_sapaan(user_name, awal_kalimat=True)
 
     # Tentukan key data dan link berdasarkan nama prodi
-    # Mapping nama prodi kanonikal ke key config dan short name
-    prodi_mapping = {
-        "Teknik Informatika": {"data_key": "JADWAL_TI_DATA", "link_key": "LINK_JADWAL_TI", "short_name": "TI"},
-        "Teknik Sipil": {"data_key": "JADWAL_SIPIL_DATA", "link_key": "LINK_JADWAL_SIPIL", "short_name": "sipil"},
-        "Teknik Pertambangan": {"data_key": "JADWAL_TAMBANG_DATA", "link_key": "LINK_JADWAL_TAMBANG", "short_name": "TP"}
-    }
-
-    prodi_info = prodi_mapping.get(prodi_name)
+    prodi_info = JADWAL_PRODI_MAPPING.get(prodi_name)
 
     if not prodi_info:
         # Ini seharusnya tidak terjadi jika dipanggil dari intent_logic yang sudah memfilter prodi
@@ -66,7 +242,7 @@ def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, confi
 
     jadwal_prodi_data = config.get(data_key, {})
     link_jadwal_prodi = config.get(link_key, '')
-    periode = "2024-2025" # <<-- KONFIGURASI PERIODE JADWAL DI SINI -->>
+    periode = JADWAL_PERIODE
 
     # Check if the main data structure exists and contains the prodi's data
     if not jadwal_prodi_data or not isinstance(jadwal_prodi_data.get("jadwal_kuliah"), dict) or prodi_short_name not in jadwal_prodi_data["jadwal_kuliah"]:
@@ -88,52 +264,67 @@ def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, confi
              fallback_msg = f"Silakan cek pengumuman resmi dari prodi {prodi_name}."
          return (f"Maaf {sapaan_tengah}, data jadwal kuliah **{escape(prodi_name)}** untuk periode {periode} belum tersedia di data saya. {fallback_msg}"), "fallback_jadwal_prodi_no_period_data"
 
+    # Gunakan indeks yang dibangun saat data dimuat; bangun di tempat jika belum tersedia
+    schedule_index = config.get('JADWAL_INDEX', {}).get(prodi_name, {}).get(periode)
+    if schedule_index is None:
+        schedule_index = ScheduleIndex(schedule_data)
+
     found_schedule = []
     search_term = None
     matched_course = None
-    # Ambil nama mata kuliah dari data jadwal (keys)
-    available_courses = list(schedule_data.keys())
-    available_courses_lower = [name.lower() for name in available_courses]
-
-
-    # 1. Cek Matkul Spesifik (dengan word boundary)
-    # Iterasi melalui nama mata kuliah yang tersedia (kasus asli)
-    for real_course_name in available_courses:
-        course_name_lower = real_course_name.lower()
-        # Cari whole word match atau frasa parsial yang signifikan
-        # Gunakan regex untuk mencocokkan kata utuh atau frasa penting
-        patterns_to_match = [
-            r'\b' + re.escape(course_name_lower) + r'\b', # Full match
-            # r'\b' + re.escape(course_name_lower.split()[0]) + r'\b.*\b' + re.escape(course_name_lower.split()[-1]) + r'\b', # First and last word
-            # Tambahkan pola regex lain jika perlu untuk variasi
-        ]
-        if any(re.search(pattern, original_text_lower) for pattern in patterns_to_match):
-             matched_course = real_course_name
-             search_term = matched_course
-             found_schedule.append((real_course_name, schedule_data[real_course_name]))
-             break # Found the specific course
-
-
-    # 2. Cek Hari Spesifik (jika tidak cari matkul)
-    if not found_schedule:
-        days_map = {"senin": "Senin", "selasa": "Selasa", "rabu": "Rabu",
-                    "kamis": "Kamis", "jumat": "Jumat", "sabtu": "Sabtu"}
-        matched_day_key = None
-        # Cari pola seperti "hari senin", "jadwal senin", atau hanya "senin"
-        for day_key, day_proper in days_map.items():
-            # Adjusted regex to allow "jadwal senin", "senin jadwal", "hari senin", or just "senin"
-             if re.search(r'\b(' + re.escape(day_key) + r'|hari\s+' + re.escape(day_key) + r'|' + re.escape(day_key) + r'\s+jadwal)\b', original_text_lower):
-                matched_day_key = day_key
-                search_term = f"Hari {day_proper}"
+    # Nama mata kuliah dari indeks (tanpa sufiks duplikat seperti '_2')
+    available_courses = schedule_index.course_names
+
+    # Hari dan jam pada teks dipakai sebagai filter oleh beberapa jenis query di bawah
+    matched_day_key = _find_jadwal_day(original_text_lower)
+    matched_minute = _find_jadwal_minute(original_text_lower)
+
+    # 1. Cek Matkul Spesifik (kata utuh, lewat trie nama matkul di indeks)
+    matched_course = schedule_index.find_course(original_text_lower)
+    if not matched_course:
+        # Nama matkul dengan typo ("struktur baja2", "metode numerk") dari indeks entitas fuzzy
+        for candidate in matkul_candidates:
+            candidate_entries = schedule_index.entries_for_course(candidate)
+            if candidate_entries:
+                matched_course = candidate_entries[0].course
                 break
-        if matched_day_key:
-            day_proper_case = days_map[matched_day_key]
-            for course_name, details in schedule_data.items():
-                # Ensure 'hari' key exists and is a string before lowercasing
-                if isinstance(details.get("hari"), str) and details["hari"].lower() == day_proper_case.lower():
-                    found_schedule.append((course_name, details))
-            # Urutkan berdasarkan jam jika ditemukan berdasarkan hari
-            found_schedule.sort(key=lambda item: item[1].get("jam", "99:99"))
+    if matched_course:
+        search_term = matched_course
+        # Semua kelas/jadwal untuk matkul ini, sudah terurut berdasarkan hari lalu jam
+        found_schedule = list(schedule_index.entries_for_course(matched_course))
+
+    # 2. Cek Dosen ("jadwal dosen Sudirman", "jadwal pak Muarif")
+    if not found_schedule:
+        dosen_match = _JADWAL_DOSEN_RE.search(original_text_lower)
+        if dosen_match:
+            found_schedule = _filter_jadwal_entries(schedule_index.entries_for_dosen(dosen_match.group(1)), matched_day_key, matched_minute)
+            if found_schedule:
+                search_term = f"Dosen {found_schedule[0].dosen}"
+
+    # 3. Cek Ruang ("ruang A04 kosong kapan" -> slot kosong, "jadwal ruang A04" -> jadwal ruang)
+    if not found_schedule:
+        room_keys = schedule_index.find_rooms(original_text_lower)
+        if room_keys:
+            room_entries = schedule_index.entries_for_room(room_keys)
+            room_label = room_entries[0].ruang if len(room_keys) == 1 else original_text_lower.split("ruang", 1)[-1].strip()
+            if _JADWAL_FREE_ROOM_RE.search(original_text_lower):
+                return _format_free_room_response(schedule_index, room_keys, room_label, matched_day_key, prodi_name, periode, user_name), "jadwal_kuliah_ft_free_room"
+            found_schedule = _filter_jadwal_entries(room_entries, matched_day_key, matched_minute)
+            if found_schedule:
+                search_term = f"Ruang {room_label}"
+
+    # 4. Cek Hari dan/atau Jam Spesifik ("jadwal senin", "kuliah jam 10 hari rabu")
+    if not found_schedule and (matched_day_key or matched_minute is not None):
+        if matched_minute is not None:
+            # Query rentang waktu: jadwal yang sedang berlangsung pada jam tersebut
+            found_schedule = schedule_index.entries_at(matched_minute, day_name=matched_day_key)
+            search_term = f"Jam {format_minutes(matched_minute)}"
+            if matched_day_key:
+                search_term = f"Hari {JADWAL_DAYS[matched_day_key]}, {search_term}"
+        else:
+            # Bucket per hari di indeks sudah terurut berdasarkan jam mulai
+            found_schedule = list(schedule_index.entries_for_day(matched_day_key))
+            search_term = f"Hari {JADWAL_DAYS[matched_day_key]}"
 
     # 3. Buat Respons
     response_parts = []
@@ -147,13 +338,14 @@ def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, confi
              response_parts.append(f"{sapaan_awal_kalimat}, berikut jadwal yang saya temukan ({escape(prodi_name)} - Periode {periode}):\n")
 
 
-        for course_name, details in found_schedule:
-            jam = details.get("jam", "N/A")
-            ruang = details.get("ruang", "N/A")
-            dosen = details.get("dosen", "N/A")
-            hari = details.get("hari", "N/A")
-            semester = details.get("semester", "N/A")
-            kelas = details.get("kelas", "N/A")
+        for entry in found_schedule:
+            course_name = entry.course
+            jam = entry.jam
+            ruang = entry.ruang
+            dosen = entry.dosen
+            hari = entry.hari
+            semester = entry.semester
+            kelas = entry.kelas
 
             # Format berbeda jika mencari matkul spesifik vs hari
             if matched_course: # Jika mencari matkul spesifik
@@ -182,6 +374,11 @@ def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, confi
 
 
         response_parts.append("\n*Jadwal dapat berubah, selalu konfirmasi ke prodi/dosen.*")
+    elif matched_minute is not None and search_term:
+        # Query jam valid tapi tidak ada kuliah yang berlangsung pada jam tersebut
+        response_parts.append(f"{sapaan_awal_kalimat}, tidak ada jadwal kuliah **{escape(prodi_name)}** yang berlangsung pada **{escape(search_term)}** (Periode {periode}).")
+        response_parts.append("Coba jam lain, atau tanyakan jadwal per hari (Contoh: 'jadwal kuliah hari senin').")
+        final_category = "jadwal_kuliah_ft_no_match"
     else:
         # Jika tidak ada jadwal ditemukan DAN tidak ada search term (tidak cari hari/matkul)
         # Maka minta klarifikasi (implicit disambiguation / slot filling prompt)
@@ -190,13 +387,14 @@ def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, confi
 
         # Tawarkan contoh matkul jika ada di data (ambil 1-2 contoh)
         if available_courses:
-             sample_courses = random.sample(available_courses, min(len(available_courses), 2))
+             sample_courses = _rng.sample(available_courses, min(len(available_courses), 2))
              # Escape contoh mata kuliah
-             response_parts.append(f"- **Mata kuliah tertentu?** (Contoh: 'jadwal {escape(random.choice(sample_courses))}')")
+             response_parts.append(f"- **Mata kuliah tertentu?** (Contoh: 'jadwal {escape(_rng.choice(sample_courses))}')")
         else:
              response_parts.append("- **Mata kuliah tertentu?**") # Tanpa contoh jika data kosong
 
         response_parts.append("- **Hari tertentu?** (Contoh: 'jadwal kuliah hari senin')")
+        response_parts.append("- **Jam, dosen, atau ruang tertentu?** (Contoh: 'kuliah jam 10 hari rabu', 'jadwal dosen ...', 'ruang A04 kosong kapan')")
 
         # Tampilkan link jika tersedia dan bukan placeholder
         if link_jadwal_prodi and "[GANTI" not in link_jadwal_prodi:
@@ -208,24 +406,27 @@ def _get_jadwal_prodi_response(original_text_lower, prodi_name, user_name, confi
     return "\n".join(response_parts), final_category
 
 
-def _get_spp_response(original_text_lower, detected_prodi_canonical, user_name, config):
+def _detect_spp_periode(original_text_lower):
+    """Deteksi periode SPP dari keyword pada teks. Mengembalikan "2023-2024", "2018-2022", atau None."""
+    if any(k in original_text_lower for k in _SPP_PERIODE_2023_2024_KWS):
+        return "2023-2024"
+    if any(k in original_text_lower for k in _SPP_PERIODE_2018_2022_KWS):
+        return "2018-2022"
+    return None
+
+def _get_spp_response(original_text_lower, detected_prodi_canonical, user_name, spp_fragments):
     """Membuat respons spesifik untuk pertanyaan SPP/UKT, meminta prodi jika tidak ada."""
-    spp_data = config.get('SPP_DATA', {})
     sapaan = get_sapaan(user_name, awal_kalimat=True)
-    safe_user_name = get_safe_user_name(user_name)
     sapaan_tengah = get_sapaan(user_name) # Untuk ditengah kalimat
 
     # === LANGKAH DISAMBIGUASI / SLOT FILLING ENTITAS ===
     if not detected_prodi_canonical:
-        # Prodi tidak terdeteksi, minta klarifikasi
-        prodi_options = list(spp_data.keys()) # Ambil prodi yang ada di data SPP
-        # Filter prodi internal seperti "_default" jika ada dan pastikan ada data di dalamnya
-        prodi_display_options = [p for p in prodi_options if not p.startswith('_') and isinstance(spp_data.get(p), dict) and spp_data.get(p)]
-
+        # Prodi tidak terdeteksi, minta klarifikasi (pilihan prodi dari data SPP)
+        prodi_display_options = spp_fragments["prodi_options"]
         if prodi_display_options:
             response_text = (f"{sapaan}, untuk memberikan info SPP yang tepat, mohon sebutkan nama program studinya. "
-                             f"Pilihan yang ada di data saya: **{', '.join(map(escape, prodi_display_options))}**.\n"
-                             f"Contoh: 'berapa spp {escape(random.choice(prodi_display_options))}'")
+                             f"Pilihan yang ada di data saya: **{spp_fragments['prodi_options_text']}**.\n"
+                             f"Contoh: 'berapa spp {escape(_rng.choice(prodi_display_options))}'")
             # Kembalikan tuple (respons, kategori_intent_final)
             return response_text, "prompt_for_prodi_spp"
         else:
@@ -235,828 +436,527 @@ def _get_spp_response(original_text_lower, detected_prodi_canonical, user_name,
     # =====================================================
 
     # --- Lanjutkan jika prodi sudah ada ---
-    if not spp_data or not isinstance(spp_data, dict):
+    if not spp_fragments["valid"]:
         return f"Maaf {sapaan_tengah}data SPP tidak dapat dimuat saat ini. Mohon coba lagi nanti atau hubungi TU.", "fallback_spp_data_error"
 
-
-    # Cek apakah prodi yang terdeteksi ada di data SPP
-    if detected_prodi_canonical not in spp_data or not isinstance(spp_data[detected_prodi_canonical], dict):
-        response_text = f"{sapaan}, mohon maaf, data SPP spesifik untuk prodi '{escape(detected_prodi_canonical)}' belum tersedia atau tidak valid di data saya. "
-        # Coba berikan ringkasan prodi lain jika ada
-        response_text += "\nBerikut adalah ringkasan biaya SPP (UKT) per semester Fakultas Teknik yang berlaku saat ini (periode 2023-2024) untuk prodi lain:\n"
-        found_any = False
-        for prodi, data in spp_data.items():
-             if prodi.startswith('_') or not isinstance(data, dict): continue # Skip kunci internal atau data tidak valid
-             spp_terbaru = data.get("2023-2024")
-             if spp_terbaru is not None:
-                 response_text += f"\n- **{escape(prodi)}**: {format_idr(spp_terbaru)}"
-                 found_any = True
-        if not found_any:
-            response_text = f"Maaf {sapaan_tengah}saya belum memiliki informasi detail biaya SPP saat ini untuk prodi manapun. Silakan hubungi bagian akademik/keuangan."
+    prodi_fragments = spp_fragments["by_prodi"].get(detected_prodi_canonical)
+    if prodi_fragments is None:
+        # Prodi tidak ada di data SPP: berikan ringkasan prodi lain jika ada
+        if spp_fragments["other_summary"]:
+            response_text = (f"{sapaan}, mohon maaf, data SPP spesifik untuk prodi '{escape(detected_prodi_canonical)}' belum tersedia atau tidak valid di data saya. "
+                             + spp_fragments["other_summary"])
         else:
-            response_text += "\n\nUntuk info SPP prodi lain, silakan sebutkan nama prodinya."
+            response_text = f"Maaf {sapaan_tengah}saya belum memiliki informasi detail biaya SPP saat ini untuk prodi manapun. Silakan hubungi bagian akademik/keuangan."
         return response_text, "fallback_spp_prodi_not_found"
 
-    # --- Logika utama _get_spp_response (jika prodi ada di data) ---
-    response = ""
-    periode_terdeteksi = None
-    keywords_lama = ["angkatan 2018", "angkatan 2019", "angkatan 2020", "angkatan 2021", "angkatan 2022", "spp lama", "spp dulu"]
-    keywords_baru = ["angkatan 2023", "angkatan 2024", "spp terbaru", "spp sekarang", "spp saat ini", "biaya berlaku"]
-    periode_2023_2024_kws = ["2023", "2024", "terbaru", "sekarang", "saat ini"]
-    periode_2018_2022_kws = ["2018", "2019", "2020", "2021", "2022", "lama", "dulu"]
-
-
-    # Deteksi periode berdasarkan keyword
-    if any(k in original_text_lower for k in periode_2023_2024_kws):
-        periode_terdeteksi = "2023-2024"
-    elif any(k in original_text_lower for k in periode_2018_2022_kws):
-        periode_terdeteksi = "2018-2022"
-
-    spp_prodi = spp_data[detected_prodi_canonical]
-    target_periode = periode_terdeteksi if periode_terdeteksi else "2023-2024" # Default ke terbaru
-    amount = spp_prodi.get(target_periode)
-
-    if amount is not None:
-        response = f"{sapaan}, biaya SPP/UKT untuk prodi **{escape(detected_prodi_canonical)}** periode **{target_periode}** adalah **{format_idr(amount)}** per semester."
-        if not periode_terdeteksi and target_periode == "2023-2024":
-            response += " (Ini adalah biaya SPP yang berlaku saat ini)."
-        elif periode_terdeteksi == "2018-2022" and "2023-2024" in spp_prodi:
-                amount_baru = spp_prodi.get("2023-2024")
-                if amount_baru is not None: # Pastikan amount_baru ada
-                    response += f"\nSebagai info, biaya SPP terbaru (periode 2023-2024) untuk prodi ini adalah **{format_idr(amount_baru)}** per semester."
-    else:
-        response = f"Maaf {sapaan_tengah}saya tidak memiliki data SPP untuk prodi **{escape(detected_prodi_canonical)}** pada periode **{target_periode}**. "
-        spp_terbaru = spp_prodi.get("2023-2024")
-        if spp_terbaru is not None: # Pastikan spp_terbaru ada
-            response += f"Biaya SPP yang berlaku saat ini (periode 2023-2024) untuk **{escape(detected_prodi_canonical)}** adalah **{format_idr(spp_terbaru)}** per semester."
-        else:
-            response += f"Informasi SPP terbaru untuk **{escape(detected_prodi_canonical)}** juga belum tersedia di data saya."
-
-    return response.strip(), "info_spp_ft_handled" # Kembalikan kategori asli jika berhasil
-
+    # Fragmen per periode yang terdeteksi (None = default ke periode terbaru)
+    return _render_fragment(prodi_fragments[_detect_spp_periode(original_text_lower)], user_name)
+
+
+# --- Fragmen Respons Terkompilasi ---
+# Data ft_fees/pmb_info/spp_data/learning_content dirender sekali per snapshot (lihat
+# compile_response_fragments); handler cukup lookup lalu mengisi sapaan.
+# Penanda sapaan di dalam fragmen (karakter Private Use Area), diisi oleh _render_fragment
+_SAPAAN_AWAL = "\uE010"
+_SAPAAN_TENGAH = "\uE011"
+# Konteks "prodi terdeteksi tapi bukan pemilik lab" untuk fragmen tanya_pembelajaran_lab
+_OTHER_PRODI = "\uE012"
+
+def _render_fragment(fragment, user_name):
+    """Isi penanda sapaan pada fragmen (template, kategori). Mengembalikan (response_text, kategori)."""
+    template, category = fragment
+    return (template.replace(_SAPAAN_AWAL, get_sapaan(user_name, awal_kalimat=True))
+                    .replace(_SAPAAN_TENGAH, get_sapaan(user_name)), category)
+
+def _fee_text_parts(fee_info, partisipasi_label, ujian_label):
+    """Komponen biaya praktikum (partisipasi, ujian akhir) yang sudah diformat Rupiah."""
+    biaya_text_parts = []
+    biaya_partisipasi = fee_info.get('amount')
+    biaya_ujian = fee_info.get('ujian_akhir_praktikum_amount')
+    if biaya_partisipasi is not None: biaya_text_parts.append(f"{partisipasi_label} **{format_idr(biaya_partisipasi)}**")
+    if biaya_ujian is not None and biaya_ujian != 0: biaya_text_parts.append(f"{ujian_label} **{format_idr(biaya_ujian)}**")
+    return biaya_text_parts
+
+def _compile_spp(spp_data):
+    spp_valid = bool(spp_data) and isinstance(spp_data, dict)
+    spp_data = spp_data if isinstance(spp_data, dict) else {}
+    prodi_options = [p for p in spp_data if not p.startswith('_') and isinstance(spp_data.get(p), dict) and spp_data.get(p)]
+
+    # Ringkasan SPP terbaru semua prodi (untuk prodi yang tidak ada di data)
+    summary_lines = []
+    for prodi, data in spp_data.items():
+        if prodi.startswith('_') or not isinstance(data, dict): continue
+        spp_terbaru = data.get("2023-2024")
+        if spp_terbaru is not None:
+            summary_lines.append(f"\n- **{escape(prodi)}**: {format_idr(spp_terbaru)}")
+    other_summary = None
+    if summary_lines:
+        other_summary = ("\nBerikut adalah ringkasan biaya SPP (UKT) per semester Fakultas Teknik yang berlaku saat ini (periode 2023-2024) untuk prodi lain:\n"
+                         + "".join(summary_lines) + "\n\nUntuk info SPP prodi lain, silakan sebutkan nama prodinya.")
+
+    by_prodi = {}
+    for prodi, spp_prodi in spp_data.items():
+        if not isinstance(spp_prodi, dict): continue
+        fragments = {}
+        for periode_terdeteksi in (None, "2023-2024", "2018-2022"):
+            target_periode = periode_terdeteksi if periode_terdeteksi else "2023-2024" # Default ke terbaru
+            amount = spp_prodi.get(target_periode)
+            if amount is not None:
+                response = f"{_SAPAAN_AWAL}, biaya SPP/UKT untuk prodi **{escape(prodi)}** periode **{target_periode}** adalah **{format_idr(amount)}** per semester."
+                if not periode_terdeteksi and target_periode == "2023-2024":
+                    response += " (Ini adalah biaya SPP yang berlaku saat ini)."
+                elif periode_terdeteksi == "2018-2022" and "2023-2024" in spp_prodi:
+                    amount_baru = spp_prodi.get("2023-2024")
+                    if amount_baru is not None:
+                        response += f"\nSebagai info, biaya SPP terbaru (periode 2023-2024) untuk prodi ini adalah **{format_idr(amount_baru)}** per semester."
+            else:
+                response = f"Maaf {_SAPAAN_TENGAH}saya tidak memiliki data SPP untuk prodi **{escape(prodi)}** pada periode **{target_periode}**. "
+                spp_terbaru = spp_prodi.get("2023-2024")
+                if spp_terbaru is not None:
+                    response += f"Biaya SPP yang berlaku saat ini (periode 2023-2024) untuk **{escape(prodi)}** adalah **{format_idr(spp_terbaru)}** per semester."
+                else:
+                    response += f"Informasi SPP terbaru untuk **{escape(prodi)}** juga belum tersedia di data saya."
+            fragments[periode_terdeteksi] = (response.strip(), "info_spp_ft_handled")
+        by_prodi[prodi] = fragments
+
+    return {
+        "valid": spp_valid,
+        "prodi_options": prodi_options,
+        "prodi_options_text": ', '.join(map(escape, prodi_options)),
+        "other_summary": other_summary,
+        "by_prodi": by_prodi,
+    }
 
-# def _get_jadwal_ti_response(...): <-- REMOVED, USING _get_jadwal_prodi_response INSTEAD
+def _compile_lab_fee_response(lab_name, biaya_praktikum_info):
+    """Fragmen tanya_biaya_praktikum untuk satu lab (info spesifik lab, atau info biaya umum)."""
+    response_parts = [f"{_SAPAAN_AWAL}, terkait biaya praktikum di Fakultas Teknik:"]
+    # Cari info spesifik lab, fallback ke default jika tidak ada
+    info = biaya_praktikum_info.get(lab_name, biaya_praktikum_info.get("_default"))
 
-# --- Main Intent Logic Function ---
+    if info and isinstance(info, dict):
+        if lab_name in biaya_praktikum_info: response_parts.append(f"\nUntuk praktikum **{escape(lab_name)}**:")
+        elif "_default" in biaya_praktikum_info and info is biaya_praktikum_info["_default"]: response_parts.append(f"\nUntuk praktikum **{escape(lab_name)}** (menggunakan info biaya umum):")
+        else: response_parts.append(f"\nInformasi biaya untuk **{escape(lab_name)}** ditemukan, tetapi tidak spesifik lab ini.")
 
-def get_response_for_intent(nlu_result, user_name, original_text, config):
-    """
-    Menghasilkan teks respons berdasarkan intent yang terdeteksi.
-    Menggunakan data dari dictionary 'config'.
-    Meminta klarifikasi jika entitas wajib hilang.
-    Mengembalikan tuple: (response_text, final_intent_category)
-    """
-    intent = nlu_result.get('intent')
-    score = nlu_result.get('score', 0.0)
-    entities = nlu_result.get('entities', {})
-    detected_prodi_list = entities.get("PRODI", [])
-    detected_lab_list = entities.get("LAB", [])
-    # Ambil yang pertama jika ada, jika tidak None
-    detected_prodi = detected_prodi_list[0] if detected_prodi_list else None
-    detected_lab = detected_lab_list[0] if detected_lab_list else None
+        notes = info.get('notes', 'Biaya dapat berubah, mohon konfirmasi ke lab/akademik.')
+        biaya_text_parts = _fee_text_parts(info, "Biaya partisipasi/modul utama:", "biaya ujian akhir praktikum (jika ada):")
+        if biaya_text_parts: response_parts.append(f"- {', ditambah '.join(biaya_text_parts)}.")
+        else: response_parts.append("- Detail komponen biaya (partisipasi/ujian) belum tersedia.")
 
-    sapaan_untuk_user = get_sapaan(user_name) # Sapaan tengah kalimat
-    sapaan_awal_kalimat = get_sapaan(user_name, awal_kalimat=True)
-    safe_user_name = get_safe_user_name(user_name)
+        if notes: response_parts.append(f"- *Catatan: {notes}*")
+        final_intent_category = "tanya_biaya_praktikum_handled"
+    else:
+        response_parts.append(f"\nMaaf, informasi detail biaya praktikum untuk **{escape(lab_name)}** belum tersedia atau tidak valid di data saya.")
+        final_intent_category = "fallback_lab_fee_details_missing"
+
+    return "\n".join(filter(None, response_parts)), final_intent_category
+
+def _compile_lab_specific_fee_lines(fee_info):
+    """Baris biaya untuk info_lab spesifik satu lab."""
+    if not fee_info or not isinstance(fee_info, dict):
+        return ["  Informasi biaya spesifik lab ini belum tersedia."]
+    lines = []
+    biaya_text_parts = _fee_text_parts(fee_info, "Biaya partisipasi sekitar", "biaya ujian akhir sekitar")
+    if biaya_text_parts: lines.append(f"  Biaya praktikum: {', ditambah '.join(biaya_text_parts)}.")
+    else: lines.append("  Informasi komponen biaya praktikum ini belum tersedia.")
+    notes = fee_info.get('notes', '')
+    if notes: lines.append(f"  *Catatan: {notes}*")
+    return lines
+
+def _compile_lab(learning_content, ft_fees, lab_names):
+    has_learning_data = bool(learning_content and isinstance(learning_content, dict))
+    has_fee_data = bool(ft_fees and isinstance(ft_fees.get("praktikum"), dict) and ft_fees["praktikum"])
+    learning_content = learning_content if has_learning_data else {}
+    biaya_praktikum_info = ft_fees["praktikum"] if has_fee_data else {}
+
+    lab_owner = {} # Lab -> prodi pertama yang memilikinya
+    labs_by_prodi = {}
+    labs_with_learning = {} # Prodi -> lab yang punya deskripsi pembelajaran
+    for prodi, labs in learning_content.items():
+        if not isinstance(labs, dict): continue
+        for lab in labs:
+            lab_owner.setdefault(lab, prodi)
+        labs_by_prodi[prodi] = [lab for lab in labs if not lab.startswith("_")]
+        labs_with_learning[prodi] = [lab for lab in labs if not lab.startswith("_") and labs.get(lab) and isinstance(labs.get(lab), str) and labs.get(lab).strip()]
+
+    fee_specific = {}
+    fee_prodi_list, fee_general, fee_responses = [], [], {}
+    if has_fee_data:
+        fee_specific = {lab: _compile_lab_specific_fee_lines(info) for lab, info in biaya_praktikum_info.items()}
+        default_info = biaya_praktikum_info.get("_default")
+        if default_info and isinstance(default_info, dict):
+            notes = default_info.get('notes', '')
+            biaya_text_parts = _fee_text_parts(default_info, "biaya partisipasi sekitar", "biaya ujian akhir sekitar")
+            if biaya_text_parts: fee_prodi_list.append(f"  Biaya praktikum umumnya sekitar {', ditambah '.join(biaya_text_parts)}.")
+            else: fee_prodi_list.append("  Informasi komponen biaya praktikum umum belum tersedia.")
+            if notes: fee_prodi_list.append(f"  *Catatan umum: {notes}*")
+
+            biaya_text_parts = _fee_text_parts(default_info, "Biaya partisipasi sekitar", "biaya ujian akhir sekitar")
+            if biaya_text_parts: fee_general.append(f"\nBiaya praktikum umumnya sekitar {', ditambah '.join(biaya_text_parts)}.")
+            else: fee_general.append("\nInformasi komponen biaya praktikum umum belum tersedia.")
+            if notes: fee_general.append(f"*Catatan umum: {notes}*")
+        fee_responses = {lab: _compile_lab_fee_response(lab, biaya_praktikum_info)
+                         for lab in list(biaya_praktikum_info) + list(lab_names)}
+
+    # Lab yang punya info biaya (untuk contoh di prompt tanya_biaya_praktikum)
+    labs_with_fee_info = [lab for lab in biaya_praktikum_info if not lab.startswith("_")]
+    if "_default" in biaya_praktikum_info and isinstance(biaya_praktikum_info["_default"], dict) and biaya_praktikum_info["_default"]:
+        labs_with_fee_info.append("umum/default") # Representasi untuk info umum
+
+    return {
+        "has_learning_data": has_learning_data,
+        "has_fee_data": has_fee_data,
+        "lab_owner": lab_owner,
+        "labs_by_prodi": labs_by_prodi,
+        "labs_by_prodi_text": {prodi: ', '.join(map(escape, labs)) for prodi, labs in labs_by_prodi.items()},
+        "labs_with_learning": labs_with_learning,
+        "fee_specific": fee_specific,
+        "fee_specific_default": _compile_lab_specific_fee_lines(biaya_praktikum_info.get("_default")),
+        "fee_prodi_list": fee_prodi_list,
+        "fee_general": fee_general,
+        "fee_responses": fee_responses,
+        "labs_with_fee_info": labs_with_fee_info,
+        # Set -> list sekali di sini supaya contoh acak memakai urutan yang sama seperti sebelumnya
+        "fee_example_labs": list(set(labs_with_fee_info)),
+    }
 
-    # Ambil data dan konfigurasi
-    confidence_threshold = config.get('CONFIDENCE_THRESHOLD', 0.5)
-    link_jadwal_ti = config.get('LINK_JADWAL_TI', '')
-    link_jadwal_sipil = config.get('LINK_JADWAL_SIPIL', '')
-    link_jadwal_tambang = config.get('LINK_JADWAL_TAMBANG', '')
-    link_jadwal_umum_ft = config.get('LINK_JADWAL_UMUM_FT', '')
-    link_prodi_sipil = config.get('LINK_PRODI_SIPIL', '')
-    link_prodi_informatika = config.get('LINK_PRODI_INFORMATIKA', '')
-    link_prodi_tambang = config.get('LINK_PRODI_TAMBANG', '')
-    kontak_tu_info = config.get('KONTAK_TU_INFO', 'Informasi kontak TU belum tersedia.')
-    krs_sevima_guide = config.get('KRS_SEVIMA_GUIDE', '')
-    payment_sevima_tokopedia_guide = config.get('PAYMENT_SEVIMA_TOKOPEDIA_GUIDE', '')
-    ft_fees = config.get('FT_FEES', {})
-    pmb_info = config.get('PMB_INFO', {})
-    learning_content = config.get('LEARNING_CONTENT', {})
-    # spp_data sudah diambil di helper spp
-    # jadwal_ti_data, jadwal_sipil_data, jadwal_tambang_data diambil di helper jadwal
-    lab_terms = config.get('TERMS_DATA', {}).get('lab', {}) # Ambil terms jika perlu
-    prodi_terms = config.get('TERMS_DATA', {}).get('prodi', {}) # Ambil terms jika perlu
-
-    # Default response
-    response_text = f"Maaf {sapaan_untuk_user}saya belum bisa memproses permintaan terkait '{intent}' saat ini. Mungkin bisa coba tanyakan dengan cara lain?"
-    final_intent_category = intent if intent else "unhandled_intent" # Default kategori
-
-
-    # --- Logika Respons per Intent ---
-    # Hanya proses intent yang dikenali dengan skor di atas threshold
-    if intent and score >= confidence_threshold:
-        # Set kategori default berdasarkan intent yang terdeteksi (akan di-override jika perlu)
-        final_intent_category = intent
-
-        # --- Intent Handling ---
-        if intent == "greeting_ft":
-            if safe_user_name:
-                 response_text = random.choice([
-                     f"Halo lagi {safe_user_name}! Ada lagi yang bisa saya bantu?",
-                     f"Hai {safe_user_name}! Senang bertemu Anda lagi.",
-                     f"Ya {safe_user_name}, ada keperluan apa lagi?"
-                 ])
-            else:
-                response_text = random.choice([
-                    "Halo! Ada yang bisa saya bantu?",
-                    "Hai! Selamat datang di chatbot Fakultas Teknik UNANDA.",
-                    "Salam! Ada yang ingin ditanyakan seputar Fakultas Teknik?"
-                ])
-            final_intent_category = "greeting_ft_handled"
-
-        elif intent == "goodbye_ft":
-            response_text = random.choice([
-                f"{sapaan_awal_kalimat}, sampai jumpa!",
-                "Sampai jumpa!",
-                "Senang bisa membantu. Jika ada lagi, jangan ragu bertanya.",
-                "Terima kasih telah bertanya!"
-                ])
-            final_intent_category = "goodbye_ft_handled"
-
-        elif intent == "thankyou_ft":
-            response_text = random.choice([
-                f"Sama-sama, {safe_user_name}!" if safe_user_name else "Sama-sama!",
-                "Dengan senang hati!",
-                "Tidak masalah!",
-                "Senang bisa membantu!"
-                ])
-            final_intent_category = "thankyou_ft_handled"
-
-        elif intent == "ask_bot_identity":
-             response_text = ("Saya adalah chatbot Fakultas Teknik Universitas Andi Djemma. "
-                              "Saya dirancang untuk membantu memberikan informasi seputar fakultas, "
-                              "Penerimaan Mahasiswa Baru (PMB), biaya kuliah (SPP, praktikum), "
-                              "informasi prodi & lab, jadwal kuliah, panduan KRS dan pembayaran, serta kontak. "
-                              "Ada yang bisa saya bantu?")
-             final_intent_category = "ask_bot_identity_handled"
-
-        elif intent == "info_biaya_umum":
-            # Ini sudah merupakan bentuk disambiguasi, tidak perlu diubah
-            final_intent_category = "disambiguate_cost" # Override kategori
-            response_text = (f"{sapaan_awal_kalimat}. Saya bisa bantu informasi biaya di Fakultas Teknik. "
-                             "Jenis biaya apa yang spesifik Anda maksud?\n\n"
-                             "1. **SPP** (Biaya kuliah per semester)\n"
-                             "2. **Praktikum/Laboratorium** (Biaya kegiatan di lab)\n"
-                             "3. **Pendaftaran Mahasiswa Baru (PMB)** (Biaya formulir, tes, orientasi awal, dll.)\n\n"
-                             "Silakan sebutkan jenisnya (misal: 'info SPP', 'biaya praktikum', atau 'biaya PMB').")
-
-        elif intent == "info_spp_ft":
-            # Panggil helper yang sudah dimodifikasi untuk slot filling
-            response_text, final_intent_category = _get_spp_response(
-                original_text.lower(), detected_prodi, user_name, config
-            )
+def _compile_prodi_info(prodi, config, learning_content, spp_data):
+    """Template info_prodi untuk satu prodi (tanpa contoh lab acak dan tanpa pembersihan baris kosong)."""
+    link = config.get(PRODI_LINK_KEYS[prodi], '') if prodi in PRODI_LINK_KEYS else None
+    info = ""
+    if prodi in PRODI_SUMMARY_DEFAULTS:
+        info = learning_content.get(prodi, {}).get("_prodi_summary", PRODI_SUMMARY_DEFAULTS[prodi])
+
+    response_text = f"{_SAPAAN_AWAL}. Berikut informasi umum mengenai **Prodi {escape(prodi)}**:"
+    if info: response_text += f"\n\n- **Fokus Utama**: {escape(info)}"
+    if link and "[GANTI" not in link and "http" in link:
+        response_text += f"\n- **Website/Info Lengkap**: {link}"
+    else:
+        response_text += f"\n- Website Prodi: (Link belum tersedia atau belum diganti)"
+
+    # Cek apakah ada data SPP untuk prodi ini
+    if spp_data and isinstance(spp_data, dict) and prodi in spp_data:
+        response_text += f"\n\nUntuk biaya kuliah, Anda bisa tanya 'berapa spp {escape(prodi)}?'."
+    # Cek apakah ada data jadwal spesifik untuk prodi ini
+    jadwal_data = config.get(f"JADWAL_{prodi.replace('Teknik ', '').upper()}_DATA")
+    if jadwal_data and isinstance(jadwal_data, dict) and isinstance(jadwal_data.get("jadwal_kuliah"), dict) and jadwal_data.get("jadwal_kuliah"):
+        response_text += f"\nUntuk jadwal kuliah, saya bisa coba cek detail mata kuliah atau hari tertentu jika Anda bertanya lebih spesifik (misal: 'jadwal {escape(prodi.replace('Teknik ', ''))} hari senin')."
+    return response_text
+
+def _compile_prodi(config, learning_content, spp_data, prodi_terms):
+    learning_content = learning_content if isinstance(learning_content, dict) else {}
+    # Daftar prodi dari terms data (atau prodi yang punya link jika terms kosong)
+    available = list(prodi_terms.keys()) if prodi_terms and isinstance(prodi_terms, dict) else list(PRODI_LINK_KEYS)
+    return {
+        "available": available,
+        "available_text": ', '.join(map(escape, available)),
+        "has_any_link": any(config.get(key, '') for key in PRODI_LINK_KEYS.values()),
+        "info": {prodi: _compile_prodi_info(prodi, config, learning_content, spp_data) for prodi in available},
+    }
 
-        elif intent == "cara_bayar_spp_ft":
-             response_text = (f"{sapaan_awal_kalimat}. Untuk pembayaran SPP/UKT (setelah Anda resmi menjadi mahasiswa), "
-                              "biasanya dilakukan melalui sistem akademik online Sevima/SIAKAD Cloud. "
-                              "Apakah Anda ingin tahu:\n"
-                              "1. **Panduan bayar via Tokopedia** (jika tersedia)?\n"
-                              "2. **Informasi metode pembayaran lain** (misal transfer bank)?\n"
-                              "3. **Batas waktu pembayaran** semester ini?\n\n"
-                              "Mohon konfirmasi ke bagian keuangan atau cek pengumuman resmi fakultas/universitas "
-                              "untuk detail metode pembayaran yang valid dan jadwalnya.")
-             if payment_sevima_tokopedia_guide and "tidak ditemukan" not in payment_sevima_tokopedia_guide:
-                 response_text += "\n\nJika ingin panduan pembayaran via Tokopedia, ketik 'cara bayar sevima tokopedia'."
-             final_intent_category = "cara_bayar_spp_ft_prompt"
-
-
-        elif intent == "cara_bayar_sevima_tokopedia":
-             if payment_sevima_tokopedia_guide and "tidak ditemukan" not in payment_sevima_tokopedia_guide:
-                  response_text = (f"{sapaan_awal_kalimat}, ini panduan umum membayar uang kuliah melalui Sevima Pay "
-                                   f"di platform Tokopedia:\n\n{payment_sevima_tokopedia_guide}\n\n"
-                                   "**Penting:** Pastikan Anda mengikuti langkah-langkah ini dengan benar, "
-                                   "memilih tagihan yang sesuai, dan membayar sebelum batas waktu yang ditentukan. "
-                                   "Simpan bukti pembayaran Anda.")
-                  final_intent_category = "cara_bayar_sevima_tokopedia_handled"
-             else:
-                 response_text = (f"Maaf {sapaan_untuk_user}, panduan spesifik pembayaran via Tokopedia belum tersedia di data saya. "
-                                  "Silakan cek pengumuman resmi dari bagian keuangan atau universitas mengenai metode pembayaran yang tersedia.")
-                 final_intent_category = "fallback_payment_guide_missing"
-
-        elif intent == "info_krs_sevima":
-             if krs_sevima_guide and "tidak ditemukan" not in krs_sevima_guide:
-                  response_text = (f"{sapaan_awal_kalimat}, berikut panduan umum pengisian Kartu Rencana Studi (KRS) "
-                                   f"di sistem Sevima/SIAKAD Cloud:\n\n{krs_sevima_guide}\n\n"
-                                   "**Ingat:** Selalu perhatikan **jadwal resmi pengisian KRS** yang dikeluarkan oleh fakultas/universitas. "
-                                   "Jika ada mata kuliah yang tidak muncul, error, atau Anda ragu, segera konsultasikan "
-                                   "dengan **Dosen Pembimbing Akademik (PA)** Anda atau bagian akademik.")
-                  final_intent_category = "info_krs_sevima_handled"
-             else:
-                 response_text = (f"Maaf {sapaan_untuk_user}, panduan pengisian KRS via Sevima belum tersedia di data saya. "
-                                  "Secara umum, Anda perlu login ke sistem SIAKAD/Sevima pada jadwal yang ditentukan, "
-                                  "memilih mata kuliah yang akan diambil sesuai dengan semester dan kurikulum Anda, "
-                                  "lalu menyimpannya. Pastikan status KRS Anda disetujui oleh Dosen PA. "
-                                  "Untuk panduan detail, silakan cek sumber informasi resmi dari kampus.")
-                 final_intent_category = "fallback_krs_guide_missing"
-
-
-        elif intent == "jadwal_kuliah_ft":
-            # Mapping prodi yang didukung untuk pencarian jadwal spesifik
-            supported_jadwal_prodi = {
-                 "Teknik Informatika": config.get('JADWAL_TI_DATA'),
-                 "Teknik Sipil": config.get('JADWAL_SIPIL_DATA'),
-                 "Teknik Pertambangan": config.get('JADWAL_TAMBANG_DATA'),
-            }
-            # Filter prodi yang datanya benar-benar ada dan tidak kosong
-            # Check if data exists, is a dictionary, contains "jadwal_kuliah", and that key is also a dictionary
-            available_jadwal_prodi = {
-                p: data for p, data in supported_jadwal_prodi.items()
-                if data and isinstance(data, dict) and isinstance(data.get("jadwal_kuliah"), dict) and data["jadwal_kuliah"]
-            }
-
-
-            if detected_prodi and detected_prodi in available_jadwal_prodi:
-                # Panggil helper jadwal umum untuk prodi yang terdeteksi
-                response_text, final_intent_category = _get_jadwal_prodi_response(
-                    original_text.lower(), detected_prodi, user_name, config
-                )
-            else:
-                # Logika untuk prodi lain atau jika prodi tidak terdeteksi ATAU data jadwalnya tidak ada
-                base_response = f"{sapaan_awal_kalimat}. Untuk jadwal kuliah Fakultas Teknik semester ini, "
-                links_found = []
-                specific_prodi_link_handled = False # Flag untuk menandai jika sudah menawarkan link spesifik prodi yang terdeteksi
-
-                # Coba cari link prodi yang terdeteksi (jika ada)
-                if detected_prodi:
-                    base_response += f"khususnya untuk **{escape(detected_prodi)}**, "
-                    prodi_link_key = f"LINK_JADWAL_{detected_prodi.replace('Teknik ', '').upper()}"
-                    prodi_specific_link = config.get(prodi_link_key)
-                    # Pastikan link bukan placeholder
-                    if prodi_specific_link and "[GANTI" not in prodi_specific_link and "http" in prodi_specific_link:
-                        links_found.append(f"- **{escape(detected_prodi)}**: {prodi_specific_link}")
-                        specific_prodi_link_handled = True
-
-                    if not specific_prodi_link_handled:
-                         base_response += "saya belum punya link jadwal spesifiknya. "
-                    else:
-                         base_response += "berikut link yang mungkin relevan:\n"
-
-                # Jika tidak ada prodi terdeteksi ATAU link spesifik tidak ketemu, tawarkan semua link
-                if not detected_prodi or not specific_prodi_link_handled:
-                    if not detected_prodi:
-                        base_response += "berikut link jadwal yang mungkin relevan untuk beberapa prodi:\n"
-                    else: # Link spesifik prodi tidak ada, tawarkan yang lain
-                         base_response += "Namun, Anda bisa cek link prodi lain atau link umum berikut:\n"
-
-                    # Tambahkan link untuk prodi yang didukung, kecuali yang sudah ditambahkan
-                    # Pastikan link bukan placeholder
-                    if detected_prodi != "Teknik Informatika" and link_jadwal_ti and "[GANTI" not in link_jadwal_ti and "http" in link_jadwal_ti: links_found.append(f"- **Teknik Informatika**: {link_jadwal_ti}")
-                    if detected_prodi != "Teknik Sipil" and link_jadwal_sipil and "[GANTI" not in link_jadwal_sipil and "http" in link_jadwal_sipil: links_found.append(f"- **Teknik Sipil**: {link_jadwal_sipil}")
-                    if detected_prodi != "Teknik Pertambangan" and link_jadwal_tambang and "[GANTI" not in link_jadwal_tambang and "http" in link_jadwal_tambang: links_found.append(f"- **Teknik Pertambangan**: {link_jadwal_tambang}")
-                    if link_jadwal_umum_ft and "[GANTI" not in link_jadwal_umum_ft and "http" in link_jadwal_umum_ft: links_found.append(f"- **Umum Fakultas**: {link_jadwal_umum_ft}")
-
-
-                if links_found:
-                    response_text = base_response + "\n".join(links_found)
-                    response_text += "\n\nJadwal biasanya dibagikan oleh masing-masing prodi. Anda juga bisa cek pengumuman di grup mahasiswa atau sistem Sevima/SIAKAD."
-                    # Tawarkan bantuan untuk prodi jika datanya ada (menggunakan helper _get_jadwal_prodi_response)
-                    offer_detail_help_prodi = [p for p in available_jadwal_prodi.keys()]
-                    if offer_detail_help_prodi:
-                         response_text += f"\nUntuk {' atau '.join(map(escape, offer_detail_help_prodi))}, saya bisa coba bantu cek jadwal mata kuliah atau hari tertentu jika Anda bertanya lebih spesifik."
-
-                    final_intent_category = "jadwal_kuliah_ft_links_provided"
-                else:
-                    # Tidak ada link sama sekali DAN tidak ada data jadwal spesifik
-                    response_text = (f"Maaf {sapaan_untuk_user}, saya belum memiliki data atau link jadwal kuliah yang bisa dibagikan saat ini. "
-                                     "Silakan cek pengumuman resmi dari prodi Anda, grup mahasiswa, atau sistem Sevima/SIAKAD. "
-                                     "Jadwal biasanya keluar mendekati awal semester.")
-                    # Tawarkan bantuan untuk prodi jika datanya ada (walaupun tidak ada link)
-                    offer_detail_help_prodi = [p for p in available_jadwal_prodi.keys()]
-                    if offer_detail_help_prodi:
-                         response_text += f"\nJika Anda mahasiswa {' atau '.join(map(escape, offer_detail_help_prodi))}, saya bisa coba bantu cek jadwal mata kuliah atau hari tertentu jika Anda bertanya lebih spesifik."
-
-                    final_intent_category = "fallback_jadwal_links_missing"
-
-
-        elif intent == "fasilitas_umum_ft":
-            response_text = (f"{sapaan_awal_kalimat}. Fasilitas umum yang tersedia di lingkungan Fakultas Teknik UNANDA antara lain:\n"
-                             "- Ruang kuliah yang dilengkapi AC dan LCD Proyektor.\n"
-                             "- Jaringan WiFi di beberapa area kampus.\n"
-                             "- Perpustakaan fakultas/universitas.\n"
-                             "- Laboratorium komputer dan laboratorium spesifik per prodi.\n"
-                             "- Area diskusi mahasiswa.\n"
-                             "- Kantin atau area jajan terdekat.\n"
-                             "- Mushola/Tempat ibadah.\n"
-                             "- Toilet.\n\n"
-                             "Untuk detail fasilitas laboratorium spesifik prodi, Anda bisa tanyakan misalnya 'info lab informatika'.")
-            final_intent_category = "fasilitas_umum_ft_handled"
-
-        elif intent.startswith("info_lab_") or (detected_lab and intent not in ["tanya_pembelajaran_lab", "tanya_biaya_praktikum"]):
-            # Mapping intent spesifik lab ke nama prodi kanonikal
-            intent_prodi_mapping = {
-                 "info_lab_sipil": "Teknik Sipil",
-                 "info_lab_informatika": "Teknik Informatika",
-                 "info_lab_pertambangan": "Teknik Pertambangan"
-            }
-            target_prodi_from_intent = intent_prodi_mapping.get(intent)
-            target_prodi = detected_prodi or target_prodi_from_intent # Prioritaskan prodi dari NLU
-
-            response_parts = [f"{sapaan_awal_kalimat}. Mengenai laboratorium di Fakultas Teknik:"]
-            has_learning_data = bool(learning_content and isinstance(learning_content, dict)) # Check if learning_content is a non-empty dict
-            has_fee_data = bool(ft_fees and isinstance(ft_fees.get("praktikum"), dict) and ft_fees["praktikum"]) # Check if praktikum key exists and is a non-empty dict
-
-            if not has_learning_data and not has_fee_data and not detected_lab:
-                 response_parts.append("Maaf, informasi detail mengenai laboratorium (materi atau biaya) tidak dapat dimuat saat ini.")
-                 final_intent_category = "fallback_lab_data_missing"
-            else:
-                # Jika tanya spesifik LAB tapi tidak terdeteksi PRODI, coba cari prodi pemilik lab
-                if detected_lab and not target_prodi and has_learning_data:
-                    for p, labs in learning_content.items():
-                        if isinstance(labs, dict) and detected_lab in labs:
-                             target_prodi = p # Assign the first prodi found owning this lab
-                             break
-
-                if target_prodi:
-                    response_parts.append(f"\n**Untuk Prodi {escape(target_prodi)}:**")
-                    labs_in_prodi = []
-                    if has_learning_data and target_prodi in learning_content and isinstance(learning_content[target_prodi], dict):
-                        # Ambil nama lab yang valid (bukan _*)
-                        labs_in_prodi = [lab for lab in learning_content[target_prodi] if not lab.startswith("_")]
-
-                    if detected_lab and detected_lab in labs_in_prodi:
-                        # Info spesifik LAB yang diminta
-                        response_parts.append(f"- Fokus pada: **{escape(detected_lab)}**.")
-                        # Tambahkan info biaya jika ada
-                        if has_fee_data:
-                             biaya_praktikum_info = ft_fees.get("praktikum", {})
-                             fee_info = biaya_praktikum_info.get(detected_lab, biaya_praktikum_info.get("_default"))
-                             if fee_info and isinstance(fee_info, dict):
-                                 biaya_partisipasi = fee_info.get('amount')
-                                 biaya_ujian = fee_info.get('ujian_akhir_praktikum_amount')
-                                 notes = fee_info.get('notes', '')
-                                 biaya_text_parts = []
-                                 if biaya_partisipasi is not None: biaya_text_parts.append(f"Biaya partisipasi sekitar **{format_idr(biaya_partisipasi)}**")
-                                 if biaya_ujian is not None and biaya_ujian != 0: biaya_text_parts.append(f"biaya ujian akhir sekitar **{format_idr(biaya_ujian)}**")
-
-                                 if biaya_text_parts: response_parts.append(f"  Biaya praktikum: {', ditambah '.join(biaya_text_parts)}.")
-                                 else: response_parts.append("  Informasi komponen biaya praktikum ini belum tersedia.")
-
-                                 if notes: response_parts.append(f"  *Catatan: {notes}*")
-                             else: response_parts.append("  Informasi biaya spesifik lab ini belum tersedia.")
-
-                        # Tambahkan ajakan tanya pembelajaran jika ada datanya
-                        if has_learning_data and detected_lab in learning_content.get(target_prodi, {}) and learning_content[target_prodi][detected_lab] and isinstance(learning_content[target_prodi][detected_lab], str) and learning_content[target_prodi][detected_lab].strip():
-                            response_parts.append(f"  Anda bisa tanya 'apa yang dipelajari di {escape(detected_lab)}?'")
-                        final_intent_category = "info_lab_specific_handled"
-
-                    elif labs_in_prodi:
-                        # Info umum LAB untuk PRODI yang diminta (karena lab spesifik tidak diminta/ditemukan)
-                        response_parts.append(f"  Terdapat beberapa laboratorium utama, antara lain: **{', '.join(map(escape, labs_in_prodi))}**.")
-                        # Tampilkan biaya umum jika ada
-                        if has_fee_data:
-                             biaya_praktikum_info = ft_fees.get("praktikum", {})
-                             fee_info = biaya_praktikum_info.get("_default")
-                             if fee_info and isinstance(fee_info, dict):
-                                 biaya_partisipasi = fee_info.get('amount')
-                                 biaya_ujian = fee_info.get('ujian_akhir_praktikum_amount')
-                                 notes = fee_info.get('notes', '')
-                                 biaya_text_parts = []
-                                 if biaya_partisipasi is not None: biaya_text_parts.append(f"biaya partisipasi sekitar **{format_idr(biaya_partisipasi)}**")
-                                 if biaya_ujian is not None and biaya_ujian != 0: biaya_text_parts.append(f"biaya ujian akhir sekitar **{format_idr(biaya_ujian)}**")
-
-                                 if biaya_text_parts: response_parts.append(f"  Biaya praktikum umumnya sekitar {', ditambah '.join(biaya_text_parts)}.")
-                                 else: response_parts.append("  Informasi komponen biaya praktikum umum belum tersedia.")
-
-                                 if notes: response_parts.append(f"  *Catatan umum: {notes}*")
-
-                        response_parts.append("  Anda bisa tanya info lebih detail tentang lab spesifik (misal: 'info lab software' atau 'biaya lab hidrolika').")
-                        final_intent_category = "info_lab_prodi_list_handled"
-                    else:
-                        response_parts.append(f"  Maaf, daftar laboratorium spesifik untuk Prodi {escape(target_prodi)} belum tersedia di data saya.")
-                        final_intent_category = "fallback_lab_list_missing"
-                else:
-                    # Tidak ada prodi terdeteksi sama sekali (baik dari intent atau NLU)
-                    # Ambil dari terms di config dan pastikan terms_data valid
-                    all_labs_options = list(lab_terms.keys()) if lab_terms and isinstance(lab_terms, dict) else []
-                    if all_labs_options:
-                       response_parts.append("\nFakultas Teknik memiliki berbagai laboratorium untuk mendukung pembelajaran.")
-                       display_count = min(len(all_labs_options), 5)
-                       contoh_labs = random.sample(all_labs_options, display_count)
-                       response_parts.append(f"Beberapa di antaranya: **{', '.join(map(escape, contoh_labs))}**{ '...' if len(all_labs_options) > display_count else '.'}")
-
-                       # Tampilkan biaya umum jika ada
-                       if has_fee_data:
-                            biaya_praktikum_info = ft_fees.get("praktikum", {})
-                            fee_info = biaya_praktikum_info.get("_default")
-                            if fee_info and isinstance(fee_info, dict):
-                                 biaya_partisipasi = fee_info.get('amount')
-                                 biaya_ujian = fee_info.get('ujian_akhir_praktikum_amount')
-                                 notes = fee_info.get('notes', '')
-                                 biaya_text_parts = []
-                                 if biaya_partisipasi is not None: biaya_text_parts.append(f"Biaya partisipasi sekitar **{format_idr(biaya_partisipasi)}**")
-                                 if biaya_ujian is not None and biaya_ujian != 0: biaya_text_parts.append(f"biaya ujian akhir sekitar **{format_idr(biaya_ujian)}**")
-
-                                 if biaya_text_parts: response_parts.append(f"\nBiaya praktikum umumnya sekitar {', ditambah '.join(biaya_text_parts)}.")
-                                 else: response_parts.append("\nInformasi komponen biaya praktikum umum belum tersedia.")
-
-                                 if notes: response_parts.append(f"*Catatan umum: {notes}*")
-
-                       response_parts.append("\nApakah ada laboratorium spesifik atau dari prodi tertentu yang ingin Anda ketahui lebih lanjut? (Contoh: 'info lab sipil' atau 'lab software')")
-                       final_intent_category = "info_lab_general_prompt"
-                    else:
-                       response_parts.append("\nMaaf, informasi umum mengenai laboratorium belum tersedia saat ini.")
-                       final_intent_category = "fallback_lab_terms_missing"
-
-
-            response_text = "\n".join(response_parts)
-
-
-        elif intent.startswith("info_prodi_"):
-            # Mapping intent spesifik prodi ke nama prodi kanonikal
-            intent_prodi_mapping = {
-                 "info_prodi_sipil": "Teknik Sipil",
-                 "info_prodi_informatika": "Teknik Informatika",
-                 "info_prodi_pertambangan": "Teknik Pertambangan"
-            }
-            target_prodi_intent = intent_prodi_mapping.get(intent)
-            target_prodi = detected_prodi or target_prodi_intent # Prioritaskan NLU
-
-            prodi_links = {
-                 "Teknik Sipil": link_prodi_sipil,
-                 "Teknik Informatika": link_prodi_informatika,
-                 "Teknik Pertambangan": link_prodi_tambang
-            }
-            # Deskripsi singkat bisa ditaruh di config atau data tersendiri nanti
-            # Menggunakan data dari learning_content jika ada summary prodi
-            prodi_general_info = {
-                 "Teknik Sipil": learning_content.get("Teknik Sipil", {}).get("_prodi_summary", "Fokus pada perancangan, pembangunan, dan pemeliharaan infrastruktur seperti gedung, jembatan, jalan, dan sistem air."),
-                 "Teknik Informatika": learning_content.get("Teknik Informatika", {}).get("_prodi_summary", "Mempelajari dasar-dasar ilmu komputer, pengembangan perangkat lunak (software), jaringan komputer, kecerdasan buatan, dan manajemen data."),
-                 "Teknik Pertambangan": learning_content.get("Teknik Pertambangan", {}).get("_prodi_summary", "Berkaitan dengan eksplorasi, penambangan (ekstraksi), dan pengolahan sumber daya mineral dan batubara secara efisien dan aman.")
-            }
-
-
-            # Ambil daftar prodi yang tersedia di terms data (atau prodi_links jika terms kosong)
-            available_prodi_list = list(prodi_terms.keys()) if prodi_terms and isinstance(prodi_terms, dict) else list(prodi_links.keys())
-
-
-            if target_prodi and target_prodi in available_prodi_list: # Check if detected prodi is in our known list
-                link = prodi_links.get(target_prodi)
-                info = prodi_general_info.get(target_prodi, "") # Gunakan .get() untuk default jika tidak ada
-
-                response_text = f"{sapaan_awal_kalimat}. Berikut informasi umum mengenai **Prodi {escape(target_prodi)}**:"
-                if info: response_text += f"\n\n- **Fokus Utama**: {escape(info)}" # Escape info
-                if link and "[GANTI" not in link and "http" in link:
-                    response_text += f"\n- **Website/Info Lengkap**: {link}"
-                else:
-                     response_text += f"\n- Website Prodi: (Link belum tersedia atau belum diganti)"
+def _compile_pmb(pmb_info):
+    """Fragmen keempat intent PMB (tidak bergantung pada entitas)."""
+    fragments = {}
+    pmb_valid = bool(pmb_info) and isinstance(pmb_info, dict)
+    website = pmb_info.get('website', '') if pmb_valid else ''
+    has_website = bool(website and 'http' in website)
 
-                # Cek apakah ada data SPP untuk prodi ini
-                if config.get('SPP_DATA') and isinstance(config['SPP_DATA'], dict) and target_prodi in config['SPP_DATA']:
-                     response_text += f"\n\nUntuk biaya kuliah, Anda bisa tanya 'berapa spp {escape(target_prodi)}?'."
-                # Cek apakah ada data jadwal spesifik untuk prodi ini
-                jadwal_prodi_key = f"JADWAL_{target_prodi.replace('Teknik ', '').upper()}_DATA"
-                # Check if data exists, is a dictionary, contains "jadwal_kuliah", and that key is also a dictionary
-                if config.get(jadwal_prodi_key) and isinstance(config.get(jadwal_prodi_key), dict) and isinstance(config.get(jadwal_prodi_key).get("jadwal_kuliah"), dict) and config.get(jadwal_prodi_key).get("jadwal_kuliah"):
-                     response_text += f"\nUntuk jadwal kuliah, saya bisa coba cek detail mata kuliah atau hari tertentu jika Anda bertanya lebih spesifik (misal: 'jadwal {escape(target_prodi.replace('Teknik ', ''))} hari senin')."
+    if not pmb_valid:
+        fragments["info_pmb_umum"] = (f"Maaf {_SAPAAN_TENGAH}, informasi Penerimaan Mahasiswa Baru (PMB) tidak dapat dimuat saat ini. Silakan cek website resmi UNANDA.", "fallback_pmb_data_missing")
+    else:
+        kontak = pmb_info.get('contact_person', '')
+        response_text = f"{_SAPAAN_AWAL}. Informasi lengkap mengenai Penerimaan Mahasiswa Baru (PMB) UNANDA, termasuk untuk Fakultas Teknik, "
+        if has_website: response_text += f"biasanya dapat diakses melalui website resmi PMB di: **{website}**\n\n"
+        else: response_text += "biasanya dapat diakses melalui website resmi PMB UNANDA.\n\n"
+        response_text += ("Di sana Anda bisa menemukan informasi tentang:\n"
+                          "- Jadwal pendaftaran\n- Jalur seleksi yang tersedia\n- Persyaratan pendaftaran\n"
+                          "- Rincian biaya awal\n- Alur dan prosedur pendaftaran online\n\n")
+        if kontak and str(kontak).strip(): response_text += f"Jika ada pertanyaan lebih lanjut mengenai PMB, Anda juga bisa menghubungi kontak panitia PMB: **{escape(str(kontak))}**.\n\n"
+        response_text += "Apakah ada informasi spesifik terkait PMB yang ingin Anda tanyakan kepada saya? (misalnya tentang jalur, biaya awal, atau cara daftar)"
+        fragments["info_pmb_umum"] = (response_text, "info_pmb_umum_handled")
+
+    jalur_data = pmb_info.get('jalur') if pmb_valid else None
+    if not isinstance(jalur_data, dict) or not jalur_data:
+        fragments["info_jalur_pmb"] = (f"Maaf {_SAPAAN_TENGAH}, informasi detail mengenai jalur pendaftaran PMB tidak dapat dimuat. Silakan cek website PMB resmi.", "fallback_pmb_jalur_missing")
+    else:
+        response_parts = [f"{_SAPAAN_AWAL}, berikut adalah jalur pendaftaran yang umumnya tersedia (berdasarkan data terakhir):"]
+        for key, info in jalur_data.items():
+            if not isinstance(info, dict): continue # Skip jika format data salah
+            name = info.get('name', key.replace('_', ' ').title())
+            desc = info.get('description', 'Informasi detail belum tersedia.')
+            response_parts.append(f"\n- **{escape(name)}**: {escape(desc)}")
+        response_parts.append("\n\n**Penting:** Persyaratan detail, kuota, dan jadwal spesifik untuk setiap jalur dapat berubah setiap tahun.")
+        if has_website: response_parts.append(f"Pastikan Anda selalu memeriksa informasi terbaru dan paling akurat di website PMB resmi: **{website}**")
+        else: response_parts.append("Pastikan Anda selalu memeriksa informasi terbaru dan paling akurat di website PMB UNANDA.")
+        fragments["info_jalur_pmb"] = ("\n".join(response_parts), "info_jalur_pmb_handled")
+
+    fees_data = pmb_info.get('fees') if pmb_valid else None
+    if not isinstance(fees_data, dict) or not fees_data:
+        fragments["info_biaya_pmb"] = (f"Maaf {_SAPAAN_TENGAH}, informasi rincian biaya awal PMB tidak dapat dimuat. Silakan cek website PMB resmi.", "fallback_pmb_fee_missing")
+    else:
+        response_parts = [f"{_SAPAAN_AWAL}, berikut adalah perkiraan komponen biaya awal yang terkait dengan Pendaftaran Mahasiswa Baru (berdasarkan data terakhir):"]
+        found_fee = False
+        for key, info in fees_data.items():
+            if not isinstance(info, dict): continue # Skip jika format data salah
+            name = info.get('name', key.replace('_', ' ').title())
+            amount = info.get('amount')
+            notes = info.get('notes', '')
+            if amount is not None:
+                response_parts.append(f"\n- **{escape(name)}**: **{format_idr(amount)}**")
+                if notes and str(notes).strip(): response_parts.append(f"  *({escape(str(notes))})*")
+                found_fee = True
+            elif name != key: # Tampilkan nama meski amount tidak ada
+                response_parts.append(f"\n- **{escape(name)}**: Informasi biaya belum tersedia")
+                if notes and str(notes).strip(): response_parts.append(f"  *({escape(str(notes))})*")
+        if found_fee:
+            response_parts.append("\n\n**Penting:**")
+            response_parts.append("- Ini adalah **biaya awal** yang terkait pendaftaran dan mungkin kegiatan orientasi/pembekalan.")
+            response_parts.append("- Biaya ini **umumnya belum termasuk** biaya SPP/UKT untuk semester pertama dan biaya variabel lainnya (seperti praktikum jika ada di semester 1).")
+            response_parts.append("- Jumlah dan komponen biaya dapat berubah. Selalu konfirmasi rincian biaya terbaru.")
+        if has_website: response_parts.append(f"Cek rincian biaya resmi dan terbaru di website PMB: **{website}**")
+        else: response_parts.append("Cek rincian biaya resmi dan terbaru di website PMB UNANDA.")
+        fragments["info_biaya_pmb"] = ("\n".join(response_parts), "info_biaya_pmb_handled")
+
+    steps_data = pmb_info.get('general_steps') if pmb_valid else None
+    if not isinstance(steps_data, list) or not steps_data:
+        fragments["cara_daftar_pmb"] = (f"Maaf {_SAPAAN_TENGAH}, panduan umum langkah pendaftaran PMB tidak dapat dimuat. Silakan cek alur pendaftaran di website PMB resmi.", "fallback_pmb_steps_missing")
+    else:
+        response_parts = [f"{_SAPAAN_AWAL}! Berikut adalah gambaran umum langkah-langkah mendaftar sebagai mahasiswa baru secara online (berdasarkan prosedur umum):"]
+        for i, step in enumerate(steps_data):
+            if isinstance(step, str): response_parts.append(f"{i+1}. {escape(step)}")
+            else: response_parts.append(f"{i+1}. (Langkah tidak valid)")
+        response_parts.append("\n\n**Mohon Diperhatikan:**")
+        response_parts.append("- Ini adalah alur umum, langkah spesifik mungkin sedikit berbeda tergantung jalur pendaftaran dan sistem yang digunakan.")
+        response_parts.append("- Pastikan Anda membaca **semua petunjuk** dengan teliti di portal pendaftaran.")
+        response_parts.append("- Siapkan **semua dokumen** yang diperlukan dalam format digital (scan/foto) sesuai persyaratan.")
+        response_parts.append("- Perhatikan **jadwal dan batas waktu** setiap tahapan.")
+        if has_website: response_parts.append(f"\nUntuk panduan paling akurat dan memulai pendaftaran, kunjungi website PMB resmi: **{website}**")
+        else: response_parts.append("\nUntuk panduan paling akurat dan memulai pendaftaran, kunjungi website PMB resmi UNANDA.")
+        fragments["cara_daftar_pmb"] = ("\n".join(response_parts), "cara_daftar_pmb_handled")
+    return fragments
+
+def _compile_learning_prodi_response(prodi, learning_content):
+    """Fragmen tanya_pembelajaran_prodi untuk prodi yang terdeteksi."""
+    prodi_info = learning_content.get(prodi)
+    prodi_summary = None
+    if prodi_info and isinstance(prodi_info, dict) and prodi_info.get("_prodi_summary") and isinstance(prodi_info.get("_prodi_summary"), str):
+        prodi_summary = prodi_info.get("_prodi_summary").strip()
+
+    if prodi_summary:
+        return ((f"{_SAPAAN_AWAL}. Secara garis besar, di **Prodi {escape(prodi)}**, mahasiswa akan mempelajari berbagai hal terkait bidangnya. "
+                 f"Berikut adalah ringkasan fokus pembelajarannya:\n\n{escape(prodi_summary)}\n\n"
+                 "Tentu saja ini gambaran umum. Mata kuliah spesifik akan dipelajari per semester sesuai kurikulum. "
+                 f"Anda bisa cek detail kurikulum di website prodi {escape(prodi)} jika tersedia."), "tanya_pembelajaran_prodi_handled")
+    return ((f"Maaf {_SAPAAN_TENGAH}, ringkasan materi pembelajaran untuk **Prodi {escape(prodi)}** belum tersedia secara spesifik di data saya. "
+             "Secara umum, prodi ini akan membahas topik-topik yang relevan dengan bidangnya. "
+             f"Anda bisa mencari silabus atau kurikulum di website resmi Prodi {escape(prodi)} untuk detail mata kuliah."), "fallback_learning_prodi_summary_missing")
+
+def _compile_learning_lab_response(lab, detected_prodi, learning_content):
+    """Fragmen tanya_pembelajaran_lab untuk lab yang terdeteksi (dengan konteks prodi jika ada)."""
+    possible_prodi_owners = []
+    lab_description = None
+    target_prodi_for_lab = None # Prodi yang deskripsi labnya diambil
+    for prodi, content in learning_content.items():
+        if isinstance(content, dict) and lab in content:
+            desc = content.get(lab)
+            if desc and isinstance(desc, str) and desc.strip():
+                possible_prodi_owners.append(prodi)
+                # Prioritaskan prodi yang terdeteksi dari NLU jika ada
+                if detected_prodi and detected_prodi == prodi:
+                    lab_description = desc.strip()
+                    target_prodi_for_lab = prodi
+                    break
+                elif not lab_description:
+                    lab_description = desc.strip()
+                    target_prodi_for_lab = prodi
+
+    if not lab_description:
+        return ((f"Maaf {_SAPAAN_TENGAH}, deskripsi detail mengenai apa yang dipelajari di laboratorium "
+                 f"**{escape(lab)}** belum tersedia di data saya. "
+                 "Biasanya lab ini mendukung mata kuliah praktikum terkait."), "fallback_learning_lab_desc_missing")
+    if len(possible_prodi_owners) > 1 and not detected_prodi:
+        # Lab ada di >1 prodi, dan pengguna tidak spesifik prodi
+        return ((f"{_SAPAAN_AWAL}. Laboratorium **{escape(lab)}** relevan untuk beberapa prodi "
+                 f"(misalnya {', '.join(map(escape, possible_prodi_owners))}).\n\n"
+                 f"Secara umum, di lab ini fokus pembelajarannya adalah:\n{escape(lab_description)}\n\n"
+                 f"Materi spesifik mungkin disesuaikan tergantung kebutuhan prodi."), "tanya_pembelajaran_lab_multi_prodi")
+    prodi_konteks = f" (Prodi {escape(target_prodi_for_lab)})" if target_prodi_for_lab else ""
+    return ((f"{_SAPAAN_AWAL}. Di laboratorium **{escape(lab)}**{prodi_konteks}, "
+             f"fokus materi pembelajaran dan praktikumnya meliputi:\n\n{escape(lab_description)}"), "tanya_pembelajaran_lab_handled")
+
+def _compile_learning(learning_content, prodi_names):
+    learning_valid = bool(learning_content and isinstance(learning_content, dict))
+    learning_content = learning_content if learning_valid else {}
+
+    prodi_options = [prodi for prodi, content in learning_content.items()
+                     if not prodi.startswith("_") and isinstance(content, dict) and content.get("_prodi_summary")
+                     and isinstance(content.get("_prodi_summary"), str) and content["_prodi_summary"].strip()]
+    all_labs_with_desc = []
+    for prodi, content in learning_content.items():
+        if isinstance(content, dict):
+            all_labs_with_desc.extend([lab for lab in content.keys() if not lab.startswith("_") and content.get(lab) and isinstance(content.get(lab), str) and content.get(lab).strip()])
+
+    # Varian per lab: tanpa prodi (None), prodi pemilik lab, atau prodi lain (_OTHER_PRODI)
+    lab_responses = {}
+    for lab in set(all_labs_with_desc):
+        owners = [prodi for prodi, content in learning_content.items() if isinstance(content, dict) and lab in content]
+        lab_responses[lab] = {context: _compile_learning_lab_response(lab, context, learning_content)
+                              for context in [None, _OTHER_PRODI] + owners}
+
+    return {
+        "valid": learning_valid,
+        "prodi_options": prodi_options,
+        "prodi_options_text": ', '.join(map(escape, prodi_options)),
+        "prodi_responses": {prodi: _compile_learning_prodi_response(prodi, learning_content)
+                            for prodi in list(learning_content) + list(prodi_names)} if learning_valid else {},
+        "lab_example_labs": list(set(all_labs_with_desc)),
+        "lab_responses": lab_responses,
+    }
 
+def compile_response_fragments(config):
+    """Kompilasi fragmen respons dari satu snapshot data (ft_fees, pmb_info, spp_data, learning_content).
 
-                # Cek apakah ada data pembelajaran lab spesifik untuk prodi ini
-                labs_in_prodi_with_learning = []
-                if learning_content and isinstance(learning_content, dict) and target_prodi in learning_content and isinstance(learning_content[target_prodi], dict):
-                     labs_in_prodi_with_learning = [lab for lab in learning_content[target_prodi] if not lab.startswith("_") and learning_content[target_prodi].get(lab) and isinstance(learning_content[target_prodi].get(lab), str) and learning_content[target_prodi].get(lab).strip()]
+    Nilai Rupiah sudah diformat, teks data sudah di-escape, dan mapping prodi/lab sudah dibangun,
+    sehingga handler hanya melakukan lookup dan mengisi sapaan. Dipanggil sekali per snapshot
+    lewat DataStore.add_derived (lihat app.py).
 
-                if labs_in_prodi_with_learning:
-                     response_text += f"\n\nAnda juga bisa tanya informasi mengenai lab spesifik di prodi ini (misal: 'info lab {escape(random.choice(labs_in_prodi_with_learning))}') atau materi pembelajarannya ('apa yang dipelajari di lab {escape(random.choice(labs_in_prodi_with_learning))}?')."
+    Args:
+        config (Mapping): Snapshot config/data (lihat data_store.DataStore).
 
+    Returns:
+        dict: Fragmen per kelompok handler: "spp", "lab", "prodi", "pmb", "learning".
+    """
+    learning_content = config.get('LEARNING_CONTENT', {})
+    ft_fees = config.get('FT_FEES', {})
+    spp_data = config.get('SPP_DATA', {})
+    terms_data = config.get('TERMS_DATA', {})
+    lab_terms = terms_data.get('lab', {}) if isinstance(terms_data, dict) else {}
+    prodi_terms = terms_data.get('prodi', {}) if isinstance(terms_data, dict) else {}
+    return {
+        "spp": _compile_spp(spp_data),
+        "lab": _compile_lab(learning_content, ft_fees, lab_terms if isinstance(lab_terms, dict) else {}),
+        "prodi": _compile_prodi(config, learning_content, spp_data, prodi_terms),
+        "pmb": _compile_pmb(config.get('PMB_INFO', {})),
+        "learning": _compile_learning(learning_content, prodi_terms if isinstance(prodi_terms, dict) else {}),
+    }
 
-                final_intent_category = f"info_prodi_{target_prodi.split()[1].lower()}_handled" # e.g., info_prodi_informatika_handled
+def get_response_fragments(config):
+    """Fragmen terkompilasi milik snapshot; dikompilasi di tempat jika config tidak membawanya."""
+    fragments = config.get('RESPONSE_FRAGMENTS')
+    return fragments if fragments is not None else compile_response_fragments(config)
 
-            elif target_prodi: # Detected prodi but not in our list of available info
-                 response_text = f"{sapaan_untuk_user}Maaf, informasi umum untuk Prodi {escape(target_prodi)} belum tersedia lengkap di data saya. "
-                 if link_prodi_informatika or link_prodi_sipil or link_prodi_tambang:
-                      response_text += "Anda bisa coba cek langsung di website Fakultas Teknik UNANDA atau bertanya tentang topik lain."
-                 else:
-                      response_text += "Anda bisa coba cek langsung di website resmi UNANDA atau bertanya tentang topik lain."
 
-                 final_intent_category = "fallback_prodi_info_missing"
+# def _get_jadwal_ti_response(...): <-- REMOVED, USING _get_jadwal_prodi_response INSTEAD
 
-            else: # No prodi detected or intent was just info_prodi_
-                if available_prodi_list:
-                     response_text = f"{sapaan_awal_kalimat}. Fakultas Teknik UNANDA saat ini memiliki program studi: **{', '.join(map(escape, available_prodi_list))}**. Prodi mana yang spesifik ingin Anda ketahui informasinya? (Contoh: 'info prodi sipil')"
-                     final_intent_category = "prompt_for_prodi_general"
-                else:
-                     response_text = f"{sapaan_untuk_user}Maaf, daftar program studi di Fakultas Teknik belum tersedia di data saya."
-                     final_intent_category = "fallback_prodi_list_missing"
-
-
-            response_text = "\n".join(filter(None, response_text.split('\n'))) # Clean up empty lines
-
-
-        elif intent == "tanya_biaya_praktikum":
-            # === DISAMBIGUASI / SLOT FILLING ===
-            # Ambil daftar lab yang memiliki info biaya (spesifik atau default)
-            labs_with_fee_info = []
-            if ft_fees and isinstance(ft_fees.get("praktikum"), dict) and ft_fees["praktikum"]:
-                 praktikum_fees_data = ft_fees["praktikum"]
-                 labs_with_fee_info = [lab for lab in praktikum_fees_data.keys() if not lab.startswith("_")]
-                 # Tambahkan "_default" jika ada info default
-                 if "_default" in praktikum_fees_data and isinstance(praktikum_fees_data["_default"], dict) and praktikum_fees_data["_default"]:
-                     labs_with_fee_info.append("umum/default") # Representasi untuk info umum
-
-            if not detected_lab:
-                 if labs_with_fee_info:
-                     # Gunakan set untuk unik, lalu kembali ke list untuk random sample
-                     contoh_lab_list = list(set(labs_with_fee_info))
-                     contoh_display = random.sample(contoh_lab_list, min(len(contoh_lab_list), 3))
-                     response_text = (f"{sapaan_awal_kalimat}, untuk memberikan informasi biaya praktikum yang lebih akurat, "
-                                      f"mohon sebutkan nama laboratorium spesifiknya.\n"
-                                      f"Beberapa lab yang ada info biayanya (atau info umum): **{', '.join(map(escape, contoh_display))}**{ '...' if len(labs_with_fee_info) > len(contoh_display) else '.'}"
-                                      f"\nContoh pertanyaan: 'biaya praktikum {escape(random.choice(contoh_display))}'")
-                     final_intent_category = "prompt_for_lab_fee"
-                 else:
-                     response_text = f"{sapaan_untuk_user}Maaf, saya belum punya daftar laboratorium dengan informasi biaya praktikum. Silakan hubungi bagian akademik/lab terkait."
-                     final_intent_category = "fallback_lab_terms_missing_for_fee"
-            # =====================================
-            elif not ft_fees or not isinstance(ft_fees.get("praktikum"), dict) or not ft_fees["praktikum"]:
-                response_text = f"Maaf {sapaan_untuk_user}, informasi biaya praktikum tidak dapat dimuat saat ini. Silakan hubungi laboratorium terkait atau bagian akademik."
-                final_intent_category = "fallback_fee_data_missing"
-            else:
-                # Logika asli jika lab terdeteksi dan data biaya ada
-                biaya_praktikum_info = ft_fees["praktikum"]
-                response_parts = [f"{sapaan_awal_kalimat}, terkait biaya praktikum di Fakultas Teknik:"]
-                info = None
-                lab_name = detected_lab # Lab sudah pasti ada karena sudah melewati cek `if not detected_lab`
-
-                # Cari info spesifik lab, fallback ke default jika tidak ada
-                info = biaya_praktikum_info.get(lab_name, biaya_praktikum_info.get("_default"))
-
-                if info and isinstance(info, dict): # Pastikan info yang ditemukan adalah dictionary
-                    if lab_name in biaya_praktikum_info: response_parts.append(f"\nUntuk praktikum **{escape(lab_name)}**:")
-                    elif "_default" in biaya_praktikum_info and info is biaya_praktikum_info["_default"]: response_parts.append(f"\nUntuk praktikum **{escape(lab_name)}** (menggunakan info biaya umum):")
-                    else: response_parts.append(f"\nInformasi biaya untuk **{escape(lab_name)}** ditemukan, tetapi tidak spesifik lab ini."); # Fallback jika ada info tapi bukan spesifik/default
-                    # Kalaupun tidak ada info spesifik atau default, akan masuk sini jika info tidak None (kasus aneh)
-
-                    details = []
-                    biaya_partisipasi = info.get('amount')
-                    biaya_ujian = info.get('ujian_akhir_praktikum_amount')
-                    notes = info.get('notes', 'Biaya dapat berubah, mohon konfirmasi ke lab/akademik.')
-
-                    biaya_text_parts = []
-                    if biaya_partisipasi is not None: biaya_text_parts.append(f"Biaya partisipasi/modul utama: **{format_idr(biaya_partisipasi)}**")
-                    if biaya_ujian is not None and biaya_ujian != 0: biaya_text_parts.append(f"biaya ujian akhir praktikum (jika ada): **{format_idr(biaya_ujian)}**")
-
-                    if biaya_text_parts: response_parts.append(f"- {', ditambah '.join(biaya_text_parts)}.")
-                    else: response_parts.append("- Detail komponen biaya (partisipasi/ujian) belum tersedia.")
-
-                    if notes: response_parts.append(f"- *Catatan: {notes}*")
-                    final_intent_category = "tanya_biaya_praktikum_handled"
-                else:
-                     # Jika info tidak ketemu atau formatnya salah
-                     response_parts.append(f"\nMaaf, informasi detail biaya praktikum untuk **{escape(lab_name)}** belum tersedia atau tidak valid di data saya.")
-                     final_intent_category = "fallback_lab_fee_details_missing"
+# --- Main Intent Logic Function ---
 
+def _resolve_handler(nlu_result):
+    """HandlerSpec untuk hasil NLU (None jika intent kosong atau skor di bawah threshold ditangani di luar registry)."""
+    entities = nlu_result.get('entities', {})
+    return REGISTRY.resolve(nlu_result.get('intent'), has_lab=bool(entities.get("LAB")))
 
-                response_text = "\n".join(filter(None, response_parts))
+def _response_cache_key(nlu_result, original_text, config):
+    """Key cache dari input ternormalisasi, atau None jika respons tidak boleh di-cache.
 
+    Hanya entitas yang dideklarasikan handler yang masuk key, sehingga misalnya salam dengan
+    PRODI berbeda tetap berbagi satu entri.
+    """
+    intent = nlu_result.get('intent')
+    score = nlu_result.get('score', 0.0)
+    # Respons skor rendah memuat skor mentah dan tidak melewati registry
+    if not intent or score < config.get('CONFIDENCE_THRESHOLD', 0.5):
+        return None
+    spec = _resolve_handler(nlu_result)
+    if not spec.cacheable:
+        return None
+    entities = nlu_result.get('entities', {})
+    detected_prodi_list = entities.get("PRODI", []) if "PRODI" in spec.entities else None
+    detected_lab_list = entities.get("LAB", []) if "LAB" in spec.entities else None
+    detected_prodi = detected_prodi_list[0] if detected_prodi_list else None
+    detected_lab = detected_lab_list[0] if detected_lab_list else None
+    detected_matkul = tuple(entities.get("MATKUL", [])) if "MATKUL" in spec.entities else None
+    text_key = spec.cache_text_key((original_text or "").lower()) if spec.cache_text_key else None
+    return (spec.name, intent, detected_prodi, detected_lab, detected_matkul, text_key)
 
-        elif intent == "kontak_ft":
-             if "[GANTI" in kontak_tu_info:
-                 response_text = (f"{sapaan_untuk_user}Informasi kontak Tata Usaha (TU) belum lengkap di data saya. "
-                                  "Anda bisa coba cek langsung di website resmi Fakultas Teknik UNANDA untuk informasi kontak terbaru.")
-                 final_intent_category = "fallback_kontak_placeholder"
-             else:
-                  response_text = f"{sapaan_awal_kalimat}. {kontak_tu_info}" # Mulai dengan Baik Nama, ...
-                  final_intent_category = "kontak_ft_handled"
+def get_response_for_intent(nlu_result, user_name, original_text, config, cache=None):
+    """
+    Menghasilkan teks respons berdasarkan intent yang terdeteksi.
+    Menggunakan data dari dictionary 'config'.
+    Meminta klarifikasi jika entitas wajib hilang.
+    Mengembalikan tuple: (response_text, final_intent_category)
 
+    Intent dikirim ke handler di paket intent_handlers lewat registry (lookup dict); lihat
+    intent_handlers untuk deklarasi config/entitas per handler.
 
-        # --- Handler PMB (Tidak perlu disambiguasi entitas utama di sini) ---
-        elif intent == "info_pmb_umum":
-            if not pmb_info or not isinstance(pmb_info, dict):
-                response_text = f"Maaf {sapaan_untuk_user}, informasi Penerimaan Mahasiswa Baru (PMB) tidak dapat dimuat saat ini. Silakan cek website resmi UNANDA."
-                final_intent_category = "fallback_pmb_data_missing"
-            else:
-                website = pmb_info.get('website', '')
-                kontak = pmb_info.get('contact_person', '')
-                response_text = f"{sapaan_awal_kalimat}. Informasi lengkap mengenai Penerimaan Mahasiswa Baru (PMB) UNANDA, termasuk untuk Fakultas Teknik, "
-                if website and 'http' in website: response_text += f"biasanya dapat diakses melalui website resmi PMB di: **{website}**\n\n"
-                else: response_text += "biasanya dapat diakses melalui website resmi PMB UNANDA.\n\n"
-                response_text += ("Di sana Anda bisa menemukan informasi tentang:\n"
-                                  "- Jadwal pendaftaran\n- Jalur seleksi yang tersedia\n- Persyaratan pendaftaran\n"
-                                  "- Rincian biaya awal\n- Alur dan prosedur pendaftaran online\n\n")
-                if kontak and str(kontak).strip(): response_text += f"Jika ada pertanyaan lebih lanjut mengenai PMB, Anda juga bisa menghubungi kontak panitia PMB: **{escape(str(kontak))}**.\n\n" # Escape kontak person
-                response_text += "Apakah ada informasi spesifik terkait PMB yang ingin Anda tanyakan kepada saya? (misalnya tentang jalur, biaya awal, atau cara daftar)"
-                final_intent_category = "info_pmb_umum_handled"
-
-        elif intent == "info_jalur_pmb":
-            if not pmb_info or not isinstance(pmb_info, dict) or not isinstance(pmb_info.get('jalur'), dict) or not pmb_info.get('jalur'):
-                 response_text = f"Maaf {sapaan_untuk_user}, informasi detail mengenai jalur pendaftaran PMB tidak dapat dimuat. Silakan cek website PMB resmi."
-                 final_intent_category = "fallback_pmb_jalur_missing"
-            else:
-                response_parts = [f"{sapaan_awal_kalimat}, berikut adalah jalur pendaftaran yang umumnya tersedia (berdasarkan data terakhir):"]
-                jalur_data = pmb_info.get('jalur', {})
-                website = pmb_info.get('website', '')
-                if not jalur_data: response_parts.append("- Informasi jalur pendaftaran belum tersedia.")
-                else:
-                    for key, info in jalur_data.items():
-                        if not isinstance(info, dict): continue # Skip jika format data salah
-                        name = info.get('name', key.replace('_', ' ').title())
-                        desc = info.get('description', 'Informasi detail belum tersedia.')
-                        response_parts.append(f"\n- **{escape(name)}**: {escape(desc)}") # Escape nama dan deskripsi
-                response_parts.append("\n\n**Penting:** Persyaratan detail, kuota, dan jadwal spesifik untuk setiap jalur dapat berubah setiap tahun.")
-                if website and 'http' in website: response_parts.append(f"Pastikan Anda selalu memeriksa informasi terbaru dan paling akurat di website PMB resmi: **{website}**")
-                else: response_parts.append("Pastikan Anda selalu memeriksa informasi terbaru dan paling akurat di website PMB UNANDA.")
-                response_text = "\n".join(response_parts)
-                final_intent_category = "info_jalur_pmb_handled"
-
-        elif intent == "info_biaya_pmb":
-            if not pmb_info or not isinstance(pmb_info, dict) or not isinstance(pmb_info.get('fees'), dict) or not pmb_info.get('fees'):
-                response_text = f"Maaf {sapaan_untuk_user}, informasi rincian biaya awal PMB tidak dapat dimuat. Silakan cek website PMB resmi."
-                final_intent_category = "fallback_pmb_fee_missing"
-            else:
-                response_parts = [f"{sapaan_awal_kalimat}, berikut adalah perkiraan komponen biaya awal yang terkait dengan Pendaftaran Mahasiswa Baru (berdasarkan data terakhir):"]
-                fees_data = pmb_info.get('fees', {})
-                website = pmb_info.get('website', '')
-                found_fee = False
-                if not fees_data: response_parts.append("- Rincian biaya pendaftaran belum tersedia.")
-                else:
-                    for key, info in fees_data.items():
-                        if not isinstance(info, dict): continue # Skip jika format data salah
-                        name = info.get('name', key.replace('_', ' ').title())
-                        amount = info.get('amount')
-                        notes = info.get('notes', '')
-                        if amount is not None:
-                            response_parts.append(f"\n- **{escape(name)}**: **{format_idr(amount)}**")
-                            if notes and str(notes).strip(): response_parts.append(f"  *({escape(str(notes))})*") # Escape notes
-                            found_fee = True
-                        elif name != key: # Tampilkan nama meski amount tidak ada
-                             response_parts.append(f"\n- **{escape(name)}**: Informasi biaya belum tersedia")
-                             if notes and str(notes).strip(): response_parts.append(f"  *({escape(str(notes))})*") # Escape notes
-                if found_fee:
-                    response_parts.append("\n\n**Penting:**")
-                    response_parts.append("- Ini adalah **biaya awal** yang terkait pendaftaran dan mungkin kegiatan orientasi/pembekalan.")
-                    response_parts.append("- Biaya ini **umumnya belum termasuk** biaya SPP/UKT untuk semester pertama dan biaya variabel lainnya (seperti praktikum jika ada di semester 1).")
-                    response_parts.append("- Jumlah dan komponen biaya dapat berubah. Selalu konfirmasi rincian biaya terbaru.")
-                if website and 'http' in website: response_parts.append(f"Cek rincian biaya resmi dan terbaru di website PMB: **{website}**")
-                else: response_parts.append("Cek rincian biaya resmi dan terbaru di website PMB UNANDA.")
-                response_text = "\n".join(response_parts)
-                final_intent_category = "info_biaya_pmb_handled"
-
-        elif intent == "cara_daftar_pmb":
-            if not pmb_info or not isinstance(pmb_info, dict) or not isinstance(pmb_info.get('general_steps'), list) or not pmb_info.get('general_steps'):
-                 response_text = f"Maaf {sapaan_untuk_user}, panduan umum langkah pendaftaran PMB tidak dapat dimuat. Silakan cek alur pendaftaran di website PMB resmi."
-                 final_intent_category = "fallback_pmb_steps_missing"
-            else:
-                # Ganti sapaan agar lebih pas
-                response_parts = [f"{sapaan_awal_kalimat}! Berikut adalah gambaran umum langkah-langkah mendaftar sebagai mahasiswa baru secara online (berdasarkan prosedur umum):"]
-                steps_data = pmb_info.get('general_steps', [])
-                website = pmb_info.get('website', '')
-                if not steps_data: response_parts.append("- Langkah-langkah pendaftaran belum tersedia.")
-                else:
-                    for i, step in enumerate(steps_data):
-                        if isinstance(step, str): response_parts.append(f"{i+1}. {escape(step)}") # Escape step
-                        else: response_parts.append(f"{i+1}. (Langkah tidak valid)")
-
-                response_parts.append("\n\n**Mohon Diperhatikan:**")
-                response_parts.append("- Ini adalah alur umum, langkah spesifik mungkin sedikit berbeda tergantung jalur pendaftaran dan sistem yang digunakan.")
-                response_parts.append("- Pastikan Anda membaca **semua petunjuk** dengan teliti di portal pendaftaran.")
-                response_parts.append("- Siapkan **semua dokumen** yang diperlukan dalam format digital (scan/foto) sesuai persyaratan.")
-                response_parts.append("- Perhatikan **jadwal dan batas waktu** setiap tahapan.")
-                if website and 'http' in website: response_parts.append(f"\nUntuk panduan paling akurat dan memulai pendaftaran, kunjungi website PMB resmi: **{website}**")
-                else: response_parts.append("\nUntuk panduan paling akurat dan memulai pendaftaran, kunjungi website PMB resmi UNANDA.")
-                response_text = "\n".join(response_parts)
-                final_intent_category = "cara_daftar_pmb_handled"
-
-
-        # --- Handler Tanya Pembelajaran (dengan Slot Filling) ---
-        elif intent == "tanya_pembelajaran_prodi":
-            # === DISAMBIGUASI / SLOT FILLING ===
-            # Dapatkan daftar prodi yang memiliki ringkasan pembelajaran di data
-            prodi_options_with_learning_summary = []
-            if learning_content and isinstance(learning_content, dict):
-                 for prodi, content in learning_content.items():
-                      # Check if prodi is not an internal key and has a non-empty string summary
-                      if not prodi.startswith("_") and isinstance(content, dict) and content.get("_prodi_summary") and isinstance(content.get("_prodi_summary"), str) and content["_prodi_summary"].strip():
-                           prodi_options_with_learning_summary.append(prodi)
-
-            if not detected_prodi:
-                if prodi_options_with_learning_summary:
-                    response_text = (f"{sapaan_awal_kalimat}, Anda ingin mengetahui gambaran pembelajaran di program studi mana? "
-                                     f"Pilihan yang ada di data saya: **{', '.join(map(escape, prodi_options_with_learning_summary))}**.")
-                    final_intent_category = "prompt_for_prodi_learning"
-                else:
-                    response_text = f"{sapaan_untuk_user}Maaf, informasi pembelajaran untuk program studi belum tersedia di data saya."
-                    final_intent_category = "fallback_learning_prodi_list_missing"
-            # =====================================
-            elif not learning_content or not isinstance(learning_content, dict):
-                response_text = f"Maaf {sapaan_untuk_user}, informasi materi pembelajaran prodi tidak dapat dimuat saat ini."
-                final_intent_category = "fallback_learning_data_missing"
-            else:
-                 # Logika asli jika prodi terdeteksi
-                prodi_info = learning_content.get(detected_prodi)
-                prodi_summary = None
-                # Check if prodi_info exists, is a dictionary, and has a non-empty string summary
-                if prodi_info and isinstance(prodi_info, dict) and prodi_info.get("_prodi_summary") and isinstance(prodi_info.get("_prodi_summary"), str):
-                     prodi_summary = prodi_info.get("_prodi_summary").strip()
-
-                if prodi_summary:
-                    response_text = (f"{sapaan_awal_kalimat}. Secara garis besar, di **Prodi {escape(detected_prodi)}**, mahasiswa akan mempelajari berbagai hal terkait bidangnya. "
-                                        f"Berikut adalah ringkasan fokus pembelajarannya:\n\n{escape(prodi_summary)}\n\n" # Escape summary
-                                        "Tentu saja ini gambaran umum. Mata kuliah spesifik akan dipelajari per semester sesuai kurikulum. "
-                                        f"Anda bisa cek detail kurikulum di website prodi {escape(detected_prodi)} jika tersedia.")
-                    final_intent_category = "tanya_pembelajaran_prodi_handled"
-                else:
-                    response_text = (f"Maaf {sapaan_untuk_user}, ringkasan materi pembelajaran untuk **Prodi {escape(detected_prodi)}** belum tersedia secara spesifik di data saya. "
-                                        "Secara umum, prodi ini akan membahas topik-topik yang relevan dengan bidangnya. "
-                                        f"Anda bisa mencari silabus atau kurikulum di website resmi Prodi {escape(detected_prodi)} untuk detail mata kuliah.")
-                    final_intent_category = "fallback_learning_prodi_summary_missing"
-
-        elif intent == "tanya_pembelajaran_lab":
-            # === DISAMBIGUASI / SLOT FILLING ===
-            # Ambil daftar lab yang memiliki deskripsi pembelajaran
-            all_labs_with_desc = []
-            if learning_content and isinstance(learning_content, dict):
-                for prodi, content in learning_content.items():
-                     if isinstance(content, dict):
-                          # Ambil lab yang punya deskripsi (string non-kosong)
-                          all_labs_with_desc.extend([lab for lab in content.keys() if not lab.startswith("_") and content.get(lab) and isinstance(content.get(lab), str) and content.get(lab).strip()]) # Use .keys() and .get() safely
-
-            if not detected_lab:
-                 if all_labs_with_desc:
-                     # Gunakan set untuk unik, lalu kembali ke list untuk random sample
-                     contoh_lab_list = list(set(all_labs_with_desc))
-                     contoh_display = random.sample(contoh_lab_list, min(len(contoh_lab_list), 3))
-                     response_text = (f"{sapaan_awal_kalimat}, Anda ingin tahu materi pembelajaran di laboratorium mana? "
-                                      "Mohon sebutkan nama laboratorium spesifiknya. "
-                                      f"Contohnya: 'apa yang dipelajari di {escape(random.choice(contoh_display))}?'")
-                     final_intent_category = "prompt_for_lab_learning"
-                 else:
-                     response_text = (f"{sapaan_awal_kalimat}. Anda ingin tahu materi pembelajaran di laboratorium mana? "
-                                      "Mohon sebutkan nama laboratorium spesifiknya. (Maaf, daftar lab dengan deskripsi belum tersedia di data saya untuk diberikan contoh).")
-                     final_intent_category = "prompt_for_lab_learning_no_examples"
-            # =====================================
-            elif not learning_content or not isinstance(learning_content, dict):
-                 response_text = f"Maaf {sapaan_untuk_user}, informasi materi pembelajaran laboratorium tidak dapat dimuat saat ini."
-                 final_intent_category = "fallback_learning_data_missing"
-            else:
-                 # Logika asli jika lab terdeteksi
-                possible_prodi_owners = []
-                lab_description = None
-                target_prodi_for_lab = None # Prodi yang deskripsi labnya diambil
-                for prodi, content in learning_content.items():
-                    # Check if content is a dictionary before checking for lab
-                    if isinstance(content, dict) and detected_lab in content:
-                        desc = content.get(detected_lab)
-                        # Pastikan deskripsi valid (string non-kosong)
-                        if desc and isinstance(desc, str) and desc.strip():
-                            possible_prodi_owners.append(prodi)
-                            # Prioritaskan prodi yang terdeteksi dari NLU jika ada
-                            if detected_prodi and detected_prodi == prodi:
-                                lab_description = desc.strip()
-                                target_prodi_for_lab = prodi
-                                break # Sudah ketemu deskripsi dari prodi yang relevan
-                            elif not lab_description: # Ambil deskripsi pertama yang ditemukan jika prodi tidak terdeteksi
-                                lab_description = desc.strip()
-                                target_prodi_for_lab = prodi
-
-                if lab_description:
-                     if len(possible_prodi_owners) > 1 and not detected_prodi:
-                         # Lab ada di >1 prodi, dan pengguna tidak spesifik prodi
-                         response_text = (f"{sapaan_awal_kalimat}. Laboratorium **{escape(detected_lab)}** relevan untuk beberapa prodi "
-                                          f"(misalnya {', '.join(map(escape, possible_prodi_owners))}).\n\n"
-                                          f"Secara umum, di lab ini fokus pembelajarannya adalah:\n{escape(lab_description)}\n\n" # Escape deskripsi
-                                          f"Materi spesifik mungkin disesuaikan tergantung kebutuhan prodi.")
-                         final_intent_category = "tanya_pembelajaran_lab_multi_prodi"
-                     else:
-                         # Lab spesifik atau hanya di 1 prodi
-                         prodi_konteks = f" (Prodi {escape(target_prodi_for_lab)})" if target_prodi_for_lab else ""
-                         response_text = (f"{sapaan_awal_kalimat}. Di laboratorium **{escape(detected_lab)}**{prodi_konteks}, "
-                                          f"fokus materi pembelajaran dan praktikumnya meliputi:\n\n{escape(lab_description)}") # Escape deskripsi
-                         final_intent_category = "tanya_pembelajaran_lab_handled"
-                else:
-                    response_text = (f"Maaf {sapaan_untuk_user}, deskripsi detail mengenai apa yang dipelajari di laboratorium "
-                                     f"**{escape(detected_lab)}** belum tersedia di data saya. "
-                                     "Biasanya lab ini mendukung mata kuliah praktikum terkait.")
-                    final_intent_category = "fallback_learning_lab_desc_missing"
+    Jika 'cache' (ResponseCache) diberikan, respons handler yang deterministik disimpan per
+    (handler, intent, entitas yang dipakai handler, keyword teks, DATA_VERSION) dengan nama user
+    sebagai placeholder; nama asli dimasukkan setelah respons diambil dari cache. Variasi acak
+    (_rng.choice/_rng.sample di handler) disimpan sebagai slot dan diundi ulang setiap request.
+    """
+    key = _response_cache_key(nlu_result, original_text, config) if cache is not None else None
+    if key is None:
+        return _build_response_for_intent(nlu_result, user_name, original_text, config)
 
-        # --- Intent tidak ada handler spesifik di atas ---
-        # Ini adalah fallback jika intent dikenali tapi tidak ada logika di if/elif blocks di atas
-        else:
-            final_intent_category = "unhandled_valid_intent" # Override kategori
-            # Periksa apakah intent yang tidak terhandle ini adalah salah satu intent yang diharapkan
-            # Misalnya, jika ada intent baru di model tapi belum ada handler di sini
-            known_intents_without_handlers = [
-                 # Daftarkan intent yang ada di model tapi belum ditangani spesifik di atas
-                 # Contoh: "info_dosen", "info_kurikulum"
-            ]
-            # Use get('intent') safely as it might be None
-            if intent and intent in known_intents_without_handlers:
-                 response_text = (f"Saya mengerti Anda bertanya tentang '{escape(intent.replace('_', ' '))}' ({score*100:.1f}%). "
-                                  f"Namun, saya belum memiliki informasi detail atau tindakan spesifik untuk topik tersebut saat ini. "
-                                  "Mungkin Anda bisa bertanya tentang topik lain seperti biaya, pendaftaran, jadwal, atau prodi?")
-            else:
-                # Ini kasus sangat jarang, intent tidak umum atau salah deteksi
-                response_text = (f"Saya mendeteksi niat '{escape(intent.replace('_', ' ')) if intent else 'Tidak Dikenali'}' ({score*100:.1f}%) dari pertanyaan Anda, " # Use ternary for intent
-                                 "tapi saya belum diprogram untuk menjawab topik tersebut. "
-                                 "Mohon ajukan pertanyaan lain yang terkait Fakultas Teknik UNANDA.")
+    safe_user_name = get_safe_user_name(user_name)
+    key += (safe_user_name is not None,)
+    data_version = config.get('DATA_VERSION')
+    cached = cache.get(key, data_version)
+    if cached is None:
+        variants = _rng.record_variants()
+        try:
+            response_text, final_intent_category = _build_response_for_intent(
+                nlu_result, NAME_PLACEHOLDER if safe_user_name is not None else None, original_text, config
+            )
+        finally:
+            _rng.stop_recording()
+        cached = (response_text, final_intent_category, tuple(variants))
+        cache.put(key, data_version, cached)
+    response_template, final_intent_category, variants = cached
+    # Variasi acak diundi per request, setelah lookup; nama user diisi paling akhir
+    response_text = fill_variants(response_template, variants)
+    if safe_user_name is not None:
+        response_text = response_text.replace(NAME_PLACEHOLDER, str(safe_user_name))
+    return response_text, final_intent_category
 
+def _build_response_for_intent(nlu_result, user_name, original_text, config):
+    """Bangun respons untuk intent tanpa cache. Lihat get_response_for_intent."""
+    intent = nlu_result.get('intent')
+    score = nlu_result.get('score', 0.0)
 
-    # --- Skor rendah atau tidak ada intent (sudah ditangani di app.py) ---
-    # Logika ini sudah dipindahkan ke app.py sebelum memanggil get_response_for_intent
+    # Skor rendah atau tidak ada intent sudah ditangani di app.py; ini hanya jaring pengaman
+    if not intent or score < config.get('CONFIDENCE_THRESHOLD', 0.5):
+        sapaan_untuk_user = get_sapaan(user_name)
+        response_text = f"Maaf {sapaan_untuk_user}saya belum bisa memproses permintaan terkait '{intent}' saat ini. Mungkin bisa coba tanyakan dengan cara lain?"
+        return response_text, intent if intent else "unhandled_intent"
 
-    # Kembalikan teks respons dan kategori intent final
-    # Pastikan final_intent_category sudah di-set dengan benar di setiap cabang logika
-    return response_text, final_intent_category
+    spec = _resolve_handler(nlu_result)
+    entities = nlu_result.get('entities', {})
+    detected_prodi_list = entities.get("PRODI", [])
+    detected_lab_list = entities.get("LAB", [])
+    # Handler hanya melihat entitas, config, dan fragmen yang dideklarasikannya
+    fragments = get_response_fragments(config)
+    ctx = HandlerContext(
+        intent=intent,
+        score=score,
+        prodi=detected_prodi_list[0] if detected_prodi_list and "PRODI" in spec.entities else None,
+        lab=detected_lab_list[0] if detected_lab_list and "LAB" in spec.entities else None,
+        matkul=tuple(entities.get("MATKUL", [])) if "MATKUL" in spec.entities else (),
+        user_name=user_name,
+        safe_user_name=get_safe_user_name(user_name),
+        sapaan=get_sapaan(user_name), # Sapaan tengah kalimat
+        sapaan_awal=get_sapaan(user_name, awal_kalimat=True),
+        text_lower=original_text.lower() if original_text else "",
+        config={key: config[key] for key in spec.config if key in config},
+        fragments={name: fragments[name] for name in spec.fragments},
+    )
+    return REGISTRY.dispatch(spec, ctx)
+
+def handler_stats():
+    """Statistik per handler (jumlah panggilan, rata-rata durasi) untuk /nlu_stats."""
+    return REGISTRY.stats()
+
+def load_all_handlers():
+    """Import semua modul handler sekarang (warm-up) alih-alih saat intent pertama kali muncul."""
+    REGISTRY.load_all()
 
 # --- END OF FILE intent_logic.py ---
\ No newline at end of file
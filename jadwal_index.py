@@ -0,0 +1,324 @@
+# --- START OF FILE jadwal_index.py ---
+"""Indeks jadwal kuliah yang dibangun sekali saat data dimuat.
+
+Berisi trie nama mata kuliah (per kata) dan bucket per hari, semester, dosen,
+dan ruang yang sudah terurut berdasarkan jam mulai. Pencarian tidak perlu lagi
+menjalankan satu regex per mata kuliah atau mengurutkan ulang setiap request.
+
+Setiap jadwal disimpan sebagai JadwalEntry (__slots__) dengan jam mulai/selesai
+dalam menit, sehingga query rentang waktu ("kuliah jam 10 hari rabu"), slot
+kosong ruang, dan jadwal dosen tidak perlu mem-parsing string 'jam' per request.
+"""
+
+import re
+from bisect import bisect_right
+
+_WORD_RE = re.compile(r"\w+")
+_DUPLICATE_SUFFIX_RE = re.compile(r"_\d*$") # "STRUKTUR BAJA 2_2" -> "STRUKTUR BAJA 2"
+_JAM_START_RE = re.compile(r"(\d{1,2})\s*[.:]\s*(\d{2})")
+_JAM_RANGE_RE = re.compile(r"(\d{1,2})\s*[.:]\s*(\d{2})\s*-\s*(\d{1,2})\s*[.:]\s*(\d{2})")
+UNKNOWN_TIME = 99 * 60 + 99 # Setara default "99:99" lama: jadwal tanpa jam diletakkan di akhir
+DAY_ORDER = {"senin": 0, "selasa": 1, "rabu": 2, "kamis": 3, "jumat": 4, "sabtu": 5, "minggu": 6}
+WEEKDAYS = ("senin", "selasa", "rabu", "kamis", "jumat")
+DEFAULT_SLOT_DAY_START = 8 * 60 # Rentang jam kuliah untuk pencarian ruang kosong
+DEFAULT_SLOT_DAY_END = 17 * 60
+DEFAULT_SLOT_MIN_MINUTES = 30 # Jeda antar sesi (misal 09.40-09.50) tidak dihitung sebagai slot kosong
+
+# Gelar/singkatan yang tidak dipakai sebagai kunci pencarian dosen
+DOSEN_STOPWORDS = frozenset([
+    "s", "t", "m", "st", "mt", "dr", "ir", "si", "pd", "kom", "cs", "sc", "hum", "pi", "ipm",
+    "msc", "mkom", "mcs", "mpd", "msi", "spd", "skom", "ss", "ph", "d", "phd", "dan",
+])
+
+
+def tokenize(text):
+    """Pecah teks menjadi token kata lowercase (dipakai untuk teks user dan nama matkul)."""
+    return _WORD_RE.findall(text.lower()) if text else []
+
+
+def parse_jam_start(jam):
+    """Ambil jam mulai (menit sejak 00:00) dari string seperti '08.00- 09.40' atau '08:00 - 09:40'."""
+    if not isinstance(jam, str):
+        return UNKNOWN_TIME
+    match = _JAM_START_RE.search(jam)
+    if not match:
+        return UNKNOWN_TIME
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def parse_jam_range(jam):
+    """Ambil (mulai, selesai) dalam menit dari string 'jam'.
+
+    Jika jam selesai tidak terbaca, selesai = mulai (durasi nol); jika jam mulai
+    juga tidak terbaca, keduanya UNKNOWN_TIME.
+    """
+    if not isinstance(jam, str):
+        return UNKNOWN_TIME, UNKNOWN_TIME
+    match = _JAM_RANGE_RE.search(jam)
+    if match:
+        start = int(match.group(1)) * 60 + int(match.group(2))
+        end = int(match.group(3)) * 60 + int(match.group(4))
+        return start, max(start, end)
+    start = parse_jam_start(jam)
+    return start, start
+
+
+def format_minutes(minutes):
+    """Format menit sejak 00:00 menjadi 'HH.MM' (gaya penulisan jam di data jadwal)."""
+    return f"{minutes // 60:02d}.{minutes % 60:02d}"
+
+
+def normalize_room(ruang):
+    """Kunci ruang tanpa tanda baca: 'A-04' dan 'a04' menjadi 'a04'."""
+    return "".join(tokenize(str(ruang))) if ruang is not None else ""
+
+
+def base_course_name(course_name):
+    """Nama matkul tanpa sufiks duplikat dari konversi spreadsheet ('_2', '_3', ...)."""
+    return _DUPLICATE_SUFFIX_RE.sub("", course_name).strip()
+
+
+class JadwalEntry:
+    """Satu baris jadwal yang sudah di-parse.
+
+    Nilai tampilan (jam, ruang, dosen, ...) disimpan apa adanya dari data (default "N/A"),
+    sedangkan day/start/end/room_key dipakai untuk pencarian dan pengurutan.
+    """
+    __slots__ = ("course", "hari", "jam", "ruang", "dosen", "semester", "kelas",
+                 "day", "start", "end", "room_key")
+
+    def __init__(self, course, details):
+        self.course = course
+        self.hari = details.get("hari", "N/A")
+        self.jam = details.get("jam", "N/A")
+        self.ruang = details.get("ruang", "N/A")
+        self.dosen = details.get("dosen", "N/A")
+        self.semester = details.get("semester", "N/A")
+        self.kelas = details.get("kelas", "N/A")
+        self.day = details["hari"].strip().lower() if isinstance(details.get("hari"), str) else None
+        self.start, self.end = parse_jam_range(details.get("jam"))
+        self.room_key = normalize_room(details.get("ruang"))
+
+    def overlaps(self, start, end):
+        return self.start < end and start < self.end
+
+    def __repr__(self):
+        return f"JadwalEntry({self.course!r}, {self.hari!r}, {self.jam!r}, {self.ruang!r})"
+
+
+def _day_rank(entry):
+    return DAY_ORDER.get(entry.day, len(DAY_ORDER))
+
+
+class ScheduleIndex:
+    """Indeks untuk satu tabel jadwal (satu prodi, satu periode).
+
+    Args:
+        schedule_data (dict): Mapping nama matkul -> detail (dict) atau list detail per kelas,
+            seperti isi data/jadwal_*.json untuk satu periode.
+    """
+
+    def __init__(self, schedule_data):
+        self.entries = [] # List JadwalEntry terurut berdasarkan jam mulai
+        self.course_names = [] # Nama matkul (tanpa sufiks duplikat) sesuai urutan data
+        self.by_course = {}
+        self.by_day = {}
+        self.by_semester = {}
+        self.by_dosen = {}
+        self.by_room = {}
+        self._trie = {}
+
+        order = 0
+        keyed_entries = []
+        for raw_name, details_or_list in (schedule_data or {}).items():
+            details_list = details_or_list if isinstance(details_or_list, list) else [details_or_list]
+            course_name = base_course_name(raw_name)
+            for details in details_list:
+                if not isinstance(details, dict):
+                    continue
+                entry = JadwalEntry(course_name, details)
+                # Urutan data asli dipakai sebagai tie-breaker agar hasil stabil
+                keyed_entries.append(((entry.start, order), entry, details))
+                order += 1
+            if course_name.lower() not in self.by_course and any(isinstance(d, dict) for d in details_list):
+                self.course_names.append(course_name)
+                self.by_course[course_name.lower()] = []
+                self._add_to_trie(course_name)
+
+        keyed_entries.sort(key=lambda item: item[0])
+        for _, entry, details in keyed_entries:
+            self.entries.append(entry)
+            self.by_course[entry.course.lower()].append(entry)
+            if entry.day:
+                self.by_day.setdefault(entry.day, []).append(entry)
+            if details.get("semester") is not None:
+                self.by_semester.setdefault(str(details["semester"]).strip().upper(), []).append(entry)
+            if entry.room_key:
+                self.by_room.setdefault(entry.room_key, []).append(entry)
+            for token in set(tokenize(str(details.get("dosen") or ""))):
+                if len(token) > 2 and token not in DOSEN_STOPWORDS:
+                    self.by_dosen.setdefault(token, []).append(entry)
+
+        # Jadwal per matkul/dosen/ruang diurutkan berdasarkan hari lalu jam (sort stabil atas urutan jam)
+        for buckets in (self.by_course, self.by_dosen, self.by_room):
+            for bucket_entries in buckets.values():
+                bucket_entries.sort(key=_day_rank)
+        # Jam mulai per hari untuk pencarian biner pada query rentang waktu
+        self._day_starts = {day: [entry.start for entry in day_entries] for day, day_entries in self.by_day.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add_to_trie(self, course_name):
+        tokens = tokenize(course_name)
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # Simpan nama pertama saja jika ada dua matkul dengan token yang sama
+        node.setdefault(None, course_name)
+
+    def find_course(self, text_lower):
+        """Cari nama matkul yang disebut dalam teks (kata utuh), atau None.
+
+        Jika beberapa matkul cocok, yang terpanjang (paling spesifik) dipilih,
+        misal 'Sistem Informasi Geografis' dibanding 'Sistem Informasi'.
+        """
+        tokens = tokenize(text_lower)
+        best_name, best_len = None, 0
+        for start in range(len(tokens)):
+            node = self._trie
+            for offset in range(start, len(tokens)):
+                node = node.get(tokens[offset])
+                if node is None:
+                    break
+                length = offset - start + 1
+                if None in node and length > best_len:
+                    best_name, best_len = node[None], length
+        return best_name
+
+    def entries_for_course(self, course_name):
+        return self.by_course.get(course_name.lower(), []) if course_name else []
+
+    def entries_for_day(self, day_name):
+        return self.by_day.get(day_name.lower(), []) if day_name else []
+
+    def teaching_days(self):
+        """Hari yang ada di data (minimal Senin-Jumat), terurut Senin -> Minggu."""
+        return sorted(set(WEEKDAYS) | set(self.by_day), key=lambda day: DAY_ORDER.get(day, len(DAY_ORDER)))
+
+    def entries_at(self, start, end=None, day_name=None):
+        """Jadwal yang berlangsung pada rentang [start, end) menit (end=None berarti satu titik waktu).
+
+        Args:
+            start (int): Menit sejak 00:00, misal 600 untuk jam 10.
+            end (int): Akhir rentang (eksklusif); None berarti start + 1.
+            day_name (str): Batasi ke satu hari; None berarti semua hari (Senin -> Minggu).
+        """
+        end = start + 1 if end is None else end
+        days = [day_name.lower()] if day_name else sorted(self.by_day, key=lambda day: DAY_ORDER.get(day, len(DAY_ORDER)))
+        result = []
+        for day in days:
+            day_entries = self.by_day.get(day, [])
+            # Hanya jadwal yang mulai sebelum akhir rentang yang mungkin overlap
+            limit = bisect_right(self._day_starts.get(day, []), end - 1)
+            result.extend(entry for entry in day_entries[:limit] if entry.overlaps(start, end))
+        return result
+
+    def find_rooms(self, text_lower):
+        """Cari kunci ruang yang disebut setelah kata 'ruang'/'ruangan'/'r.' dalam teks.
+
+        'ruang A04' cocok persis dengan 'a04'; 'ruang pb 1' cocok dengan awalan
+        'pb1kampuskamanre'. Mengembalikan list kunci ruang (bisa kosong).
+        """
+        match = re.search(r"\b(?:ruang(?:an)?|r\.)\s*(.+)", text_lower)
+        if not match:
+            return []
+        tokens = tokenize(match.group(1))[:3]
+        for size in range(len(tokens), 0, -1):
+            candidate = "".join(tokens[:size])
+            if candidate in self.by_room:
+                return [candidate]
+            prefixed = [room_key for room_key in self.by_room if room_key.startswith(candidate)]
+            if prefixed:
+                return prefixed
+        return []
+
+    def entries_for_room(self, room_keys):
+        entries = [entry for room_key in room_keys for entry in self.by_room.get(room_key, [])]
+        return sorted(entries, key=lambda entry: (_day_rank(entry), entry.start)) if len(room_keys) > 1 else entries
+
+    def free_slots(self, room_keys, day_name=None, day_start=DEFAULT_SLOT_DAY_START,
+                   day_end=DEFAULT_SLOT_DAY_END, min_minutes=DEFAULT_SLOT_MIN_MINUTES):
+        """Slot kosong sebuah ruang per hari, dalam rentang jam kuliah.
+
+        Returns:
+            list: [(hari, [(mulai, selesai), ...]), ...] dalam menit, terurut per hari.
+        """
+        days = [day_name.lower()] if day_name else self.teaching_days()
+        busy_by_day = {}
+        for entry in self.entries_for_room(room_keys):
+            if entry.start != UNKNOWN_TIME:
+                busy_by_day.setdefault(entry.day, []).append((entry.start, entry.end))
+        result = []
+        for day in days:
+            slots = []
+            cursor = day_start
+            for busy_start, busy_end in sorted(busy_by_day.get(day, [])):
+                if busy_start - cursor >= min_minutes:
+                    slots.append((cursor, min(busy_start, day_end)))
+                cursor = max(cursor, busy_end)
+                if cursor >= day_end:
+                    break
+            if day_end - cursor >= min_minutes:
+                slots.append((cursor, day_end))
+            result.append((day, slots))
+        return result
+
+    def entries_for_dosen(self, text_lower):
+        """Jadwal dosen yang namanya disebut dalam teks.
+
+        Semua token nama yang dikenal harus cocok (irisan), sehingga 'Andi Fathussalam'
+        lebih spesifik daripada 'Andi'. Token yang tidak dikenal di indeks diabaikan.
+        """
+        known_tokens = [token for token in tokenize(text_lower) if token in self.by_dosen]
+        if not known_tokens:
+            return []
+        matched = None
+        for token in known_tokens:
+            token_ids = {id(entry) for entry in self.by_dosen[token]}
+            matched = token_ids if matched is None else matched & token_ids
+        # Pertahankan urutan (hari, jam) dari bucket token pertama
+        return [entry for entry in self.by_dosen[known_tokens[0]] if id(entry) in matched]
+
+
+def build_jadwal_indexes(config, prodi_mapping, periods=None):
+    """Bangun ScheduleIndex untuk setiap prodi (dan periode) yang datanya tersedia di config.
+
+    Args:
+        config (Mapping): Snapshot config (lihat data_store.DataStore) yang berisi data jadwal (JADWAL_*_DATA).
+        prodi_mapping (dict): Nama prodi kanonikal -> {"data_key", "short_name", ...}.
+        periods (list): Periode yang diindeks; None berarti semua periode yang berupa tabel jadwal.
+
+    Returns:
+        dict: {nama prodi: {periode: ScheduleIndex}}
+    """
+    indexes = {}
+    for prodi_name, info in prodi_mapping.items():
+        jadwal_data = config.get(info["data_key"])
+        if not isinstance(jadwal_data, dict) or not isinstance(jadwal_data.get("jadwal_kuliah"), dict):
+            continue
+        prodi_periods = jadwal_data["jadwal_kuliah"].get(info["short_name"])
+        if not isinstance(prodi_periods, dict):
+            continue
+        for periode, schedule_data in prodi_periods.items():
+            if periods is not None and periode not in periods:
+                continue
+            # Lewati key yang bukan tabel jadwal (misal sisa konversi berisi satu matkul)
+            if not isinstance(schedule_data, dict) or not any(isinstance(v, (dict, list)) for v in schedule_data.values()):
+                continue
+            indexes.setdefault(prodi_name, {})[periode] = ScheduleIndex(schedule_data)
+    return indexes
+
+# --- END OF FILE jadwal_index.py ---
@@ -0,0 +1,320 @@
+# --- START OF FILE loadtest.py ---
+"""Load test /predict dengan replay ucapan dari test_set.json dan/atau log query JSONL.
+
+Berbeda dengan benchmark_serving.py (yang menyalakan server sendiri untuk membandingkan mode),
+skrip ini menembak server yang SUDAH berjalan (lokal/staging) sehingga bisa dipakai untuk
+menentukan jumlah worker gunicorn dan mengecek regresi latensi sebelum deploy.
+
+Dua model beban:
+  - closed loop (default, --rate 0): --concurrency koneksi mengirim request berikutnya
+    begitu respons sebelumnya diterima.
+  - open loop (--rate R): request datang dengan laju R req/s (--arrival constant/poisson)
+    dan dilayani lewat maksimal --concurrency koneksi. Latensi dihitung dari jadwal
+    kedatangan, jadi antrean di sisi klien saat server kewalahan ikut terukur.
+
+Admission control server (ADMISSION_RATE per klien) ikut membatasi: untuk mengukur kapasitas
+worker, jalankan server dengan ADMISSION_RATE=0; untuk menguji load shedding, biarkan aktif
+(penolakan terlihat sebagai status 503 di hasil).
+
+Log query JSONL: satu baris per query, berupa objek {"text": ...} (atau "user_text")
+atau string JSON biasa; baris lain dilewati.
+
+Jalankan dari root project (server sudah jalan, misal gunicorn -c gunicorn.conf.py app:app):
+    python loadtest.py --url http://127.0.0.1:8000 --concurrency 16 --duration 30 --json hasil.json
+    python loadtest.py --rate 40 --arrival poisson --log query_log.jsonl --compare hasil.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+from benchmark_serving import Connection, load_texts, percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TRANSPORT_ERRORS = (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError)
+# Metrik yang dibandingkan dengan --compare: (nama, True jika lebih besar = lebih buruk)
+COMPARED_METRICS = (("throughput_rps", False), ("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("error_rate", True))
+
+
+def load_query_log(path):
+    """Ambil teks dari log query JSONL ({"text": ...}, {"user_text": ...} atau string per baris)."""
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(item, dict):
+                item = item.get("text") or item.get("user_text")
+            if isinstance(item, str) and item.strip():
+                texts.append(item)
+    return texts
+
+
+def replay_sequence(texts, shuffle, seed):
+    """Iterator tak berujung atas teks: urutan asli, atau diacak ulang di setiap putaran."""
+    if not shuffle:
+        return itertools.cycle(texts)
+    rng = random.Random(seed)
+
+    def generator():
+        order = list(texts)
+        while True:
+            rng.shuffle(order)
+            yield from order
+    return generator()
+
+
+def intent_category(body):
+    try:
+        return json.loads(body).get("debug_info", {}).get("final_intent_category") or "unknown"
+    except (ValueError, AttributeError):
+        return "unparseable"
+
+
+class LoadResults:
+    def __init__(self):
+        self.latencies = []
+        self.status = Counter()
+        self.intents = Counter()
+        self.transport_errors = 0
+
+    def record(self, latency, status, body):
+        self.latencies.append(latency)
+        self.status[status] += 1
+        if status == 200:
+            self.intents[intent_category(body)] += 1
+
+
+async def open_connection(target, intro, request_timeout):
+    conn = Connection(target.port, host=target.hostname, path=target.path or "/predict")
+    if intro:
+        # Perkenalan dulu supaya request berikutnya melewati alur normal (nama sudah ada di sesi)
+        await asyncio.wait_for(conn.request(intro), request_timeout)
+    return conn
+
+
+async def send(conn, text, scheduled, results, request_timeout):
+    try:
+        status = await asyncio.wait_for(conn.request(text), request_timeout)
+    except TRANSPORT_ERRORS:
+        results.transport_errors += 1
+        conn.close()
+        return
+    results.record(time.perf_counter() - scheduled, status, conn.last_body)
+
+
+async def run_closed_loop(connections, sequence, args, results):
+    deadline = time.perf_counter() + args.duration
+    remaining = [args.requests] if args.requests else None
+
+    async def worker(conn):
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            await send(conn, next(sequence), time.perf_counter(), results, args.request_timeout)
+
+    await asyncio.gather(*(worker(conn) for conn in connections))
+
+
+async def run_open_loop(connections, sequence, args, results):
+    pool = asyncio.Queue()
+    for conn in connections:
+        pool.put_nowait(conn)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    scheduled = started
+    tasks = []
+
+    async def dispatch(text, scheduled_at):
+        conn = await pool.get()
+        try:
+            await send(conn, text, scheduled_at, results, args.request_timeout)
+        finally:
+            pool.put_nowait(conn)
+
+    for sent in itertools.count():
+        if args.requests and sent >= args.requests:
+            break
+        interval = rng.expovariate(args.rate) if args.arrival == "poisson" else 1.0 / args.rate
+        scheduled += interval
+        if scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(dispatch(next(sequence), scheduled)))
+    await asyncio.gather(*tasks)
+
+
+async def run_load(target, texts, args):
+    results = LoadResults()
+    connections = []
+    for _ in range(args.concurrency):
+        try:
+            connections.append(await open_connection(target, args.intro, args.request_timeout))
+        except TRANSPORT_ERRORS:
+            results.transport_errors += 1
+    if not connections:
+        raise RuntimeError(f"Tidak ada koneksi yang berhasil ke {target.geturl()}.")
+    sequence = replay_sequence(texts, args.shuffle, args.seed)
+    started = time.perf_counter()
+    try:
+        if args.rate > 0:
+            await run_open_loop(connections, sequence, args, results)
+        else:
+            await run_closed_loop(connections, sequence, args, results)
+    finally:
+        for conn in connections:
+            conn.close()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed, args):
+    latencies = sorted(results.latencies)
+    ok = results.status.get(200, 0)
+    attempted = len(latencies) + results.transport_errors
+    failed = attempted - ok
+    to_ms = lambda seconds: round(seconds * 1000, 1) if seconds is not None else None
+    return {
+        "requests": attempted,
+        "ok": ok,
+        "errors": failed,
+        "transport_errors": results.transport_errors,
+        "error_rate": round(failed / attempted, 4) if attempted else 0.0,
+        "status": {str(k): v for k, v in sorted(results.status.items())},
+        "elapsed_s": round(elapsed, 2),
+        "offered_rps": args.rate if args.rate > 0 else None,
+        "throughput_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": to_ms(sum(latencies) / len(latencies) if latencies else None),
+        "p50_ms": to_ms(percentile(latencies, 50)),
+        "p95_ms": to_ms(percentile(latencies, 95)),
+        "p99_ms": to_ms(percentile(latencies, 99)),
+        "max_ms": to_ms(latencies[-1] if latencies else None),
+        "intents": dict(results.intents.most_common()),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def check_ready(target):
+    url = f"{target.scheme}://{target.netloc}/readyz"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def compare(summary, baseline_path, max_regression_pct):
+    """Cetak selisih terhadap hasil sebelumnya. Mengembalikan daftar metrik yang memburuk melebihi batas."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f).get("summary", {})
+    regressions = []
+    print(f"\n--- Perbandingan dengan '{baseline_path}' (batas regresi {max_regression_pct}%) ---")
+    for name, higher_is_worse in COMPARED_METRICS:
+        old, new = baseline.get(name), summary.get(name)
+        if old is None or new is None:
+            continue
+        if name == "throughput_rps" and (summary.get("offered_rps") or baseline.get("offered_rps")):
+            continue # Pada open loop throughput ditentukan --rate, bukan kapasitas server
+        change_pct = ((new - old) / old * 100) if old else (0.0 if new == old else float("inf"))
+        worse_pct = change_pct if higher_is_worse else -change_pct
+        if name == "error_rate":
+            regressed = new > old # Error rate tidak boleh naik sama sekali
+        else:
+            regressed = worse_pct > max_regression_pct
+        flag = "REGRESI" if regressed else "ok"
+        print(f"[*] {name.ljust(15)}: {old} -> {new} ({change_pct:+.1f}%) {flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /predict dengan replay ucapan dari test set atau log query.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/predict", help="URL endpoint /predict (HTTP, tanpa TLS).")
+    parser.add_argument("--texts", default=os.path.join(BASE_DIR, "test_set.json"), help="File teks format test_set.json ('' untuk tidak dipakai).")
+    parser.add_argument("--log", action="append", default=[], help="Log query JSONL untuk di-replay (boleh diulang).")
+    parser.add_argument("--concurrency", type=int, default=16, help="Jumlah koneksi (sesi) ke server.")
+    parser.add_argument("--rate", type=float, default=0.0, help="Laju kedatangan (req/s) untuk open loop; 0 = closed loop.")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="constant", help="Pola kedatangan untuk --rate.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durasi beban (detik).")
+    parser.add_argument("--requests", type=int, default=0, help="Berhenti setelah sejumlah request (0 = hanya dibatasi durasi).")
+    parser.add_argument("--shuffle", action="store_true", help="Acak urutan replay (default: urutan file).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--intro", default="nama saya Budi", help="Pesan perkenalan per koneksi sebelum beban ('' untuk tidak ada).")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Timeout per request (detik).")
+    parser.add_argument("--json", help="Simpan hasil ke file JSON.")
+    parser.add_argument("--compare", help="File JSON hasil sebelumnya untuk dibandingkan.")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Batas regresi (%%) throughput/latensi untuk --compare.")
+    args = parser.parse_args()
+
+    target = urllib.parse.urlsplit(args.url)
+    if target.scheme != "http" or not target.hostname:
+        parser.error("--url harus berupa URL http://host:port/predict")
+    if target.port is None:
+        target = urllib.parse.urlsplit(f"http://{target.hostname}:80{target.path}")
+    if args.concurrency < 1 or args.rate < 0:
+        parser.error("--concurrency minimal 1 dan --rate tidak boleh negatif")
+
+    texts = load_texts(args.texts) if args.texts else []
+    for log_path in args.log:
+        texts.extend(load_query_log(log_path))
+    if not texts:
+        parser.error("Tidak ada teks untuk di-replay (cek --texts/--log).")
+    if not check_ready(target):
+        print(f"WARNING: {target.scheme}://{target.netloc}/readyz tidak mengembalikan 200; hasil bisa tidak representatif.")
+
+    load_model = f"open loop {args.rate} req/s ({args.arrival})" if args.rate > 0 else "closed loop"
+    print(f"--- Load test {args.url}: {load_model}, {args.concurrency} koneksi, {args.duration:.0f} s, {len(texts)} teks ---")
+    results, elapsed = asyncio.run(run_load(target, texts, args))
+    summary = summarize(results, elapsed, args)
+
+    print(f"[*] Throughput  : {summary['throughput_rps']} req/s ({summary['ok']} OK dari {summary['requests']} request)")
+    print(f"[*] Latensi (ms): p50 {summary['p50_ms']}  p95 {summary['p95_ms']}  p99 {summary['p99_ms']}  max {summary['max_ms']}")
+    print(f"[*] Error rate  : {summary['error_rate']:.2%} (status {summary['status']}, transport {summary['transport_errors']})")
+    print("[*] Distribusi intent:")
+    for intent, count in summary["intents"].items():
+        print(f"    - {intent.ljust(40)} {count} ({count / summary['ok']:.1%})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git_commit": git_commit(),
+                                                      "texts": len(texts)}, "summary": summary}, f, indent=2)
+        print(f"INFO: Hasil disimpan ke '{args.json}'.")
+
+    if args.compare:
+        regressions = compare(summary, args.compare, args.max_regression)
+        if regressions:
+            print(f"ERROR: Regresi terdeteksi pada: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE loadtest.py ---
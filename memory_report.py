@@ -0,0 +1,119 @@
+# --- START OF FILE memory_report.py ---
+"""Laporan memori (RSS/PSS) per proses gunicorn untuk sizing instance.
+
+RSS menghitung penuh halaman yang dipakai bersama (model spaCy yang di-share
+copy-on-write ikut terhitung di setiap worker), sedangkan PSS membagi halaman
+bersama secara proporsional. Jumlah PSS semua proses = pemakaian memori riil.
+
+Contoh:
+    python memory_report.py <pid master gunicorn>
+    python memory_report.py <pid master> --json
+"""
+
+import argparse
+import json
+import os
+
+
+def read_process_memory(pid):
+    """Baca RSS, PSS, shared, dan private (KB) dari /proc/<pid>/smaps_rollup (Linux).
+
+    Returns:
+        dict: {"pid", "rss_kb", "pss_kb", "shared_kb", "private_kb"} atau None jika tidak terbaca.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        # Fallback tanpa smaps_rollup (kernel lama / non-Linux): hanya RSS dari statm
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                rss_pages = int(f.read().split()[1])
+            rss_kb = rss_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+            return {"pid": pid, "rss_kb": rss_kb, "pss_kb": None, "shared_kb": None, "private_kb": None}
+        except (OSError, ValueError, IndexError):
+            return None
+    return {
+        "pid": pid,
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "shared_kb": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(pid):
+    """PID anak langsung dari sebuah proses (dibaca dari /proc/*/stat)."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            # Field ke-4 (ppid) berada setelah nama proses dalam tanda kurung
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def format_mb(kb):
+    return "n/a" if kb is None else f"{kb / 1024:.1f} MB"
+
+
+def build_report(master_pid):
+    """Kumpulkan memori master + semua worker beserta totalnya."""
+    processes = []
+    master = read_process_memory(master_pid)
+    if master:
+        processes.append(dict(master, role="master"))
+    for pid in child_pids(master_pid):
+        worker = read_process_memory(pid)
+        if worker:
+            processes.append(dict(worker, role="worker"))
+    workers = [p for p in processes if p["role"] == "worker"]
+    total_pss = sum(p["pss_kb"] or 0 for p in processes)
+    return {
+        "master_pid": master_pid,
+        "workers": len(workers),
+        "processes": processes,
+        "total_rss_kb": sum(p["rss_kb"] for p in processes),
+        "total_pss_kb": total_pss,
+        "avg_worker_private_kb": round(sum(p["private_kb"] or 0 for p in workers) / len(workers)) if workers else 0,
+    }
+
+
+def print_report(report):
+    print(f"--- Memori gunicorn (master PID {report['master_pid']}, {report['workers']} worker) ---")
+    for p in report["processes"]:
+        print(f"[*] {p['role'].ljust(6)} {str(p['pid']).ljust(7)} RSS {format_mb(p['rss_kb']).rjust(10)}  "
+              f"PSS {format_mb(p['pss_kb']).rjust(10)}  shared {format_mb(p['shared_kb']).rjust(10)}  private {format_mb(p['private_kb']).rjust(10)}")
+    print(f"[*] Total RSS (terhitung ganda) : {format_mb(report['total_rss_kb'])}")
+    print(f"[*] Total PSS (memori riil)     : {format_mb(report['total_pss_kb'])}")
+    print(f"[*] Rata-rata private/worker    : {format_mb(report['avg_worker_private_kb'])} (tambahan per worker baru)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laporan RSS/PSS master dan worker gunicorn.")
+    parser.add_argument("master_pid", type=int, help="PID proses master gunicorn.")
+    parser.add_argument("--json", action="store_true", help="Cetak laporan sebagai JSON.")
+    args = parser.parse_args()
+
+    report = build_report(args.master_pid)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE memory_report.py ---
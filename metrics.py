@@ -0,0 +1,235 @@
+# --- START OF FILE metrics.py ---
+"""Metrik latensi per tahap dan per intent, plus counter, dalam format teks Prometheus.
+
+Setiap giliran chat membawa RequestTrace yang mengumpulkan span per tahap (state dialog,
+OOS, NLU, ekstraksi nama, intent handler). Tahap di dalam NLU (komponen spaCy,
+PhraseMatcher) dicatat langsung ke registry lewat MetricsRegistry.stage().
+
+Histogram memakai bucket tetap (kumulatif, gaya Prometheus) untuk agregasi lintas scrape,
+ditambah jendela sampel terakhir untuk p50/p95/p99 yang diekspor sebagai summary.
+Metrik disimpan per proses: dengan beberapa worker gunicorn, setiap worker punya angkanya sendiri.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+
+# Batas atas bucket histogram (detik)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class LatencyHistogram:
+    """Histogram latensi (bucket kumulatif + sum + count) dengan jendela sampel terakhir untuk kuantil.
+
+    Tidak thread-safe sendiri; dipakai di bawah lock MetricsRegistry.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # Bucket terakhir = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=max(1, int(window)))
+
+    def observe(self, seconds):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Kuantil dari jendela sampel terakhir. Mengembalikan {q: detik} (kosong jika belum ada sampel)."""
+        if not self.recent:
+            return {}
+        ordered = sorted(self.recent)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, max(0, int(round(q * last))))] for q in quantiles}
+
+
+class RequestTrace:
+    """Kumpulan span untuk satu giliran chat. Durasi per tahap dijumlahkan jika tahap berulang."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        if self.enabled:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class MetricsRegistry:
+    """Registry metrik thread-safe: histogram per tahap dan per intent, counter berlabel.
+
+    Args:
+        enabled (bool): False membuat semua pencatatan menjadi no-op (endpoint tetap menjawab).
+        buckets (tuple): Batas atas bucket histogram (detik).
+        window (int): Jumlah sampel terakhir per histogram untuk menghitung p50/p95/p99.
+        prefix (str): Prefix nama metrik.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, window=1024, prefix="chatbot"):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {} # (nama metrik, label) -> LatencyHistogram
+        self._counters = {} # (nama metrik, label) -> int
+        self._help = {}
+        self._started = time.time()
+        if hasattr(os, "register_at_fork"):
+            # Sampel dari proses master (warm-up saat preload) tidak ikut ke worker
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def describe(self, name, help_text):
+        self._help[f"{self.prefix}_{name}"] = help_text
+
+    def trace(self):
+        return RequestTrace(enabled=self.enabled)
+
+    def observe(self, name, seconds, **labels):
+        """Catat satu sampel latensi (detik) ke histogram `name` dengan label yang diberikan."""
+        if not self.enabled:
+            return
+        key = (f"{self.prefix}_{name}", tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(self.buckets, self.window)
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (f"{self.prefix}_{name}_total", tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def stage(self, name):
+        """Context manager yang mencatat durasi blok ke histogram stage_latency_seconds{stage=name}."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed_stage(name)
+
+    @contextlib.contextmanager
+    def _timed_stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_latency_seconds", time.perf_counter() - started, stage=name)
+
+    def observe_trace(self, trace, intent):
+        """Masukkan semua span RequestTrace ke histogram per tahap dan total latensi ke histogram per intent."""
+        if not self.enabled or not trace.enabled:
+            return
+        for stage, seconds in trace.stages.items():
+            self.observe("stage_latency_seconds", seconds, stage=stage)
+        self.observe("request_latency_seconds", trace.elapsed(), intent=intent)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._started = time.time()
+
+    def _reset_after_fork(self):
+        # Lock bisa saja sedang dipegang thread lain saat fork; buat baru di proses anak
+        self._lock = threading.Lock()
+        self.reset()
+
+    def stats(self):
+        """Ringkasan JSON: p50/p95/p99 (ms) per histogram dan nilai counter."""
+        with self._lock:
+            histograms = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                label_text = ",".join(f"{k}={v}" for k, v in labels)
+                histograms.setdefault(name, {})[label_text] = {
+                    "count": histogram.count,
+                    **{f"p{int(q * 100)}_ms": round(v * 1000, 2) for q, v in histogram.quantiles().items()},
+                }
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+        return {"enabled": self.enabled, "histograms": histograms, "counters": counters}
+
+    def render_prometheus(self):
+        """Semua metrik dalam format teks Prometheus (text/plain; version=0.0.4)."""
+        lines = []
+        with self._lock:
+            histogram_names = sorted({name for name, _ in self._histograms})
+            for name in histogram_names:
+                series = sorted((labels, h) for (n, labels), h in self._histograms.items() if n == name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(float(bound))),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+                # Kuantil dari jendela sampel terakhir diekspor sebagai summary terpisah
+                window_name = f"{name}_window"
+                lines.append(f"# HELP {window_name} p50/p95/p99 dari {self.window} sampel terakhir per seri.")
+                lines.append(f"# TYPE {window_name} summary")
+                for labels, histogram in series:
+                    for q, value in histogram.quantiles().items():
+                        lines.append(f"{window_name}{_format_labels(labels + (('quantile', str(q)),))} {_format_value(value)}")
+                    lines.append(f"{window_name}_sum{_format_labels(labels)} {_format_value(sum(histogram.recent))}")
+                    lines.append(f"{window_name}_count{_format_labels(labels)} {len(histogram.recent)}")
+
+            counter_names = sorted({name for name, _ in self._counters})
+            for name in counter_names:
+                help_key = name[:-len("_total")]
+                if help_key in self._help:
+                    lines.append(f"# HELP {name} {self._help[help_key]}")
+                lines.append(f"# TYPE {name} counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        uptime_name = f"{self.prefix}_metrics_uptime_seconds"
+        lines.append(f"# TYPE {uptime_name} gauge")
+        lines.append(f"{uptime_name} {_format_value(round(time.time() - self._started, 3))}")
+        return "\n".join(lines) + "\n"
+
+# --- END OF FILE metrics.py ---
@@ -0,0 +1,178 @@
+# --- START OF FILE nlu_batcher.py ---
+"""Micro-batching untuk request NLU yang datang bersamaan.
+
+Request /predict yang masuk hampir bersamaan (gunicorn threaded worker) ditahan
+beberapa milidetik, digabung menjadi satu panggilan nlp.pipe, lalu hasilnya
+dikembalikan ke masing-masing request yang menunggu.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class _PendingItem:
+    __slots__ = ("text", "enqueued_at", "event", "result", "error")
+
+    def __init__(self, text):
+        self.text = text
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _percentile(sorted_values, pct):
+    """Ambil persentil dari list yang sudah terurut (nearest-rank)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class MicroBatcher:
+    """Menggabungkan panggilan submit() dari banyak thread menjadi satu batch.
+
+    Args:
+        process_batch (callable): Fungsi yang menerima list item submit() dan mengembalikan
+            list hasil dengan urutan yang sama (misal: app._process_nlu_coalesced).
+        max_batch_size (int): Jumlah teks maksimum per batch.
+        max_wait_ms (float): Waktu tunggu maksimum (ms) sejak item pertama masuk
+            sebelum batch dijalankan walaupun belum penuh.
+        stats_window (int): Jumlah batch/item terakhir yang disimpan untuk statistik.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=5.0, stats_window=1024):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+
+        # Statistik untuk tuning latency/throughput
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._recent_fill = deque(maxlen=stats_window)
+        self._recent_delay_ms = deque(maxlen=stats_window)
+        self._recent_batch_ms = deque(maxlen=stats_window)
+
+        # Antrean/lock milik proses induk tidak berlaku di child hasil fork (gunicorn preload)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    # --- API publik ---
+    def submit(self, text, timeout=None):
+        """Masukkan satu teks ke antrean dan tunggu hasil dari batch-nya."""
+        self._ensure_worker()
+        item = _PendingItem(text)
+        with self._cond:
+            self._queue.append(item)
+            self._cond.notify()
+        if not item.event.wait(timeout):
+            raise TimeoutError(f"NLU batch tidak selesai dalam {timeout} detik.")
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def stats(self):
+        """Ringkasan statistik batch: fill ratio dan antrean (queueing delay)."""
+        with self._stats_lock:
+            fills = list(self._recent_fill)
+            delays = sorted(self._recent_delay_ms)
+            batch_times = sorted(self._recent_batch_ms)
+            batches, items, errors = self._batches, self._items, self._errors
+        with self._cond:
+            queue_depth = len(self._queue)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "batches_total": batches,
+            "items_total": items,
+            "errors_total": errors,
+            "queue_depth": queue_depth,
+            "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+            "fill_ratio_avg": round(items / (batches * self.max_batch_size), 4) if batches else 0.0,
+            "fill_ratio_recent": round(sum(fills) / len(fills), 4) if fills else 0.0,
+            "queue_delay_ms": {
+                "p50": round(_percentile(delays, 50), 3),
+                "p95": round(_percentile(delays, 95), 3),
+                "p99": round(_percentile(delays, 99), 3),
+                "max": round(delays[-1], 3) if delays else 0.0,
+            },
+            "batch_time_ms": {
+                "p50": round(_percentile(batch_times, 50), 3),
+                "p95": round(_percentile(batch_times, 95), 3),
+            },
+        }
+
+    # --- Worker ---
+    def _ensure_worker(self):
+        # Thread tidak ikut ter-fork; mulai ulang jika proses ini belum punya worker
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._cond:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="nlu-microbatcher", daemon=True)
+            self._worker.start()
+
+    def _reset_after_fork(self):
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def _collect_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Tunggu hingga batch penuh atau max_wait sejak item pertama terlewati
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            try:
+                results = self.process_batch([item.text for item in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"process_batch mengembalikan {len(results)} hasil untuk {len(batch)} teks.")
+                for item, result in zip(batch, results):
+                    item.result = result
+                failed = False
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+                failed = True
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._errors += 1 if failed else 0
+                self._recent_fill.append(len(batch) / self.max_batch_size)
+                self._recent_batch_ms.append((finished - started) * 1000)
+                for item in batch:
+                    self._recent_delay_ms.append((started - item.enqueued_at) * 1000)
+
+            for item in batch:
+                item.event.set()
+
+# --- END OF FILE nlu_batcher.py ---
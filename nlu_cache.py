@@ -0,0 +1,169 @@
+# --- START OF FILE nlu_cache.py ---
+"""Cache LRU + TTL untuk hasil NLU per teks yang sudah dinormalisasi.
+
+Yang disimpan hanya intent, skor, dan entitas (PRODI/LAB/PERSON), bukan Doc spaCy.
+Cache otomatis dikosongkan jika fingerprint sumbernya (direktori model,
+data/terms.json) berubah.
+"""
+
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from structured_log import get_logger
+
+logger = get_logger("nlu_cache")
+
+
+def path_fingerprint(paths):
+    """Hitung fingerprint (hash pendek) dari mtime dan ukuran file pada path yang diberikan.
+
+    Args:
+        paths (list): Daftar path file atau direktori (direktori ditelusuri rekursif).
+
+    Returns:
+        str: Hash hex 12 karakter; berubah jika ada file yang diubah, ditambah, atau dihapus.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    try:
+                        st = os.stat(file_path)
+                    except OSError:
+                        continue
+                    digest.update(f"{os.path.relpath(file_path, path)}:{st.st_mtime_ns}:{st.st_size};".encode("utf-8"))
+        else:
+            try:
+                st = os.stat(path)
+                digest.update(f"{path}:{st.st_mtime_ns}:{st.st_size};".encode("utf-8"))
+            except OSError:
+                digest.update(f"{path}:missing;".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class NLUResultCache:
+    """Cache hasil NLU yang thread-safe dengan batas ukuran (LRU) dan umur (TTL).
+
+    Args:
+        max_size (int): Jumlah entri maksimum; entri paling lama tidak dipakai dibuang lebih dulu.
+        ttl_seconds (float): Umur maksimum entri (detik). 0 atau None berarti tanpa TTL.
+        watch_paths (list): Path yang perubahannya mengosongkan cache (model dir, terms.json).
+        check_interval (float): Jeda minimum (detik) antar pengecekan fingerprint watch_paths.
+    """
+
+    def __init__(self, max_size=2048, ttl_seconds=3600, watch_paths=None, check_interval=2.0):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl_seconds) if ttl_seconds else None
+        self.watch_paths = list(watch_paths or [])
+        self.check_interval = check_interval
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = path_fingerprint(self.watch_paths) if self.watch_paths else "static"
+        self._last_check = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def version(self):
+        """Versi sumber data yang sedang di-cache (fingerprint model + terms)."""
+        self._check_invalidation()
+        return self._version
+
+    def make_key(self, normalized_text):
+        return (self.version, normalized_text)
+
+    def invalidation_check_due(self):
+        """True jika get() berikutnya akan menghitung ulang fingerprint (menelusuri watch_paths di disk)."""
+        return bool(self.watch_paths) and time.monotonic() - self._last_check >= self.check_interval
+
+    def get(self, normalized_text, check_invalidation=True):
+        """Ambil salinan hasil NLU dari cache, atau None jika tidak ada/kedaluwarsa.
+
+        Dengan check_invalidation=False, fingerprint tidak dihitung ulang (tanpa I/O disk; misal dari
+        event loop asgi.py, yang memakai invalidation_check_due() untuk menyerahkan pengecekan ke thread pool).
+        """
+        key = (self.version if check_invalidation else self._version, normalized_text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl is not None and now - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        # Salin agar pemanggil bebas memodifikasi hasil (misal menambah 'user_text')
+        return copy.deepcopy(value)
+
+    def put(self, normalized_text, nlu_result):
+        """Simpan hasil NLU (tanpa Doc) ke cache."""
+        value = {
+            "doc": None,
+            "intent": nlu_result.get("intent"),
+            "score": nlu_result.get("score", 0.0),
+            "entities": copy.deepcopy(nlu_result.get("entities", {})),
+            "all_intents": dict(nlu_result.get("all_intents", {})),
+        }
+        key = self.make_key(normalized_text)
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "version": self._version,
+                "size": size,
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _check_invalidation(self):
+        if not self.watch_paths:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        current = path_fingerprint(self.watch_paths)
+        if current != self._version:
+            with self._lock:
+                self._data.clear()
+                self._version = current
+                self.invalidations += 1
+            logger.info("Cache NLU dikosongkan karena model/terms berubah (versi %s).", current)
+
+# --- END OF FILE nlu_cache.py ---
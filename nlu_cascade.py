@@ -0,0 +1,137 @@
+# --- START OF FILE nlu_cascade.py ---
+"""Klasifikasi intent dua tingkat (cascade) untuk komponen textcat TextCatEnsemble.
+
+Tingkat 1 memakai separuh linear (TextCatBOW) dari ensemble saja: murah, hanya hashing n-gram
+dan satu perkalian sparse. Jika selisih skor intent teratas dan kedua dari model linear >= margin,
+skor tersebut langsung dipakai sebagai doc.cats. Jika tidak, Doc diteruskan ke ensemble penuh
+(tok2vec CNN + linear), sama seperti tanpa cascade.
+
+Margin dikalibrasi offline dengan calibrate_cascade.py dan disimpan sebagai cascade.json
+di direktori model (margin hanya berlaku untuk bobot model yang dikalibrasi).
+"""
+
+import json
+import os
+import threading
+
+from structured_log import get_logger
+
+logger = get_logger("nlu_cascade")
+
+CASCADE_FILE_NAME = "cascade.json"
+
+
+def find_linear_model(textcat_model):
+    """Cari sub-model linear (TextCatBOW) di dalam model TextCatEnsemble.
+
+    Ensemble dibangun sebagai (linear_model | cnn_model) >> output_layer; sub-model linear adalah
+    cabang pertama concatenate, yang mengandung layer 'sparse_linear'.
+
+    Returns:
+        thinc Model atau None jika arsitektur textcat bukan ensemble dengan cabang linear.
+    """
+    layers = getattr(textcat_model, "layers", [])
+    if len(layers) != 2 or len(layers[0].layers) != 2:
+        return None
+    linear_model = layers[0].layers[0]
+    if not any(node.name == "sparse_linear" for node in linear_model.walk()):
+        return None
+    return linear_model
+
+
+def top_two_margin(scores):
+    """(indeks teratas, selisih skor teratas dan kedua) untuk satu baris skor."""
+    order = scores.argsort()[::-1]
+    top = int(order[0])
+    second = float(scores[order[1]]) if len(order) > 1 else 0.0
+    return top, float(scores[top]) - second
+
+
+def load_cascade_config(model_dir):
+    """Baca cascade.json hasil calibrate_cascade.py dari direktori model; None jika tidak ada/rusak."""
+    path = os.path.join(model_dir, CASCADE_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        float(config["margin"])
+        return config
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("'%s' tidak valid (%s); cascade textcat tidak aktif.", path, e)
+        return None
+
+
+class CascadeTextcat:
+    """Pengganti langkah textcat pada pipeline: model linear dulu, ensemble penuh jika ragu.
+
+    Args:
+        textcat: Komponen textcat spaCy (nlp.get_pipe("textcat")) dengan model TextCatEnsemble.
+        margin (float): Selisih minimum skor teratas vs kedua (0..1) agar jalur cepat dipakai.
+        on_route (callable): Opsional, dipanggil on_route(jumlah_jalur_cepat, jumlah_ensemble) per panggilan.
+
+    Raises:
+        ValueError: Jika model textcat tidak memiliki cabang linear (bukan TextCatEnsemble).
+    """
+
+    def __init__(self, textcat, margin, on_route=None):
+        self.textcat = textcat
+        self.labels = list(textcat.labels)
+        self.margin = float(margin)
+        self.on_route = on_route
+        self.linear_model = find_linear_model(textcat.model)
+        if self.linear_model is None:
+            raise ValueError("Model textcat tidak memiliki sub-model linear (TextCatBOW) untuk cascade.")
+
+        self._lock = threading.Lock()
+        self.fast = 0
+        self.full = 0
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def __call__(self, doc):
+        """Isi doc.cats untuk satu Doc (jalur cepat atau ensemble penuh)."""
+        return self.pipe([doc])[0]
+
+    def pipe(self, docs, batch_size=None):
+        """Isi doc.cats untuk banyak Doc; hanya Doc yang ragu yang diproses ensemble penuh (per batch)."""
+        docs = list(docs)
+        if not docs:
+            return docs
+        scores = self.linear_model.ops.to_numpy(self.linear_model.predict(docs))
+        uncertain = []
+        for i, (doc, row) in enumerate(zip(docs, scores)):
+            _, margin = top_two_margin(row)
+            if margin >= self.margin:
+                doc.cats = {label: float(score) for label, score in zip(self.labels, row)}
+            else:
+                uncertain.append(i)
+        if uncertain:
+            full_docs = self.textcat.pipe([docs[i] for i in uncertain], batch_size=batch_size or len(uncertain))
+            for i, doc in zip(uncertain, full_docs):
+                docs[i] = doc
+        with self._lock:
+            self.fast += len(docs) - len(uncertain)
+            self.full += len(uncertain)
+        if self.on_route is not None:
+            self.on_route(len(docs) - len(uncertain), len(uncertain))
+        return docs
+
+    def stats(self):
+        with self._lock:
+            total = self.fast + self.full
+            return {
+                "enabled": True,
+                "margin": self.margin,
+                "fast_path": self.fast,
+                "full_ensemble": self.full,
+                "fast_path_ratio": round(self.fast / total, 4) if total else 0.0,
+            }
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self.fast = 0
+        self.full = 0
+
+# --- END OF FILE nlu_cascade.py ---
@@ -0,0 +1,465 @@
+# --- START OF FILE nlu_server.py ---
+"""Server inferensi NLU terpisah yang dipakai bersama oleh banyak worker web lewat Unix socket.
+
+Server memuat intent_model_ft_v2 dan PhraseMatcher SEKALI (lewat app.py, sehingga hasil NLU
+identik dengan mode in-process), lalu fork beberapa proses model yang menerima koneksi
+di socket yang sama. Worker web (gunicorn/ASGI) cukup memakai NLUClient dan tidak perlu
+memuat model sendiri: jumlah worker HTTP tidak lagi menentukan pemakaian memori model.
+
+Menjalankan:
+    python nlu_server.py --socket /tmp/chatbot_nlu.sock --processes 2 --pin
+    NLU_SERVER_SOCKET=/tmp/chatbot_nlu.sock gunicorn -c gunicorn.conf.py -w 16 app:app
+
+Protokol (semua integer big-endian):
+    frame     : u32 panjang payload + payload
+    request   : u32 request_id, u8 op, body
+                op 0 HELLO  -> body respons: label textcat dipisah '\\n' (utf-8)
+                op 1 NLU    -> body request: teks utf-8; body respons: hasil NLU (lihat encode_result)
+                op 2 PING   -> body kosong
+    response  : u32 request_id, u8 status (0 ok, 1 error), body (pesan error utf-8 jika status 1)
+
+Request boleh dikirim beruntun (pipelining) tanpa menunggu respons; server membalas
+sesuai urutan dan memproses frame yang tiba bersamaan sebagai satu batch nlp.pipe.
+"""
+
+import argparse
+import gc
+import os
+import queue
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+OP_HELLO, OP_NLU, OP_PING = 0, 1, 2
+STATUS_OK, STATUS_ERROR = 0, 1
+MAX_FRAME_BYTES = 1 << 20
+NO_INDEX = 0xFFFF
+NO_STRING = 0xFFFF
+ENTITY_LIST_KEYS = ("PRODI", "LAB", "MATKUL") # Entitas berupa list canonical, dikirim berurutan
+
+_LEN = struct.Struct("!I")
+_HEADER = struct.Struct("!IB")
+_U16 = struct.Struct("!H")
+_INTENT = struct.Struct("!Hd")
+_RECV_SIZE = 65536
+
+
+class NLUServerError(Exception):
+    """Server NLU tidak bisa dihubungi atau mengembalikan respons yang tidak valid."""
+
+
+# --- Encoding hasil NLU ---
+def _pack_string(value, parts):
+    if value is None:
+        parts.append(_U16.pack(NO_STRING))
+        return
+    data = value.encode("utf-8")
+    if len(data) >= NO_STRING:
+        # Potong di batas karakter: memotong bytes saja bisa membelah karakter multi-byte
+        data = data[:NO_STRING - 1].decode("utf-8", "ignore").encode("utf-8")
+    parts.append(_U16.pack(len(data)))
+    parts.append(data)
+
+
+def _unpack_string(body, offset):
+    (length,) = _U16.unpack_from(body, offset)
+    offset += _U16.size
+    if length == NO_STRING:
+        return None, offset
+    return body[offset:offset + length].decode("utf-8"), offset + length
+
+
+def encode_result(result, label_index):
+    """Hasil process_nlu() -> bytes: intent + skor, skor semua label (float64), PERSON, PRODI, LAB, MATKUL.
+
+    Doc spaCy tidak dikirim (di sisi klien "doc" bernilai None, sama seperti hasil dari cache).
+    """
+    intent = result.get("intent")
+    all_intents = result.get("all_intents") or {}
+    parts = [_INTENT.pack(label_index.get(intent, NO_INDEX), float(result.get("score", 0.0)))]
+    if all_intents and len(all_intents) == len(label_index) and all(label in label_index for label in all_intents):
+        parts.append(_U16.pack(len(label_index)))
+        parts.append(struct.pack(f"!{len(label_index)}d", *(float(all_intents[label]) for label in label_index)))
+    else:
+        parts.append(_U16.pack(0))
+    entities = result.get("entities") or {}
+    _pack_string(entities.get("PERSON"), parts)
+    for key in ENTITY_LIST_KEYS:
+        values = entities.get(key) or []
+        parts.append(_U16.pack(len(values)))
+        for value in values:
+            _pack_string(value, parts)
+    return b"".join(parts)
+
+
+def decode_result(body, labels):
+    """Kebalikan encode_result(); struktur sama dengan hasil process_nlu() in-process."""
+    intent_index, score = _INTENT.unpack_from(body, 0)
+    offset = _INTENT.size
+    (count,) = _U16.unpack_from(body, offset)
+    offset += _U16.size
+    scores = struct.unpack_from(f"!{count}d", body, offset)
+    offset += 8 * count
+    person, offset = _unpack_string(body, offset)
+    entities = {"PERSON": person}
+    for key in ENTITY_LIST_KEYS:
+        (n_values,) = _U16.unpack_from(body, offset)
+        offset += _U16.size
+        values = []
+        for _ in range(n_values):
+            value, offset = _unpack_string(body, offset)
+            values.append(value)
+        entities[key] = values
+    return {
+        "doc": None,
+        "intent": labels[intent_index] if intent_index != NO_INDEX else None,
+        "score": score,
+        "entities": entities,
+        "all_intents": dict(zip(labels, scores)) if count else {},
+    }
+
+
+def _frame(request_id, code, body=b""):
+    payload = _HEADER.pack(request_id, code) + body
+    return _LEN.pack(len(payload)) + payload
+
+
+def _split_frames(buffer):
+    """Ambil semua frame lengkap dari buffer (bytearray, dimodifikasi di tempat)."""
+    frames, offset = [], 0
+    while len(buffer) - offset >= _LEN.size:
+        (length,) = _LEN.unpack_from(buffer, offset)
+        if length > MAX_FRAME_BYTES or length < _HEADER.size:
+            raise NLUServerError(f"Frame tidak valid (panjang {length}).")
+        if len(buffer) - offset - _LEN.size < length:
+            break
+        start = offset + _LEN.size
+        frames.append(bytes(buffer[start:start + length]))
+        offset = start + length
+    del buffer[:offset]
+    return frames
+
+
+# --- Klien (dipakai worker web) ---
+class _Connection:
+    __slots__ = ("sock", "buffer", "labels", "next_id")
+
+    def __init__(self, path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.buffer = bytearray()
+        self.next_id = 1
+        try:
+            self.sock.connect(path)
+            (_, body), = self.roundtrip([(OP_HELLO, b"")])
+        except BaseException:
+            self.sock.close()
+            raise
+        self.labels = body.decode("utf-8").split("\n") if body else []
+
+    def roundtrip(self, requests):
+        """Kirim semua request sekaligus (pipelining), lalu baca respons sebanyak request."""
+        first_id = self.next_id
+        self.next_id = (self.next_id + len(requests)) & 0xFFFFFFFF
+        self.sock.sendall(b"".join(_frame((first_id + i) & 0xFFFFFFFF, op, body) for i, (op, body) in enumerate(requests)))
+        responses = []
+        while len(responses) < len(requests):
+            frames = _split_frames(self.buffer)
+            if not frames:
+                chunk = self.sock.recv(_RECV_SIZE)
+                if not chunk:
+                    raise NLUServerError("Koneksi ditutup oleh server NLU.")
+                self.buffer += chunk
+                continue
+            for payload in frames:
+                request_id, status = _HEADER.unpack_from(payload, 0)
+                if request_id != (first_id + len(responses)) & 0xFFFFFFFF:
+                    raise NLUServerError(f"Urutan respons tidak cocok (id {request_id}).")
+                responses.append((status, payload[_HEADER.size:]))
+        return responses
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class NLUClient:
+    """Klien server NLU dengan pool koneksi (maks pool_size koneksi aktif per proses).
+
+    Aman dipakai banyak thread; pool dibuat ulang setelah fork (koneksi tidak dibagi
+    antara master gunicorn dan worker).
+
+    Args:
+        path (str): Path Unix socket server.
+        pool_size (int): Maks koneksi per proses; thread berikutnya menunggu koneksi bebas.
+        timeout (float): Timeout connect/kirim/terima (detik).
+    """
+
+    def __init__(self, path, pool_size=4, timeout=5.0):
+        self.path = path
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = float(timeout)
+        self.healthy = False
+        self.last_failure_at = 0.0
+        self.requests = 0
+        self.pipelined_batches = 0
+        self.errors = 0
+        self.last_error = None
+        self._reset_pool()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_pool)
+
+    def _reset_pool(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self._open_connections = 0
+
+    @contextmanager
+    def _connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise NLUServerError(f"Semua {self.pool_size} koneksi server NLU sedang dipakai.")
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = _Connection(self.path, self.timeout)
+                with self._lock:
+                    self._open_connections += 1
+            yield conn
+            self._idle.put(conn)
+        except BaseException:
+            # Status koneksi tidak diketahui (respons bisa tertinggal di buffer): buang
+            if conn is not None:
+                conn.close()
+                with self._lock:
+                    self._open_connections -= 1
+            raise
+        finally:
+            self._slots.release()
+
+    def _call(self, requests):
+        try:
+            with self._connection() as conn:
+                responses = conn.roundtrip(requests)
+                labels = conn.labels
+        except (OSError, struct.error, UnicodeDecodeError, NLUServerError) as e:
+            self.healthy = False
+            self.last_failure_at = time.monotonic()
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise NLUServerError(self.last_error) from e
+        self.healthy = True
+        return responses, labels
+
+    def process_batch(self, texts):
+        """NLU untuk banyak teks lewat satu koneksi (request dikirim beruntun tanpa menunggu)."""
+        if not texts:
+            return []
+        responses, labels = self._call([(OP_NLU, text.encode("utf-8")) for text in texts])
+        self.requests += len(texts)
+        if len(texts) > 1:
+            self.pipelined_batches += 1
+        results = []
+        for status, body in responses:
+            if status != STATUS_OK:
+                raise NLUServerError(body.decode("utf-8", "replace"))
+            results.append(decode_result(body, labels))
+        return results
+
+    def process(self, text):
+        return self.process_batch([text])[0]
+
+    def ping(self):
+        self._call([(OP_PING, b"")])
+        return True
+
+    def available(self, retry_interval=1.0):
+        """True jika server terakhir kali merespons; setelah gagal, ping ulang paling sering tiap retry_interval detik."""
+        if self.healthy:
+            return True
+        if time.monotonic() - self.last_failure_at < retry_interval:
+            return False
+        try:
+            return self.ping()
+        except NLUServerError:
+            return False
+
+    def wait_until_ready(self, timeout):
+        """Coba ping sampai berhasil atau timeout habis. Mengembalikan True jika server siap."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.ping()
+            except NLUServerError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.25)
+
+    def stats(self):
+        return {
+            "socket": self.path,
+            "healthy": self.healthy,
+            "pool_size": self.pool_size,
+            "open_connections": self._open_connections,
+            "idle_connections": self._idle.qsize(),
+            "requests": self.requests,
+            "pipelined_batches": self.pipelined_batches,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+# --- Server ---
+def _handle_frames(frames, labels, label_index, infer_lock, app_module):
+    """Proses semua frame yang tiba bersamaan; teks NLU dijalankan sebagai satu batch."""
+    requests = [_HEADER.unpack_from(payload, 0) + (payload[_HEADER.size:],) for payload in frames]
+    texts = [body.decode("utf-8", "replace") for _, op, body in requests if op == OP_NLU]
+    results = []
+    if texts:
+        with infer_lock:
+            results = app_module.process_nlu_batch(texts)
+    result_iter = iter(results)
+    out = []
+    for request_id, op, _ in requests:
+        if op == OP_NLU:
+            out.append(_frame(request_id, STATUS_OK, encode_result(next(result_iter), label_index)))
+        elif op == OP_HELLO:
+            out.append(_frame(request_id, STATUS_OK, "\n".join(labels).encode("utf-8")))
+        elif op == OP_PING:
+            out.append(_frame(request_id, STATUS_OK))
+        else:
+            out.append(_frame(request_id, STATUS_ERROR, f"Operasi {op} tidak dikenal.".encode("utf-8")))
+    return b"".join(out)
+
+
+def _serve_connection(conn, labels, label_index, infer_lock, app_module):
+    buffer = bytearray()
+    with conn:
+        while True:
+            try:
+                chunk = conn.recv(_RECV_SIZE)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            try:
+                frames = _split_frames(buffer)
+            except NLUServerError as e:
+                print(f"WARNING: Koneksi NLU ditutup: {e}")
+                return
+            if frames:
+                try:
+                    conn.sendall(_handle_frames(frames, labels, label_index, infer_lock, app_module))
+                except OSError:
+                    return
+                except Exception as e:
+                    print(f"ERROR: Gagal memproses frame NLU: {e}")
+                    traceback.print_exc()
+                    return
+
+
+def _worker_main(listener, labels, app_module, cpu=None):
+    """Loop accept di proses model; satu thread per koneksi, inferensi diserialkan per proses."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    app_module.DATA_STORE.start_watching() # terms.json yang berubah tetap membangun ulang PhraseMatcher
+    label_index = {label: i for i, label in enumerate(labels)}
+    infer_lock = threading.Lock()
+    print(f"INFO: Proses model NLU {os.getpid()} siap" + (f" (CPU {cpu})." if cpu is not None else "."))
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=_serve_connection, args=(conn, labels, label_index, infer_lock, app_module),
+                         name="nlu-conn", daemon=True).start()
+
+
+def serve(socket_path, processes=1, pin=False):
+    """Muat model sekali, lalu fork `processes` proses model yang melayani socket yang sama."""
+    # Server sendiri selalu memakai model in-process
+    os.environ["NLU_SERVER_SOCKET"] = ""
+    os.environ["APP_STARTUP_MODE"] = "eager"
+    import app as app_module
+
+    if not app_module.nlp:
+        print("FATAL ERROR: Model NLP gagal dimuat; server NLU tidak dijalankan.")
+        return 1
+    labels = list(app_module.nlp.get_pipe("textcat").labels) if "textcat" in app_module.nlp.pipe_names else []
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    os.chmod(socket_path, 0o660)
+    listener.listen(256)
+
+    # Seperti preload gunicorn: model dipakai bersama proses anak lewat copy-on-write
+    gc.collect()
+    gc.freeze()
+    cpus = sorted(os.sched_getaffinity(0)) if pin and hasattr(os, "sched_getaffinity") else []
+    children = {}
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker_main(listener, labels, app_module, cpus[slot % len(cpus)] if cpus else None)
+            finally:
+                os._exit(1)
+        children[pid] = slot
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"INFO: Server NLU mendengarkan di '{socket_path}' dengan {processes} proses model ({len(labels)} label).")
+    try:
+        for slot in range(processes):
+            spawn(slot)
+        while True:
+            pid, status = os.wait()
+            slot = children.pop(pid, None)
+            if slot is not None:
+                print(f"WARNING: Proses model NLU {pid} berhenti (status {status}); dijalankan ulang.")
+                time.sleep(1.0)
+                spawn(slot)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print("INFO: Server NLU berhenti.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server inferensi NLU bersama (Unix socket) untuk worker web.")
+    parser.add_argument("--socket", default=os.environ.get("NLU_SERVER_SOCKET") or "/tmp/chatbot_nlu.sock",
+                        help="Path Unix socket.")
+    parser.add_argument("--processes", type=int, default=int(os.environ.get("NLU_SERVER_PROCESSES", 1)),
+                        help="Jumlah proses model.")
+    parser.add_argument("--pin", action="store_true", help="Pin setiap proses model ke satu CPU (Linux).")
+    args = parser.parse_args()
+    sys.exit(serve(args.socket, max(1, args.processes), args.pin))
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE nlu_server.py ---
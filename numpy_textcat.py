@@ -0,0 +1,468 @@
+# --- START OF FILE numpy_textcat.py ---
+"""Scorer textcat murni NumPy dari bobot yang diekspor export_textcat_numpy.py (tanpa spaCy/thinc).
+
+Mereproduksi doc.cats komponen textcat TextCatEnsemble.v2 pada intent_model_ft_v2:
+- tokenizer spaCy (special case, prefix/suffix/infix, token_match/url_match) dan atribut
+  leksikal NORM/LOWER/PREFIX/SUFFIX/SHAPE, dengan hash string MurmurHash64A (seed 1)
+  seperti StringStore spaCy,
+- cabang CNN: HashEmbed (MurmurHash3 x64 128-bit, 4 baris per kunci) -> Maxout+LayerNorm,
+  MaxoutWindowEncoder (residual expand_window -> Maxout -> LayerNorm) dengan padding antar-doc
+  seperti with_array thinc, ParametricAttention -> reduce_sum -> residual Maxout+LayerNorm,
+- cabang linear: unigram ORTH -> SparseLinear (MurmurHash3 x86 32-bit, dua bucket per kunci)
+  -> softmax, dengan bobot yang disimpan hanya untuk bucket yang tidak nol,
+- layer output softmax atas gabungan kedua cabang.
+
+Contoh:
+    from numpy_textcat import NumpyTextcat
+    scorer = NumpyTextcat.load("intent_model_ft_v2/textcat_numpy.npz")
+    scorer("berapa spp informatika")  # -> {"info_spp_ft": 0.99, ...}
+
+Catatan: pass terakhir tokenizer spaCy (_apply_special_cases, special case yang baru cocok
+setelah pemisahan afiks) tidak direproduksi; benchmark_numpy_textcat.py melaporkan token yang berbeda.
+"""
+
+import json
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+FORMAT_VERSION = 1
+ORTH, NORM = 65, 67 # ID atribut spaCy (spacy.attrs) yang dipakai di special case tokenizer
+
+_U64 = np.uint64
+_U32 = np.uint32
+_MASK64 = (1 << 64) - 1
+TOKEN_CACHE_SIZE = 50000 # Token unik (orth, norm) yang vektor embed/linear-nya disimpan; cache dikosongkan saat penuh
+
+
+# --- Hash (harus identik bit-per-bit dengan murmurhash/thinc) ---
+def murmurhash64a(data, seed=1):
+    """MurmurHash64A (hash64 pustaka murmurhash) atas bytes; dipakai StringStore spaCy dengan seed 1."""
+    m = 0xc6a4a7935bd1e995
+    r = 47
+    length = len(data)
+    h = (seed ^ (length * m)) & _MASK64
+    n_blocks = length // 8
+    for i in range(n_blocks):
+        k = int.from_bytes(data[i * 8:i * 8 + 8], "little")
+        k = (k * m) & _MASK64
+        k ^= k >> r
+        k = (k * m) & _MASK64
+        h ^= k
+        h = (h * m) & _MASK64
+    tail = data[n_blocks * 8:]
+    if tail:
+        h ^= int.from_bytes(tail, "little")
+        h = (h * m) & _MASK64
+    h ^= h >> r
+    h = (h * m) & _MASK64
+    h ^= h >> r
+    return h
+
+
+def _fmix64(k):
+    k ^= k >> _U64(33)
+    k *= _U64(0xff51afd7ed558ccd)
+    k ^= k >> _U64(33)
+    k *= _U64(0xc4ceb9fe1a85ec53)
+    k ^= k >> _U64(33)
+    return k
+
+
+def murmurhash3_128_uint64(keys, seed):
+    """Versi vektor MurmurHash3_x86_128_uint64 thinc (NumpyOps.hash): uint64[N] -> uint32[N, 4]."""
+    h1 = keys.astype(_U64) * _U64(0x87c37b91114253d5)
+    h1 = (h1 << _U64(31)) | (h1 >> _U64(33))
+    h1 *= _U64(0x4cf5ad432745937f)
+    h1 ^= _U64(seed)
+    h1 ^= _U64(8)
+    h2 = np.full_like(h1, _U64(seed) ^ _U64(8))
+    h1 += h2
+    h2 += h1
+    h1 = _fmix64(h1)
+    h2 = _fmix64(h2)
+    h1 += h2
+    h2 += h1
+    out = np.empty((len(keys), 4), dtype=_U32)
+    out[:, 0] = h1 & _U64(0xffffffff)
+    out[:, 1] = h1 >> _U64(32)
+    out[:, 2] = h2 & _U64(0xffffffff)
+    out[:, 3] = h2 >> _U64(32)
+    return out
+
+
+def murmurhash3_32_uint64(keys, seed):
+    """Versi vektor MurmurHash3_x86_32_uint64 (SparseLinear thinc): uint64[N] -> uint32[N]."""
+    c1, c2 = _U32(0xcc9e2d51), _U32(0x1b873593)
+    h1 = np.full(keys.shape, seed, dtype=_U32)
+    for k1 in ((keys & _U64(0xffffffff)).astype(_U32), (keys >> _U64(32)).astype(_U32)):
+        k1 = k1 * c1
+        k1 = (k1 << _U32(15)) | (k1 >> _U32(17))
+        k1 = k1 * c2
+        h1 ^= k1
+        h1 = (h1 << _U32(13)) | (h1 >> _U32(19))
+        h1 = h1 * _U32(5) + _U32(0xe6546b64)
+    h1 ^= _U32(8)
+    h1 ^= h1 >> _U32(16)
+    h1 *= _U32(0x85ebca6b)
+    h1 ^= h1 >> _U32(13)
+    h1 *= _U32(0xc2b2ae35)
+    h1 ^= h1 >> _U32(16)
+    return h1
+
+
+# --- Atribut leksikal (spacy.lang.lex_attrs) ---
+def word_shape(text):
+    """Sama dengan spacy.lang.lex_attrs.word_shape."""
+    if len(text) >= 100:
+        return "LONG"
+    shape = []
+    last = ""
+    seq = 0
+    for char in text:
+        if char.isalpha():
+            shape_char = "X" if char.isupper() else "x"
+        elif char.isdigit():
+            shape_char = "d"
+        else:
+            shape_char = char
+        if shape_char == last:
+            seq += 1
+        else:
+            seq = 0
+            last = shape_char
+        if seq < 4:
+            shape.append(shape_char)
+    return "".join(shape)
+
+
+class SpacyStyleTokenizer:
+    """Port algoritme Tokenizer spaCy (_tokenize_affixes, _split_affixes, _attach_tokens).
+
+    Token dikembalikan sebagai pasangan (orth, norm_atau_None); norm hanya terisi dari special case.
+    """
+
+    def __init__(self, config):
+        self.specials = {key: [tuple(token) for token in tokens] for key, tokens in config["specials"]}
+        self.prefix_search = self._compile(config.get("prefix"), "search")
+        self.suffix_search = self._compile(config.get("suffix"), "search")
+        self.infix_finditer = self._compile(config.get("infix"), "finditer")
+        self.token_match = self._compile(config.get("token_match"), "match")
+        self.url_match = self._compile(config.get("url_match"), "match")
+
+    @staticmethod
+    def _compile(spec, method):
+        if not spec:
+            return None
+        return getattr(re.compile(spec["pattern"], spec.get("flags", 0)), method)
+
+    def __call__(self, text):
+        tokens = []
+        if not text:
+            return tokens
+        start = 0
+        in_ws = text[0].isspace()
+        for i, char in enumerate(text):
+            if char.isspace() != in_ws:
+                if start < i:
+                    self._tokenize_span(text[start:i], tokens)
+                start = i + 1 if char == " " else i
+                in_ws = not in_ws
+        if start < len(text):
+            self._tokenize_span(text[start:], tokens)
+        return tokens
+
+    def _tokenize_span(self, span, tokens):
+        special = self.specials.get(span)
+        if special is not None:
+            tokens.extend(special)
+            return
+        prefixes, suffixes = [], []
+        string = self._split_affixes(span, prefixes, suffixes)
+        tokens.extend((prefix, None) for prefix in prefixes)
+        if string:
+            special = self.specials.get(string)
+            if special is not None:
+                tokens.extend(special)
+            elif (self.token_match and self.token_match(string)) or (self.url_match and self.url_match(string)):
+                tokens.append((string, None))
+            else:
+                matches = list(self.infix_finditer(string)) if self.infix_finditer else []
+                if not matches:
+                    tokens.append((string, None))
+                else:
+                    start = 0
+                    for match in matches:
+                        infix_start, infix_end = match.start(), match.end()
+                        if infix_start == 0:
+                            continue
+                        if infix_start != start:
+                            tokens.append((string[start:infix_start], None))
+                        if infix_start != infix_end:
+                            tokens.append((string[infix_start:infix_end], None))
+                        start = infix_end
+                    if string[start:]:
+                        tokens.append((string[start:], None))
+        tokens.extend((suffix, None) for suffix in reversed(suffixes))
+
+    def _find(self, search, string):
+        if search is None:
+            return 0
+        match = search(string)
+        return match.end() - match.start() if match is not None else 0
+
+    def _split_affixes(self, string, prefixes, suffixes):
+        last_size = 0
+        while string and len(string) != last_size:
+            if self.token_match and self.token_match(string):
+                break
+            if string in self.specials:
+                break
+            last_size = len(string)
+            pre_len = self._find(self.prefix_search, string)
+            if pre_len:
+                prefix = string[:pre_len]
+                minus_pre = string[pre_len:]
+                if minus_pre and minus_pre in self.specials:
+                    string = minus_pre
+                    prefixes.append(prefix)
+                    break
+            suf_len = self._find(self.suffix_search, string[pre_len:])
+            if suf_len:
+                suffix = string[-suf_len:]
+                minus_suf = string[:-suf_len]
+                if minus_suf and minus_suf in self.specials:
+                    string = minus_suf
+                    suffixes.append(suffix)
+                    break
+            if pre_len and suf_len and (pre_len + suf_len) <= len(string):
+                string = string[pre_len:-suf_len]
+                prefixes.append(prefix)
+                suffixes.append(suffix)
+            elif pre_len:
+                string = minus_pre
+                prefixes.append(prefix)
+            elif suf_len:
+                string = minus_suf
+                suffixes.append(suffix)
+        return string
+
+
+# --- Layer ---
+def _maxout(X, W, b):
+    n_out, n_pieces, n_in = W.shape
+    Y = X @ W.reshape(n_out * n_pieces, n_in).T
+    Y += b.reshape(n_out * n_pieces)
+    return Y.reshape(X.shape[0], n_out, n_pieces).max(axis=-1)
+
+
+def _layer_norm(X, G, b):
+    mu = X.mean(axis=1, keepdims=True)
+    var = X.var(axis=1, keepdims=True) + 1e-08
+    return (X - mu) * var ** (-1.0 / 2.0) * G + b
+
+
+def _expand_window(X, window):
+    """seq2col thinc: [x[i-window] .. x[i] .. x[i+window]] dengan nol di tepi."""
+    if window == 0:
+        return X
+    n, width = X.shape
+    padded = np.zeros((n + 2 * window, width), dtype=X.dtype)
+    padded[window:window + n] = X
+    return np.concatenate([padded[offset:offset + n] for offset in range(2 * window + 1)], axis=1)
+
+
+def _softmax(X):
+    shifted = X - X.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class NumpyTextcat:
+    """Scorer textcat dari file .npz hasil export_textcat_numpy.py.
+
+    Args:
+        meta (dict): Metadata ekspor (label, konfigurasi layer, tokenizer, tabel norm/simbol).
+        arrays (dict): Bobot layer (nama -> numpy.ndarray).
+    """
+
+    def __init__(self, meta, arrays):
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Format ekspor {meta.get('format_version')} tidak didukung (butuh {FORMAT_VERSION}).")
+        self.meta = meta
+        self.labels = list(meta["labels"])
+        self.tokenizer = SpacyStyleTokenizer(meta["tokenizer"])
+        self.base_norms = meta.get("base_norms", {})
+        self.lexeme_norms = meta.get("lexeme_norm", {})
+        self.symbols = meta.get("symbols", {})
+        self.feature_attrs = meta["embed"]["attrs"]
+        self.seeds = meta["embed"]["seeds"]
+        self.window = meta["encode"]["window_size"]
+        self.depth = meta["encode"]["depth"]
+        self.pad = meta["encode"]["pad"]
+        self.linear_length = meta["linear"]["length"]
+        self.output_normalize = meta["output"].get("normalize", True)
+        self.output_temperature = meta["output"].get("temperature", 1.0)
+
+        self.tables = [arrays[f"embed_E{i}"] for i in range(len(self.feature_attrs))]
+        self.embed_maxout = (arrays["embed_maxout_W"], arrays["embed_maxout_b"])
+        self.embed_norm = (arrays["embed_ln_G"], arrays["embed_ln_b"])
+        self.encode_layers = [
+            ((arrays[f"encode{d}_maxout_W"], arrays[f"encode{d}_maxout_b"]), (arrays[f"encode{d}_ln_G"], arrays[f"encode{d}_ln_b"]))
+            for d in range(self.depth)
+        ]
+        self.attention_Q = arrays["attention_Q"]
+        self.cnn_maxout = (arrays["cnn_maxout_W"], arrays["cnn_maxout_b"])
+        self.cnn_norm = (arrays["cnn_ln_G"], arrays["cnn_ln_b"])
+        self.linear_buckets = arrays["linear_buckets"]
+        self.linear_W = arrays["linear_W"]
+        self.linear_b = arrays["linear_b"]
+        self.output_W = arrays["output_W"]
+        self.output_b = arrays["output_b"]
+        self.string_id = lru_cache(maxsize=65536)(self._string_id)
+        self._token_cache = {}
+        self._token_cache_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Muat scorer dari file .npz (tanpa pickle)."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta_json"]))
+            arrays = {name: data[name] for name in data.files if name != "meta_json"}
+        return cls(meta, arrays)
+
+    # --- Fitur token ---
+    def _string_id(self, string):
+        """ID string seperti StringStore.add spaCy: simbol bawaan dulu, selain itu hash64(utf8, seed 1)."""
+        symbol = self.symbols.get(string)
+        if symbol is not None:
+            return symbol
+        return murmurhash64a(string.encode("utf8"), 1)
+
+    def _attr_string(self, attr, orth, norm):
+        if attr == "ORTH":
+            return orth
+        if attr == "LOWER":
+            return orth.lower()
+        if attr == "NORM":
+            if norm is not None:
+                return norm
+            if orth in self.lexeme_norms:
+                return self.lexeme_norms[orth]
+            return self.base_norms.get(orth, orth.lower())
+        if attr == "PREFIX":
+            return orth[:1]
+        if attr == "SUFFIX":
+            return orth[-3:]
+        if attr == "SHAPE":
+            return word_shape(orth)
+        raise ValueError(f"Atribut fitur '{attr}' tidak didukung.")
+
+    def token_features(self, text):
+        """(token [(orth, norm)], ID fitur uint64[n, n_attr], ID ORTH uint64[n]) untuk satu teks."""
+        tokens = self.tokenizer(text)
+        features = np.array(
+            [[self.string_id(self._attr_string(attr, orth, norm)) for attr in self.feature_attrs] for orth, norm in tokens],
+            dtype=_U64,
+        ).reshape(len(tokens), len(self.feature_attrs))
+        orths = np.array([self.string_id(orth) for orth, _ in tokens], dtype=_U64)
+        return tokens, features, orths
+
+    # --- Forward ---
+    def _token_vectors(self, tokens):
+        """(embedding CNN float32[n, width], kontribusi SparseLinear float32[n, n_label]) per token.
+
+        Keduanya hanya bergantung pada token itu sendiri (embed: HashEmbed -> Maxout -> LayerNorm per
+        baris; linear: jumlah baris W bucket unigram ORTH), jadi dihitung sekali per token unik lalu
+        disimpan di cache; hanya token baru yang di-hash dan di-embed (sekaligus satu batch).
+
+        Vektor untuk panggilan ini dikumpulkan di dict lokal; cache bersama hanya diubah (digabung atau
+        dikosongkan) di bawah lock, jadi predict() aman dipanggil dari beberapa thread.
+        """
+        vectors = {}
+        for token in tokens:
+            if token not in vectors:
+                row = self._token_cache.get(token)
+                if row is not None:
+                    vectors[token] = row
+        missing = list({token for token in tokens if token not in vectors})
+        if missing:
+            features = np.array(
+                [[self.string_id(self._attr_string(attr, orth, norm)) for attr in self.feature_attrs] for orth, norm in missing],
+                dtype=_U64,
+            )
+            orths = np.array([self.string_id(orth) for orth, _ in missing], dtype=_U64)
+            computed = {token: (embedded, linear)
+                        for token, embedded, linear in zip(missing, self._embed(features), self._linear_rows(orths))}
+            vectors.update(computed)
+            with self._token_cache_lock:
+                if len(self._token_cache) + len(computed) > TOKEN_CACHE_SIZE:
+                    self._token_cache.clear()
+                self._token_cache.update(computed)
+        cached = [vectors[token] for token in tokens]
+        return np.stack([row[0] for row in cached]), np.stack([row[1] for row in cached])
+
+    def _embed(self, features):
+        parts = []
+        for column, (table, seed) in enumerate(zip(self.tables, self.seeds)):
+            keys = murmurhash3_128_uint64(features[:, column], seed) % _U32(table.shape[0])
+            parts.append(table[keys].sum(axis=1))
+        X = _maxout(np.concatenate(parts, axis=1), *self.embed_maxout)
+        return _layer_norm(X, *self.embed_norm)
+
+    def _linear_rows(self, orths):
+        """Baris bobot SparseLinear untuk setiap ID ORTH (dua bucket per kunci, bucket nol dilewati)."""
+        rows = np.zeros((len(orths), len(self.labels)), dtype=np.float32)
+        n_buckets = len(self.linear_buckets)
+        for seed in (0, 1):
+            buckets = murmurhash3_32_uint64(orths, seed) % _U32(self.linear_length)
+            positions = np.searchsorted(self.linear_buckets, buckets)
+            found = positions < n_buckets
+            found[found] = self.linear_buckets[positions[found]] == buckets[found]
+            rows[found] += self.linear_W[positions[found]]
+        return rows
+
+    def _encode(self, X, lengths):
+        """Encoder CNN atas semua doc sekaligus, dengan `pad` baris nol di antara doc (with_array thinc)."""
+        n_docs, width = len(lengths), X.shape[1]
+        rows = np.arange(len(X)) + self.pad * (np.arange(n_docs) + 1).repeat(lengths)
+        padded = np.zeros((int(lengths.sum()) + self.pad * (n_docs + 1), width), dtype=np.float32)
+        padded[rows] = X
+        for maxout, norm in self.encode_layers:
+            padded = padded + _layer_norm(_maxout(_expand_window(padded, self.window), *maxout), *norm)
+        return padded[rows]
+
+    def _cnn(self, X, lengths):
+        X = self._encode(X, lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths[:-1])))
+        logits = np.clip(X @ self.attention_Q, -20.0, 20.0)
+        attention = np.exp(logits)
+        attention /= np.add.reduceat(attention, starts).repeat(lengths)
+        pooled = np.add.reduceat(X * attention[:, None], starts, axis=0)
+        return pooled + _layer_norm(_maxout(pooled, *self.cnn_maxout), *self.cnn_norm)
+
+    def predict(self, texts):
+        """Skor semua label untuk setiap teks: float32[len(texts), n_label] (urutan = self.labels)."""
+        scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        docs_tokens = [self.tokenizer(text) for text in texts]
+        non_empty = [i for i, tokens in enumerate(docs_tokens) if tokens]
+        if not non_empty:
+            return scores
+        lengths = np.array([len(docs_tokens[i]) for i in non_empty])
+        X, linear_rows = self._token_vectors([token for i in non_empty for token in docs_tokens[i]])
+        starts = np.concatenate(([0], np.cumsum(lengths[:-1])))
+        linear = _softmax(np.add.reduceat(linear_rows, starts, axis=0) + self.linear_b)
+        hidden = np.concatenate([linear, self._cnn(X, lengths)], axis=1)
+        logits = hidden @ self.output_W.T + self.output_b
+        if self.output_normalize:
+            logits = _softmax(logits / self.output_temperature)
+        scores[non_empty] = logits
+        return scores
+
+    def __call__(self, text):
+        """doc.cats untuk satu teks: {label: skor}."""
+        return {label: float(score) for label, score in zip(self.labels, self.predict([text])[0])}
+
+# --- END OF FILE numpy_textcat.py ---
@@ -0,0 +1,79 @@
+# --- START OF FILE response_cache.py ---
+"""Cache LRU untuk respons handler intent yang deterministik.
+
+Key disusun oleh intent_logic dari input yang sudah dinormalisasi (intent, PRODI, LAB,
+flag kata kunci). Isi cache terikat ke DATA_VERSION snapshot data: begitu versi
+snapshot berubah (hot reload), seluruh entri dibuang.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Cache respons (teks, kategori) yang thread-safe dan dikosongkan per versi snapshot data.
+
+    Args:
+        max_size (int): Jumlah entri maksimum; entri paling lama tidak dipakai dibuang lebih dulu.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max(1, int(max_size))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_version(self, data_version):
+        # Dipanggil dengan lock dipegang
+        if data_version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = data_version
+
+    def get(self, key, data_version):
+        """Ambil nilai untuk key (intent_logic: template respons, kategori, variasi acak), atau None."""
+        with self._lock:
+            self._sync_version(data_version)
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, data_version, value):
+        with self._lock:
+            self._sync_version(data_version)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "data_version": self._version,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# --- END OF FILE response_cache.py ---
@@ -0,0 +1,220 @@
+# --- START OF FILE serving_bundle.py ---
+"""Bundle serving satu file: model spaCy, pola PhraseMatcher + entity_details, dan data/.
+
+Dibangun sekali dengan build_bundle.py lalu dibaca worker lewat SERVING_BUNDLE (lihat app.py),
+sehingga worker tidak perlu memuat direktori model, menokenisasi ulang pola matcher satu per satu,
+dan mem-parse ulang setiap file JSON. Semua worker yang membuka file yang sama melaporkan
+content_hash yang sama (/readyz), jadi versi yang dilayani bisa dibuktikan.
+
+Format (little-endian):
+    MAGIC (8 byte) | panjang header (uint32) | header JSON | padding | section ...
+Setiap section dimulai di offset kelipatan SECTION_ALIGN (relatif ke awal area section) sehingga
+bisa dibaca langsung dari mmap. Header mencatat nama, offset, panjang, dan sha256 setiap section.
+content_hash adalah sha256 atas (format_version, nama + sha256 section) sehingga input yang sama
+selalu menghasilkan hash yang sama (waktu build tidak ikut di-hash).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+
+from spacy import util as spacy_util
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
+from thinc.api import Config
+
+BUNDLE_MAGIC = b"CBBUNDLE"
+BUNDLE_FORMAT_VERSION = 1
+SECTION_ALIGN = 4096 # Section rata halaman agar bisa di-mmap tanpa salinan
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+class BundleError(ValueError):
+    """Bundle tidak valid: magic/versi tidak cocok, section hilang, atau checksum berbeda."""
+
+
+# --- Pola PhraseMatcher (dipakai app.py saat startup/reload dan build_bundle.py) ---
+def compile_entity_patterns(nlp_model, terms_data):
+    """Tokenisasi semua variasi PRODI/LAB dari terms.json menjadi entri pola siap pakai.
+
+    Returns:
+        list: Entri {"match_id", "label", "canonical", "patterns": [[token, ...], ...]}.
+    """
+    entries = []
+    for section, label in (("prodi", "PRODI"), ("lab", "LAB")):
+        terms = terms_data.get(section, {}) if isinstance(terms_data, dict) else {}
+        if not isinstance(terms, dict):
+            continue
+        for canonical, variations in terms.items():
+            if not isinstance(variations, list): continue
+            patterns = [[token.text for token in nlp_model.make_doc(text)] for text in variations if isinstance(text, str) and text.strip()]
+            if not patterns:
+                continue
+            if label == "PRODI":
+                match_id = f"PRODI_{canonical.replace(' ', '_').replace('&', 'and').upper()}"
+            else:
+                safe_canonical = re.sub(r'\W+', '_', canonical) # Make key safer
+                match_id = f"LAB_{safe_canonical.upper()}"
+            entries.append({"match_id": match_id, "label": label, "canonical": canonical, "patterns": patterns})
+    return entries
+
+
+def build_phrase_matcher(vocab, entries):
+    """(PhraseMatcher LOWER, entity_details match_id -> {"label", "canonical"}) dari entri pola."""
+    matcher = PhraseMatcher(vocab, attr='LOWER')
+    details = {}
+    for entry in entries:
+        matcher.add(entry["match_id"], [Doc(vocab, words=words) for words in entry["patterns"]])
+        details[entry["match_id"]] = {"label": entry["label"], "canonical": entry["canonical"]}
+    return matcher, details
+
+
+# --- Tulis ---
+def _content_hash(sections):
+    manifest = json.dumps({"format_version": BUNDLE_FORMAT_VERSION, "sections": [[s["name"], s["sha256"]] for s in sections]})
+    return hashlib.sha256(manifest.encode("utf-8")).hexdigest()
+
+
+def _align(offset):
+    return -(-offset // SECTION_ALIGN) * SECTION_ALIGN
+
+
+def write_bundle(path, sections, meta=None):
+    """Tulis bundle ke `path` (atomik lewat file sementara).
+
+    Args:
+        path (str): File tujuan.
+        sections (list): List (nama, bytes) dalam urutan yang diinginkan.
+        meta (dict): Info tambahan di header (sumber model, waktu build, versi spaCy, ...).
+
+    Returns:
+        dict: Header yang ditulis (termasuk content_hash).
+    """
+    entries, offset = [], 0
+    for name, payload in sections:
+        entries.append({"name": name, "offset": offset, "length": len(payload), "sha256": hashlib.sha256(payload).hexdigest()})
+        offset = _align(offset + len(payload))
+    header = dict(meta or {}, format_version=BUNDLE_FORMAT_VERSION, content_hash=_content_hash(entries), sections=entries)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(BUNDLE_MAGIC) + _HEADER_LENGTH.size + len(header_bytes))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC + _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+        for entry, (_, payload) in zip(entries, sections):
+            f.seek(data_start + entry["offset"])
+            f.write(payload)
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return header
+
+
+# --- Baca ---
+class ServingBundle:
+    """Bundle yang sudah dibuka (read-only mmap). Buat dengan ServingBundle.open(path).
+
+    Section dibaca langsung dari mmap; halaman file dibagi page cache OS antar-worker.
+    """
+
+    def __init__(self, path, mapped, header, data_start):
+        self.path = path
+        self.header = header
+        self.content_hash = header["content_hash"]
+        self._mapped = mapped
+        self._data_start = data_start
+        self._sections = {entry["name"]: entry for entry in header["sections"]}
+
+    @classmethod
+    def open(cls, path, verify=True):
+        """Buka dan validasi bundle.
+
+        Args:
+            path (str): File bundle hasil build_bundle.py.
+            verify (bool): Cocokkan sha256 setiap section dan content_hash (disarankan; ~ms per 10 MB).
+
+        Raises:
+            OSError: File tidak bisa dibuka.
+            BundleError: Format, versi, atau checksum tidak valid.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            prefix = len(BUNDLE_MAGIC) + _HEADER_LENGTH.size
+            if len(mapped) < prefix or mapped[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+                raise BundleError(f"'{path}' bukan bundle serving (magic tidak cocok).")
+            (header_length,) = _HEADER_LENGTH.unpack(mapped[len(BUNDLE_MAGIC):prefix])
+            try:
+                header = json.loads(mapped[prefix:prefix + header_length].decode("utf-8"))
+            except ValueError as e:
+                raise BundleError(f"Header bundle '{path}' rusak: {e}") from e
+            if header.get("format_version") != BUNDLE_FORMAT_VERSION:
+                raise BundleError(f"Format bundle {header.get('format_version')} tidak didukung (butuh {BUNDLE_FORMAT_VERSION}).")
+            bundle = cls(path, mapped, header, _align(prefix + header_length))
+            for entry in header["sections"]:
+                if bundle._data_start + entry["offset"] + entry["length"] > len(mapped):
+                    raise BundleError(f"Section '{entry['name']}' terpotong; file bundle tidak lengkap.")
+            if verify:
+                bundle.verify()
+            return bundle
+        except Exception:
+            mapped.close()
+            raise
+
+    def verify(self):
+        """Cocokkan sha256 setiap section dan content_hash dengan header; BundleError jika berbeda."""
+        for entry in self.header["sections"]:
+            if hashlib.sha256(self.section(entry["name"])).hexdigest() != entry["sha256"]:
+                raise BundleError(f"Checksum section '{entry['name']}' tidak cocok; bundle rusak.")
+        if _content_hash(self.header["sections"]) != self.content_hash:
+            raise BundleError("content_hash tidak cocok dengan daftar section.")
+
+    def has_section(self, name):
+        return name in self._sections
+
+    def section(self, name):
+        """Isi section sebagai memoryview atas mmap (tanpa salinan)."""
+        entry = self._sections.get(name)
+        if entry is None:
+            raise BundleError(f"Section '{name}' tidak ada di bundle.")
+        start = self._data_start + entry["offset"]
+        return memoryview(self._mapped)[start:start + entry["length"]]
+
+    def json_section(self, name):
+        return json.loads(bytes(self.section(name)).decode("utf-8"))
+
+    def load_nlp(self):
+        """Bangun pipeline spaCy dari config dan bytes model di bundle."""
+        config = Config().from_str(bytes(self.section("nlp_config")).decode("utf-8"))
+        nlp = spacy_util.load_model_from_config(config, auto_fill=False, validate=False)
+        return nlp.from_bytes(bytes(self.section("nlp")))
+
+    def entity_patterns(self):
+        return self.json_section("entity_patterns")
+
+    def data_files(self):
+        """Isi data/ yang dibundel: nama file -> hasil parse JSON atau teks."""
+        return self.json_section("data")
+
+    def cascade_config(self):
+        """cascade.json milik model yang dibundel, atau None jika model belum dikalibrasi."""
+        return self.json_section("cascade") if self.has_section("cascade") else None
+
+    def info(self):
+        """Ringkasan untuk log, /readyz, dan /nlu_stats."""
+        return {
+            "path": self.path,
+            "content_hash": self.content_hash,
+            "format_version": self.header["format_version"],
+            "built_at": self.header.get("built_at"),
+            "model": self.header.get("model"),
+            "spacy_version": self.header.get("spacy_version"),
+            "size_bytes": len(self._mapped),
+        }
+
+    def close(self):
+        self._mapped.close()
+
+# --- END OF FILE serving_bundle.py ---
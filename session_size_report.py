@@ -0,0 +1,102 @@
+# --- START OF FILE session_size_report.py ---
+"""Bandingkan ukuran cookie session dan biaya serialisasi: state di cookie (lama) vs session store.
+
+Cara lama menyimpan dialogue_state, clarification_options, dan seluruh nlu_result
+(termasuk Doc spaCy) di cookie Flask. Sekarang cookie hanya berisi sid + nama user,
+dan record ringkas disimpan di session store (memory/sqlite).
+
+Jalankan dari root project:
+    python session_size_report.py --repeat 2000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import secrets
+import tempfile
+import timeit
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+from session_store import MemorySessionStore, SQLiteSessionStore, make_clarification_record
+
+SAMPLE_TEXT = "berapa biaya kuliah teknik informatika dan cara daftarnya"
+
+
+def build_sample_state():
+    """nlu_result dan opsi klarifikasi seperti saat predict() meminta klarifikasi."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        nlu_result = app._process_nlu_direct(SAMPLE_TEXT) if app.nlp else app._empty_nlu_result()
+    if not nlu_result.get("all_intents"):
+        # Model tidak tersedia: skor sintetis untuk semua intent yang punya deskripsi
+        labels = list(app.INTENT_DESCRIPTIONS)
+        nlu_result["all_intents"] = {label: round(1.0 / (i + 2), 6) for i, label in enumerate(labels)}
+        nlu_result["intent"], nlu_result["score"] = labels[0], nlu_result["all_intents"][labels[0]]
+        nlu_result["entities"] = {"PERSON": None, "PRODI": ["Teknik Informatika"], "LAB": []}
+    ranked = sorted(nlu_result["all_intents"].items(), key=lambda item: item[1], reverse=True)[:3]
+    options = {str(i + 1): intent for i, (intent, _) in enumerate(ranked)}
+    return nlu_result, ranked, options
+
+
+def measure_cookie(serializer, payload, repeat):
+    """Ukuran cookie (byte) dan waktu dumps+loads per request (mikrodetik)."""
+    cookie = serializer.dumps(payload)
+    seconds = timeit.timeit(lambda: serializer.loads(serializer.dumps(payload)), number=repeat)
+    return len(cookie), seconds / repeat * 1e6
+
+
+def measure_store(store, record, repeat):
+    sid = secrets.token_urlsafe(16)
+    seconds = timeit.timeit(lambda: (store.set(sid, record), store.get(sid)), number=repeat)
+    return seconds / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laporan ukuran cookie session dan biaya serialisasi.")
+    parser.add_argument("--repeat", type=int, default=2000, help="Jumlah iterasi untuk pengukuran waktu.")
+    args = parser.parse_args()
+
+    serializer = app.app.session_interface.get_signing_serializer(app.app)
+    nlu_result, ranked, options = build_sample_state()
+
+    legacy_nlu = dict(nlu_result, user_text=SAMPLE_TEXT)
+    legacy_doc_serializable = True
+    try:
+        serializer.dumps({"original_ambiguous_nlu": legacy_nlu})
+    except TypeError:
+        # Doc spaCy tidak bisa di-serialisasi JSON: cookie lama gagal disimpan jika hasil NLU masih membawa Doc
+        legacy_doc_serializable = False
+    legacy_nlu["doc"] = None
+    legacy_payload = {
+        "user_name": "Budi",
+        "dialogue_state": "awaiting_intent_clarification",
+        "clarification_options": options,
+        "original_ambiguous_nlu": legacy_nlu,
+    }
+    new_payload = {"user_name": "Budi", "sid": secrets.token_urlsafe(16)}
+    record = make_clarification_record(SAMPLE_TEXT, ranked, options, nlu_result.get("entities"))
+
+    legacy_size, legacy_us = measure_cookie(serializer, legacy_payload, args.repeat)
+    new_size, new_us = measure_cookie(serializer, new_payload, args.repeat)
+
+    memory_us = measure_store(MemorySessionStore(), record, args.repeat)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sqlite_us = measure_store(SQLiteSessionStore(path=os.path.join(tmp_dir, "sessions.sqlite3")), record, args.repeat)
+
+    print(f"--- Session: cookie lama vs session store ({len(nlu_result.get('all_intents', {}))} skor intent) ---")
+    print(f"[*] Doc spaCy di cookie lama    : {'bisa diserialisasi' if legacy_doc_serializable else 'GAGAL (TypeError), diukur dengan doc=None'}")
+    print(f"[*] Cookie lama                 : {legacy_size} byte, dumps+loads {legacy_us:.1f} us/request")
+    print(f"[*] Cookie baru (sid + nama)    : {new_size} byte, dumps+loads {new_us:.1f} us/request")
+    print(f"[*] Record ringkas di server    : {len(json.dumps(record, separators=(',', ':')))} byte")
+    print(f"[*] Session store memory        : set+get {memory_us:.1f} us")
+    print(f"[*] Session store sqlite        : set+get {sqlite_us:.1f} us")
+    print(f"[*] Pengurangan ukuran cookie   : {legacy_size - new_size} byte ({(1 - new_size / legacy_size) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
+
+# --- END OF FILE session_size_report.py ---
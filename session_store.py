@@ -0,0 +1,186 @@
+# --- START OF FILE session_store.py ---
+"""Penyimpanan state dialog di sisi server.
+
+Cookie session Flask hanya berisi `sid` (dan nama user); state klarifikasi intent
+disimpan di sini sebagai record ringkas (lihat make_clarification_record), bukan
+seluruh nlu_result beserta Doc spaCy.
+
+Backend:
+    memory  LRU + TTL di dalam proses (cepat, tapi tidak dibagi antar worker gunicorn).
+    sqlite  File SQLite (WAL) yang bisa dipakai bersama oleh beberapa worker di satu mesin.
+            Path wajib diberikan (app.py: SESSION_STORE_PATH, default di folder instance/ aplikasi);
+            file dibuat dengan izin 0600 karena berisi state dialog user.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CLARIFICATION_STATE = "awaiting_intent_clarification"
+
+
+def make_clarification_record(text, candidates, options, entities):
+    """Record ringkas untuk state klarifikasi intent.
+
+    Args:
+        text (str): Teks asli user yang ambigu.
+        candidates (list): [(intent, skor), ...] yang ditawarkan.
+        options (dict): Nomor pilihan ('1', '2', ...) -> intent.
+        entities (dict): Entitas hasil NLU; hanya canonical PRODI/LAB/MATKUL dan PERSON yang disimpan.
+    """
+    entities = entities or {}
+    return {
+        "state": CLARIFICATION_STATE,
+        "text": text,
+        "candidates": [[intent, round(float(score), 4)] for intent, score in candidates],
+        "options": dict(options),
+        "entities": {
+            "PERSON": entities.get("PERSON"),
+            "PRODI": list(entities.get("PRODI") or []),
+            "LAB": list(entities.get("LAB") or []),
+            "MATKUL": list(entities.get("MATKUL") or []),
+        },
+    }
+
+
+class MemorySessionStore:
+    """Store in-process dengan batas jumlah sesi (LRU) dan umur (TTL)."""
+
+    backend = "memory"
+
+    def __init__(self, max_size=10000, ttl_seconds=1800):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl_seconds) if ttl_seconds else None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            stored_at, record = entry
+            if self.ttl is not None and now - stored_at > self.ttl:
+                del self._data[sid]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(sid)
+            # Record dibuat ulang setiap set(), jadi salinan dangkal cukup untuk pemanggil
+            return dict(record)
+
+    def set(self, sid, record):
+        with self._lock:
+            self._data[sid] = (time.monotonic(), dict(record))
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, sid):
+        with self._lock:
+            return self._data.pop(sid, None) is not None
+
+    def stats(self):
+        with self._lock:
+            return {"backend": self.backend, "size": len(self._data), "max_size": self.max_size,
+                    "ttl_seconds": self.ttl, "evictions": self.evictions, "expirations": self.expirations}
+
+
+def _prepare_private_file(path):
+    """Pastikan file database ada, milik proses ini, dan hanya bisa dibaca/ditulis pemiliknya (0600).
+
+    File -wal/-shm yang dibuat SQLite mengikuti izin file database.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    try:
+        # Gagal (PermissionError) jika file sudah ada tapi milik user lain
+        os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+class SQLiteSessionStore:
+    """Store berbasis file SQLite; aman dipakai beberapa proses (worker gunicorn) di satu mesin.
+
+    Satu koneksi per thread (dan per proses setelah fork). Record disimpan sebagai JSON.
+    Tidak ada path default di direktori bersama (mis. /tmp): user lain di mesin yang sama bisa
+    membuat file itu lebih dulu lalu membaca atau menanam state sesi.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path, ttl_seconds=1800, purge_interval=60.0):
+        if not path:
+            raise ValueError("SQLiteSessionStore butuh path file (set SESSION_STORE_PATH).")
+        self.path = path
+        _prepare_private_file(path)
+        self.ttl = float(ttl_seconds) if ttl_seconds else None
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS dialogue_sessions ("
+                         "sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_dialogue_sessions_expires ON dialogue_sessions(expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid):
+        row = self._connect().execute(
+            "SELECT data, expires_at FROM dialogue_sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None:
+            return None
+        data, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(sid)
+            return None
+        return json.loads(data)
+
+    def set(self, sid, record):
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        self._connect().execute(
+            "INSERT OR REPLACE INTO dialogue_sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, json.dumps(record, ensure_ascii=False, separators=(",", ":")), expires_at))
+        self._maybe_purge()
+
+    def delete(self, sid):
+        cursor = self._connect().execute("DELETE FROM dialogue_sessions WHERE sid = ?", (sid,))
+        return cursor.rowcount > 0
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        self._connect().execute("DELETE FROM dialogue_sessions WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+
+    def stats(self):
+        size = self._connect().execute("SELECT COUNT(*) FROM dialogue_sessions").fetchone()[0]
+        return {"backend": self.backend, "path": self.path, "size": size, "ttl_seconds": self.ttl}
+
+
+def create_session_store(backend="memory", ttl_seconds=1800, max_size=10000, path=None):
+    """Buat session store sesuai nama backend ('memory' atau 'sqlite'; sqlite butuh path)."""
+    if backend == "memory":
+        return MemorySessionStore(max_size=max_size, ttl_seconds=ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path=path, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Backend session store '{backend}' tidak dikenal (pilih 'memory' atau 'sqlite').")
+
+# --- END OF FILE session_store.py ---
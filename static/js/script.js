@@ -50,24 +50,12 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
 
-    chatForm.addEventListener("submit", function(event) {
-        event.preventDefault();
-
-        const userInput = userInputField.value.trim();
-        if (!userInput) return;
-
-        // Tampilkan pesan pengguna
-        addMessage('user', userInput);
-
-        // Kosongkan input field
-        userInputField.value = "";
-        userInputField.focus(); // Fokus kembali ke input
-
-        // Tampilkan loading indicator (typing indicator)
-        const loadingWrapper = addMessage('bot', '<div class="typing-indicator"><span></span><span></span><span></span></div>', true);
+    // Error yang berarti giliran chat BELUM diproses server, sehingga aman diulang lewat /predict
+    class StreamUnavailableError extends Error {}
 
-        // *** BAGIAN INI TIDAK DIUBAH (Interaksi Backend) ***
-        fetch('/predict', {
+    // Mode lama: satu respons JSON utuh
+    function sendClassic(userInput, loadingWrapper) {
+        return fetch('/predict', {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify({ text: userInput })
@@ -83,17 +71,131 @@ document.addEventListener('DOMContentLoaded', () => {
             loadingWrapper.remove(); // Hapus loading indicator
             // Tampilkan respons bot
             addMessage('bot', data.answer || "Maaf, saya tidak bisa memproses permintaan Anda saat ini.");
+        });
+    }
+
+    // Mode streaming: event SSE 'intent', lalu 'chunk' (potongan jawaban), lalu 'done'
+    async function sendStreaming(userInput, loadingWrapper) {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            throw new StreamUnavailableError('Browser tidak mendukung ReadableStream');
+        }
+        let response;
+        try {
+            response = await fetch('/predict_stream', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json', 'Accept': 'text/event-stream'},
+                body: JSON.stringify({ text: userInput })
+            });
+        } catch (error) {
+            throw new StreamUnavailableError(error.message);
+        }
+        if (response.status === 404 || response.status === 405) {
+            throw new StreamUnavailableError(`Endpoint streaming tidak ada (status ${response.status})`);
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream') || !response.body) {
+            // Server menjawab JSON biasa (misal versi lama): tampilkan seperti /predict
+            const data = await response.json();
+            loadingWrapper.remove();
+            addMessage('bot', data.answer || "Maaf, saya tidak bisa memproses permintaan Anda saat ini.");
+            return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let bubble = null;
+        let answer = '';
+        let finished = false;
+        let intentCategory = '';
+
+        function handleEvent(rawEvent) {
+            let eventName = 'message';
+            const dataLines = [];
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+            });
+            if (!dataLines.length) return;
+            const payload = JSON.parse(dataLines.join('\n'));
+            if (eventName === 'chunk') {
+                if (!bubble) {
+                    // Potongan pertama: ganti typing indicator dengan bubble jawaban
+                    loadingWrapper.remove();
+                    const wrapper = addMessage('bot', '');
+                    wrapper.dataset.intent = intentCategory;
+                    bubble = wrapper.querySelector('.chat-bubble');
+                }
+                answer += payload.text;
+                bubble.textContent = answer;
+                responseContainer.scrollTop = responseContainer.scrollHeight;
+            } else if (eventName === 'intent') {
+                // Kosong jika intent handler belum berjalan; kategori akhir datang di event 'done'
+                intentCategory = payload.final_intent_category || '';
+            } else if (eventName === 'done') {
+                finished = true;
+                const finalCategory = (payload.debug_info || {}).final_intent_category;
+                if (bubble && finalCategory) bubble.parentElement.dataset.intent = finalCategory;
+            }
+        }
+
+        while (true) {
+            let value, done;
+            try {
+                ({ value, done } = await reader.read());
+            } catch (error) {
+                if (!bubble) throw error;
+                break; // Jawaban parsial sudah tampil; ditandai di bawah
+            }
+            if (value) buffer += decoder.decode(value, { stream: true });
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                handleEvent(buffer.slice(0, separator));
+                buffer = buffer.slice(separator + 2);
+            }
+            if (done) break;
+        }
+        if (!bubble) {
+            loadingWrapper.remove();
+            addMessage('bot', "Maaf, saya tidak bisa memproses permintaan Anda saat ini.");
+        } else if (!finished) {
+            // Koneksi terputus di tengah jawaban: jawaban parsial tetap ditampilkan
+            bubble.textContent = answer + "\n\n(Koneksi terputus, jawaban mungkin belum lengkap.)";
+        }
+    }
+
+    chatForm.addEventListener("submit", function(event) {
+        event.preventDefault();
+
+        const userInput = userInputField.value.trim();
+        if (!userInput) return;
+
+        // Tampilkan pesan pengguna
+        addMessage('user', userInput);
+
+        // Kosongkan input field
+        userInputField.value = "";
+        userInputField.focus(); // Fokus kembali ke input
+
+        // Tampilkan loading indicator (typing indicator)
+        const loadingWrapper = addMessage('bot', '<div class="typing-indicator"><span></span><span></span><span></span></div>', true);
+
+        // Coba /predict_stream dulu (jawaban tampil bertahap); jika tidak didukung, pakai /predict
+        sendStreaming(userInput, loadingWrapper)
+        .catch(error => {
+            if (!(error instanceof StreamUnavailableError)) throw error;
+            console.warn('Streaming tidak tersedia, kembali ke /predict:', error.message);
+            return sendClassic(userInput, loadingWrapper);
         })
         .catch(error => {
             console.error('Fetch Error:', error);
             loadingWrapper.remove(); // Hapus loading indicator jika ada error
             // Tampilkan pesan error yang lebih ramah
             addMessage('bot', "Waduh, sepertinya ada gangguan jaringan atau server. Silakan coba lagi beberapa saat.");
-        })
-        // .finally(() => {
-            // Scroll sudah dilakukan di dalam addMessage
-        // });
-         // *** AKHIR BAGIAN YANG TIDAK DIUBAH ***
+        });
     });
 });
 
@@ -0,0 +1,202 @@
+# --- START OF FILE structured_log.py ---
+"""Logging terstruktur non-blocking (JSON lines) untuk jalur request.
+
+Thread pemanggil hanya membentuk record lalu memasukkannya ke antrean terbatas dengan
+put_nowait; satu thread latar (QueueListener) yang menulis ke stdout. Jika antrean penuh,
+record dibuang dan dihitung, sehingga worker inferensi tidak pernah menunggu I/O log.
+
+Level DEBUG/INFO bisa di-sampling (LOG_SAMPLE_RATE); WARNING ke atas selalu ditulis.
+Pesan diformat secara lazy (logger.debug("... %s", arg)), jadi log di bawah LOG_LEVEL
+hanya berbiaya satu pengecekan level.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower() # 'json' (JSON lines) atau 'text' ("LEVEL: pesan")
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000)) # Record yang menunggu ditulis; lebih dari ini dibuang
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0)) # Fraksi record DEBUG/INFO yang ditulis
+
+ROOT_LOGGER_NAME = "chatbot"
+
+# Atribut bawaan LogRecord; atribut lain (dari extra=...) ikut ditulis sebagai field JSON
+_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu record = satu baris JSON: ts, level, logger, msg, pid, field extra, dan exc jika ada."""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format lama ala print(): "LEVEL: pesan", untuk pengembangan lokal."""
+
+    def format(self, record):
+        text = f"{record.levelname}: {record.getMessage()}"
+        if record.exc_text:
+            text += "\n" + record.exc_text
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """Loloskan hanya sebagian record sampai level `max_level`; level di atasnya selalu lolos."""
+
+    def __init__(self, rate=1.0, max_level=logging.INFO):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, float(rate)))
+        self.max_level = max_level
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if self.rate >= 1.0 or record.levelno > self.max_level:
+            return True
+        if random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Saat berhenti boleh menunggu: thread penulis terus mengosongkan antrean, sisa record tetap tertulis
+        self.queue.put(self._sentinel)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang tidak pernah menunggu: antrean penuh = record dibuang dan dihitung.
+
+    Thread penulis (QueueListener) dijalankan saat record pertama masuk, dan dibuat ulang
+    di proses anak setelah fork (thread tidak ikut ter-fork, misalnya worker gunicorn --preload).
+    """
+
+    def __init__(self, target, max_size=10000):
+        self.max_size = max(1, int(max_size))
+        super().__init__(queue.Queue(self.max_size))
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._start_lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def prepare(self, record):
+        # Pesan dan traceback dibentuk di thread pemanggil (argumen bisa berubah setelahnya);
+        # penulisan ke stream dikerjakan thread listener.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._listener is None:
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_listener(self):
+        with self._start_lock:
+            if self._listener is None:
+                listener = _Listener(self.queue, self.target)
+                listener.start()
+                self._listener = listener
+
+    def stop(self):
+        """Tulis sisa antrean lalu hentikan thread listener (dipanggil saat proses keluar)."""
+        with self._start_lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+    def _reset_after_fork(self):
+        # Antrean/lock bisa saja sedang dipegang thread lain saat fork; buat baru di proses anak
+        self.queue = queue.Queue(self.max_size)
+        self._start_lock = threading.Lock()
+        self._listener = None
+        self.dropped = 0
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "max_queue": self.max_size, "dropped": self.dropped}
+
+
+_handler = None
+_sampler = None
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, queue_size=LOG_QUEUE_SIZE, sample_rate=LOG_SAMPLE_RATE, stream=None):
+    """Pasang handler antrean ke logger 'chatbot'. Aman dipanggil berulang (handler lama diganti)."""
+    global _handler, _sampler
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _handler.stop()
+
+    target = logging.StreamHandler(stream or sys.stdout)
+    target.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+    _sampler = SamplingFilter(sample_rate)
+    _handler = NonBlockingQueueHandler(target, max_size=queue_size)
+    _handler.addFilter(_sampler)
+
+    root.addHandler(_handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.propagate = False
+    return root
+
+
+def get_logger(name):
+    """Logger anak dari 'chatbot' (misalnya get_logger('app') -> 'chatbot.app')."""
+    if _handler is None:
+        configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def logging_stats():
+    """Status logger untuk /nlu_stats: level, format, sampling, dan record yang dibuang."""
+    if _handler is None:
+        return {"configured": False}
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    return {
+        "configured": True,
+        "level": logging.getLevelName(root.level),
+        "format": "text" if isinstance(_handler.target.formatter, TextFormatter) else "json",
+        "sample_rate": _sampler.rate,
+        "sampled_out": _sampler.sampled_out,
+        **_handler.stats(),
+    }
+
+
+def _shutdown():
+    if _handler is not None:
+        _handler.stop()
+
+
+atexit.register(_shutdown)
+
+# --- END OF FILE structured_log.py ---